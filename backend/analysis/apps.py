@@ -1,6 +1,7 @@
 import logging
 
 from django.apps import AppConfig
+from django.conf import settings
 
 from analysis.constants import FAERS_QUARTER_RANGE_END, FAERS_QUARTER_RANGE_START
 
@@ -16,3 +17,10 @@ class AnalysisConfig(AppConfig):
             FAERS_QUARTER_RANGE_START,
             FAERS_QUARTER_RANGE_END,
         )
+        if settings.EMAIL_OUTBOX_BACKGROUND_SENDER:
+            from analysis.email_outbox import is_server_process, outbox_sender
+
+            # Send the emails left in the outbox by a restart without waiting for
+            # a new one to be queued
+            if is_server_process():
+                outbox_sender.start()
@@ -0,0 +1,213 @@
+import logging
+import os
+import sys
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from analysis.email_service import EmailService
+from analysis.models import EmailKind, EmailStatus, OutboxEmail, Result, ResultStatus
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_result_email(result: Result) -> Optional[OutboxEmail]:
+    """
+    Queue the notification email matching the result status.
+    Only completed and failed results are notified. Returns the outbox entry,
+    or None if the status does not require an email.
+
+    A result notifies once per query run: a retried pipeline callback maps to the
+    same dedup_key and does not queue a second email.
+    """
+    query = result.query
+    context = {
+        "query_name": query.name,
+        "chart_url": f"{settings.FRONTEND_URL}/queries/{query.id}",
+    }
+
+    if result.status == ResultStatus.COMPLETED:
+        kind = EmailKind.QUERY_COMPLETION
+    elif result.status == ResultStatus.FAILED:
+        kind = EmailKind.QUERY_ERROR
+        context["error_message"] = getattr(
+            result, "error_message", "pipeline error running"
+        )
+    else:
+        return None
+
+    dedup_key = f"{kind}:{result.id}:{query.updated_at.isoformat()}"
+    email, created = OutboxEmail.objects.get_or_create(
+        dedup_key=dedup_key,
+        defaults={
+            "kind": kind,
+            "recipient": query.user.email,
+            "context": context,
+        },
+    )
+
+    if created:
+        logger.info(f"Queued {kind} email {email.id} for result {result.id}")
+        # Wake the sender only once the outbox row is visible to other connections
+        transaction.on_commit(outbox_sender.wake)
+    else:
+        logger.info(
+            f"Skipping duplicate {kind} email for result {result.id} (outbox email {email.id})"
+        )
+    return email
+
+
+def _build_message(email_service: EmailService, email: OutboxEmail):
+    if email.kind == EmailKind.QUERY_COMPLETION:
+        return email_service.build_query_completion_email(
+            user_email=email.recipient, **email.context
+        )
+    if email.kind == EmailKind.QUERY_ERROR:
+        return email_service.build_query_error_email(
+            user_email=email.recipient, **email.context
+        )
+    raise ValueError(f"Unknown outbox email kind: {email.kind}")
+
+
+def _record_failure(email: OutboxEmail, error: Exception) -> None:
+    """Schedule the next attempt with exponential backoff, or give up."""
+    email.attempts += 1
+    email.last_error = str(error)
+
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = EmailStatus.FAILED
+        logger.error(
+            f"Giving up on outbox email {email.id} after {email.attempts} attempts: {error}"
+        )
+    else:
+        delay = min(
+            settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1),
+            settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS,
+        )
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        logger.warning(
+            f"Outbox email {email.id} failed (attempt {email.attempts}), retrying in {delay}s: {error}"
+        )
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def send_pending_emails(batch_size: Optional[int] = None) -> int:
+    """
+    Send one batch of due outbox emails over a single SMTP connection.
+
+    Rows are locked while the batch is sent, so concurrent senders skip them.
+    Returns the number of emails processed (sent or failed).
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    email_service = EmailService()
+
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailStatus.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if not emails:
+            return 0
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error(f"Failed to open email connection for outbox batch: {e}")
+            for email in emails:
+                _record_failure(email, e)
+            return len(emails)
+
+        try:
+            for email in emails:
+                try:
+                    message = _build_message(email_service, email)
+                    message.connection = connection
+                    message.send()
+                except Exception as e:
+                    _record_failure(email, e)
+                    continue
+
+                email.status = EmailStatus.SENT
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.save(update_fields=["status", "attempts", "sent_at"])
+                logger.info(f"Outbox email {email.id} sent to {email.recipient}")
+        finally:
+            connection.close()
+
+    return len(emails)
+
+
+def is_server_process(argv=None) -> bool:
+    """
+    Whether this process serves requests, so it should run the background sender.
+
+    Management commands other than runserver exit when done and send nothing. With
+    the autoreloader, runserver serves from a child process (RUN_MAIN=true) and the
+    parent only watches the files.
+    """
+    argv = sys.argv if argv is None else argv
+    program = os.path.basename(argv[0]) if argv else ""
+    if program not in ("manage.py", "django-admin"):
+        # WSGI/ASGI server
+        return True
+    command = argv[1] if len(argv) > 1 else ""
+    if command != "runserver":
+        return False
+    return "--noreload" in argv or os.environ.get("RUN_MAIN") == "true"
+
+
+class OutboxSender:
+    """
+    Background thread that drains the email outbox.
+
+    The thread is started with the server process (see AnalysisConfig.ready), so
+    emails left pending or waiting for a retry by a restart are sent, or else on
+    the first wake(). It sends due emails whenever it is woken up or the poll
+    interval elapses (to pick up retries).
+    """
+
+    def __init__(self):
+        self._wake_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        """Ask the sender to process the outbox now."""
+        if not settings.EMAIL_OUTBOX_BACKGROUND_SENDER:
+            return
+        self.start()
+        self._wake_event.set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="email-outbox-sender", daemon=True
+            )
+            self._thread.start()
+            logger.info("Email outbox sender started")
+
+    def _run(self) -> None:
+        while True:
+            self._wake_event.clear()
+            try:
+                # Keep sending while full batches come back
+                while send_pending_emails() >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.exception("Email outbox sender iteration failed: %s", str(e))
+            finally:
+                close_old_connections()
+            self._wake_event.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS)
+
+
+outbox_sender = OutboxSender()
@@ -17,6 +17,48 @@ class EmailService:
         self.email_password = settings.EMAIL_HOST_PASSWORD
         self.use_tls = settings.EMAIL_USE_TLS
 
+    def build_query_completion_email(
+        self, user_email, query_name, chart_url=None, chart_file_path=None
+    ) -> EmailMultiAlternatives:
+        """
+        Build the email notification sent when query processing is complete
+        """
+        # Email subject
+        subject = f"Your Query Analysis is Ready: {query_name}"
+
+        # Email context for template
+        context = {
+            "query_name": query_name,
+            "chart_url": chart_url,
+            "user_email": user_email,
+            "support_email": settings.DEFAULT_FROM_EMAIL,
+            "site_name": getattr(settings, "SITE_NAME", "Drug Analysis Platform"),
+        }
+
+        # Render HTML email template
+        html_content = render_to_string(
+            "account/email/email_query_completion.html", context
+        )
+        text_content = strip_tags(html_content)  # Plain text version
+
+        # Create email message
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user_email],
+        )
+
+        # Attach HTML version
+        email.attach_alternative(html_content, "text/html")
+
+        # Attach chart file if provided
+        if chart_file_path and os.path.exists(chart_file_path):
+            with open(chart_file_path, "rb") as attachment:
+                email.attach(f"{query_name}_chart.png", attachment.read(), "image/png")
+
+        return email
+
     def send_query_completion_email(
         self, user_email, query_name, chart_url=None, chart_file_path=None
     ):
@@ -24,43 +66,9 @@ class EmailService:
         Send email notification when query processing is complete
         """
         try:
-            # Email subject
-            subject = f"Your Query Analysis is Ready: {query_name}"
-
-            # Email context for template
-            context = {
-                "query_name": query_name,
-                "chart_url": chart_url,
-                "user_email": user_email,
-                "support_email": settings.DEFAULT_FROM_EMAIL,
-                "site_name": getattr(settings, "SITE_NAME", "Drug Analysis Platform"),
-            }
-
-            # Render HTML email template
-            html_content = render_to_string(
-                "account/email/email_query_completion.html", context
+            email = self.build_query_completion_email(
+                user_email, query_name, chart_url, chart_file_path
             )
-            text_content = strip_tags(html_content)  # Plain text version
-
-            # Create email message
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user_email],
-            )
-
-            # Attach HTML version
-            email.attach_alternative(html_content, "text/html")
-
-            # Attach chart file if provided
-            if chart_file_path and os.path.exists(chart_file_path):
-                with open(chart_file_path, "rb") as attachment:
-                    email.attach(
-                        f"{query_name}_chart.png", attachment.read(), "image/png"
-                    )
-
-            # Send email
             email.send()
 
             logger.info(f"Query completion email sent successfully to {user_email}")
@@ -74,6 +82,36 @@ class EmailService:
             )
             return False
 
+    def build_query_error_email(
+        self, user_email, query_name, error_message, chart_url=None
+    ) -> EmailMultiAlternatives:
+        """
+        Build the email notification sent when query processing fails
+        """
+        subject = f"Query Processing Failed: {query_name}"
+
+        context = {
+            "query_name": query_name,
+            "error_message": error_message,
+            "user_email": user_email,
+            "support_email": settings.DEFAULT_FROM_EMAIL,
+            "site_name": getattr(settings, "SITE_NAME", "Drug Analysis Platform"),
+            "chart_url": chart_url,  # if chart_url exists
+        }
+
+        html_content = render_to_string("account/email/email_query_error.html", context)
+        text_content = strip_tags(html_content)
+
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user_email],
+        )
+
+        email.attach_alternative(html_content, "text/html")
+        return email
+
     def send_query_error_email(
         self, user_email, query_name, error_message, chart_url=None
     ):
@@ -81,31 +119,9 @@ class EmailService:
         Send email notification when query processing fails
         """
         try:
-            self._log_email_config("error", user_email, query_name)
-            subject = f"Query Processing Failed: {query_name}"
-
-            context = {
-                "query_name": query_name,
-                "error_message": error_message,
-                "user_email": user_email,
-                "support_email": settings.DEFAULT_FROM_EMAIL,
-                "site_name": getattr(settings, "SITE_NAME", "Drug Analysis Platform"),
-                "chart_url": chart_url,  # if chart_url exists
-            }
-
-            html_content = render_to_string(
-                "account/email/email_query_error.html", context
+            email = self.build_query_error_email(
+                user_email, query_name, error_message, chart_url
             )
-            text_content = strip_tags(html_content)
-
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user_email],
-            )
-
-            email.attach_alternative(html_content, "text/html")
             email.send()
 
             logger.info(f"Query error email sent successfully to {user_email}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from analysis.email_outbox import send_pending_emails
+
+
+class Command(BaseCommand):
+    """
+    Sends all due emails from the email outbox.
+    Useful for draining emails queued before a restart or when the background sender is disabled.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            help="Number of emails sent over a single connection",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            processed = send_pending_emails(batch_size)
+            total += processed
+            if processed == 0:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} outbox emails"))
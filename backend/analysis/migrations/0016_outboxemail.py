@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:15
+
+import django.core.validators
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0001_squashed_0015_remove_drug_case_remove_reaction_case_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.TextField(choices=[('query_completion', 'Query completion'), ('query_error', 'Query error')])),
+                ('recipient', models.TextField(validators=[django.core.validators.MaxLengthValidator(254)])),
+                ('context', models.JSONField(default=dict)),
+                ('dedup_key', models.TextField(unique=True, validators=[django.core.validators.MaxLengthValidator(255)])),
+                ('status', models.TextField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending')),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='analysis_ou_status_cc2b6e_idx')],
+            },
+        ),
+    ]
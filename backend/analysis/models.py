@@ -6,6 +6,7 @@ from django.core.validators import (
 )
 from django.db import models
 from django.db.models import CheckConstraint, Q
+from django.utils import timezone
 
 from analysis.constants import DB_YEAR_START, DB_YEAR_END
 
@@ -113,6 +114,47 @@ class Result(models.Model):
         return f"Result #{self.id} for Query #{self.query.id}"
 
 
+class EmailKind(models.TextChoices):
+    QUERY_COMPLETION = "query_completion", "Query completion"
+    QUERY_ERROR = "query_error", "Query error"
+
+
+class EmailStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    SENT = "sent", "Sent"
+    FAILED = "failed", "Failed"
+
+
+class OutboxEmail(models.Model):
+    """
+    A notification email waiting to be sent by the background outbox sender.
+
+    Emails are queued instead of sent inline so pipeline callbacks do not wait on SMTP.
+    dedup_key prevents sending the same notification twice when a callback is retried.
+    """
+
+    kind = models.TextField(choices=EmailKind.choices)
+    recipient = models.TextField(validators=[MaxLengthValidator(254)])
+    # Arguments for the EmailService builder of this kind (query_name, chart_url, ...)
+    context = models.JSONField(default=dict)
+    dedup_key = models.TextField(unique=True, validators=[MaxLengthValidator(255)])
+
+    status = models.TextField(choices=EmailStatus.choices, default=EmailStatus.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["next_attempt_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.kind} email to {self.recipient} ({self.status})"
+
+
 # Note: Pipeline-related models (Case, Demo, Drug, Outcome, Reaction) have been removed
 # as pipeline logic now runs in an external service. Only Query/Result models remain
 # for the Django API, along with DrugName/ReactionName models for search functionality.
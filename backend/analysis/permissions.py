@@ -1,6 +1,8 @@
 import ipaddress
 import logging
 import socket
+import threading
+import time
 
 from django.conf import settings
 from rest_framework.permissions import BasePermission
@@ -8,6 +10,134 @@ from rest_framework.permissions import BasePermission
 logger = logging.getLogger(__name__)
 
 
+class CompiledWhitelist:
+    """
+    Pipeline service whitelist parsed once from PIPELINE_SERVICE_IPS.
+
+    IP and CIDR rules are kept as ip_network objects. Hostname rules (e.g. docker
+    service names like "pipeline-api") are resolved through a TTL cache that is
+    refreshed in a background thread, so checking a client IP never waits on DNS
+    except for the very first lookup of a hostname.
+    """
+
+    def __init__(self, rules, ttl_seconds):
+        self.rules = tuple(rules)
+        self.ttl_seconds = ttl_seconds
+        self.networks = []
+        self.hostnames = []
+        for rule in self.rules:
+            try:
+                self.networks.append(ipaddress.ip_network(rule, strict=False))
+            except ValueError:
+                self.hostnames.append(rule)
+
+        self._lock = threading.Lock()
+        # hostname -> (frozenset of resolved addresses, monotonic expiry time)
+        self._resolved = {}
+        self._refresh_thread = None
+
+    def allows(self, client_ip):
+        if not client_ip:
+            return False
+        try:
+            address = ipaddress.ip_address(client_ip)
+        except ValueError:
+            return False
+
+        if any(address in network for network in self.networks):
+            return True
+
+        return any(
+            address in self.resolved_addresses(hostname) for hostname in self.hostnames
+        )
+
+    def resolved_addresses(self, hostname):
+        """Return cached addresses for hostname, scheduling a refresh once they expire."""
+        entry = self._resolved.get(hostname)
+        if entry is None:
+            # Nothing to serve yet: resolve inline once
+            return self.refresh_hostname(hostname)
+
+        addresses, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self.schedule_refresh()
+        return addresses
+
+    def refresh_hostname(self, hostname):
+        try:
+            resolved = socket.getaddrinfo(hostname, None)
+        except socket.gaierror as e:
+            logger.warning(f"Failed to resolve pipeline service host {hostname}: {e}")
+            resolved = []
+
+        addresses = set()
+        for item in resolved:
+            sockaddr = item[4]
+            if not sockaddr:
+                continue
+            try:
+                addresses.add(ipaddress.ip_address(sockaddr[0]))
+            except ValueError:
+                continue
+
+        addresses = frozenset(addresses)
+        self._resolved[hostname] = (addresses, time.monotonic() + self.ttl_seconds)
+        return addresses
+
+    def refresh_hostnames(self):
+        for hostname in self.hostnames:
+            self.refresh_hostname(hostname)
+
+    def schedule_refresh(self):
+        """Refresh all hostnames in a background thread, unless one is already running."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self.refresh_hostnames,
+                name="pipeline-whitelist-refresh",
+                daemon=True,
+            )
+            self._refresh_thread.start()
+
+
+class PipelineServiceWhitelist:
+    """Process-wide holder of the compiled whitelist, rebuilt only when the rules change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+
+    def get(self, rules):
+        rules = tuple(rules)
+        ttl_seconds = getattr(settings, "PIPELINE_SERVICE_HOSTNAME_TTL_SECONDS", 60)
+        compiled = self._compiled
+        if (
+            compiled is not None
+            and compiled.rules == rules
+            and compiled.ttl_seconds == ttl_seconds
+        ):
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled
+            if (
+                compiled is None
+                or compiled.rules != rules
+                or compiled.ttl_seconds != ttl_seconds
+            ):
+                compiled = CompiledWhitelist(rules, ttl_seconds)
+                self._compiled = compiled
+            return compiled
+
+    def reset(self):
+        with self._lock:
+            self._compiled = None
+
+
+pipeline_service_whitelist = PipelineServiceWhitelist()
+
+
 class IsPipelineService(BasePermission):
     """
     Permission class to check if request is from the authorized pipeline service IP.
@@ -81,10 +211,7 @@ class IsPipelineService(BasePermission):
             self.log_denied_request(client_ip, endpoint, "missing_client_ip")
             return False
 
-        if any(
-            self.ip_matches_rule(client_ip, allowed_ip)
-            for allowed_ip in normalized_rules
-        ):
+        if pipeline_service_whitelist.get(normalized_rules).allows(client_ip):
             logger.info(
                 "Allowed pipeline callback request.",
                 extra={
@@ -121,37 +248,6 @@ class IsPipelineService(BasePermission):
             if isinstance(rule, str) and rule.strip()
         ]
 
-    def ip_matches_rule(self, client_ip, allowed_value):
-        if not client_ip or not allowed_value:
-            return False
-
-        # Exact string match for literal IP entries.
-        if client_ip == allowed_value:
-            return True
-
-        try:
-            return ipaddress.ip_address(client_ip) in ipaddress.ip_network(
-                allowed_value, strict=False
-            )
-        except ValueError:
-            # Support hostname rules (e.g. docker service names like "pipeline-api").
-            # Resolve hostname to IP(s) via DNS and check if client_ip matches any resolved address.
-            # This enables container-based deployments where services communicate by name rather than IP.
-            try:
-                resolved = socket.getaddrinfo(allowed_value, None)
-            except socket.gaierror:
-                return False
-
-            for item in resolved:
-                sockaddr = item[4]
-                if not sockaddr:
-                    continue
-                resolved_ip = sockaddr[0]
-                if resolved_ip == client_ip:
-                    return True
-
-            return False
-
     def log_denied_request(self, client_ip, endpoint, reason):
         logger.warning(
             "Denied pipeline callback request.",
@@ -0,0 +1,313 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: the pipeline (or a proxy in front of it) is temporarily unavailable
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+
+def failed_before_sending(error: requests.exceptions.RequestException) -> bool:
+    """
+    Whether the request failed while connecting, so the pipeline never received it.
+
+    Other connection errors (a reset connection, a failed read of the response) can
+    happen after the request was sent and processed.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying error
+    reason = getattr(error.args[0], "reason", error.args[0])
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling the pipeline while the circuit breaker is open."""
+
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold failures in a row the circuit opens and calls are
+    short-circuited for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                logger.info("Pipeline circuit breaker half-open, sending trial request")
+                return True
+            # Half-open: a trial request is already in flight
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Pipeline circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"Pipeline circuit breaker opened after {self._failures} consecutive failures, "
+                        f"short-circuiting calls for {self.reset_timeout}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ClientMetrics:
+    """Thread-safe counters for pipeline calls latency and failures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests = 0
+            self._failures = 0
+            self._retries = 0
+            self._short_circuited = 0
+            self._latency_ms_total = 0.0
+            self._latency_ms_max = 0.0
+
+    def record_request(self, latency_ms: float, failed: bool) -> None:
+        with self._lock:
+            self._requests += 1
+            self._latency_ms_total += latency_ms
+            self._latency_ms_max = max(self._latency_ms_max, latency_ms)
+            if failed:
+                self._failures += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._retries += 1
+
+    def record_short_circuit(self) -> None:
+        with self._lock:
+            self._short_circuited += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "failures": self._failures,
+                "retries": self._retries,
+                "short_circuited": self._short_circuited,
+                "latency_ms_avg": (
+                    self._latency_ms_total / self._requests if self._requests else 0.0
+                ),
+                "latency_ms_max": self._latency_ms_max,
+            }
+
+
+class PipelineHttpClient:
+    """
+    Shared HTTP client for backend -> pipeline calls.
+
+    Reuses pooled keep-alive connections through a single requests.Session,
+    retries transient failures with exponential backoff and jitter,
+    and short-circuits calls with a circuit breaker while the pipeline is down.
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        pool_maxsize: Optional[int] = None,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+    ):
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else getattr(settings, "PIPELINE_HTTP_MAX_RETRIES", 3)
+        )
+        self.backoff_base = (
+            backoff_base
+            if backoff_base is not None
+            else getattr(settings, "PIPELINE_HTTP_BACKOFF_BASE_SECONDS", 0.5)
+        )
+        self.backoff_max = (
+            backoff_max
+            if backoff_max is not None
+            else getattr(settings, "PIPELINE_HTTP_BACKOFF_MAX_SECONDS", 8)
+        )
+        pool_maxsize = pool_maxsize or getattr(settings, "PIPELINE_HTTP_POOL_SIZE", 10)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=(
+                failure_threshold
+                if failure_threshold is not None
+                else getattr(settings, "PIPELINE_CIRCUIT_FAILURE_THRESHOLD", 5)
+            ),
+            reset_timeout=(
+                reset_timeout
+                if reset_timeout is not None
+                else getattr(settings, "PIPELINE_CIRCUIT_RESET_SECONDS", 30)
+            ),
+        )
+        self.metrics = ClientMetrics()
+
+    def reset(self) -> None:
+        """Close the circuit and clear metrics."""
+        self.circuit_breaker.reset()
+        self.metrics.reset()
+
+    def stats(self) -> Dict[str, object]:
+        """Circuit state and call metrics of this process, reported by the health check."""
+        return {"circuit": self.circuit_breaker.state, **self.metrics.snapshot()}
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return random.uniform(0, delay)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        max_retries: Optional[int] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a request, retrying transient failures.
+
+        Failures to connect are always retried, since the pipeline never got the request.
+        Other connection errors, timeouts and 5xx responses are only retried for
+        idempotent requests (GET by default): they can happen after the pipeline
+        received the request, and retrying a POST could start the same pipeline run twice.
+        The last response is returned even if it is a 5xx, so callers can raise_for_status.
+        """
+        method = method.upper()
+        max_retries = self.max_retries if max_retries is None else max_retries
+        if idempotent is None:
+            idempotent = method == "GET"
+
+        if not self.circuit_breaker.allow_request():
+            self.metrics.record_short_circuit()
+            logger.warning(f"{method} {url} short-circuited: pipeline circuit is open")
+            raise CircuitOpenError(f"Pipeline circuit is open, skipping {method} {url}")
+
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                retryable = failed_before_sending(e) or (
+                    idempotent
+                    and isinstance(
+                        e,
+                        (
+                            requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout,
+                        ),
+                    )
+                )
+                self.metrics.record_request(
+                    (time.monotonic() - start) * 1000, failed=True
+                )
+                if retryable and attempt < max_retries:
+                    self._sleep_before_retry(method, url, attempt, max_retries, str(e))
+                    attempt += 1
+                    continue
+                self.circuit_breaker.record_failure()
+                raise
+            except Exception:
+                # Never leave a half-open circuit waiting on a call that blew up
+                self.circuit_breaker.record_failure()
+                raise
+
+            latency_ms = (time.monotonic() - start) * 1000
+            server_error = response.status_code in RETRY_STATUS_CODES
+            self.metrics.record_request(latency_ms, failed=server_error)
+            logger.debug(
+                f"{method} {url} - status {response.status_code} in {latency_ms:.1f}ms"
+            )
+
+            if server_error and idempotent and attempt < max_retries:
+                self._sleep_before_retry(
+                    method, url, attempt, max_retries, f"status {response.status_code}"
+                )
+                attempt += 1
+                continue
+
+            if server_error:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            return response
+
+    def _sleep_before_retry(
+        self, method: str, url: str, attempt: int, max_retries: int, reason: str
+    ):
+        delay = self._backoff_delay(attempt)
+        self.metrics.record_retry()
+        logger.info(
+            f"Retrying {method} {url} in {delay:.2f}s (attempt {attempt + 1}/{max_retries}): {reason}"
+        )
+        time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+pipeline_http_client = PipelineHttpClient()
@@ -1,11 +1,16 @@
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import requests
 from django.conf import settings
 
+from analysis.services.http_client import pipeline_http_client
+
 logger = logging.getLogger(__name__)
 
+# Most external_ids the pipeline accepts in one batch lookup
+PIPELINE_BATCH_LOOKUP_SIZE = 1000
+
 
 class PipelineService:
     """
@@ -18,6 +23,7 @@ class PipelineService:
     def __init__(self):
         self.base_url = getattr(settings, "PIPELINE_BASE_URL", "http://localhost:8001")
         self.timeout = getattr(settings, "PIPELINE_TIMEOUT", 30)
+        self.http = pipeline_http_client
 
     def trigger_pipeline_analysis(
         self,
@@ -28,9 +34,12 @@ class PipelineService:
         drugs: List[Dict[str, any]],
         reactions: List[Dict[str, any]],
         result_id: int,
+        profile: bool = False,
     ) -> Dict[str, any]:
         """
         Trigger pipeline analysis for the given parameters.
+        With profile, the pipeline runs the task under a profiler (when it allows
+        profile requests); callers only set it for staff users.
 
         Returns:
             Dict containing the pipeline response
@@ -48,6 +57,8 @@ class PipelineService:
             "reactions": [reaction.name for reaction in reactions],
             "external_id": str(result_id),
         }
+        if profile:
+            payload["profile"] = True
 
         url = f"{self.base_url}/api/v1/pipeline/run/"
 
@@ -55,7 +66,7 @@ class PipelineService:
             logger.info(f"Triggering pipeline analysis for result_id: {result_id}")
             logger.debug(f"Payload: {payload}")
 
-            response = requests.post(
+            response = self.http.post(
                 url,
                 json=payload,
                 headers={"Content-Type": "application/json"},
@@ -90,20 +101,21 @@ class PipelineService:
             logger.error(error_msg)
             raise ValueError(error_msg) from e
 
-    def get_pipeline_task(self, task_id: int, retry_http_error_cnt=3) -> Dict[str, any]:
+    def get_pipeline_task(self, task_id: int) -> Dict[str, any]:
         """
         Get detailed results of a completed task from the pipeline service.
 
         Note: The pipeline now identifies tasks by external_id. We route
         this call to the external lookup endpoint using the provided task_id
         (which equals the external_id of the result in our system).
+        Transient failures are retried by the shared pipeline HTTP client.
         """
         url = f"{self.base_url}/api/v1/pipeline/external/{task_id}"
 
         try:
             logger.debug(f"Fetching detailed results for task_id: {task_id}")
 
-            response = requests.get(
+            response = self.http.get(
                 url,
                 timeout=self.timeout,
             )
@@ -120,12 +132,6 @@ class PipelineService:
             logger.error(
                 f"Pipeline service HTTP error for task_id {task_id}: {e.response.status_code}"
             )
-            if retry_http_error_cnt > 0:
-                retry_http_error_cnt -= 1
-                logger.info(
-                    f"Retrying fetch for task_id {task_id}, attempts left: {retry_http_error_cnt}"
-                )
-                return self.get_pipeline_task(task_id, retry_http_error_cnt)
             return None
 
         except requests.exceptions.RequestException as e:
@@ -134,13 +140,130 @@ class PipelineService:
             )
             return None
 
+    def get_pipeline_tasks(
+        self, task_ids: List[int]
+    ) -> Optional[Dict[str, Dict[str, any]]]:
+        """
+        Get the latest pipeline task for many task_ids.
+
+        Uses the pipeline's batch external_id lookup instead of one request per task,
+        with at most PIPELINE_BATCH_LOOKUP_SIZE ids per request (the pipeline's limit).
+
+        Returns:
+            Dict mapping each found task_id (as a string) to its task data,
+            or None if the pipeline service could not be reached.
+        """
+        external_ids = [str(task_id) for task_id in task_ids]
+        logger.debug(f"Fetching pipeline tasks for {len(external_ids)} task_ids")
+
+        tasks = {}
+        for start in range(0, len(external_ids), PIPELINE_BATCH_LOOKUP_SIZE):
+            chunk = self._get_pipeline_tasks_batch(
+                external_ids[start : start + PIPELINE_BATCH_LOOKUP_SIZE]
+            )
+            if chunk is None:
+                return None
+            tasks.update(chunk)
+
+        logger.info(f"Retrieved {len(tasks)} pipeline tasks in batch")
+        return tasks
+
+    def _get_pipeline_tasks_batch(
+        self, external_ids: List[str]
+    ) -> Optional[Dict[str, Dict[str, any]]]:
+        """One batch lookup request, None on failure."""
+        url = f"{self.base_url}/api/v1/pipeline/external/batch"
+
+        try:
+            # A read-only lookup, so it is safe to retry like a GET
+            response = self.http.post(
+                url,
+                json={"external_ids": external_ids},
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+                idempotent=True,
+            )
+
+            response.raise_for_status()
+            response_data = response.json()
+
+            tasks = {task["external_id"]: task for task in response_data["tasks"]}
+            missing = response_data.get("missing", [])
+            if missing:
+                logger.warning(
+                    f"Task results {', '.join(missing)} not found in pipeline service"
+                )
+            return tasks
+
+        except requests.exceptions.HTTPError as e:
+            logger.error(
+                f"Pipeline service HTTP error for batch task lookup: {e.response.status_code}"
+            )
+            return None
+
+        except requests.exceptions.RequestException as e:
+            logger.error(
+                f"Pipeline service connection error for batch task lookup: {str(e)}"
+            )
+            return None
+
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(
+                f"Invalid response from pipeline service for batch task lookup: {str(e)}"
+            )
+            return None
+
+    def get_task_profile(
+        self, task_id: int, output: str = "pstats"
+    ) -> Optional[requests.Response]:
+        """
+        Get the profile of the pipeline task of a result (task_id is its external_id),
+        as a pstats file or, with output "text", a text report of its top functions.
+
+        The pipeline serves profiles only to the backend, so staff users fetch them
+        through this proxy.
+
+        Returns:
+            The pipeline response, or None if the task or its profile was not found
+            or the pipeline service could not be reached.
+        """
+        task = self.get_pipeline_task(task_id)
+        if task is None:
+            return None
+        url = f"{self.base_url}/api/v1/pipeline/{task['id']}/profile"
+
+        try:
+            response = self.http.get(
+                url, params={"format": output}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            logger.info(f"Retrieved profile for task_id {task_id}")
+            return response
+
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                logger.warning(f"No profile of task {task_id} in pipeline service")
+                return None
+            logger.error(
+                f"Pipeline service HTTP error for profile of task_id {task_id}: "
+                f"{e.response.status_code}"
+            )
+            return None
+
+        except requests.exceptions.RequestException as e:
+            logger.error(
+                f"Pipeline service connection error for profile of task_id {task_id}: "
+                f"{str(e)}"
+            )
+            return None
+
     def health_check(self) -> bool:
         """
         Check if the pipeline service is healthy.
         """
         try:
             url = f"{self.base_url}/api/v1/health"
-            response = requests.get(url, timeout=5)
+            response = self.http.get(url, timeout=5, max_retries=0)
             return response.status_code == 200
         except Exception:
             return False
@@ -0,0 +1,21 @@
+import pytest
+
+from analysis.permissions import pipeline_service_whitelist
+from analysis.services.http_client import pipeline_http_client
+
+
+@pytest.fixture(autouse=True)
+def reset_pipeline_http_client(mocker):
+    """Start every test with a closed circuit and no retry backoff delays."""
+    pipeline_http_client.reset()
+    mocker.patch("analysis.services.http_client.time.sleep")
+    yield
+    pipeline_http_client.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_pipeline_service_whitelist():
+    """Do not leak compiled whitelists and cached hostname lookups between tests."""
+    pipeline_service_whitelist.reset()
+    yield
+    pipeline_service_whitelist.reset()
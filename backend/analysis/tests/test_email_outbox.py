@@ -0,0 +1,228 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.utils import timezone
+
+from analysis.email_outbox import enqueue_result_email, send_pending_emails
+from analysis.models import (
+    EmailKind,
+    EmailStatus,
+    OutboxEmail,
+    Query,
+    Result,
+    ResultStatus,
+)
+
+
+@pytest.fixture
+def user1(db):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    return User.objects.create_user(email="test@example.com", password="testpass")
+
+
+@pytest.fixture
+def result(user1):
+    query = Query.objects.create(
+        user=user1,
+        name="Test Query",
+        quarter_start=1,
+        quarter_end=2,
+        year_start=2020,
+        year_end=2020,
+    )
+    return Result.objects.create(query=query, status=ResultStatus.COMPLETED)
+
+
+@pytest.fixture
+def outbox_settings(settings):
+    settings.EMAIL_OUTBOX_BATCH_SIZE = 10
+    settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 3
+    settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+    settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+    return settings
+
+
+@pytest.mark.django_db
+class TestEnqueueResultEmail:
+    @pytest.mark.parametrize(
+        "status,kind",
+        [
+            (ResultStatus.COMPLETED, EmailKind.QUERY_COMPLETION),
+            (ResultStatus.FAILED, EmailKind.QUERY_ERROR),
+        ],
+    )
+    def test_enqueue_by_result_status(self, result, status, kind):
+        result.status = status
+        result.save()
+
+        email = enqueue_result_email(result)
+
+        assert email.kind == kind
+        assert email.recipient == "test@example.com"
+        assert email.status == EmailStatus.PENDING
+        assert email.context["query_name"] == "Test Query"
+        assert len(mail.outbox) == 0  # nothing is sent inline
+
+    @pytest.mark.parametrize("status", [ResultStatus.PENDING, ResultStatus.RUNNING])
+    def test_enqueue_skips_unfinished_results(self, result, status):
+        result.status = status
+        result.save()
+
+        assert enqueue_result_email(result) is None
+        assert OutboxEmail.objects.count() == 0
+
+    def test_enqueue_deduplicates_retried_callbacks(self, result):
+        first = enqueue_result_email(result)
+        second = enqueue_result_email(result)
+
+        assert first.id == second.id
+        assert OutboxEmail.objects.count() == 1
+
+    def test_enqueue_new_run_queues_new_email(self, result):
+        enqueue_result_email(result)
+
+        # Re-running a query updates it, which starts a new notification cycle
+        result.query.save()
+        enqueue_result_email(result)
+
+        assert OutboxEmail.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestSendPendingEmails:
+    def test_sends_batch_over_single_connection(
+        self, mocker, outbox_settings, result
+    ):
+        enqueue_result_email(result)
+        result.status = ResultStatus.FAILED
+        result.save()
+        enqueue_result_email(result)
+
+        get_connection = mocker.patch(
+            "analysis.email_outbox.get_connection", wraps=mail.get_connection
+        )
+
+        processed = send_pending_emails()
+
+        assert processed == 2
+        get_connection.assert_called_once()
+        assert len(mail.outbox) == 2
+        assert {m.subject for m in mail.outbox} == {
+            "Your Query Analysis is Ready: Test Query",
+            "Query Processing Failed: Test Query",
+        }
+        assert set(OutboxEmail.objects.values_list("status", flat=True)) == {
+            EmailStatus.SENT
+        }
+
+    def test_sent_emails_are_not_resent(self, outbox_settings, result):
+        enqueue_result_email(result)
+
+        assert send_pending_emails() == 1
+        assert send_pending_emails() == 0
+        assert len(mail.outbox) == 1
+
+    def test_failure_schedules_retry_with_backoff(
+        self, mocker, outbox_settings, result
+    ):
+        email = enqueue_result_email(result)
+        mocker.patch(
+            "django.core.mail.EmailMultiAlternatives.send",
+            side_effect=ConnectionError("SMTP down"),
+        )
+
+        before = timezone.now()
+        send_pending_emails()
+        email.refresh_from_db()
+        assert email.status == EmailStatus.PENDING
+        assert email.attempts == 1
+        assert email.last_error == "SMTP down"
+        assert email.next_attempt_at >= before + timedelta(seconds=30)
+
+        # Not due yet, so it is not retried immediately
+        assert send_pending_emails() == 0
+
+        email.next_attempt_at = timezone.now()
+        email.save()
+        send_pending_emails()
+        email.refresh_from_db()
+        assert email.attempts == 2
+        assert email.next_attempt_at >= timezone.now() + timedelta(seconds=59)
+
+    def test_failure_gives_up_after_max_attempts(
+        self, mocker, outbox_settings, result
+    ):
+        email = enqueue_result_email(result)
+        mocker.patch(
+            "django.core.mail.EmailMultiAlternatives.send",
+            side_effect=ConnectionError("SMTP down"),
+        )
+
+        for _ in range(outbox_settings.EMAIL_OUTBOX_MAX_ATTEMPTS):
+            OutboxEmail.objects.filter(id=email.id).update(
+                next_attempt_at=timezone.now()
+            )
+            send_pending_emails()
+
+        email.refresh_from_db()
+        assert email.status == EmailStatus.FAILED
+        assert email.attempts == outbox_settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        assert send_pending_emails() == 0
+
+    def test_connection_open_failure_retries_whole_batch(
+        self, mocker, outbox_settings, result
+    ):
+        email = enqueue_result_email(result)
+        connection = mocker.Mock()
+        connection.open.side_effect = OSError("Connection refused")
+        mocker.patch("analysis.email_outbox.get_connection", return_value=connection)
+
+        assert send_pending_emails() == 1
+
+        email.refresh_from_db()
+        assert email.status == EmailStatus.PENDING
+        assert email.attempts == 1
+        assert len(mail.outbox) == 0
+
+
+class TestOutboxSenderStartup:
+    @pytest.mark.parametrize(
+        "argv,run_main,expected",
+        [
+            (["gunicorn", "backend.wsgi"], None, True),
+            (["manage.py", "runserver", "0.0.0.0:8000"], "true", True),
+            (["manage.py", "runserver", "--noreload"], None, True),
+            # Autoreloader parent: the server runs in its child
+            (["manage.py", "runserver", "0.0.0.0:8000"], None, False),
+            (["manage.py", "migrate", "--noinput"], None, False),
+            (["manage.py", "send_outbox_emails"], None, False),
+        ],
+    )
+    def test_is_server_process(self, monkeypatch, argv, run_main, expected):
+        from analysis.email_outbox import is_server_process
+
+        if run_main is None:
+            monkeypatch.delenv("RUN_MAIN", raising=False)
+        else:
+            monkeypatch.setenv("RUN_MAIN", run_main)
+        assert is_server_process(argv) is expected
+
+    @pytest.mark.parametrize(
+        "enabled,server,started",
+        [(True, True, True), (True, False, False), (False, True, False)],
+    )
+    def test_ready_starts_sender_in_server_process(
+        self, settings, mocker, enabled, server, started
+    ):
+        from django.apps import apps
+
+        settings.EMAIL_OUTBOX_BACKGROUND_SENDER = enabled
+        mocker.patch("analysis.email_outbox.is_server_process", return_value=server)
+        start = mocker.patch("analysis.email_outbox.outbox_sender.start")
+
+        apps.get_app_config("analysis").ready()
+
+        assert start.called is started
@@ -0,0 +1,201 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from analysis.services.http_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    PipelineHttpClient,
+)
+
+URL = "http://pipeline/api/v1/pipeline/external/1"
+
+
+@pytest.fixture
+def client():
+    return PipelineHttpClient(
+        max_retries=2,
+        backoff_base=0.5,
+        backoff_max=2,
+        failure_threshold=2,
+        reset_timeout=30,
+    )
+
+
+def make_response(mocker, status_code):
+    response = mocker.Mock()
+    response.status_code = status_code
+    return response
+
+
+class TestPipelineHttpClientRetries:
+    def test_get_retries_connection_errors_then_succeeds(self, mocker, client):
+        ok = make_response(mocker, 200)
+        mock_request = mocker.patch.object(
+            client.session,
+            "request",
+            side_effect=[requests.ConnectionError("refused"), ok],
+        )
+
+        assert client.get(URL, timeout=5) is ok
+        assert mock_request.call_count == 2
+        assert client.metrics.snapshot()["retries"] == 1
+
+    def test_get_retries_server_errors_and_returns_last_response(
+        self, mocker, client
+    ):
+        error = make_response(mocker, 503)
+        mock_request = mocker.patch.object(client.session, "request", return_value=error)
+
+        assert client.get(URL) is error
+        assert mock_request.call_count == 3  # 2 retries
+
+    def test_client_errors_are_not_retried(self, mocker, client):
+        not_found = make_response(mocker, 404)
+        mock_request = mocker.patch.object(
+            client.session, "request", return_value=not_found
+        )
+
+        assert client.get(URL) is not_found
+        mock_request.assert_called_once()
+
+    def test_post_timeout_is_not_retried(self, mocker, client):
+        mock_request = mocker.patch.object(
+            client.session, "request", side_effect=requests.Timeout("timed out")
+        )
+
+        with pytest.raises(requests.Timeout):
+            client.post(URL, json={})
+        mock_request.assert_called_once()
+
+    def test_post_connection_reset_is_not_retried(self, mocker, client):
+        # The request may have reached the pipeline before the connection dropped
+        mock_request = mocker.patch.object(
+            client.session,
+            "request",
+            side_effect=requests.ConnectionError("Connection reset by peer"),
+        )
+
+        with pytest.raises(requests.ConnectionError):
+            client.post(URL, json={})
+        mock_request.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "error",
+        [
+            requests.ConnectionError(
+                MaxRetryError(
+                    pool=None, url=URL, reason=NewConnectionError(None, "refused")
+                )
+            ),
+            requests.ConnectTimeout("connect timed out"),
+        ],
+    )
+    def test_post_connect_failure_is_retried(self, mocker, client, error):
+        ok = make_response(mocker, 201)
+        mock_request = mocker.patch.object(
+            client.session, "request", side_effect=[error, ok]
+        )
+
+        assert client.post(URL, json={}) is ok
+        assert mock_request.call_count == 2
+
+    def test_idempotent_post_is_retried(self, mocker, client):
+        mock_request = mocker.patch.object(
+            client.session, "request", return_value=make_response(mocker, 500)
+        )
+
+        client.post(URL, json={}, idempotent=True)
+        assert mock_request.call_count == 3
+
+    def test_backoff_grows_exponentially_with_jitter(self, mocker, client):
+        uniform = mocker.patch(
+            "analysis.services.http_client.random.uniform", side_effect=lambda a, b: b
+        )
+
+        assert [client._backoff_delay(attempt) for attempt in range(4)] == [
+            0.5,
+            1,
+            2,
+            2,  # capped at backoff_max
+        ]
+        assert uniform.call_count == 4
+
+
+class TestPipelineHttpClientCircuitBreaker:
+    def test_circuit_opens_after_consecutive_failures(self, mocker, client):
+        mock_request = mocker.patch.object(
+            client.session, "request", side_effect=requests.ConnectionError("down")
+        )
+
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                client.get(URL, max_retries=0)
+
+        with pytest.raises(CircuitOpenError):
+            client.get(URL)
+        assert mock_request.call_count == 2
+        assert client.metrics.snapshot()["short_circuited"] == 1
+
+    def test_half_open_success_closes_circuit(self, mocker):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        monotonic = mocker.patch(
+            "analysis.services.http_client.time.monotonic", return_value=100.0
+        )
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+
+        monotonic.return_value = 131.0
+        assert breaker.allow_request() is True
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one trial request while half-open
+        assert breaker.allow_request() is False
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request() is True
+
+    def test_half_open_failure_reopens_circuit(self, mocker):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        monotonic = mocker.patch(
+            "analysis.services.http_client.time.monotonic", return_value=100.0
+        )
+        for _ in range(3):
+            breaker.record_failure()
+
+        monotonic.return_value = 131.0
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+
+
+class TestPipelineHttpClientMetrics:
+    def test_metrics_track_latency_and_failures(self, mocker, client):
+        mocker.patch.object(
+            client.session,
+            "request",
+            side_effect=[make_response(mocker, 200), make_response(mocker, 500)],
+        )
+
+        client.get(URL, max_retries=0)
+        client.get(URL, max_retries=0)
+
+        snapshot = client.metrics.snapshot()
+        assert snapshot["requests"] == 2
+        assert snapshot["failures"] == 1
+        assert snapshot["latency_ms_max"] >= snapshot["latency_ms_avg"] >= 0
+
+    def test_stats_report_circuit_state_and_metrics(self, mocker, client):
+        mocker.patch.object(
+            client.session, "request", return_value=make_response(mocker, 200)
+        )
+
+        client.get(URL)
+
+        stats = client.stats()
+        assert stats["circuit"] == CircuitBreaker.CLOSED
+        assert stats["requests"] == 1
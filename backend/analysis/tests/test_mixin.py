@@ -433,3 +433,72 @@ class TestPipelineStatusCheckMixinEdgeCases:
         mock_check_status.assert_called_once()
         mock_result.refresh_from_db()
         assert mock_result.status == ResultStatus.RUNNING
+
+
+@pytest.mark.django_db
+class TestPipelineStatusCheckMixinBatch:
+    def test_batch_updates_all_results_with_single_request(
+        self, mocker, mixin_instance, user1
+    ):
+        running = create_result_with_query_age(user1, ResultStatus.PENDING, 1)
+        completed = create_result_with_query_age(user1, ResultStatus.RUNNING, 1)
+        missing = create_result_with_query_age(user1, ResultStatus.PENDING, 1)
+        done = create_result_with_query_age(user1, ResultStatus.COMPLETED, 1)
+
+        tasks = {
+            str(running.id): {
+                "id": running.id,
+                "status": ResultStatus.RUNNING,
+                "ror_values": [],
+                "ror_lower": [],
+                "ror_upper": [],
+            },
+            str(completed.id): {
+                "id": completed.id,
+                "status": ResultStatus.COMPLETED,
+                "ror_values": [1.5],
+                "ror_lower": [1.2],
+                "ror_upper": [1.8],
+            },
+        }
+        mock_batch = mocker.patch(
+            "analysis.views.pipeline_service.get_pipeline_tasks", return_value=tasks
+        )
+        mock_single = mocker.patch("analysis.views.pipeline_service.get_pipeline_task")
+
+        mixin_instance.check_and_update_results_from_pipeline(
+            [running, completed, missing, done]
+        )
+
+        mock_batch.assert_called_once_with([running.id, completed.id, missing.id])
+        mock_single.assert_not_called()
+        for result in (running, completed, missing, done):
+            result.refresh_from_db()
+        assert running.status == ResultStatus.RUNNING
+        assert completed.status == ResultStatus.COMPLETED
+        assert completed.ror_values == [1.5]
+        assert missing.status == ResultStatus.FAILED
+        assert done.status == ResultStatus.COMPLETED
+
+    def test_batch_lookup_failure_leaves_results_untouched(
+        self, mocker, mixin_instance, mock_result
+    ):
+        mocker.patch(
+            "analysis.views.pipeline_service.get_pipeline_tasks", return_value=None
+        )
+
+        mixin_instance.check_and_update_results_from_pipeline([mock_result])
+
+        mock_result.refresh_from_db()
+        assert mock_result.status == ResultStatus.PENDING
+
+    def test_batch_skips_request_when_nothing_to_check(
+        self, mocker, mixin_instance, mock_result
+    ):
+        mock_result.status = ResultStatus.COMPLETED
+        mock_result.save()
+        mock_batch = mocker.patch("analysis.views.pipeline_service.get_pipeline_tasks")
+
+        mixin_instance.check_and_update_results_from_pipeline([mock_result])
+
+        mock_batch.assert_not_called()
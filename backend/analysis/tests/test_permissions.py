@@ -1,9 +1,10 @@
+import socket
 from types import SimpleNamespace
 
 import pytest
 from rest_framework.test import APIClient
 
-from analysis.permissions import IsPipelineService
+from analysis.permissions import CompiledWhitelist, IsPipelineService
 
 
 @pytest.fixture
@@ -115,6 +116,44 @@ class TestIsPipelineServicePermission:
 
         assert permission.has_permission(request, None) is True
 
+    def test_hostname_resolution_is_cached(
+        self, settings, permission, mock_request, mocker
+    ):
+        """Hostname rules are resolved once, not on every callback."""
+        settings.PIPELINE_SERVICE_IPS = ["pipeline-api"]
+        getaddrinfo = mocker.patch(
+            "analysis.permissions.socket.getaddrinfo",
+            return_value=[(2, 1, 6, "", ("172.21.0.5", 0))],
+        )
+
+        for _ in range(3):
+            request = mock_request(REMOTE_ADDR="172.21.0.5")
+            assert permission.has_permission(request, None) is True
+        request = mock_request(REMOTE_ADDR="172.21.0.6")
+        assert permission.has_permission(request, None) is False
+
+        getaddrinfo.assert_called_once_with("pipeline-api", None)
+
+    def test_ip_rules_never_resolve_hostnames(
+        self, settings, permission, mock_request, mocker
+    ):
+        settings.PIPELINE_SERVICE_IPS = ["192.168.1.100", "172.21.0.0/16"]
+        getaddrinfo = mocker.patch("analysis.permissions.socket.getaddrinfo")
+
+        request = mock_request(REMOTE_ADDR="1.1.1.1")
+        assert permission.has_permission(request, None) is False
+        getaddrinfo.assert_not_called()
+
+    def test_whitelist_is_recompiled_when_settings_change(
+        self, settings, permission, mock_request
+    ):
+        settings.PIPELINE_SERVICE_IPS = ["192.168.1.100"]
+        request = mock_request(REMOTE_ADDR="10.0.0.1")
+        assert permission.has_permission(request, None) is False
+
+        settings.PIPELINE_SERVICE_IPS = ["10.0.0.0/8"]
+        assert permission.has_permission(request, None) is True
+
     def test_permission_denied_for_raw_string_configuration(
         self, settings, permission, mock_request
     ):
@@ -162,3 +201,38 @@ class TestIsPipelineServicePermission:
         assert record.client_ip == "10.0.0.1"
         assert record.endpoint == "update_by_task_id"
         assert record.rejection_reason == "empty_pipeline_service_ips"
+
+
+class TestCompiledWhitelist:
+    def test_expired_hostname_is_refreshed_in_background(self, mocker):
+        monotonic = mocker.patch(
+            "analysis.permissions.time.monotonic", return_value=100.0
+        )
+        getaddrinfo = mocker.patch(
+            "analysis.permissions.socket.getaddrinfo",
+            return_value=[(2, 1, 6, "", ("172.21.0.5", 0))],
+        )
+        whitelist = CompiledWhitelist(["pipeline-api"], ttl_seconds=60)
+        assert whitelist.allows("172.21.0.5") is True
+
+        # The container got a new address and the cached entry expired
+        getaddrinfo.return_value = [(2, 1, 6, "", ("172.21.0.9", 0))]
+        monotonic.return_value = 161.0
+
+        # The stale address is still served while the refresh runs
+        assert whitelist.allows("172.21.0.5") is True
+        whitelist._refresh_thread.join(timeout=5)
+
+        assert whitelist.allows("172.21.0.9") is True
+        assert whitelist.allows("172.21.0.5") is False
+        assert getaddrinfo.call_count == 2
+
+    def test_unresolvable_hostname_is_denied(self, mocker):
+        mocker.patch(
+            "analysis.permissions.socket.getaddrinfo",
+            side_effect=socket.gaierror("Name or service not known"),
+        )
+        whitelist = CompiledWhitelist(["pipeline-api"], ttl_seconds=60)
+
+        assert whitelist.allows("172.21.0.5") is False
+        assert whitelist.allows("not-an-ip") is False
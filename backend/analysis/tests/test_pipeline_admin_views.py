@@ -0,0 +1,119 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from analysis.services.http_client import pipeline_http_client
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    """Fixture for API client"""
+    return APIClient()
+
+
+@pytest.fixture
+def staff_user(db):
+    return User.objects.create_user(
+        email="staff@example.com", password="testpassword", is_staff=True
+    )
+
+
+@pytest.fixture
+def regular_user(db):
+    return User.objects.create_user(email="user@example.com", password="testpassword")
+
+
+@pytest.mark.django_db
+class TestPipelineClientStats:
+    def test_staff_user_gets_client_stats(self, api_client, staff_user):
+        api_client.force_authenticate(user=staff_user)
+
+        response = api_client.get(reverse("pipeline-client-stats"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == pipeline_http_client.stats()
+
+    def test_regular_user_is_forbidden(self, api_client, regular_user):
+        api_client.force_authenticate(user=regular_user)
+
+        response = api_client.get(reverse("pipeline-client-stats"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_anonymous_user_is_refused(self, api_client):
+        response = api_client.get(reverse("pipeline-client-stats"))
+
+        assert response.status_code in (
+            status.HTTP_401_UNAUTHORIZED,
+            status.HTTP_403_FORBIDDEN,
+        )
+
+
+@pytest.mark.django_db
+class TestPipelineProfile:
+    def profile_url(self, result_id=42):
+        return reverse("pipeline-profile", kwargs={"result_id": result_id})
+
+    def test_staff_user_gets_text_profile(self, api_client, staff_user, mocker):
+        profile = mocker.Mock(
+            content=b"ncalls  tottime", headers={"Content-Type": "text/plain"}
+        )
+        mock_get_profile = mocker.patch(
+            "analysis.views.pipeline_service.get_task_profile", return_value=profile
+        )
+        api_client.force_authenticate(user=staff_user)
+
+        response = api_client.get(self.profile_url(), {"output": "text"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == b"ncalls  tottime"
+        assert response["Content-Type"] == "text/plain"
+        mock_get_profile.assert_called_once_with(42, output="text")
+
+    def test_pstats_profile_is_an_attachment(self, api_client, staff_user, mocker):
+        profile = mocker.Mock(
+            content=b"pstats", headers={"Content-Type": "application/octet-stream"}
+        )
+        mocker.patch(
+            "analysis.views.pipeline_service.get_task_profile", return_value=profile
+        )
+        api_client.force_authenticate(user=staff_user)
+
+        response = api_client.get(self.profile_url())
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Disposition"] == (
+            'attachment; filename="result-42.prof"'
+        )
+
+    def test_missing_profile_is_not_found(self, api_client, staff_user, mocker):
+        mocker.patch(
+            "analysis.views.pipeline_service.get_task_profile", return_value=None
+        )
+        api_client.force_authenticate(user=staff_user)
+
+        response = api_client.get(self.profile_url())
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unknown_output_is_rejected(self, api_client, staff_user):
+        api_client.force_authenticate(user=staff_user)
+
+        response = api_client.get(self.profile_url(), {"output": "html"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_regular_user_is_forbidden(self, api_client, regular_user, mocker):
+        mock_get_profile = mocker.patch(
+            "analysis.views.pipeline_service.get_task_profile"
+        )
+        api_client.force_authenticate(user=regular_user)
+
+        response = api_client.get(self.profile_url())
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        mock_get_profile.assert_not_called()
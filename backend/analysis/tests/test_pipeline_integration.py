@@ -129,6 +129,29 @@ class TestPipelineIntegration:
         query = Query.objects.get(name="Pipeline Failure Query")
         assert query.result.status == ResultStatus.FAILED
 
+    @pytest.mark.parametrize(
+        "is_staff, expected_profile", [(True, True), (False, False)]
+    )
+    def test_create_query_profile_only_for_staff(
+        self, mocker, api_client, user, required_fields, is_staff, expected_profile
+    ):
+        """Test ?profile=true is forwarded to the pipeline for staff users only"""
+        mock_trigger = mocker.patch(
+            "analysis.views.pipeline_service.trigger_pipeline_analysis"
+        )
+        mocker.patch.object(settings, "NUM_DEMO_QUARTERS", -1)
+        user.is_staff = is_staff
+        user.save()
+
+        authenticate_user(api_client, user)
+
+        list_url = reverse("query-list")
+        data = {"name": "Profiled Query", **required_fields}
+        response = api_client.post(f"{list_url}?profile=true", data, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert mock_trigger.call_args[1]["profile"] is expected_profile
+
     def test_create_query_demo_mode(self, mocker, api_client, user, required_fields):
         """Test creating query in demo mode creates completed result without calling pipeline"""
         # Mock pipeline service - should NOT be called
@@ -46,7 +46,7 @@ class TestPipelineService:
         mock_response.raise_for_status.return_value = None
 
         mock_post = mocker.patch(
-            "analysis.services.pipeline_service.requests.post",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
 
@@ -76,6 +76,31 @@ class TestPipelineService:
 
         assert result == {"task_id": "abc123", "status": "started"}
 
+    @pytest.mark.parametrize("profile", [True, False])
+    def test_trigger_pipeline_analysis_profile(self, mocker, drug, reaction, profile):
+        """Test the profile flag is only sent when requested"""
+        mock_response = mocker.Mock()
+        mock_response.json.return_value = {"id": 1, "status": "pending"}
+        mock_response.raise_for_status.return_value = None
+        mock_post = mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            return_value=mock_response,
+        )
+
+        PipelineService().trigger_pipeline_analysis(
+            drugs=[drug],
+            reactions=[reaction],
+            result_id=123,
+            year_start=2020,
+            year_end=2021,
+            quarter_start=1,
+            quarter_end=4,
+            profile=profile,
+        )
+
+        payload = mock_post.call_args[1]["json"]
+        assert payload.get("profile", False) is profile
+
     def test_trigger_pipeline_analysis_http_error(self, mocker, drug, reaction):
         """Test pipeline trigger with HTTP error"""
         mock_response = mocker.Mock()
@@ -87,7 +112,7 @@ class TestPipelineService:
         mock_response.raise_for_status.side_effect = http_error
 
         mock_post = mocker.patch(
-            "analysis.services.pipeline_service.requests.post",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
 
@@ -107,7 +132,7 @@ class TestPipelineService:
     def test_trigger_pipeline_analysis_timeout(self, mocker, drug, reaction):
         """Test pipeline trigger with timeout"""
         mock_post = mocker.patch(
-            "analysis.services.pipeline_service.requests.post",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             side_effect=requests.Timeout("Request timed out"),
         )
         mock_post.side_effect = requests.Timeout("Request timed out")
@@ -131,24 +156,28 @@ class TestPipelineService:
         mock_response.status_code = 200
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
 
         service = PipelineService()
         assert service.health_check() is True
-        mock_get.assert_called_once_with("http://localhost:8001/api/v1/health", timeout=5)
+        mock_get.assert_called_once_with(
+            "GET", "http://localhost:8001/api/v1/health", timeout=5
+        )
 
     def test_health_check_failure(self, mocker):
         """Test failed health check"""
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             side_effect=requests.RequestException("Connection failed"),
         )
 
         service = PipelineService()
         assert service.health_check() is False
-        mock_get.assert_called_once_with("http://localhost:8001/api/v1/health", timeout=5)
+        mock_get.assert_called_once_with(
+            "GET", "http://localhost:8001/api/v1/health", timeout=5
+        )
 
 
 @pytest.mark.django_db
@@ -166,7 +195,7 @@ class TestCheckTaskStatus:
         mock_response.raise_for_status.return_value = None
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
 
@@ -174,6 +203,7 @@ class TestCheckTaskStatus:
         result = service.get_pipeline_task(task_id=123)
 
         mock_get.assert_called_once_with(
+            "GET",
             "http://localhost:8001/api/v1/pipeline/external/123",
             timeout=30,
         )
@@ -187,7 +217,7 @@ class TestCheckTaskStatus:
         mock_response.raise_for_status.side_effect = http_error
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
 
@@ -205,12 +235,12 @@ class TestCheckTaskStatus:
     )
     def test_status_network_errors_return_none(self, mocker, error_cls, msg):
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             side_effect=error_cls(msg),
         )
         service = PipelineService()
         result = service.get_pipeline_task(task_id=789)
-        mock_get.assert_called_once()
+        assert mock_get.call_count == 4  # 3 retries
         assert result is None
 
     def test_status_http_500_returns_none(self, mocker):
@@ -221,7 +251,7 @@ class TestCheckTaskStatus:
         mock_response.raise_for_status.side_effect = http_error
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
@@ -237,12 +267,13 @@ class TestCheckTaskStatus:
         mock_response.raise_for_status.return_value = None
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
         service.get_pipeline_task(task_id=1)
         mock_get.assert_called_once_with(
+            "GET",
             "http://localhost:8001/api/v1/pipeline/external/1",
             timeout=10,
         )
@@ -263,12 +294,13 @@ class TestGetTaskResults:
         mock_response.raise_for_status.return_value = None
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
         result = service.get_pipeline_task(task_id=123)
         mock_get.assert_called_once_with(
+            "GET",
             "http://localhost:8001/api/v1/pipeline/external/123",
             timeout=30,
         )
@@ -283,7 +315,7 @@ class TestGetTaskResults:
         mock_response.raise_for_status.side_effect = http_error
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
@@ -300,12 +332,12 @@ class TestGetTaskResults:
     )
     def test_results_network_errors_return_none(self, mocker, error_cls, msg):
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             side_effect=error_cls(msg),
         )
         service = PipelineService()
         result = service.get_pipeline_task(task_id=333)
-        mock_get.assert_called_once()
+        assert mock_get.call_count == 4  # 3 retries
         assert result is None
 
     def test_results_invalid_json_raises(self, mocker):
@@ -315,7 +347,7 @@ class TestGetTaskResults:
         mock_response.json.side_effect = ValueError("Invalid JSON")
 
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
@@ -329,12 +361,153 @@ class TestGetTaskResults:
         mock_response.json.return_value = {"id": 1, "status": "completed"}
         mock_response.raise_for_status.return_value = None
         mock_get = mocker.patch(
-            "analysis.services.pipeline_service.requests.get",
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
             return_value=mock_response,
         )
         service = PipelineService()
         service.get_pipeline_task(task_id=1)
         mock_get.assert_called_once_with(
+            "GET",
             "http://localhost:8001/api/v1/pipeline/external/1",
             timeout=15,
         )
+
+
+@pytest.mark.django_db
+class TestGetPipelineTasks:
+    def test_batch_success_maps_tasks_by_external_id(self, mocker):
+        mock_response = mocker.Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "tasks": [
+                {"id": 1, "external_id": "10", "status": "running"},
+                {"id": 2, "external_id": "11", "status": "completed"},
+            ],
+            "missing": ["12"],
+        }
+        mock_response.raise_for_status.return_value = None
+
+        mock_post = mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            return_value=mock_response,
+        )
+
+        service = PipelineService()
+        result = service.get_pipeline_tasks([10, 11, 12])
+
+        mock_post.assert_called_once_with(
+            "POST",
+            "http://localhost:8001/api/v1/pipeline/external/batch",
+            json={"external_ids": ["10", "11", "12"]},
+            headers={"Content-Type": "application/json"},
+            timeout=30,
+        )
+        assert set(result.keys()) == {"10", "11"}
+        assert result["11"]["status"] == "completed"
+
+    def test_batch_lookup_is_sent_in_chunks(self, mocker):
+        """Test more ids than the pipeline accepts per request are sent in chunks"""
+        mocker.patch(
+            "analysis.services.pipeline_service.PIPELINE_BATCH_LOOKUP_SIZE", 2
+        )
+
+        def lookup(method, url, json, **kwargs):
+            response = mocker.Mock()
+            response.raise_for_status.return_value = None
+            response.json.return_value = {
+                "tasks": [
+                    {"id": int(i), "external_id": i, "status": "running"}
+                    for i in json["external_ids"]
+                ],
+                "missing": [],
+            }
+            return response
+
+        mock_post = mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            side_effect=lookup,
+        )
+
+        result = PipelineService().get_pipeline_tasks([10, 11, 12, 13, 14])
+
+        chunks = [call[1]["json"]["external_ids"] for call in mock_post.call_args_list]
+        assert chunks == [["10", "11"], ["12", "13"], ["14"]]
+        assert set(result.keys()) == {"10", "11", "12", "13", "14"}
+
+    def test_batch_http_error_returns_none(self, mocker):
+        mock_response = mocker.Mock()
+        mock_response.status_code = 500
+        http_error = requests.HTTPError("Server Error")
+        http_error.response = mock_response
+        mock_response.raise_for_status.side_effect = http_error
+
+        mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            return_value=mock_response,
+        )
+
+        service = PipelineService()
+        assert service.get_pipeline_tasks([1, 2]) is None
+
+    def test_batch_connection_error_returns_none(self, mocker):
+        mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            side_effect=requests.ConnectionError("Connection refused"),
+        )
+
+        service = PipelineService()
+        assert service.get_pipeline_tasks([1]) is None
+
+
+class TestGetTaskProfile:
+    def test_profile_is_fetched_by_pipeline_task_id(self, mocker):
+        mock_task = mocker.Mock()
+        mock_task.json.return_value = {"id": 7, "external_id": "123"}
+        mock_task.raise_for_status.return_value = None
+        mock_profile = mocker.Mock()
+        mock_profile.raise_for_status.return_value = None
+
+        mock_get = mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            side_effect=[mock_task, mock_profile],
+        )
+
+        service = PipelineService()
+        assert service.get_task_profile(123, output="text") is mock_profile
+        assert mock_get.call_args_list[1] == mocker.call(
+            "GET",
+            "http://localhost:8001/api/v1/pipeline/7/profile",
+            params={"format": "text"},
+            timeout=30,
+        )
+
+    def test_missing_task_returns_none(self, mocker):
+        mocker.patch(
+            "analysis.services.pipeline_service.PipelineService.get_pipeline_task",
+            return_value=None,
+        )
+        mock_get = mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request"
+        )
+
+        service = PipelineService()
+        assert service.get_task_profile(123) is None
+        mock_get.assert_not_called()
+
+    def test_missing_profile_returns_none(self, mocker):
+        mocker.patch(
+            "analysis.services.pipeline_service.PipelineService.get_pipeline_task",
+            return_value={"id": 7},
+        )
+        mock_response = mocker.Mock()
+        mock_response.status_code = 404
+        http_error = requests.HTTPError("Not Found")
+        http_error.response = mock_response
+        mock_response.raise_for_status.side_effect = http_error
+        mocker.patch(
+            "analysis.services.pipeline_service.pipeline_http_client.session.request",
+            return_value=mock_response,
+        )
+
+        service = PipelineService()
+        assert service.get_task_profile(123) is None
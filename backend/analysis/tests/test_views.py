@@ -5,6 +5,7 @@ import pytest
 from allauth.account.models import EmailAddress
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core import mail
 from django.core.cache import cache
 from django.test import override_settings
 from django.urls import reverse
@@ -14,7 +15,15 @@ from rest_framework.settings import api_settings
 from rest_framework.test import APIClient
 from rest_framework.throttling import SimpleRateThrottle
 
-from analysis.models import DrugName, Query, ReactionName, Result, ResultStatus
+from analysis.models import (
+    DrugName,
+    EmailKind,
+    OutboxEmail,
+    Query,
+    ReactionName,
+    Result,
+    ResultStatus,
+)
 from analysis.serializers import QuerySerializer
 
 User = get_user_model()
@@ -244,6 +253,25 @@ class TestQueryViewSet:
         response = api_client.get(list_url)
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+    def test_list_queries_checks_pipeline_in_single_batch(
+        self, mocker, api_client, user1, query1, query2
+    ):
+        """Test that listing queries fetches all pending results with one batch call."""
+        mock_batch = mocker.patch(
+            "analysis.views.pipeline_service.get_pipeline_tasks", return_value={}
+        )
+        mock_single = mocker.patch("analysis.views.pipeline_service.get_pipeline_task")
+
+        self.authenticate_user(api_client, user=user1)
+        response = api_client.get(reverse("query-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        mock_batch.assert_called_once()
+        assert sorted(mock_batch.call_args.args[0]) == sorted(
+            [query1.result.id, query2.result.id]
+        )
+        mock_single.assert_not_called()
+
     def test_retrieve_query_owned_by_user(self, api_client, user1, query1):
         """Test that a user can retrieve their own query."""
         self.authenticate_user(api_client, user=user1)
@@ -907,6 +935,12 @@ class TestResultViewSetUpdateByTaskId:
         assert result1.status == result_data["status"]
         assert result1.ror_values == result_data["ror_values"]
 
+        # Notification is queued in the outbox rather than sent inline
+        assert len(mail.outbox) == 0
+        queued = OutboxEmail.objects.get()
+        assert queued.kind == EmailKind.QUERY_COMPLETION
+        assert queued.recipient == result1.query.user.email
+
     def test_update_by_task_id_denied_for_invalid_ip(
         self, settings, api_client, result1, result_data
     ):
@@ -1,4 +1,10 @@
-from analysis.views import QueryViewSet, DrugNameViewSet, ReactionNameViewSet, ResultViewSet
+from analysis.views import (
+    DrugNameViewSet,
+    PipelineAdminViewSet,
+    QueryViewSet,
+    ReactionNameViewSet,
+    ResultViewSet,
+)
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -6,4 +12,5 @@ router.register(r"queries", QueryViewSet, basename="query")
 router.register(r"results", ResultViewSet, basename="result")
 router.register(r"drug-names", DrugNameViewSet, basename="drug-name")
 router.register(r"reaction-names", ReactionNameViewSet, basename="reaction-name")
+router.register(r"pipeline", PipelineAdminViewSet, basename="pipeline")
 urlpatterns = router.urls
\ No newline at end of file
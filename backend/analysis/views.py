@@ -2,17 +2,18 @@ import logging
 from datetime import timedelta
 
 from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from analysis.constants import PIPELINE_DEMO_DATA
-from analysis.email_service import EmailService
+from analysis.email_outbox import enqueue_result_email
 from analysis.models import DrugName, Query, ReactionName, Result, ResultStatus
 from analysis.permissions import IsPipelineService
 from analysis.serializers import (
@@ -21,6 +22,7 @@ from analysis.serializers import (
     ReactionNameSerializer,
     ResultSerializer,
 )
+from analysis.services.http_client import pipeline_http_client
 from analysis.services.pipeline_service import pipeline_service
 
 logger = logging.getLogger(__name__)
@@ -43,12 +45,48 @@ class PipelineStatusCheckMixin:
         - If pipeline returns error/404, mark as failed
         - Otherwise, update with current pipeline status
         """
+        if not self._is_pipeline_check_needed(result):
+            return
+
+        task = pipeline_service.get_pipeline_task(result.id)
+        self._update_result_from_pipeline_task(result, task)
+
+    def check_and_update_results_from_pipeline(self, results) -> None:
+        """
+        Bulk version of check_and_update_result_from_pipeline.
+        Fetches the pipeline tasks of all pending/running results in one request.
+        If the pipeline service cannot be reached, results are left untouched
+        so the next check can retry.
+        """
+        results_to_check = [
+            result for result in results if self._is_pipeline_check_needed(result)
+        ]
+        if not results_to_check:
+            return
+
+        tasks = pipeline_service.get_pipeline_tasks(
+            [result.id for result in results_to_check]
+        )
+        if tasks is None:
+            logger.warning(
+                f"Batch pipeline lookup failed, skipping update of {len(results_to_check)} results"
+            )
+            return
+
+        for result in results_to_check:
+            self._update_result_from_pipeline_task(result, tasks.get(str(result.id)))
+
+    def _is_pipeline_check_needed(self, result: Result) -> bool:
+        """
+        Return True if the result is still pending/running within the timeout threshold.
+        Results that exceeded the threshold are marked as failed.
+        """
         # Only check if result is pending or running
         if result.status not in [ResultStatus.PENDING, ResultStatus.RUNNING]:
             logger.debug(
                 f"Result {result.id} status is {result.status}, no pipeline check needed"
             )
-            return
+            return False
 
         task_id = result.id
         logger.debug(
@@ -68,9 +106,13 @@ class PipelineStatusCheckMixin:
             )
             result.status = ResultStatus.FAILED
             result.save()
-            return
+            return False
 
-        task = pipeline_service.get_pipeline_task(task_id)
+        return True
+
+    def _update_result_from_pipeline_task(self, result: Result, task) -> None:
+        """Apply a pipeline task snapshot to the result and save it."""
+        task_id = result.id
 
         # If pipeline reports nothing for this task, mark as failed.
         if task is None or not task.get("status"):
@@ -261,6 +303,24 @@ class QueryViewSet(PipelineStatusCheckMixin, viewsets.ModelViewSet):
         """Single database lookup for single-object queries"""
         return get_object_or_404(Query, user=self.request.user, id=self.kwargs["id"])
 
+    def list(self, request, *args, **kwargs):
+        """
+        Override list to check pipeline status of all pending or running results
+        with a single batch request to the pipeline service.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        queries = list(page if page is not None else queryset)
+
+        self.check_and_update_results_from_pipeline(
+            [query.result for query in queries if hasattr(query, "result")]
+        )
+
+        serializer = self.get_serializer(queries, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     def retrieve(self, request, *args, **kwargs):
         """
         Override retrieve to check pipeline status when result is pending or running.
@@ -392,6 +452,22 @@ class QueryViewSet(PipelineStatusCheckMixin, viewsets.ModelViewSet):
             # Keep result in PENDING status if demo creation fails
             raise
 
+    def _profile_requested(self):
+        """
+        Whether the pipeline task should be profiled (?profile=true).
+        Profiling is reserved to staff users: the flag is ignored for others.
+        """
+        requested = self.request.query_params.get("profile", "").lower() in (
+            "1",
+            "true",
+        )
+        if requested and not self.request.user.is_staff:
+            logger.warning(
+                f"Ignoring profile request of non-staff user {self.request.user.id}"
+            )
+            return False
+        return requested
+
     def _trigger_pipeline_analysis(self, query):
         """Trigger pipeline analysis for the query."""
         try:
@@ -426,6 +502,7 @@ class QueryViewSet(PipelineStatusCheckMixin, viewsets.ModelViewSet):
                 year_end=query.year_end,
                 quarter_start=query.quarter_start,
                 quarter_end=query.quarter_end,
+                profile=self._profile_requested(),
             )
 
             logger.info(
@@ -510,6 +587,22 @@ class ResultViewSet(PipelineStatusCheckMixin, viewsets.ReadOnlyModelViewSet):
             "query"
         )
 
+    def list(self, request, *args, **kwargs):
+        """
+        Override list to check pipeline status of all pending or running results
+        with a single batch request to the pipeline service.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        results = list(page if page is not None else queryset)
+
+        self.check_and_update_results_from_pipeline(results)
+
+        serializer = self.get_serializer(results, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     def retrieve(self, request, *args, **kwargs):
         """
         Override retrieve to check pipeline status when result is pending or running.
@@ -560,24 +653,9 @@ class ResultViewSet(PipelineStatusCheckMixin, viewsets.ReadOnlyModelViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        # send email notification to user according to result status
-        email_service = EmailService()
-        user_email = result.query.user.email
-        query_name = result.query.name
-        chart_url = f"{settings.FRONTEND_URL}/queries/{result.query.id}"
-
-        if result.status == ResultStatus.COMPLETED:
-            email_service.send_query_completion_email(
-                user_email=user_email, query_name=query_name, chart_url=chart_url
-            )
-        elif result.status == ResultStatus.FAILED:
-            error_message = getattr(result, "error_message", "pipeline error running")
-            email_service.send_query_error_email(
-                user_email=user_email,
-                query_name=query_name,
-                error_message=error_message,
-                chart_url=chart_url,
-            )
+        # Queue email notification to user according to result status.
+        # The outbox sender delivers it in the background, so the callback does not wait on SMTP.
+        enqueue_result_email(result)
 
         logger.info(f"Result {result.id} is updated by task_id {task_id}")
 
@@ -647,3 +725,52 @@ class ReactionNameViewSet(TermNameSearchViewSet):
     serializer_class = ReactionNameSerializer
     queryset = ReactionName.objects.all()
     model_name = "reaction name"
+
+
+class PipelineAdminViewSet(viewsets.ViewSet):
+    """Staff-only diagnostics of the pipeline service integration."""
+
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=["get"], url_path="client-stats")
+    def client_stats(self, request):
+        """
+        Circuit state and call metrics (latency, failures, retries) of the
+        pipeline HTTP client of this process.
+        URL: /pipeline/client-stats/
+        """
+        return Response(pipeline_http_client.stats())
+
+    @action(detail=False, methods=["get"], url_path=r"profiles/(?P<result_id>\d+)")
+    def profile(self, request, result_id=None):
+        """
+        Profile of the pipeline task of a result run with ?profile=1, proxied from
+        the pipeline (which serves profiles only to the backend).
+        ?output=text returns a text report of the top functions instead of the
+        pstats file.
+        URL: /pipeline/profiles/{result_id}/
+        """
+        # Not ?format, which DRF reserves for content negotiation
+        output = request.query_params.get("output", "pstats")
+        if output not in ("pstats", "text"):
+            return Response(
+                {"error": "output must be pstats or text"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        profile = pipeline_service.get_task_profile(int(result_id), output=output)
+        if profile is None:
+            return Response(
+                {"error": f"No profile of result {result_id}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        response = HttpResponse(
+            profile.content,
+            content_type=profile.headers.get(
+                "Content-Type", "application/octet-stream"
+            ),
+        )
+        if output == "pstats":
+            response["Content-Disposition"] = (
+                f'attachment; filename="result-{result_id}.prof"'
+            )
+        return response
@@ -455,7 +455,41 @@ REST_AUTH_REGISTER_SERIALIZERS = {
 # to support local Docker setups. In production, an empty list denies all requests.
 pipeline_ips = os.getenv("PIPELINE_SERVICE_IPS", "")
 PIPELINE_SERVICE_IPS = [ip.strip() for ip in pipeline_ips.split(",") if ip.strip()]
+# How long resolved addresses of hostname entries in PIPELINE_SERVICE_IPS are cached
+PIPELINE_SERVICE_HOSTNAME_TTL_SECONDS = int(
+    os.getenv("PIPELINE_SERVICE_HOSTNAME_TTL_SECONDS", 60)
+)
 PIPELINE_BASE_URL = os.getenv("PIPELINE_BASE_URL", "http://localhost:8001")
 PIPELINE_TIMEOUT = 30  # seconds
 # Timeout (minutes) before a pipeline task is considered failed
 PIPELINE_TASK_TIMEOUT_MINUTES = int(os.getenv("PIPELINE_TASK_TIMEOUT_MINUTES", 60))
+# Shared HTTP client for pipeline calls: connection pool size, retries and circuit breaker
+PIPELINE_HTTP_POOL_SIZE = int(os.getenv("PIPELINE_HTTP_POOL_SIZE", 10))
+PIPELINE_HTTP_MAX_RETRIES = int(os.getenv("PIPELINE_HTTP_MAX_RETRIES", 3))
+PIPELINE_HTTP_BACKOFF_BASE_SECONDS = float(
+    os.getenv("PIPELINE_HTTP_BACKOFF_BASE_SECONDS", 0.5)
+)
+PIPELINE_HTTP_BACKOFF_MAX_SECONDS = float(
+    os.getenv("PIPELINE_HTTP_BACKOFF_MAX_SECONDS", 8)
+)
+# Consecutive failures before calls are short-circuited, and for how long
+PIPELINE_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv("PIPELINE_CIRCUIT_FAILURE_THRESHOLD", 5)
+)
+PIPELINE_CIRCUIT_RESET_SECONDS = int(os.getenv("PIPELINE_CIRCUIT_RESET_SECONDS", 30))
+
+# Email outbox settings
+
+# Query notification emails are queued in the outbox and sent by a background thread
+# so pipeline callbacks return without waiting for SMTP.
+EMAIL_OUTBOX_BACKGROUND_SENDER = (
+    os.getenv("EMAIL_OUTBOX_BACKGROUND_SENDER", "True") == "True"
+)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+# Retry delay doubles after each failed attempt, capped at the max delay
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600))
+EMAIL_OUTBOX_POLL_INTERVAL_SECONDS = int(
+    os.getenv("EMAIL_OUTBOX_POLL_INTERVAL_SECONDS", 30)
+)
@@ -22,3 +22,6 @@ DATABASES = {
         "PORT": "5432",
     }
 }
+
+# Send outbox emails explicitly in tests instead of from a background thread
+EMAIL_OUTBOX_BACKGROUND_SENDER = False
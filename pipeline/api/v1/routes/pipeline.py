@@ -2,33 +2,65 @@
 Pipeline API routes
 """
 
+import asyncio
 import logging
+from typing import List, Literal
 
 from constants import TaskStatus
+from core.access import require_backend
+from core.config import get_settings
 from database import SessionDep
-from errors import PipelineCapacityExceededError
-from fastapi import APIRouter, HTTPException, status
+from errors import (
+    DataFilesNotFoundError,
+    PipelineCapacityExceededError,
+    PipelineQueueFullError,
+)
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from models.models import TaskBase, TaskResults
 from models.schemas import (
     AvailableDataResponse,
     ErrorResponse,
+    ExternalIdsRequest,
     PipelineRequest,
+    QuarterRefreshRequest,
+    QuarterRefreshResponse,
+    TaskBatchResponse,
     TaskListResponse,
     TaskSummary,
 )
 from services import pipeline_service
+from services.quarterly_counts import QuarterlyCountsRepository
+from services.task_events import (
+    FINAL_STATUSES,
+    format_sse,
+    task_event,
+    task_event_bus,
+)
 from services.task_repository import TaskRepository
 from sqlmodel import select
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
+    HTTP_304_NOT_MODIFIED,
     HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_CONTENT,
     HTTP_429_TOO_MANY_REQUESTS,
 )
-from utils import normalise_empty_ror_fields
+from utils import Quarter, normalise_empty_ror_fields
 
 logger = logging.getLogger("faers-api.routes")
 router = APIRouter()
+settings = get_settings()
 
 
 @router.post(
@@ -44,11 +76,22 @@ async def run_pipeline(request: PipelineRequest) -> TaskBase:
         logger.info(
             f"Pipeline run requested: {request.year_start}q{request.quarter_start} to {request.year_end}q{request.quarter_end}"
         )
+        # Refuse before taking a slot when too many tasks wait for memory
+        pipeline_service.check_admission()
         # Try to create a new task using circular buffer logic
         task: TaskResults = TaskRepository.create_or_reuse_slot(request.external_id)
         pipeline_service.start_pipeline(request, task)
         return task
 
+    except PipelineQueueFullError as e:
+        logger.warning(
+            f"Pipeline queue full for external_id {request.external_id}: {str(e)}"
+        )
+        raise HTTPException(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except PipelineCapacityExceededError as e:
         logger.warning(
             f"Pipeline capacity exceeded for external_id {request.external_id}: {str(e)}"
@@ -67,6 +110,133 @@ async def run_pipeline(request: PipelineRequest) -> TaskBase:
         )
 
 
+@router.post(
+    "/refresh",
+    response_model=QuarterRefreshResponse,
+    status_code=HTTP_202_ACCEPTED,
+    summary="Extend stored results with a new quarter",
+    description="Append a newly available quarter to the results of the completed tasks ending right before it, as a background task",
+    responses={
+        404: {"model": ErrorResponse, "description": "Quarter data not found"},
+        429: {"model": ErrorResponse, "description": "Pipeline queue is full"},
+    },
+)
+async def refresh_results(request: QuarterRefreshRequest) -> QuarterRefreshResponse:
+    """Extend the stored cumulative ROR results with a new quarter"""
+    quarter = Quarter(request.year, request.quarter)
+    try:
+        entries = QuarterlyCountsRepository.get_by_last_quarter(
+            str(quarter.decrement())
+        )
+        pipeline_service.start_quarter_refresh(str(quarter))
+        return QuarterRefreshResponse(quarter=str(quarter), tasks=len(entries))
+
+    except DataFilesNotFoundError as e:
+        logger.warning(f"Cannot refresh results with {quarter}: {str(e)}")
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=str(e))
+    except PipelineQueueFullError as e:
+        logger.warning(f"Pipeline queue full, not refreshing with {quarter}: {str(e)}")
+        raise HTTPException(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        logger.error(
+            f"Unexpected error refreshing results with {quarter}: {str(e)}",
+            exc_info=True,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to refresh results",
+        )
+
+
+@router.get(
+    "/events",
+    summary="Stream task status changes",
+    description="Server-sent events with the status, progress and final ROR arrays of the given tasks (by task_id and/or external_id) as soon as they change. The current state of each task is sent first; the stream ends once all of them are completed or failed.",
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        404: {"model": ErrorResponse, "description": "Task not found"},
+    },
+)
+async def stream_task_events(
+    session: SessionDep,
+    task_id: List[int] = Query([], description="Task IDs to follow"),
+    external_id: List[str] = Query([], description="External IDs to follow"),
+) -> StreamingResponse:
+    """Stream the status changes of some tasks"""
+    if not task_id and not external_id:
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Give at least one task_id or external_id",
+        )
+    # Subscribe before reading the current state, so no change is missed
+    subscription = task_event_bus.subscribe(task_id, external_id)
+    try:
+        snapshot = []
+        for id_ in dict.fromkeys(task_id):
+            task = session.get(TaskResults, id_)
+            if not task:
+                logger.warning(f"Task not found: {id_}")
+                raise HTTPException(
+                    status_code=HTTP_404_NOT_FOUND, detail=f"Task {id_} not found"
+                )
+            snapshot.append(task_event(task))
+        for ext_id in dict.fromkeys(external_id):
+            statement = (
+                select(TaskResults)
+                .where(TaskResults.external_id == ext_id)
+                .order_by(TaskResults.created_at.desc(), TaskResults.id.desc())
+            )
+            task = session.exec(statement).first()
+            # An external_id without a task yet is followed until its task finishes
+            if task:
+                snapshot.append(task_event(task))
+    except BaseException:
+        task_event_bus.unsubscribe(subscription)
+        raise
+
+    async def events():
+        # Tasks followed by id or external_id that are not finished yet
+        pending = {("id", id_) for id_ in task_id} | {
+            ("external_id", ext_id) for ext_id in external_id
+        }
+
+        def update_pending(event):
+            keys = {("id", event.id), ("external_id", event.external_id)}
+            if event.status in FINAL_STATUSES:
+                pending.difference_update(keys)
+            elif event.external_id in subscription.external_ids:
+                # A new task for the external_id
+                pending.add(("external_id", event.external_id))
+
+        try:
+            for event in snapshot:
+                update_pending(event)
+                yield format_sse(event)
+            while pending:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=settings.PIPELINE_EVENTS_HEARTBEAT_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                update_pending(event)
+                yield format_sse(event)
+        finally:
+            task_event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/{task_id}",
     response_model=TaskResults,
@@ -102,6 +272,45 @@ async def get_pipeline_status(task_id: int, session: SessionDep) -> TaskResults:
         )
 
 
+@router.get(
+    "/{task_id}/profile",
+    summary="Get the profile of a pipeline task",
+    description="Get the cProfile stats of a profiled task, as a pstats file or a text report of its top functions. Served only to the backend (PIPELINE_BACKEND_IPS)",
+    responses={
+        200: {"content": {"application/octet-stream": {}, "text/plain": {}}},
+        403: {"model": ErrorResponse, "description": "Client is not the backend"},
+        404: {"model": ErrorResponse, "description": "Task or profile not found"},
+    },
+    dependencies=[Depends(require_backend)],
+)
+async def get_pipeline_profile(
+    task_id: int,
+    session: SessionDep,
+    format: Literal["pstats", "text"] = "pstats",
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Get the profile of a pipeline task"""
+    if not session.get(TaskResults, task_id):
+        logger.warning(f"Task not found: {task_id}")
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND, detail=f"Task {task_id} not found"
+        )
+    path = pipeline_service.profile_path(task_id)
+    if not path.exists():
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"No profile of task {task_id}",
+        )
+    if format == "text":
+        return PlainTextResponse(
+            pipeline_service.profile_summary(task_id, sort=sort, limit=limit)
+        )
+    return FileResponse(
+        path, media_type="application/octet-stream", filename=path.name
+    )
+
+
 @router.get(
     "/external/{external_id}",
     response_model=TaskResults,
@@ -154,6 +363,65 @@ async def get_pipeline_by_external_id(
         )
 
 
+@router.post(
+    "/external/batch",
+    response_model=TaskBatchResponse,
+    summary="Get pipeline tasks by a batch of external_ids",
+    description="Get the latest task for each of the given external_ids in a single lookup",
+)
+async def get_pipeline_by_external_ids(
+    request: ExternalIdsRequest, session: SessionDep
+) -> TaskBatchResponse:
+    """Get the latest task for each requested external_id"""
+    try:
+        # Keep the caller's order while dropping duplicate ids
+        external_ids = list(dict.fromkeys(request.external_ids))
+        logger.debug(f"Retrieving tasks for {len(external_ids)} external_ids")
+
+        # One indexed IN lookup; newest task per external_id comes first
+        statement = (
+            select(TaskResults)
+            .where(TaskResults.external_id.in_(external_ids))
+            .order_by(
+                TaskResults.external_id,
+                TaskResults.created_at.desc(),
+                TaskResults.id.desc(),
+            )
+        )
+        latest_by_external_id: dict[str, TaskResults] = {}
+        for task in session.exec(statement):
+            latest_by_external_id.setdefault(task.external_id, task)
+
+        tasks = []
+        missing = []
+        for external_id in external_ids:
+            task = latest_by_external_id.get(external_id)
+            if task is None:
+                missing.append(external_id)
+                continue
+            changed_fields = normalise_empty_ror_fields(task)
+            if changed_fields:
+                logger.warning(
+                    f"Task {task.id} (external_id={external_id}): normalized fields before API response: {changed_fields}"
+                )
+            tasks.append(task)
+
+        logger.debug(
+            f"Batch lookup found {len(tasks)} tasks, {len(missing)} external_ids missing"
+        )
+        return TaskBatchResponse(tasks=tasks, missing=missing)
+
+    except Exception as e:
+        logger.error(
+            f"Error retrieving tasks by external_ids: {str(e)}",
+            exc_info=True,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve tasks by external_ids",
+        )
+
+
 @router.get(
     "/status/{status}",
     response_model=TaskListResponse,
@@ -196,12 +464,24 @@ async def get_tasks_by_status(
     "/data/available",
     response_model=AvailableDataResponse,
     summary="Get available FAERS data",
-    description="Get information about available FAERS data quarters",
+    description="Get information about available FAERS data quarters. Served from an in-memory manifest refreshed when the data directory changes, with an ETag: send it back in If-None-Match to get 304 Not Modified while the data is unchanged.",
+    responses={304: {"description": "Available data not modified"}},
 )
-async def get_available_data():
+async def get_available_data(
+    response: Response,
+    if_none_match: str | None = Header(None),
+):
     """Get information about available FAERS data quarters"""
     try:
-        data_info: AvailableDataResponse = pipeline_service.get_available_data()
+        snapshot = pipeline_service.available_data_snapshot()
+        etag = snapshot.etag
+        known_etags = [t.strip() for t in (if_none_match or "").split(",")]
+        if etag in known_etags or "*" in known_etags:
+            return Response(
+                status_code=HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        data_info: AvailableDataResponse = snapshot.available_data
+        response.headers["ETag"] = etag
 
         logger.debug(
             f"Retrieved data info: {len(data_info.complete_quarters)} complete quarters, {len(data_info.incomplete_quarters)} incomplete quarters"
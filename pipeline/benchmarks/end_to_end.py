@@ -0,0 +1,202 @@
+"""
+End-to-end benchmarks of mark_data.main, report.main and run_pipeline on
+synthetic FAERS data (see synthetic_faers.py).
+
+Each stage runs in a fresh process, so its peak resident memory is measured on
+its own. Results are printed (and optionally saved) as JSON records:
+    stage, quarters, cases_per_quarter, input_rows, wall_seconds, peak_rss_mb,
+    rows_per_second
+where input_rows counts the rows of the demo, drug, reac and outc files read.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.end_to_end --n-quarters 1 8 40 --fn-out bench.json
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import defopt
+from benchmarks.synthetic_faers import SIGNAL_DRUG, SIGNAL_REACTION, generate_faers
+from utils import Quarter, generate_quarters
+
+logger = logging.getLogger("FAERS")
+
+FIRST_QUARTER = "2010q1"
+STAGES = ["mark_data", "report", "run_pipeline"]
+CONFIG_DICT = {"drug": [SIGNAL_DRUG], "reaction": [SIGNAL_REACTION], "control": None}
+
+
+def quarter_after(q: str, n: int) -> str:
+    """The quarter n quarters after q"""
+    quarter = Quarter(q)
+    index = quarter.year * 4 + quarter.quarter - 1 + n
+    return str(Quarter(index // 4, index % 4 + 1))
+
+
+def _pipeline_environment(workdir: str, q_from: str, q_to: str) -> dict:
+    """Settings of the pipeline service pointing to the benchmark directory"""
+    return {
+        "BASE_DIR": workdir,
+        "FAERS_FROM": q_from,
+        "FAERS_TO": q_to,
+        "DATA_EXTERNAL_DIR": "faers",
+        "DATA_OUTPUT_DIR": "pipeline_output",
+        "DATA_COUNT_CUBE_DIR": "no_count_cube",
+        "LOGS_DIR": "logs",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.sqlite3')}",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def _run_pipeline(workdir: str, q_from: str, q_to: str):
+    # The service reads its settings when imported
+    os.environ.update(_pipeline_environment(workdir, q_from, q_to))
+    from constants import TaskStatus
+    from database import create_db_and_tables
+    from models.schemas import PipelineRequest
+    from services.pipeline_service import run_pipeline
+    from services.task_repository import TaskRepository
+
+    create_db_and_tables()
+    first, end = Quarter(q_from), Quarter(q_to)
+    request = PipelineRequest(
+        year_start=first.year,
+        quarter_start=first.quarter,
+        year_end=end.year,
+        quarter_end=end.quarter,
+        drugs=CONFIG_DICT["drug"],
+        reactions=CONFIG_DICT["reaction"],
+        external_id=f"benchmark-{q_from}-{q_to}",
+    )
+    task = TaskRepository.create_or_reuse_slot(request.external_id)
+    run_pipeline(request, task)
+    task = TaskRepository.get_task(task.id)
+    if task.status != TaskStatus.COMPLETED:
+        raise RuntimeError(f"run_pipeline failed: {task.error_message}")
+
+
+def _run_stage(stage: str, workdir: str, q_from: str, q_to: str) -> dict:
+    """Run a stage in this (fresh) process, return its wall time and peak memory"""
+    dir_raw = os.path.join(workdir, "faers")
+    dir_marked = os.path.join(workdir, "marked", f"{q_from}-{q_to}")
+    start = time.perf_counter()
+    if stage == "mark_data":
+        from mark_data import main as mark_data_main
+
+        mark_data_main(
+            year_q_from=q_from,
+            year_q_to=q_to,
+            dir_in=dir_raw,
+            config_dict=CONFIG_DICT,
+            dir_out=dir_marked,
+        )
+    elif stage == "report":
+        from report import main as report_main
+
+        dir_reports = tempfile.mkdtemp(dir=workdir)
+        report_main(
+            dir_marked_data=dir_marked,
+            config_dict=CONFIG_DICT,
+            dir_raw_data=dir_raw,
+            dir_reports=dir_reports,
+            return_plot_data_only=True,
+        )
+    elif stage == "run_pipeline":
+        _run_pipeline(workdir, q_from, q_to)
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+    wall = time.perf_counter() - start
+    # ru_maxrss is in kB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"wall_seconds": wall, "peak_rss_mb": peak_rss_mb}
+
+
+def run_benchmarks(
+    workdir: str,
+    n_quarters: List[int],
+    cases_per_quarter: int,
+    stages: List[str] = STAGES,
+    seed: int = 0,
+) -> List[dict]:
+    q_end = Quarter(quarter_after(FIRST_QUARTER, max(n_quarters)))
+    quarters = [str(q) for q in generate_quarters(Quarter(FIRST_QUARTER), q_end)]
+    n_rows = generate_faers(
+        os.path.join(workdir, "faers"),
+        quarters,
+        cases_per_quarter=cases_per_quarter,
+        seed=seed,
+    )
+
+    records = []
+    context = multiprocessing.get_context("spawn")
+    for n in n_quarters:
+        q_to = quarter_after(FIRST_QUARTER, n)
+        input_rows = sum(sum(n_rows[q].values()) for q in quarters[:n])
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measured = executor.submit(
+                    _run_stage, stage, workdir, FIRST_QUARTER, q_to
+                ).result()
+            record = {
+                "stage": stage,
+                "quarters": n,
+                "cases_per_quarter": cases_per_quarter,
+                "input_rows": input_rows,
+                **measured,
+                "rows_per_second": input_rows / measured["wall_seconds"],
+            }
+            print(json.dumps(record), flush=True)
+            records.append(record)
+    return records
+
+
+def main(
+    *,
+    n_quarters: List[int] = [1, 8, 40],
+    cases_per_quarter: int = 10_000,
+    stages: List[str] = STAGES,
+    workdir: str = None,
+    fn_out: str = None,
+    seed: int = 0,
+):
+    """
+    Time the pipeline stages end to end on synthetic FAERS data
+
+    :param list[int] n_quarters:
+        Numbers of quarters to benchmark, starting at 2010q1
+    :param int cases_per_quarter:
+        Synthetic reports per quarter
+    :param list[str] stages:
+        Stages to run, of mark_data, report and run_pipeline (report uses the
+        output of mark_data)
+    :param str workdir:
+        Directory for the synthetic data and outputs, a temporary one by default
+    :param str fn_out:
+        Save the results to this JSON file
+    :param int seed:
+        Seed of the synthetic data
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        records = run_benchmarks(
+            os.path.abspath(workdir or tmp),
+            n_quarters,
+            cases_per_quarter,
+            stages=stages,
+            seed=seed,
+        )
+    if fn_out:
+        with open(fn_out, "w") as f:
+            json.dump(records, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    defopt.run(main)
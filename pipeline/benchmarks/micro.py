@@ -0,0 +1,296 @@
+"""
+Micro-benchmarks of the statistical hot paths of mark_data.py, utils.py and
+report.py, on synthetic FAERS data (see synthetic_faers.py) of a few sizes.
+
+Each benchmark is timed `repeat` times on fresh copies of its inputs (copies are
+made outside the timing) after a warm-up call, and the median and minimum times
+are recorded. Runs are compared by their minimum times. Results are JSON records:
+    benchmark, size, median_seconds, min_seconds, repeat
+where size is the number of reports.
+
+Run from the pipeline directory:
+
+    # Save a baseline
+    python -m benchmarks.micro run --fn-out benchmarks/baselines/micro.json
+    # Benchmark again and flag benchmarks more than 25% slower than the baseline
+    python -m benchmarks.micro run --fn-baseline benchmarks/baselines/micro.json
+    # Compare two saved runs
+    python -m benchmarks.micro compare before.json after.json --threshold 0.25
+
+Timings depend on the machine: compare runs made on the same one.
+"""
+
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+import defopt
+import pandas as pd
+import utils
+from benchmarks.synthetic_faers import generate_faers
+from mark_data import (
+    handle_duplicates,
+    mark_drug_data,
+    mark_reaction_data,
+    merge_marked_data,
+)
+from report import Reporter
+from utils import ContingencyMatrix, QuestionConfig
+
+logger = logging.getLogger("FAERS")
+
+SIZES = [1_000, 10_000, 100_000]
+QUARTERS = ["2020q1", "2020q2"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+# Number of drugs and reactions of the benchmark query, the most frequent ones
+N_QUERY_TERMS = 5
+
+
+class MicroBenchmark(NamedTuple):
+    # Fresh arguments of run from the prepared data, not timed
+    setup: Callable[[dict], tuple]
+    run: Callable
+
+
+def _ror_from_results_table(data, config):
+    return ContingencyMatrix.from_results_table(data, config).ror()
+
+
+BENCHMARKS: Dict[str, MicroBenchmark] = {
+    "read_demo_data": MicroBenchmark(
+        lambda d: (d["fn_demo"],), utils.read_demo_data
+    ),
+    "mark_drug_data": MicroBenchmark(
+        lambda d: (d["drug"].copy(), d["config"].drugs), mark_drug_data
+    ),
+    "mark_reaction_data": MicroBenchmark(
+        lambda d: (d["reac"].copy(), d["config"].reactions), mark_reaction_data
+    ),
+    "handle_duplicates": MicroBenchmark(
+        lambda d: (d["merged"].copy(),), handle_duplicates
+    ),
+    "contingency_matrix_ror": MicroBenchmark(
+        lambda d: (d["marked"], d["config"]), _ror_from_results_table
+    ),
+    "calculate_ror_data": MicroBenchmark(
+        lambda d: (d["reporter"], d["marked"]), Reporter._calculate_ror_data
+    ),
+    "demographic_table": MicroBenchmark(
+        lambda d: (d["reporter"], d["marked"]), Reporter.demographic_table
+    ),
+}
+
+
+def prepare_data(dir_out: str, size: int, seed: int = 0) -> dict:
+    """
+    Synthetic quarters with `size` reports in total, and the inputs of each stage
+    of marking and reporting them
+    """
+    dir_raw = os.path.join(dir_out, str(size))
+    generate_faers(
+        dir_raw, QUARTERS, cases_per_quarter=size // len(QUARTERS), seed=seed
+    )
+    drug = _read_quarters(dir_raw, "drug", ["primaryid", "caseid", "drugname"])
+    drug = drug.dropna()
+    reac = _read_quarters(dir_raw, "reac", ["primaryid", "caseid", "pt"])
+    config = QuestionConfig.config_from_dict(
+        {
+            "drug": list(_most_frequent(drug.drugname)),
+            "reaction": list(_most_frequent(reac.pt)),
+        }
+    )
+    demo = []
+    for q in QUARTERS:
+        tmp = utils.read_demo_data(os.path.join(dir_raw, f"demo{q}.csv.zip"))
+        tmp["q"] = q
+        demo.append(tmp.set_index("caseid"))
+    merged = merge_marked_data(
+        mark_drug_data(drug.copy(), config.drugs),
+        mark_reaction_data(reac.copy(), config.reactions),
+        pd.concat(demo),
+        [config],
+    )
+    return {
+        "fn_demo": os.path.join(dir_raw, f"demo{QUARTERS[0]}.csv.zip"),
+        "drug": drug,
+        "reac": reac,
+        "config": config,
+        "merged": merged,
+        "marked": handle_duplicates(merged.copy()),
+        "reporter": Reporter(config, "", dir_raw, False, return_plot_data_only=True),
+    }
+
+
+def _read_quarters(dir_raw: str, prefix: str, usecols: List[str]) -> pd.DataFrame:
+    return pd.concat(
+        pd.read_csv(
+            os.path.join(dir_raw, f"{prefix}{q}.csv.zip"), usecols=usecols, dtype=str
+        )
+        for q in QUARTERS
+    )
+
+
+def _most_frequent(names: pd.Series) -> pd.Index:
+    return names.value_counts().index[:N_QUERY_TERMS].str.lower()
+
+
+def time_benchmark(benchmark: MicroBenchmark, data: dict, repeat: int) -> List[float]:
+    """Seconds of each of `repeat` calls, after a warm-up call"""
+    benchmark.run(*benchmark.setup(data))
+    timings = []
+    for _ in range(repeat):
+        args = benchmark.setup(data)
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            benchmark.run(*args)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return timings
+
+
+def run_micro_benchmarks(
+    sizes: List[int] = SIZES,
+    repeat: int = 5,
+    benchmarks: List[str] = None,
+    seed: int = 0,
+) -> List[dict]:
+    names = benchmarks or list(BENCHMARKS)
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            data = prepare_data(tmp, size, seed)
+            for name in names:
+                timings = time_benchmark(BENCHMARKS[name], data, repeat)
+                records.append(
+                    {
+                        "benchmark": name,
+                        "size": size,
+                        "median_seconds": statistics.median(timings),
+                        "min_seconds": min(timings),
+                        "repeat": repeat,
+                    }
+                )
+                logger.info(
+                    f"{name} ({size:,d} reports): "
+                    f"{records[-1]['median_seconds'] * 1000:.1f} ms"
+                )
+    return records
+
+
+def compare_records(
+    baseline: List[dict],
+    current: List[dict],
+    threshold: float = 0.25,
+    min_delta: float = 0.005,
+) -> pd.DataFrame:
+    """
+    Minimum times of the benchmarks in both runs (the least noisy estimate of
+    the time of a call, as in timeit).
+
+    :param threshold: relative slowdown above which a benchmark is flagged
+    :param min_delta: seconds, smaller slowdowns are not flagged (timer noise)
+    :return: indexed by benchmark and size, with the baseline and current
+        minimum seconds, their ratio and whether it is a slowdown
+    """
+    key = ["benchmark", "size"]
+    tbl = pd.merge(
+        pd.DataFrame(baseline)[key + ["min_seconds"]],
+        pd.DataFrame(current)[key + ["min_seconds"]],
+        on=key,
+        suffixes=("_baseline", "_current"),
+    ).set_index(key)
+    tbl["ratio"] = tbl.min_seconds_current / tbl.min_seconds_baseline
+    tbl["slowdown"] = (tbl.ratio > 1 + threshold) & (
+        tbl.min_seconds_current - tbl.min_seconds_baseline > min_delta
+    )
+    return tbl
+
+
+def load_records(fn: str) -> List[dict]:
+    with open(fn) as f:
+        return json.load(f)
+
+
+def save_records(records: List[dict], fn: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+    with open(fn, "w") as f:
+        json.dump(records, f, indent=2)
+
+
+def _report_comparison(tbl: pd.DataFrame, threshold: float) -> None:
+    print(tbl.to_string(float_format=lambda x: f"{x:.4f}"))
+    slowdowns = tbl.loc[tbl.slowdown]
+    if len(slowdowns):
+        print(f"\n{len(slowdowns)} benchmarks are more than {threshold:.0%} slower:")
+        for benchmark, size in slowdowns.index:
+            print(f"  {benchmark} ({size:,d} reports)")
+        sys.exit(1)
+
+
+def run(
+    *,
+    sizes: List[int] = SIZES,
+    repeat: int = 5,
+    benchmarks: List[str] = None,
+    fn_out: str = None,
+    fn_baseline: str = None,
+    threshold: float = 0.25,
+    seed: int = 0,
+):
+    """
+    Run the micro-benchmarks
+
+    :param list[int] sizes:
+        Numbers of synthetic reports
+    :param int repeat:
+        Timed calls per benchmark and size
+    :param list[str] benchmarks:
+        Benchmarks to run, all of them by default
+    :param str fn_out:
+        Save the results (e.g. as a new baseline) to this JSON file
+    :param str fn_baseline:
+        Compare the results with this baseline, exit with an error on slowdowns
+    :param float threshold:
+        Relative slowdown flagged by the comparison
+    :param int seed:
+        Seed of the synthetic data
+    """
+    records = run_micro_benchmarks(sizes, repeat, benchmarks, seed)
+    if fn_out:
+        save_records(records, fn_out)
+    if fn_baseline:
+        tbl = compare_records(load_records(fn_baseline), records, threshold)
+        _report_comparison(tbl, threshold)
+    else:
+        print(pd.DataFrame(records).to_string(index=False))
+
+
+def compare(fn_baseline: str, fn_current: str, *, threshold: float = 0.25):
+    """
+    Compare two saved micro-benchmark runs, exit with an error on slowdowns
+
+    :param str fn_baseline:
+        Baseline results
+    :param str fn_current:
+        Results to compare with the baseline
+    :param float threshold:
+        Relative slowdown flagged, 0.25 flags benchmarks 25% slower
+    """
+    tbl = compare_records(
+        load_records(fn_baseline), load_records(fn_current), threshold
+    )
+    _report_comparison(tbl, threshold)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    defopt.run([run, compare])
@@ -0,0 +1,96 @@
+"""
+Accuracy vs. speed of the logistic regression on aggregated covariate patterns,
+compared with the exact fit on every case, on simulated cases.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.regression --n-cases 1000000
+"""
+
+import logging
+import time
+from typing import List
+
+import defopt
+import numpy as np
+import pandas as pd
+from report import REGRESSION_BIN_WIDTHS, Reporter
+from utils import QuestionConfig
+
+logger = logging.getLogger("FAERS")
+
+
+def simulate_marked_data(
+    config: QuestionConfig, n_cases: int, seed: int = 0
+) -> pd.DataFrame:
+    """Marked cases with a known exposure odds ratio of 2."""
+    rng = np.random.default_rng(seed)
+    age = rng.uniform(18, 90, n_cases)
+    wt = rng.normal(75, 15, n_cases).clip(30, 200)
+    sex = rng.choice(["F", "M"], n_cases)
+    exposed = rng.random(n_cases) < 0.2
+    logit = -3 + np.log(2) * exposed + 0.02 * (age - 50) + 0.3 * (sex == "F")
+    reacted = rng.random(n_cases) < 1 / (1 + np.exp(-logit))
+    return pd.DataFrame(
+        {
+            "age": age,
+            "wt": wt,
+            "sex": sex,
+            f"exposed {config.name}": exposed,
+            f"reacted {config.name}": reacted,
+        }
+    )
+
+
+def main(*, n_cases: List[int] = [100_000, 1_000_000], seed: int = 0):
+    """
+    Time the exact and the aggregated logistic regression and compare their odds ratios
+
+    :param list[int] n_cases:
+        Numbers of simulated cases to benchmark
+    :param int seed:
+        Seed of the simulation
+    """
+    config = QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"]}
+    )
+    print(f"Bin widths: {REGRESSION_BIN_WIDTHS}")
+    for n in n_cases:
+        data = simulate_marked_data(config, n, seed)
+        timings = {}
+        estimates = {}
+        for aggregate in False, True:
+            reporter = Reporter(
+                config,
+                "",
+                None,
+                False,
+                return_plot_data_only=True,
+                aggregate_regression=aggregate,
+            )
+            start = time.perf_counter()
+            reg_data = reporter._calculate_regression_data(data)
+            timings[aggregate] = time.perf_counter() - start
+            estimates[aggregate] = reg_data["or_estimates"]
+            n_rows = int(reg_data["result"].nobs)
+
+        rel_diff = (estimates[True] / estimates[False] - 1).abs()
+        print(
+            f"\n{n} cases, {n_rows} covariate patterns: exact {timings[False]:.2f}s, "
+            f"aggregated {timings[True]:.2f}s ({timings[False] / timings[True]:.1f}x)"
+        )
+        print(
+            pd.concat(
+                {
+                    "exact OR": estimates[False]["OR"],
+                    "aggregated OR": estimates[True]["OR"],
+                    "max rel. diff": rel_diff.max(axis=1),
+                },
+                axis=1,
+            ).to_string()
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    defopt.run(main)
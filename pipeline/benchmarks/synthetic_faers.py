@@ -0,0 +1,240 @@
+"""
+Synthetic FAERS quarterly files, shaped like the NBER extracts the pipeline reads.
+
+Each quarter has demo, drug, reac and outc .csv.zip files. Drug and reaction
+terms follow a Zipf distribution over their vocabularies (a few terms are in
+most reports, most terms are rare), a share of the reports of each quarter are
+new versions of earlier cases, and the most frequent drug is associated with
+the most frequent reaction, so the benchmark query has a signal.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.synthetic_faers --year-q-from 2020q1 --year-q-to 2021q1 \
+        --dir-out /tmp/faers --cases-per-quarter 100000
+"""
+
+import logging
+import os
+from typing import Dict, List
+
+import defopt
+import numpy as np
+import pandas as pd
+from utils import Quarter, generate_quarters
+
+logger = logging.getLogger("FAERS")
+
+FIRST_CASEID = 10_000_000
+# Versions of a case get primaryid = caseid * VERSIONS + version
+VERSIONS = 100
+# Names of the benchmark query terms (the most frequent drug and reaction)
+SIGNAL_DRUG = "drug00000"
+SIGNAL_REACTION = "reaction00000"
+
+
+def drug_name(i: np.ndarray) -> np.ndarray:
+    # Raw names are upper case, like many FAERS drug names; queries are normalized
+    return np.char.add("DRUG", np.char.zfill(i.astype(str), 5))
+
+
+def reaction_name(i: np.ndarray) -> np.ndarray:
+    return np.char.add("Reaction", np.char.zfill(i.astype(str), 5))
+
+
+def zipf_probabilities(n_terms: int, exponent: float) -> np.ndarray:
+    p = 1.0 / np.arange(1, n_terms + 1) ** exponent
+    return p / p.sum()
+
+
+def _terms_per_case(rng, n_cases, mean):
+    """At least one term per case, mean terms on average"""
+    return 1 + rng.poisson(max(mean - 1, 0), n_cases)
+
+
+def _event_dates(rng, quarter: Quarter, n: int) -> np.ndarray:
+    start = np.datetime64(f"{quarter.year}-{3 * quarter.quarter - 2:02d}-01")
+    days = rng.integers(0, 90, n)
+    return pd.DatetimeIndex(start + days).strftime("%Y%m%d").to_numpy()
+
+
+def generate_faers(
+    dir_out: str,
+    quarters: List[str],
+    cases_per_quarter: int = 10_000,
+    drugs_per_case: float = 3.0,
+    reactions_per_case: float = 2.0,
+    duplicate_rate: float = 0.05,
+    n_drugs: int = 5_000,
+    n_reactions: int = 2_000,
+    zipf_exponent: float = 1.1,
+    outcome_rate: float = 0.3,
+    seed: int = 0,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Write the files of the quarters to dir_out.
+
+    :param duplicate_rate: share of the reports of a quarter that are new versions
+        of cases reported before (in earlier quarters or earlier in the quarter)
+    :return: quarter -> number of rows written per file type
+    """
+    os.makedirs(dir_out, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    p_drug = zipf_probabilities(n_drugs, zipf_exponent)
+    p_reaction = zipf_probabilities(n_reactions, zipf_exponent)
+    n_rows = {}
+    # Number of versions reported so far, per caseid - FIRST_CASEID
+    versions = np.zeros(0, dtype=np.int64)
+
+    for q in quarters:
+        quarter = Quarter(q)
+        n_rows[q] = {}
+        n_dup = int(round(cases_per_quarter * duplicate_rate))
+        n_new = cases_per_quarter - n_dup
+        new = np.arange(len(versions), len(versions) + n_new)
+        versions = np.concatenate([versions, np.zeros(n_new, dtype=np.int64)])
+        dup = rng.integers(0, len(versions), n_dup)
+        cases = np.concatenate([new, dup])
+        # Version of each report: the occurrences of its case so far
+        order = np.argsort(cases, kind="stable")
+        first = np.searchsorted(cases[order], cases[order])
+        occurrence = np.empty_like(cases)
+        occurrence[order] = np.arange(len(cases)) - first
+        report_versions = versions[cases] + occurrence + 1
+        np.add.at(versions, cases, 1)
+        caseid = cases + FIRST_CASEID
+        primaryid = caseid * VERSIONS + np.minimum(report_versions, VERSIONS - 1)
+        n = len(cases)
+
+        age_in_months = rng.random(n) < 0.02
+        age = np.where(
+            age_in_months,
+            rng.integers(1, 36, n),
+            rng.normal(55, 18, n).clip(0, 100).round(),
+        )
+        wt_in_lbs = rng.random(n) < 0.2
+        wt = rng.normal(75, 18, n).clip(3, 250) * np.where(wt_in_lbs, 2.20462, 1)
+        demo = pd.DataFrame(
+            {
+                "primaryid": primaryid,
+                "caseid": caseid,
+                "event_dt_num": _event_dates(rng, quarter, n),
+                "age": age,
+                "age_cod": np.where(age_in_months, "MON", "YR"),
+                "sex": rng.choice(["F", "M", "UNK"], n, p=[0.55, 0.4, 0.05]),
+                "wt": wt.round(1),
+                "wt_cod": np.where(wt_in_lbs, "LBS", "KG"),
+            }
+        )
+        missing = rng.random((n, 2)) < 0.3
+        demo.loc[missing[:, 0], ["age", "age_cod"]] = None
+        demo.loc[missing[:, 1], ["wt", "wt_cod"]] = None
+
+        k = _terms_per_case(rng, n, drugs_per_case)
+        drug_report = np.repeat(np.arange(n), k)
+        drugs = rng.choice(n_drugs, len(drug_report), p=p_drug)
+        drug = pd.DataFrame(
+            {
+                "primaryid": primaryid[drug_report],
+                "caseid": caseid[drug_report],
+                "drugname": drug_name(drugs),
+            }
+        )
+
+        k = _terms_per_case(rng, n, reactions_per_case)
+        reac_report = np.repeat(np.arange(n), k)
+        reactions = rng.choice(n_reactions, len(reac_report), p=p_reaction)
+        # Signal: reports with the first drug often have the first reaction
+        has_signal_drug = np.zeros(n, dtype=bool)
+        has_signal_drug[drug_report[drugs == 0]] = True
+        signal = np.flatnonzero(has_signal_drug & (rng.random(n) < 0.3))
+        reac_report = np.concatenate([reac_report, signal])
+        reactions = np.concatenate([reactions, np.zeros(len(signal), dtype=int)])
+        reac = pd.DataFrame(
+            {
+                "primaryid": primaryid[reac_report],
+                "caseid": caseid[reac_report],
+                "pt": reaction_name(reactions),
+            }
+        )
+
+        outc_report = np.flatnonzero(rng.random(n) < outcome_rate)
+        outc = pd.DataFrame(
+            {
+                "primaryid": primaryid[outc_report],
+                "caseid": caseid[outc_report],
+                "outc_cod": rng.choice(["HO", "OT", "DE", "LT"], len(outc_report)),
+            }
+        )
+
+        for name, df in ("demo", demo), ("drug", drug), ("reac", reac), ("outc", outc):
+            df.to_csv(
+                os.path.join(dir_out, f"{name}{q}.csv.zip"),
+                index=False,
+                compression="zip",
+            )
+            n_rows[q][name] = len(df)
+        logger.info(f"Generated {q}: {n:,d} reports, {len(drug):,d} drug rows")
+    return n_rows
+
+
+def main(
+    *,
+    year_q_from: str,
+    year_q_to: str,
+    dir_out: str,
+    cases_per_quarter: int = 10_000,
+    drugs_per_case: float = 3.0,
+    reactions_per_case: float = 2.0,
+    duplicate_rate: float = 0.05,
+    n_drugs: int = 5_000,
+    n_reactions: int = 2_000,
+    zipf_exponent: float = 1.1,
+    seed: int = 0,
+):
+    """
+    Generate synthetic FAERS files
+
+    :param str year_q_from:
+        First quarter, XXXXqQ
+    :param str year_q_to:
+        End quarter (exclusive), XXXXqQ
+    :param str dir_out:
+        Output directory
+    :param int cases_per_quarter:
+        Reports per quarter
+    :param float drugs_per_case:
+        Mean number of drug rows per report (at least one)
+    :param float reactions_per_case:
+        Mean number of reaction rows per report (at least one)
+    :param float duplicate_rate:
+        Share of the reports of a quarter that are new versions of earlier cases
+    :param int n_drugs:
+        Drug vocabulary size
+    :param int n_reactions:
+        Reaction vocabulary size
+    :param float zipf_exponent:
+        Exponent of the Zipf distribution of the terms
+    :param int seed:
+        Random seed
+    """
+    quarters = [
+        str(q) for q in generate_quarters(Quarter(year_q_from), Quarter(year_q_to))
+    ]
+    n_rows = generate_faers(
+        dir_out,
+        quarters,
+        cases_per_quarter=cases_per_quarter,
+        drugs_per_case=drugs_per_case,
+        reactions_per_case=reactions_per_case,
+        duplicate_rate=duplicate_rate,
+        n_drugs=n_drugs,
+        n_reactions=n_reactions,
+        zipf_exponent=zipf_exponent,
+        seed=seed,
+    )
+    print(pd.DataFrame(n_rows).T.sum().to_dict())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    defopt.run(main)
@@ -0,0 +1,114 @@
+"""
+Time of TaskRepository.create_or_reuse_slot with many stored tasks, compared
+with loading every task row to count them (the previous implementation).
+
+Each task row holds ROR arrays like a real result. All slots are taken, so every
+call reuses the oldest completed slot.
+
+Run from the pipeline directory:
+
+    python -m benchmarks.task_slots --n-tasks 10000
+"""
+
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import defopt
+
+logger = logging.getLogger("FAERS")
+
+
+def _fill_tasks(engine, n_tasks: int, n_quarters: int) -> None:
+    from constants import TaskStatus
+    from models.models import TaskResults
+    from sqlmodel import Session
+
+    now = datetime.now(timezone.utc)
+    values = [1.0 + i / 100 for i in range(n_quarters)]
+    with Session(engine) as session:
+        for i in range(n_tasks):
+            session.add(
+                TaskResults(
+                    external_id=f"benchmark-{i}",
+                    status=TaskStatus.COMPLETED,
+                    completed_at=now - timedelta(days=1, seconds=n_tasks - i),
+                    ror_values=values,
+                    ror_lower=values,
+                    ror_upper=values,
+                )
+            )
+        session.commit()
+
+
+def _time_calls(fn, repeat: int) -> List[float]:
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_benchmark(workdir: str, n_tasks: int, n_quarters: int, repeat: int) -> dict:
+    # The repository reads its settings when imported
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'tasks.sqlite3')}",
+            "PIPELINE_SLOT_LOCK_FILE": os.path.join(workdir, "task_slots.lock"),
+            "PIPELINE_MAX_RESULTS": str(n_tasks),
+            "PIPELINE_MIN_RESULT_RETENTION_MINUTES": "0",
+        }
+    )
+    from database import create_db_and_tables, create_session, engine
+    from models.models import TaskResults
+    from services.task_repository import TaskRepository
+    from sqlmodel import select
+
+    create_db_and_tables()
+    _fill_tasks(engine, n_tasks, n_quarters)
+
+    def load_all_rows(_):
+        with create_session() as session:
+            return len(session.exec(select(TaskResults)).all())
+
+    def reuse_slot(i):
+        return TaskRepository.create_or_reuse_slot(f"reused-{i}")
+
+    benchmarks = {
+        "count_by_loading_rows": load_all_rows,
+        "create_or_reuse_slot": reuse_slot,
+    }
+    records = {}
+    for name, fn in benchmarks.items():
+        timings = _time_calls(fn, repeat)
+        records[name] = {
+            "median_ms": 1000 * statistics.median(timings),
+            "max_ms": 1000 * max(timings),
+        }
+    return {"n_tasks": n_tasks, "n_quarters": n_quarters, **records}
+
+
+def main(*, n_tasks: int = 10_000, n_quarters: int = 80, repeat: int = 20):
+    """
+    Time task slot allocation with many stored tasks
+
+    :param int n_tasks:
+        Number of stored tasks (all slots taken)
+    :param int n_quarters:
+        Length of the ROR arrays of each task
+    :param int repeat:
+        Timed calls
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        print(json.dumps(run_benchmark(workdir, n_tasks, n_quarters, repeat), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    defopt.run(main)
@@ -0,0 +1,142 @@
+"""
+Column store of a data frame: one .npy file per column, memory-mapped on read.
+
+Numeric, boolean and datetime columns are read as read-only memory maps, so
+processes reading the same store share the page cache instead of each holding
+(or unpickling) a copy of the data. Object columns (strings) are stored as
+integer codes and their distinct values, and are rebuilt as object columns on
+read. The index is stored like a column.
+
+A store can be partitioned by the values of a column (e.g. quarters): rows are
+stored grouped by partition, and the manifest records the row range of each
+partition, so a partition is read as a slice of the same files.
+
+Layout of the store directory:
+    manifest.json          column names, files, row count, index name,
+                           row range of each partition
+    NNNN.npy               values (or codes) of the column at position NNNN
+    NNNN.values.npy        distinct values of an object column
+    index.npy              index values (or codes)
+    index.values.npy       distinct index values of an object index
+"""
+
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _write_array(values: pd.Series, directory: str, name: str) -> dict:
+    """Save an array (codes and distinct values for objects) and describe its files"""
+    entry = {"file": f"{name}.npy", "values": None}
+    if values.dtype == object or isinstance(values.dtype, pd.StringDtype):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        np.save(os.path.join(directory, entry["file"]), codes.astype(np.int32))
+        entry["values"] = f"{name}.values.npy"
+        np.save(
+            os.path.join(directory, entry["values"]),
+            np.asarray(uniques, dtype=str),
+        )
+    else:
+        np.save(os.path.join(directory, entry["file"]), np.asarray(values))
+    return entry
+
+
+def _read_array(directory: str, entry: dict) -> np.ndarray:
+    values = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+    if entry["values"] is None:
+        # Plain array view of the map: results of operations on it are in memory
+        return values.view(np.ndarray)
+    uniques = np.load(os.path.join(directory, entry["values"])).astype(object)
+    return pd.Categorical.from_codes(values, uniques).astype(object)
+
+
+def write_column_store(
+    df: pd.DataFrame, directory: str, partition_by: Optional[str] = None
+) -> None:
+    """
+    Save the data frame as a column store in directory.
+
+    :param partition_by: column whose values partition the rows. The rows are
+        stored sorted by it (keeping the order of the rows of each partition).
+    """
+    os.makedirs(directory, exist_ok=True)
+    partitions = None
+    if partition_by is not None:
+        df = df.sort_values(partition_by, kind="stable")
+        values, starts, sizes = np.unique(
+            df[partition_by].to_numpy(), return_index=True, return_counts=True
+        )
+        partitions = {
+            str(value): [int(start), int(start + size)]
+            for value, start, size in zip(values, starts, sizes)
+        }
+    columns = []
+    for i, (column, values) in enumerate(df.items()):
+        columns.append({"name": column, **_write_array(values, directory, f"{i:04d}")})
+    manifest = {
+        "n_rows": len(df),
+        "partitions": partitions,
+        "columns": columns,
+        "index": {
+            "name": df.index.name,
+            **_write_array(df.index.to_series(), directory, "index"),
+        },
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def is_column_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def read_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def read_column_names(directory: str) -> List[str]:
+    return [entry["name"] for entry in read_manifest(directory)["columns"]]
+
+
+def read_column_store(
+    directory: str,
+    columns: Optional[List[str]] = None,
+    partitions: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load the data frame saved in directory.
+
+    :param columns: only these columns (in that order)
+    :param partitions: only the rows of these partitions (in the stored order).
+        Partitions without rows are skipped.
+    :return: without partitions, numeric columns are read-only views of the
+        memory-mapped files; the rows of partitions are copied.
+    """
+    manifest = read_manifest(directory)
+    entries = {entry["name"]: entry for entry in manifest["columns"]}
+    if columns is None:
+        columns = list(entries)
+    index = pd.Index(
+        _read_array(directory, manifest["index"]), name=manifest["index"]["name"]
+    )
+    df = pd.DataFrame(
+        {column: _read_array(directory, entries[column]) for column in columns},
+        index=index,
+        columns=columns,
+        copy=False,
+    )
+    if partitions is None:
+        return df
+    if manifest["partitions"] is None:
+        raise ValueError(f"The column store in {directory} is not partitioned")
+    ranges = sorted(
+        manifest["partitions"][p] for p in partitions if p in manifest["partitions"]
+    )
+    rows = [np.arange(start, stop) for start, stop in ranges]
+    return df.iloc[np.concatenate(rows) if rows else []]
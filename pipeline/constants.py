@@ -6,7 +6,18 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class CallbackStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
 class RorFields(str, Enum):
     ROR_VALUES = "ror_values"
     ROR_LOWER = "ror_lower"
-    ROR_UPPER = "ror_upper"
\ No newline at end of file
+    ROR_UPPER = "ror_upper"
+
+
+class RorMode(str, Enum):
+    CUMULATIVE = "cumulative"
+    WINDOW = "window"
+    QUARTERLY = "quarterly"
@@ -0,0 +1,83 @@
+"""
+Restriction of internal endpoints to the backend.
+
+The backend accepts callbacks only from the addresses of the pipeline service
+(PIPELINE_SERVICE_IPS); the other way around, endpoints that expose internals
+(e.g. task profiles, which hold source paths) are served only to the addresses in
+PIPELINE_BACKEND_IPS: comma-separated IPs, CIDR networks or hostnames (e.g. the
+docker service name of the backend). An empty list denies every request, except
+in DEBUG mode, to support local setups.
+"""
+
+import ipaddress
+import logging
+import socket
+from typing import List
+
+from core.config import get_settings
+from fastapi import HTTPException, Request
+from starlette.status import HTTP_403_FORBIDDEN
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def backend_rules() -> List[str]:
+    return [
+        rule.strip() for rule in settings.PIPELINE_BACKEND_IPS.split(",") if rule.strip()
+    ]
+
+
+def _resolve(hostname: str) -> set:
+    try:
+        resolved = socket.getaddrinfo(hostname, None)
+    except socket.gaierror as e:
+        logger.warning(f"Failed to resolve backend host {hostname}: {e}")
+        return set()
+    addresses = set()
+    for item in resolved:
+        try:
+            addresses.add(ipaddress.ip_address(item[4][0]))
+        except (IndexError, ValueError):
+            continue
+    return addresses
+
+
+def is_allowed(client_ip: str, rules: List[str]) -> bool:
+    """Whether client_ip matches one of the IP, network or hostname rules"""
+    try:
+        address = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return False
+    hostnames = []
+    for rule in rules:
+        try:
+            if address in ipaddress.ip_network(rule, strict=False):
+                return True
+        except ValueError:
+            hostnames.append(rule)
+    # Hostnames are resolved on each check: the restricted endpoints are rarely used
+    return any(address in _resolve(hostname) for hostname in hostnames)
+
+
+def require_backend(request: Request) -> None:
+    """Dependency of the endpoints served only to the backend (403 otherwise)"""
+    client_ip = request.client.host if request.client else None
+    rules = backend_rules()
+    if not rules:
+        if settings.DEBUG:
+            logger.warning(
+                f"Allowing {request.url.path} from {client_ip}: "
+                "PIPELINE_BACKEND_IPS is empty in DEBUG mode"
+            )
+            return
+        allowed = False
+    else:
+        allowed = client_ip is not None and is_allowed(client_ip, rules)
+
+    if not allowed:
+        logger.warning(f"Denied {request.url.path} to {client_ip}")
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN,
+            detail="Forbidden: request is not allowed from this source.",
+        )
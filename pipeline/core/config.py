@@ -33,6 +33,35 @@ class Settings(BaseSettings):
     PIPELINE_CALLBACK_URL: str = (
         "http://localhost:8000/api/v1/analysis/results/update-by-task"
     )
+    # Callback outbox delivery: batch size, retries with exponential backoff, polling
+    PIPELINE_CALLBACK_BATCH_SIZE: int = 20
+    PIPELINE_CALLBACK_MAX_ATTEMPTS: int = 10
+    PIPELINE_CALLBACK_RETRY_BASE_SECONDS: float = 2.0
+    PIPELINE_CALLBACK_RETRY_MAX_SECONDS: float = 300.0
+    PIPELINE_CALLBACK_POLL_INTERVAL_SECONDS: float = 5.0
+    # A claimed callback is skipped by the other senders for this long, and sent
+    # callbacks are deleted after the retention period
+    PIPELINE_CALLBACK_LEASE_SECONDS: float = 120.0
+    PIPELINE_CALLBACK_SENT_RETENTION_HOURS: float = 168.0
+    # Admission control: tasks start while the estimated peak memory of the
+    # running tasks (base + per quarter, learned from finished tasks) fits in the
+    # budget, and wait in a queue of at most PIPELINE_MAX_QUEUED_TASKS otherwise
+    PIPELINE_MEMORY_BUDGET_MB: float = 8192
+    PIPELINE_MAX_QUEUED_TASKS: int = 100
+    PIPELINE_TASK_BASE_MEMORY_MB: float = 300
+    PIPELINE_TASK_MEMORY_PER_QUARTER_MB: float = 100
+    PIPELINE_TASK_SECONDS_PER_QUARTER: float = 10
+    # Task profiling (cProfile stats saved next to the task log): every task, or
+    # only the tasks requested with profile=true when such requests are allowed
+    PIPELINE_PROFILE_TASKS: bool = False
+    PIPELINE_ALLOW_PROFILE_REQUESTS: bool = False
+    # Comma-separated IPs, CIDR networks or hostnames of the backend, the only
+    # clients of internal endpoints (task profiles). Empty denies all but in DEBUG
+    PIPELINE_BACKEND_IPS: str = ""
+    # Task status event streams: keep-alive comment interval and events buffered
+    # per subscriber (a subscriber that falls behind misses the oldest ones)
+    PIPELINE_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    PIPELINE_EVENTS_QUEUE_SIZE: int = 100
 
     # FAERS data bounds
     FAERS_FROM: str
@@ -41,14 +70,31 @@ class Settings(BaseSettings):
     # Data directories
     DATA_EXTERNAL_DIR: str = "data/external/faers"
     DATA_OUTPUT_DIR: str = "pipeline_output"
+    # Count cube built by count_cube.py, used for single-drug/single-reaction queries
+    DATA_COUNT_CUBE_DIR: str = "data/interim/count_cube"
+    # Last quarter each case was reported in, extended by each quarter refresh
+    DATA_CASE_HISTORY_DIR: str = "data/interim/case_history"
     LOGS_DIR: str = "logs"
+    # The manifest of the external data files is refreshed when the directory
+    # changes, and at least this often
+    PIPELINE_DATA_MANIFEST_MAX_AGE_SECONDS: float = 300.0
 
     # Database settings
     SQLITE_FILE_NAME: str = "database.sqlite3"
     DATABASE_URL: str = f"sqlite:///{SQLITE_FILE_NAME}"
+    # SQLite: seconds a write waits for the lock held by another process, WAL
+    # journal and its synchronous level (NORMAL is durable up to the last checkpoint)
+    DATABASE_BUSY_TIMEOUT_SECONDS: float = 30.0
+    DATABASE_SQLITE_WAL: bool = True
+    DATABASE_SQLITE_SYNCHRONOUS: str = "NORMAL"
+    # Other databases (e.g. postgresql+psycopg://...): connection pool per process
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
 
     # File paths
     BASE_DIR: Path = Path(__file__).parent.parent
+    # Serializes task slot allocation across the API worker processes
+    PIPELINE_SLOT_LOCK_FILE: str = "task_slots.lock"
 
     class Config:
         env_file = ".env"
@@ -61,6 +107,18 @@ class Settings(BaseSettings):
         """Get the full path to pipeline output directory"""
         return self.BASE_DIR / self.DATA_OUTPUT_DIR
 
+    def get_count_cube_path(self) -> Path:
+        """Get the full path to the count cube directory"""
+        return self.BASE_DIR / self.DATA_COUNT_CUBE_DIR
+
+    def get_case_history_path(self) -> Path:
+        """Get the full path to the case history directory"""
+        return self.BASE_DIR / self.DATA_CASE_HISTORY_DIR
+
+    def get_slot_lock_path(self) -> Path:
+        """Get the full path to the task slot lock file"""
+        return self.BASE_DIR / self.PIPELINE_SLOT_LOCK_FILE
+
     def get_logs_dir(self) -> Path:
         """Get the full path to logs directory"""
         return self.BASE_DIR / self.LOGS_DIR
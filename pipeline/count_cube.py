@@ -0,0 +1,616 @@
+"""
+Drug x reaction x quarter count cube built offline from the FAERS files.
+
+Every ROR is a function of four counts per quarter: cases, cases per drug,
+cases per reaction and cases per drug-reaction pair. The cube materializes
+these counts once for all drugs and reactions, so single-drug/single-reaction
+queries are answered by a lookup instead of marking the raw rows again.
+
+Cases are deduplicated like mark_data does: a case is counted once, in the
+first quarter of the queried range it was reported in, with the union of the
+drugs and reactions of its versions within the range. The precomputed counts
+hold for the whole cube range only, so the cube also keeps the report versions
+(case x quarter) of every case, drug and reaction: a query over any run of the
+cube quarters deduplicates the versions of its drug and reaction within its own
+range, and takes the number of cases per quarter from the counts of versions by
+the quarter of the previous version of their case.
+
+Layout of the cube directory:
+    index.pkl              quarters, drug and reaction vocabularies, cases per quarter,
+                           EBGM prior fit over the pair counts of each quarter,
+                           versions per quarter by the quarter of the previous version
+    drug_counts.npz        sparse (drugs x quarters) case counts
+    reaction_counts.npz    sparse (reactions x quarters) case counts
+    pair_keys.npy          drug_index * n_reactions + reaction_index, sorted
+    pair_quarters.npy      quarter index of each pair count
+    pair_counts.npy        cases with both the drug and the reaction in the quarter
+    version_keys.npy       case_index * n_quarters + quarter_index of each report
+                           version, sorted
+    drug_versions_ptr.npy  versions of drug i are drug_versions_keys[ptr[i]:ptr[i + 1]]
+    drug_versions_keys.npy version keys listing each drug, sorted per drug
+    reaction_versions_*    same for the reactions
+The pair and version arrays are memory-mapped, so a lookup reads only the
+matching entries. Cubes built without the version arrays answer only queries
+over their whole range.
+"""
+
+import logging
+import os
+import pickle
+from typing import List, NamedTuple, Optional, Tuple
+
+import defopt
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from ingest import TERM_SOURCES, IngestedQuarter
+from mark_data import load_quarder_files
+from shrinkage import DEFAULT_PRIOR, GpsPrior, expected_counts, fit_gps_prior
+from utils import Quarter, QuestionConfig, generate_quarters
+
+logger = logging.getLogger("FAERS")
+
+INDEX_FILE = "index.pkl"
+
+# dir -> (index mtime, CountCube) of the cubes loaded by this process
+_loaded_cubes = {}
+
+
+class ItemVersions(NamedTuple):
+    """
+    Report versions listing each item (drug or reaction): keys[ptr[i]:ptr[i + 1]]
+    are the sorted version keys (case * n_quarters + quarter) of item i.
+    """
+
+    ptr: np.ndarray
+    keys: np.ndarray
+
+
+class CountCube:
+    def __init__(
+        self,
+        quarters: List[str],
+        drugs: List[str],
+        reactions: List[str],
+        n_cases: np.ndarray,
+        drug_counts: sp.csr_matrix,
+        reaction_counts: sp.csr_matrix,
+        pair_keys: np.ndarray,
+        pair_quarters: np.ndarray,
+        pair_counts: np.ndarray,
+        ebgm_priors: Optional[List[GpsPrior]] = None,
+        version_keys: Optional[np.ndarray] = None,
+        first_counts: Optional[np.ndarray] = None,
+        drug_versions: Optional[ItemVersions] = None,
+        reaction_versions: Optional[ItemVersions] = None,
+    ):
+        self.quarters = list(quarters)
+        self.drugs = list(drugs)
+        self.reactions = list(reactions)
+        self.n_cases = np.asarray(n_cases)
+        self.drug_counts = drug_counts.tocsr()
+        self.reaction_counts = reaction_counts.tocsr()
+        self.pair_keys = pair_keys
+        self.pair_quarters = pair_quarters
+        self.pair_counts = pair_counts
+        self.ebgm_priors = (
+            [GpsPrior(*prior) for prior in ebgm_priors]
+            if ebgm_priors is not None
+            else [DEFAULT_PRIOR] * len(self.quarters)
+        )
+        self.version_keys = version_keys
+        self.first_counts = first_counts
+        self.drug_versions = drug_versions
+        self.reaction_versions = reaction_versions
+
+        self.quarter_index = {q: i for i, q in enumerate(self.quarters)}
+        self.drug_index = {d: i for i, d in enumerate(self.drugs)}
+        self.reaction_index = {r: i for i, r in enumerate(self.reactions)}
+
+    @classmethod
+    def load(cls, dir_cube: str) -> "CountCube":
+        with open(os.path.join(dir_cube, INDEX_FILE), "rb") as f:
+            index = pickle.load(f)
+        return cls(
+            quarters=index["quarters"],
+            drugs=index["drugs"],
+            reactions=index["reactions"],
+            n_cases=index["n_cases"],
+            drug_counts=sp.load_npz(os.path.join(dir_cube, "drug_counts.npz")),
+            reaction_counts=sp.load_npz(os.path.join(dir_cube, "reaction_counts.npz")),
+            pair_keys=np.load(os.path.join(dir_cube, "pair_keys.npy"), mmap_mode="r"),
+            pair_quarters=np.load(
+                os.path.join(dir_cube, "pair_quarters.npy"), mmap_mode="r"
+            ),
+            pair_counts=np.load(
+                os.path.join(dir_cube, "pair_counts.npy"), mmap_mode="r"
+            ),
+            ebgm_priors=index.get("ebgm_priors"),
+            **cls._load_versions(dir_cube, index),
+        )
+
+    @staticmethod
+    def _load_versions(dir_cube: str, index: dict) -> dict:
+        if "first_counts" not in index:
+            # Built before the cube kept the report versions
+            return {}
+
+        def load(name):
+            return np.load(os.path.join(dir_cube, f"{name}.npy"), mmap_mode="r")
+
+        return {
+            "version_keys": load("version_keys"),
+            "first_counts": index["first_counts"],
+            "drug_versions": ItemVersions(
+                load("drug_versions_ptr"), load("drug_versions_keys")
+            ),
+            "reaction_versions": ItemVersions(
+                load("reaction_versions_ptr"), load("reaction_versions_keys")
+            ),
+        }
+
+    @classmethod
+    def load_if_exists(cls, dir_cube) -> Optional["CountCube"]:
+        """
+        Load the cube if it was built, reusing the one already loaded by this process.
+        Pipeline worker processes are long-lived, so the vocabularies are read once
+        per worker rather than once per task, and reloaded when the cube is rebuilt.
+        """
+        if not dir_cube:
+            return None
+        fn_index = os.path.join(dir_cube, INDEX_FILE)
+        if not os.path.exists(fn_index):
+            return None
+
+        dir_cube = os.path.abspath(dir_cube)
+        mtime = os.path.getmtime(fn_index)
+        cached = _loaded_cubes.get(dir_cube)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        cube = cls.load(dir_cube)
+        _loaded_cubes[dir_cube] = (mtime, cube)
+        return cube
+
+    def save(self, dir_cube: str) -> None:
+        os.makedirs(dir_cube, exist_ok=True)
+        sp.save_npz(os.path.join(dir_cube, "drug_counts.npz"), self.drug_counts)
+        sp.save_npz(os.path.join(dir_cube, "reaction_counts.npz"), self.reaction_counts)
+        np.save(os.path.join(dir_cube, "pair_keys.npy"), self.pair_keys)
+        np.save(os.path.join(dir_cube, "pair_quarters.npy"), self.pair_quarters)
+        np.save(os.path.join(dir_cube, "pair_counts.npy"), self.pair_counts)
+        if self.version_keys is not None:
+            np.save(os.path.join(dir_cube, "version_keys.npy"), self.version_keys)
+            for kind, versions in (
+                ("drug", self.drug_versions),
+                ("reaction", self.reaction_versions),
+            ):
+                for part in "ptr", "keys":
+                    np.save(
+                        os.path.join(dir_cube, f"{kind}_versions_{part}.npy"),
+                        getattr(versions, part),
+                    )
+        # The index is written last: its presence marks a complete cube
+        with open(os.path.join(dir_cube, INDEX_FILE), "wb") as f:
+            pickle.dump(
+                {
+                    "quarters": self.quarters,
+                    "drugs": self.drugs,
+                    "reactions": self.reactions,
+                    "n_cases": self.n_cases,
+                    "ebgm_priors": [tuple(prior) for prior in self.ebgm_priors],
+                    **(
+                        {"first_counts": self.first_counts}
+                        if self.first_counts is not None
+                        else {}
+                    ),
+                },
+                f,
+            )
+        logger.info(
+            f"Saved count cube with {len(self.drugs):,d} drugs, {len(self.reactions):,d} reactions "
+            f"and {len(self.pair_keys):,d} pair counts to {dir_cube}"
+        )
+
+    def ebgm_prior(self, q: str) -> GpsPrior:
+        """The EBGM prior fit over the pairs of the quarter; the default one outside the cube."""
+        i = self.quarter_index.get(str(q))
+        return DEFAULT_PRIOR if i is None else self.ebgm_priors[i]
+
+    def quarter_range(self, quarters: List[str]) -> Optional[Tuple[int, int]]:
+        """
+        (start, stop) indexes of the quarters in the cube when they are a run of
+        its quarters it can answer: any run, or only the whole range for cubes
+        built without the report versions. None otherwise.
+        """
+        quarters = [str(q) for q in quarters]
+        start = self.quarter_index.get(quarters[0]) if quarters else None
+        if start is None:
+            return None
+        stop = start + len(quarters)
+        if self.quarters[start:stop] != quarters:
+            return None
+        if (start, stop) != (0, len(self.quarters)) and self.version_keys is None:
+            return None
+        return start, stop
+
+    def can_answer(self, config: QuestionConfig, quarters: List[str]) -> bool:
+        """Single drug, single reaction and no control group, over a run of its quarters."""
+        return (
+            len(set(config.drugs)) == 1
+            and len(set(config.reactions)) == 1
+            and not config.control
+            and self.quarter_range(quarters) is not None
+        )
+
+    def quarterly_counts(self, config: QuestionConfig, quarters: List[str]) -> pd.DataFrame:
+        """
+        Non-cumulative 2x2 counts per quarter for a single-drug/single-reaction config.
+
+        Returns a DataFrame indexed by quarter with columns a (exposed, reacted),
+        b (exposed, not reacted), c (not exposed, reacted) and d (neither).
+        Quarters without cases are left out, as in the row-level calculation.
+        """
+        quarter_range = self.quarter_range(quarters)
+        if quarter_range is None:
+            raise ValueError(f"The count cube cannot answer the quarters {quarters}")
+        start, stop = quarter_range
+        drug = self.drug_index.get(config.drugs[0])
+        reaction = self.reaction_index.get(config.reactions[0])
+
+        if (start, stop) == (0, len(self.quarters)):
+            n, n_drug, n_reaction, a = self._whole_range_counts(drug, reaction)
+        else:
+            n, n_drug, n_reaction, a = self._sub_range_counts(
+                drug, reaction, start, stop
+            )
+
+        counts = pd.DataFrame(
+            {
+                "a": a,
+                "b": n_drug - a,
+                "c": n_reaction - a,
+                "d": n - n_drug - n_reaction + a,
+            },
+            index=pd.Index(self.quarters[start:stop], name="q"),
+        )
+        return counts.loc[n > 0]
+
+    def _whole_range_counts(self, drug: Optional[int], reaction: Optional[int]):
+        """Cases, drug, reaction and pair counts per quarter, precomputed"""
+        q_idx = np.arange(len(self.quarters))
+        n = self.n_cases.astype(np.int64)
+        n_drug = self._item_counts(self.drug_counts, drug, q_idx)
+        n_reaction = self._item_counts(self.reaction_counts, reaction, q_idx)
+        a = np.zeros(len(q_idx), dtype=np.int64)
+        if drug is not None and reaction is not None:
+            key = drug * len(self.reactions) + reaction
+            start, stop = np.searchsorted(self.pair_keys, [key, key + 1])
+            by_quarter = dict(
+                zip(
+                    np.asarray(self.pair_quarters[start:stop]).tolist(),
+                    np.asarray(self.pair_counts[start:stop]).tolist(),
+                )
+            )
+            a = np.array([by_quarter.get(i, 0) for i in q_idx.tolist()], dtype=np.int64)
+        return n, n_drug, n_reaction, a
+
+    def _sub_range_counts(
+        self, drug: Optional[int], reaction: Optional[int], start: int, stop: int
+    ):
+        """Cases, drug, reaction and pair counts per quarter, deduplicated in the range"""
+        # A version is the first of its case in the range when its case has no
+        # version in the quarters of the range before it
+        n = self.first_counts[start:stop, : start + 1].sum(axis=1)
+        drug_cases = self._range_cases(self.drug_versions, drug, start, stop)
+        reaction_cases = self._range_cases(
+            self.reaction_versions, reaction, start, stop
+        )
+        pair_cases = np.intersect1d(drug_cases, reaction_cases, assume_unique=True)
+        return (
+            n,
+            self._first_quarter_counts(drug_cases, start, stop),
+            self._first_quarter_counts(reaction_cases, start, stop),
+            self._first_quarter_counts(pair_cases, start, stop),
+        )
+
+    def _range_cases(
+        self, versions: ItemVersions, item: Optional[int], start: int, stop: int
+    ) -> np.ndarray:
+        """Sorted cases with a version listing the item within the range"""
+        if item is None:
+            return np.array([], dtype=np.int64)
+        keys = np.asarray(versions.keys[versions.ptr[item] : versions.ptr[item + 1]])
+        cases, quarters = np.divmod(keys, len(self.quarters))
+        return np.unique(cases[(quarters >= start) & (quarters < stop)])
+
+    def _first_quarter_counts(self, cases: np.ndarray, start: int, stop: int):
+        """Number of the cases per quarter of the range, by their first version in it"""
+        n_quarters = len(self.quarters)
+        if len(cases) == 0:
+            return np.zeros(stop - start, dtype=np.int64)
+        idx = np.searchsorted(self.version_keys, cases * n_quarters + start)
+        found = idx < len(self.version_keys)
+        first_cases, first_quarters = np.divmod(
+            np.asarray(self.version_keys[idx[found]]), n_quarters
+        )
+        in_range = (first_cases == cases[found]) & (first_quarters < stop)
+        return np.bincount(
+            first_quarters[in_range] - start, minlength=stop - start
+        ).astype(np.int64)
+
+    @staticmethod
+    def _item_counts(matrix: sp.csr_matrix, row: Optional[int], q_idx: np.ndarray):
+        if row is None:
+            return np.zeros(len(q_idx), dtype=np.int64)
+        return matrix[row].toarray().ravel()[q_idx].astype(np.int64)
+
+
+def _incidence(case_codes: np.ndarray, item_codes: np.ndarray, shape) -> sp.csr_matrix:
+    """Binary (cases x items) matrix. Repeated (case, item) entries count once."""
+    data = np.ones(len(case_codes), dtype=np.int32)
+    matrix = sp.csr_matrix((data, (case_codes, item_codes)), shape=shape)
+    matrix.data[:] = 1
+    return matrix
+
+
+class CaseIncidence(NamedTuple):
+    """
+    Report versions of the cases of some quarters. Cases are numbered in the
+    order of their sorted ids, and each version is keyed case * n_quarters +
+    quarter index.
+    """
+
+    n_quarters: int
+    version_keys: np.ndarray  # sorted keys of the demographic rows
+    drugs: List[str]
+    reactions: List[str]
+    drug_versions: ItemVersions
+    reaction_versions: ItemVersions
+
+
+def _item_versions(
+    item_codes: np.ndarray, keys: np.ndarray, n_items: int
+) -> ItemVersions:
+    """Sorted distinct version keys of each item"""
+    order = np.lexsort((keys, item_codes))
+    item_codes, keys = item_codes[order], keys[order]
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = (np.diff(item_codes) != 0) | (np.diff(keys) != 0)
+    item_codes, keys = item_codes[distinct], keys[distinct]
+    return ItemVersions(np.searchsorted(item_codes, np.arange(n_items + 1)), keys)
+
+
+def _case_incidence(
+    n_quarters: int, demo: pd.DataFrame, items: List[pd.DataFrame]
+) -> CaseIncidence:
+    """
+    CaseIncidence of the (caseid, q) demographic rows and the (caseid, q, item)
+    rows of the drugs and of the reactions, q being the quarter index.
+    """
+    case_codes, cases = pd.factorize(demo.caseid, sort=True)
+    version_keys = np.unique(case_codes.astype(np.int64) * n_quarters + demo.q.values)
+
+    vocabularies = []
+    versions = []
+    for df in items:
+        item_case_codes = cases.get_indexer(df.caseid)
+        # Cases without demographic data are not part of the marked data either
+        known = item_case_codes >= 0
+        item_codes, vocabulary = pd.factorize(df["item"].values[known], sort=True)
+        keys = item_case_codes[known].astype(np.int64) * n_quarters + df.q.values[known]
+        vocabularies.append(list(vocabulary))
+        versions.append(_item_versions(item_codes, keys, len(vocabulary)))
+
+    return CaseIncidence(
+        n_quarters, version_keys, vocabularies[0], vocabularies[1], *versions
+    )
+
+
+def case_incidence(dir_in: str, quarters: List[str]) -> CaseIncidence:
+    """Load the report versions of the cases from the quarter files."""
+    quarters = [str(q) for q in quarters]
+    demo, drugs, reactions = [], [], []
+    for i, q in enumerate(quarters):
+        tmp = pd.read_csv(
+            os.path.join(dir_in, f"demo{q}.csv.zip"), usecols=["caseid"], dtype=str
+        )
+        tmp["q"] = i
+        demo.append(tmp)
+
+        tmp = load_quarder_files(
+            os.path.join(dir_in, "drugQ.csv.zip"), [q], usecols=["caseid", "drugname"]
+        ).dropna()
+        tmp["item"] = tmp.drugname.map(QuestionConfig.normalize_drug_name)
+        tmp["q"] = i
+        drugs.append(tmp[["caseid", "q", "item"]])
+
+        tmp = load_quarder_files(
+            os.path.join(dir_in, "reacQ.csv.zip"), [q], usecols=["caseid", "pt"]
+        ).dropna()
+        tmp["item"] = tmp.pt.map(QuestionConfig.normalize_reaction_name)
+        tmp["q"] = i
+        reactions.append(tmp[["caseid", "q", "item"]])
+
+    return _case_incidence(
+        len(quarters),
+        pd.concat(demo, ignore_index=True),
+        [pd.concat(drugs, ignore_index=True), pd.concat(reactions, ignore_index=True)],
+    )
+
+
+def case_incidence_from_ingested(
+    dir_ingested: str, quarters: List[str]
+) -> CaseIncidence:
+    """
+    Same as case_incidence, from the quarters ingested by ingest.py in dir_ingested
+    instead of the raw files: the incidence of each quarter is read from its
+    inverted indexes, so the raw rows are neither parsed nor normalized again.
+    """
+    quarters = [str(q) for q in quarters]
+    demo = []
+    items = {kind: [] for kind in TERM_SOURCES}
+    for i, q in enumerate(quarters):
+        iq = IngestedQuarter.load(dir_ingested, q)
+        case_ids = np.asarray(iq.demo.index, dtype=str)
+        demo.append(pd.DataFrame({"caseid": case_ids, "q": i}))
+        for kind in TERM_SOURCES:
+            # (terms x cases of the quarter) entries -> (case, term name) pairs
+            entries = iq.index[kind].tocoo()
+            items[kind].append(
+                pd.DataFrame(
+                    {
+                        "caseid": case_ids[entries.col],
+                        "q": i,
+                        "item": iq.terms[kind][entries.row],
+                    }
+                )
+            )
+
+    return _case_incidence(
+        len(quarters),
+        pd.concat(demo, ignore_index=True),
+        [pd.concat(items[kind], ignore_index=True) for kind in TERM_SOURCES],
+    )
+
+
+def versions_incidence(incidence: CaseIncidence):
+    """
+    Deduplicate the versions over the whole range.
+
+    Returns (case_quarter, drug_incidence, reaction_incidence, first_counts):
+    case_quarter holds the quarter index each case is attributed to (its first
+    version), the incidence matrices are binary sparse (cases x drugs) and
+    (cases x reactions) over all the versions of each case, and first_counts[q, p]
+    is the number of versions in quarter q whose previous version of the same case
+    is in quarter p - 1 (p = 0 for the first version of a case).
+    """
+    n_quarters = incidence.n_quarters
+    cases, quarters = np.divmod(incidence.version_keys, n_quarters)
+    first = np.ones(len(cases), dtype=bool)
+    first[1:] = cases[1:] != cases[:-1]
+    case_quarter = quarters[first]
+
+    previous = np.full(len(quarters), -1, dtype=np.int64)
+    previous[1:] = np.where(first[1:], -1, quarters[:-1])
+    first_counts = np.zeros((n_quarters, n_quarters + 1), dtype=np.int64)
+    np.add.at(first_counts, (quarters, previous + 1), 1)
+
+    matrices = []
+    for versions in incidence.drug_versions, incidence.reaction_versions:
+        n_items = len(versions.ptr) - 1
+        matrices.append(
+            _incidence(
+                versions.keys // n_quarters,
+                np.repeat(np.arange(n_items), np.diff(versions.ptr)),
+                (len(case_quarter), n_items),
+            )
+        )
+    return case_quarter, matrices[0], matrices[1], first_counts
+
+
+def quarterly_incidence(case_quarter: np.ndarray, x_drug, x_reac):
+    """Yield (quarter index, drug incidence, reaction incidence) for each quarter with cases."""
+    order = np.argsort(case_quarter, kind="stable")
+    n_quarters = case_quarter.max(initial=-1) + 1
+    bounds = np.searchsorted(case_quarter[order], np.arange(n_quarters + 1))
+    for i in range(len(bounds) - 1):
+        rows = order[bounds[i] : bounds[i + 1]]
+        if len(rows):
+            yield i, x_drug[rows], x_reac[rows]
+
+
+def build_count_cube(
+    dir_in: str, quarters: List[str], ingested: bool = False
+) -> CountCube:
+    """Build the cube from the FAERS files in dir_in, or its ingested quarters."""
+    quarters = [str(q) for q in quarters]
+    load_incidence = case_incidence_from_ingested if ingested else case_incidence
+    incidence = load_incidence(dir_in, quarters)
+    drugs, reactions = incidence.drugs, incidence.reactions
+    case_quarter, x_drug, x_reac, first_counts = versions_incidence(incidence)
+    logger.info(
+        f"Building count cube for {len(case_quarter):,d} cases, {len(drugs):,d} drugs "
+        f"and {len(reactions):,d} reactions"
+    )
+
+    n_cases = np.bincount(case_quarter, minlength=len(quarters))
+    # (items x quarters) counts from a single product with the case->quarter matrix
+    quarter_matrix = _incidence(
+        np.arange(len(case_quarter)), case_quarter, (len(case_quarter), len(quarters))
+    )
+    drug_counts = (x_drug.T @ quarter_matrix).tocsr()
+    reaction_counts = (x_reac.T @ quarter_matrix).tocsr()
+
+    pair_keys, pair_quarters, pair_counts = [], [], []
+    ebgm_priors = [DEFAULT_PRIOR] * len(quarters)
+    for i, x_drug_q, x_reac_q in quarterly_incidence(case_quarter, x_drug, x_reac):
+        pairs = (x_drug_q.T @ x_reac_q).tocoo()
+        pair_keys.append(pairs.row.astype(np.int64) * len(reactions) + pairs.col)
+        pair_quarters.append(np.full(pairs.nnz, i, dtype=np.int16))
+        pair_counts.append(pairs.data.astype(np.int32))
+        expected = expected_counts(
+            np.asarray(x_drug_q.sum(axis=0)).ravel()[pairs.row],
+            np.asarray(x_reac_q.sum(axis=0)).ravel()[pairs.col],
+            x_drug_q.shape[0],
+        )
+        ebgm_priors[i] = fit_gps_prior(pairs.data, expected)
+        logger.info(
+            f"{quarters[i]}: {x_drug_q.shape[0]:,d} cases, {pairs.nnz:,d} drug-reaction pairs"
+        )
+
+    pair_keys = np.concatenate(pair_keys) if pair_keys else np.array([], np.int64)
+    pair_quarters = (
+        np.concatenate(pair_quarters) if pair_quarters else np.array([], np.int16)
+    )
+    pair_counts = np.concatenate(pair_counts) if pair_counts else np.array([], np.int32)
+    order = np.lexsort((pair_quarters, pair_keys))
+
+    return CountCube(
+        quarters=quarters,
+        drugs=drugs,
+        reactions=reactions,
+        n_cases=n_cases,
+        drug_counts=drug_counts,
+        reaction_counts=reaction_counts,
+        pair_keys=pair_keys[order],
+        pair_quarters=pair_quarters[order],
+        pair_counts=pair_counts[order],
+        ebgm_priors=ebgm_priors,
+        version_keys=incidence.version_keys,
+        first_counts=first_counts,
+        drug_versions=incidence.drug_versions,
+        reaction_versions=incidence.reaction_versions,
+    )
+
+
+def main(
+    *,
+    year_q_from: str,
+    year_q_to: str,
+    dir_in: str,
+    dir_out: str,
+    ingested: bool = False,
+):
+    """
+    Build the count cube for all drugs and reactions of the given quarters.
+
+    :param str year_q_from:
+        XXXXqQ, where XXXX is the year, q is the literal "q" and Q is 1, 2, 3 or 4
+    :param str year_q_to:
+        XXXXqQ, exclusive
+    :param str dir_in:
+        Directory with the FAERS quarter files
+    :param str dir_out:
+        Output directory of the cube
+    :param bool ingested:
+        dir_in is the output directory of ingest.py: build from the ingested quarters
+    """
+    quarters = [
+        str(q) for q in generate_quarters(Quarter(year_q_from), Quarter(year_q_to))
+    ]
+    cube = build_count_cube(dir_in, quarters, ingested=ingested)
+    cube.save(dir_out)
+
+
+if __name__ == "__main__":
+    defopt.run(main)
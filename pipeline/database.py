@@ -1,17 +1,78 @@
+import os
 from typing import Annotated
 
 from core.config import get_settings
 from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlmodel import Session, SQLModel, create_engine
 
 settings = get_settings()
 
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+def build_engine(database_url: str) -> Engine:
+    """
+    Engine for the pipeline database.
+
+    SQLite (the default) is shared by the API and the task processes, so file
+    databases use WAL (readers do not block the writer), synchronous=NORMAL and a
+    busy timeout, so concurrent status updates wait for the write lock instead of
+    failing with "database is locked". Other databases (e.g. PostgreSQL with
+    postgresql+psycopg://...) get a pool of pre-pinged connections.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.DATABASE_BUSY_TIMEOUT_SECONDS,
+        },
+    )
+    in_memory = url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def configure_sqlite(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        busy_timeout_ms = int(settings.DATABASE_BUSY_TIMEOUT_SECONDS * 1000)
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout_ms}")
+        if not in_memory and settings.DATABASE_SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute(
+                f"PRAGMA synchronous = {settings.DATABASE_SQLITE_SYNCHRONOUS}"
+            )
+        cursor.close()
+
+    return engine
+
+
+def dispose_after_fork(engine: Engine) -> None:
+    """
+    Give forked processes (e.g. the task process pool) their own connections:
+    the child drops the pooled connections inherited from the parent, without
+    closing them under the parent.
+    """
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+engine = build_engine(settings.DATABASE_URL)
+dispose_after_fork(engine)
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips existing tables: add indexes introduced after they were created
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def get_session():
@@ -2,21 +2,43 @@
 Download FAERS quarterly CSV zip files for pipeline external data.
 
 This is intentionally aligned with backend management command behavior.
+
+Files are downloaded concurrently over a bounded connection pool into .part
+files, resumed with HTTP Range requests after an interruption, and renamed to
+their final name only once they are verified zip files. The sizes and hashes of
+the verified files are kept in manifest.json, so existing files are not read
+again on the next run.
 """
 
 import argparse
+import asyncio
+import hashlib
+import json
 import logging
 import os
 import shutil
-import urllib.request
-from multiprocessing.dummy import Pool as ThreadPool
+import zipfile
+from typing import Callable, Dict, List, Optional
 
+import httpx
 import tqdm
 from core.config import get_settings
 from utils import Quarter, generate_quarters
 
 logger = logging.getLogger("FAERS")
 
+NBER_URL = "https://data.nber.org/fda/faers"
+# Sizes and SHA-256 hashes of the verified files of the output directory
+MANIFEST_FILE = "manifest.json"
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+# Status codes worth retrying, other client errors (e.g. 404) are final
+RETRY_STATUS_CODES = {408, 425, 429}
+
+
+class DownloadError(Exception):
+    """A download attempt failed, it may succeed when retried."""
+
 
 def _parse_bool(value: str) -> bool:
     normalized = str(value).strip().lower()
@@ -27,7 +49,7 @@ def _parse_bool(value: str) -> bool:
     raise argparse.ArgumentTypeError(f"Invalid boolean value: {value}")
 
 
-def quarter_urls(quarter: Quarter) -> list[str]:
+def quarter_urls(quarter: Quarter, base_url: str = NBER_URL) -> list[str]:
     ret = []
     year = quarter.year
     yearquarter = str(quarter)
@@ -35,32 +57,187 @@ def quarter_urls(quarter: Quarter) -> list[str]:
 
     for w in what:
         if year <= 2018:
-            tmplt = f"https://data.nber.org/fda/faers/{year}/{w}{yearquarter}.csv.zip"
+            tmplt = f"{base_url}/{year}/{w}{yearquarter}.csv.zip"
         else:
-            tmplt = (
-                f"https://data.nber.org/fda/faers/{year}/csv/{w}{yearquarter}.csv.zip"
-            )
+            tmplt = f"{base_url}/{year}/csv/{w}{yearquarter}.csv.zip"
         ret.append(tmplt)
     return ret
 
 
-def download_url(url: str, dir_out: str, force: bool = False) -> None:
-    fn_out = os.path.split(url)[-1]
-    fn_out = os.path.join(dir_out, fn_out)
-    if os.path.exists(fn_out):
-        if force:
-            os.remove(fn_out)
-            logger.info(f"Deleted existing file {fn_out}")
-        else:
-            logger.debug(f"Skipping {url} because {fn_out} already exists")
+def load_manifest(dir_out: str) -> Dict[str, dict]:
+    fn = os.path.join(dir_out, MANIFEST_FILE)
+    if not os.path.exists(fn):
+        return {}
+    with open(fn) as f:
+        return json.load(f)
+
+
+def save_manifest(dir_out: str, manifest: Dict[str, dict]) -> None:
+    fn = os.path.join(dir_out, MANIFEST_FILE)
+    with open(fn + PART_SUFFIX, "w") as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=2)
+    os.replace(fn + PART_SUFFIX, fn)
+
+
+def verify_zip(fn: str) -> dict:
+    """
+    Check the CRC of every member of the zip file and hash it.
+
+    :return: manifest entry of the file (size and sha256)
+    :raise zipfile.BadZipFile: if the file is not a complete, valid zip file
+    """
+    with zipfile.ZipFile(fn) as zf:
+        bad_member = zf.testzip()
+    if bad_member is not None:
+        raise zipfile.BadZipFile(f"Bad CRC of {bad_member} in {fn}")
+    sha256 = hashlib.sha256()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return {"size": os.path.getsize(fn), "sha256": sha256.hexdigest()}
+
+
+async def _fetch_to_part(client: httpx.AsyncClient, url: str, fn_part: str) -> None:
+    """Download url into fn_part, continuing a partial file with a Range request"""
+    offset = os.path.getsize(fn_part) if os.path.exists(fn_part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 416:
+            # Nothing left after offset, the part file is verified as it is
             return
+        if response.status_code >= 500 or response.status_code in RETRY_STATUS_CODES:
+            raise DownloadError(f"{url}: HTTP {response.status_code}")
+        response.raise_for_status()
+        if response.status_code == 206:
+            logger.info(f"Resuming {url} from byte {offset:,d}")
+            mode = "ab"
+        else:
+            mode = "wb"
+        with open(fn_part, mode) as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)
+
+
+async def download_file(
+    client: httpx.AsyncClient,
+    url: str,
+    dir_out: str,
+    retries: int = 3,
+    backoff: float = 1.0,
+) -> dict:
+    """
+    Download url into dir_out through a .part file renamed once verified.
+
+    An interrupted download is resumed from its .part file. Failed attempts and
+    invalid zip files are retried, waiting backoff * 2 ** attempt seconds.
+
+    :return: manifest entry of the file (url, size and sha256)
+    """
+    fn_out = os.path.join(dir_out, os.path.split(url)[-1])
+    fn_part = fn_out + PART_SUFFIX
+    for attempt in range(retries + 1):
+        try:
+            await _fetch_to_part(client, url, fn_part)
+            try:
+                entry = await asyncio.to_thread(verify_zip, fn_part)
+            except zipfile.BadZipFile:
+                # Start over rather than resume after corrupted bytes
+                os.remove(fn_part)
+                raise
+            os.replace(fn_part, fn_out)
+            logger.info(f"Saved {fn_out}")
+            return {"url": url, **entry}
+        except (httpx.TransportError, DownloadError, zipfile.BadZipFile) as err:
+            if attempt == retries:
+                raise
+            delay = backoff * 2**attempt
+            logger.warning(f"Failed to download {url} ({err}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+
+async def download_urls(
+    urls: List[str],
+    dir_out: str,
+    connections: int = 4,
+    force: bool = False,
+    retries: int = 3,
+    backoff: float = 1.0,
+    client: Optional[httpx.AsyncClient] = None,
+    on_file: Optional[Callable[[str], None]] = None,
+) -> Dict[str, dict]:
+    """
+    Download the urls missing from dir_out, at most connections at a time.
+
+    Files listed in the manifest with their size are skipped without being read,
+    other existing files are verified and downloaded again if invalid.
+
+    :param on_file: called with the url of each file once it is in dir_out,
+        already there or downloaded
+
+    :return: the manifest, updated with the downloaded and verified files
+    """
+    manifest = load_manifest(dir_out)
+    todo = []
+    for url in urls:
+        fn = os.path.split(url)[-1]
+        fn_out = os.path.join(dir_out, fn)
+        if force:
+            for path in fn_out, fn_out + PART_SUFFIX:
+                if os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Deleted existing file {path}")
+            manifest.pop(fn, None)
+        if os.path.exists(fn_out):
+            if manifest.get(fn, {}).get("size") == os.path.getsize(fn_out):
+                logger.debug(f"Skipping {url} because {fn_out} already exists")
+                continue
+            try:
+                entry = await asyncio.to_thread(verify_zip, fn_out)
+                manifest[fn] = {"url": url, **entry}
+                continue
+            except zipfile.BadZipFile:
+                logger.warning(f"Downloading {url} again, {fn_out} is not valid")
+                os.remove(fn_out)
+                manifest.pop(fn, None)
+        todo.append(url)
+
+    ready = [url for url in urls if url not in todo]
+    if on_file is not None:
+        for url in ready:
+            on_file(url)
+
+    logger.info(f"will download {len(todo)} urls")
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=connections),
+            follow_redirects=True,
+        )
+    semaphore = asyncio.Semaphore(connections)
+
+    async def download(url):
+        async with semaphore:
+            try:
+                return url, await download_file(client, url, dir_out, retries, backoff)
+            except (httpx.HTTPError, DownloadError, zipfile.BadZipFile) as err:
+                logger.error(f"Failed to download {url} to {dir_out} {err}")
+                return url, None
+
     try:
-        urllib.request.urlretrieve(url, fn_out)
-    except Exception as err:
-        logger.error(f"Failed to download {url} to {fn_out} {err}")
-    else:
-        logger.info(f"Saved {fn_out}")
-        assert os.path.exists(fn_out)
+        for task in tqdm.tqdm(
+            asyncio.as_completed([download(url) for url in todo]), total=len(todo)
+        ):
+            url, entry = await task
+            if entry is not None:
+                manifest[os.path.split(url)[-1]] = entry
+                if on_file is not None:
+                    on_file(url)
+    finally:
+        if owns_client:
+            await client.aclose()
+        save_manifest(dir_out, manifest)
+    return manifest
 
 
 def run_download(
@@ -70,6 +247,7 @@ def run_download(
     threads: int = 4,
     clean_on_failure: bool = True,
     force: bool = False,
+    base_url: str = NBER_URL,
 ) -> None:
     dir_out_abs = os.path.abspath(dir_out)
     os.makedirs(dir_out_abs, exist_ok=True)
@@ -79,16 +257,9 @@ def run_download(
         q_last = Quarter(year_q_to)
         urls: list[str] = []
         for q in generate_quarters(q_first, q_last):
-            urls.extend(quarter_urls(q))
-
-        logger.info(f"will download {len(urls)} urls")
-        with ThreadPool(threads) as pool:
-            _ = list(
-                tqdm.tqdm(
-                    pool.imap(lambda url: download_url(url, dir_out_abs, force), urls),
-                    total=len(urls),
-                )
-            )
+            urls.extend(quarter_urls(q, base_url))
+
+        asyncio.run(download_urls(urls, dir_out_abs, connections=threads, force=force))
     except Exception:
         if clean_on_failure:
             shutil.rmtree(dir_out_abs, ignore_errors=True)
@@ -106,7 +277,9 @@ def build_parser() -> argparse.ArgumentParser:
         default=str(settings.get_external_data_path()),
         help="Output directory",
     )
-    parser.add_argument("--threads", type=int, default=4, help="N of parallel threads")
+    parser.add_argument(
+        "--threads", type=int, default=4, help="N of parallel connections"
+    )
     parser.add_argument(
         "--clean_on_failure",
         type=_parse_bool,
@@ -8,6 +8,14 @@ class PipelineCapacityExceededError(Exception):
     pass
 
 
+class PipelineQueueFullError(Exception):
+    """Raised when too many tasks already wait for memory to start."""
+
+    def __init__(self, message: str, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
 class DataFilesNotFoundError(Exception):
     """Raised when required FAERS data files are not found for the requested quarters"""
 
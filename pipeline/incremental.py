@@ -0,0 +1,224 @@
+"""
+Incremental update of cumulative ROR timelines when a new FAERS quarter lands.
+
+A timeline point is the ROR of the 2x2 counts summed over the quarters up to it
+(all of them, or a sliding window), so with the per-quarter counts of a query
+stored, adding a quarter only needs the counts of that quarter: they are
+appended and the timeline sums recomputed.
+
+The new quarter is read and marked once for all the queries being extended.
+Like in a full run, a case is counted in the first quarter it was reported in,
+so cases already reported in earlier quarters of a query are left out. Their
+follow-up versions are not merged back into the earlier quarters, which a full
+run over the whole range does.
+
+Whether a case was reported in the earlier quarters of a query comes from the
+case history: the last quarter each case was reported in, kept up to date with
+each new quarter in DATA_CASE_HISTORY_DIR, so the demographic files of the
+earlier quarters are not read again on every refresh.
+"""
+
+import json
+import logging
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from constants import RorMode
+from mark_data import mark_quarter
+from report import Reporter
+from utils import (
+    Quarter,
+    QuestionConfig,
+    generate_quarters,
+    ror_from_counts,
+    timeline_counts,
+)
+
+logger = logging.getLogger("FAERS")
+
+
+def read_case_ids(dir_in: str, q: str) -> pd.Index:
+    return pd.Index(
+        pd.read_csv(
+            os.path.join(dir_in, f"demo{q}.csv.zip"), usecols=["caseid"], dtype=str
+        ).caseid.unique()
+    )
+
+
+class CaseHistory:
+    """Last quarter each case was reported in, over a run of quarters"""
+
+    FILE = "case_history.pkl"
+    # The quarters alone, to tell what a refresh reads without loading the cases
+    QUARTERS_FILE = "case_history_quarters.json"
+
+    def __init__(self, quarters: List[str], last_seen: pd.Series):
+        self.quarters = list(quarters)
+        # caseid -> index in quarters of the last quarter the case was reported in
+        self.last_seen = last_seen
+
+    @classmethod
+    def empty(cls) -> "CaseHistory":
+        return cls([], pd.Series([], index=pd.Index([], dtype=str), dtype=np.int16))
+
+    @classmethod
+    def load(cls, dir_history: str) -> Optional["CaseHistory"]:
+        fn = os.path.join(dir_history, cls.FILE)
+        if not os.path.exists(fn):
+            return None
+        with open(fn, "rb") as f:
+            saved = pickle.load(f)
+        return cls(saved["quarters"], saved["last_seen"])
+
+    def save(self, dir_history: str):
+        os.makedirs(dir_history, exist_ok=True)
+        fn = os.path.join(dir_history, self.FILE)
+        # Written aside and renamed, so concurrent readers never see a partial file
+        tmp = f"{fn}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"quarters": self.quarters, "last_seen": self.last_seen}, f)
+        os.replace(tmp, fn)
+        with open(tmp, "w") as f:
+            json.dump(self.quarters, f)
+        os.replace(tmp, os.path.join(dir_history, self.QUARTERS_FILE))
+
+    @classmethod
+    def saved_quarters(cls, dir_history: Optional[str]) -> List[str]:
+        fn = os.path.join(dir_history, cls.QUARTERS_FILE) if dir_history else None
+        if fn is None or not os.path.exists(fn):
+            return []
+        with open(fn) as f:
+            return json.load(f)
+
+    @staticmethod
+    def missing_quarters(
+        saved_quarters: List[str], quarter: str, first_quarter: str
+    ) -> Tuple[bool, List[str]]:
+        """
+        Whether a history of saved_quarters is extended for the quarters before
+        quarter, from first_quarter on, and the quarters it is extended with.
+        It is rebuilt from first_quarter when it starts after first_quarter or
+        already holds quarter (e.g. a refresh run again).
+        """
+        # Quarter strings (e.g. 2020q1) sort in time order
+        extended = (
+            bool(saved_quarters)
+            and saved_quarters[0] <= first_quarter
+            and saved_quarters[-1] < quarter
+        )
+        start = (
+            Quarter(saved_quarters[-1]).increment()
+            if extended
+            else Quarter(first_quarter)
+        )
+        return extended, [str(q) for q in generate_quarters(start, Quarter(quarter))]
+
+    def add(self, quarter: str, case_ids: pd.Index):
+        """Record the cases reported in quarter, the one after the last recorded"""
+        self.quarters.append(str(quarter))
+        reported = pd.Series(
+            len(self.quarters) - 1, index=case_ids, dtype=self.last_seen.dtype
+        )
+        self.last_seen = reported.combine_first(self.last_seen).astype(
+            self.last_seen.dtype
+        )
+
+    def seen_since(self, case_ids: pd.Index, first_quarter: str) -> np.ndarray:
+        """Whether each case was reported from first_quarter on"""
+        last_seen = self.last_seen.reindex(case_ids)
+        return (last_seen >= self.quarters.index(str(first_quarter))).to_numpy()
+
+    @classmethod
+    def up_to(
+        cls, dir_in: str, quarter: str, first_quarter: str, dir_history: Optional[str]
+    ) -> "CaseHistory":
+        """
+        History of the quarters before quarter, from first_quarter on: the saved
+        history of dir_history with the quarters it misses (see missing_quarters).
+        """
+        history = cls.load(dir_history) if dir_history else None
+        extended, added = cls.missing_quarters(
+            history.quarters if history else [], quarter, first_quarter
+        )
+        if not extended:
+            history = cls.empty()
+        if added:
+            logger.info(f"Adding {', '.join(added)} to the case history")
+        for q in added:
+            history.add(q, read_case_ids(dir_in, q))
+        return history
+
+
+def new_quarter_counts(
+    dir_in: str,
+    quarter: str,
+    queries: Dict[int, Tuple[str, QuestionConfig]],
+    dir_history: Optional[str] = None,
+) -> Dict[int, Dict[str, int]]:
+    """
+    Counts a, b, c and d of the new quarter for each query.
+
+    :param queries: query key -> (first quarter of the query, config). Config names
+        must be unique, they name the marked columns.
+    :param dir_history: directory of the saved case history. It is extended with
+        the new quarter, so the next refresh reads only the quarter after it.
+        Without it, the demographic files of the earlier quarters are read.
+    :return: query key -> counts, or an empty dict when the quarter has no new cases
+        for the query
+    """
+    configs = [config for _, config in queries.values()]
+    drug_names = set()
+    reaction_types = set()
+    for config in configs:
+        drug_names.update(config.drugs)
+        drug_names.update(config.control or [])
+        reaction_types.update(config.reactions)
+    logger.info(
+        f"Marking {quarter} for {len(configs)} queries, {len(drug_names)} drugs and "
+        f"{len(reaction_types)} reactions"
+    )
+    marked = mark_quarter(quarter, dir_in, configs, drug_names, reaction_types)
+
+    first_quarters = {first_quarter for first_quarter, _ in queries.values()}
+    history = CaseHistory.up_to(dir_in, quarter, min(first_quarters), dir_history)
+    # Cases of the new quarter already reported since a given first quarter
+    seen_since = {
+        first_quarter: (
+            history.seen_since(marked.index, first_quarter)
+            if first_quarter < quarter
+            else np.zeros(len(marked), dtype=bool)
+        )
+        for first_quarter in first_quarters
+    }
+    if dir_history:
+        # The marked rows are the cases of the new quarter
+        history.add(quarter, pd.Index(marked.index.unique()))
+        history.save(dir_history)
+    del history
+
+    ret = {}
+    for key, (first_quarter, config) in queries.items():
+
+        data = Reporter.handle_controls(marked.loc[~seen_since[first_quarter]], config)
+        if data.empty:
+            ret[key] = {}
+            continue
+        counts = Reporter.quarterly_counts(data, config)
+        ret[key] = {column: int(counts[column].iloc[0]) for column in "abcd"}
+    return ret
+
+
+def ror_timeline(
+    counts: Dict[str, List[int]],
+    mode: RorMode = RorMode.CUMULATIVE,
+    window: int = 4,
+) -> Tuple[list, list, list]:
+    """ROR values and confidence bounds of the timeline of per-quarter counts."""
+    tbl = timeline_counts(
+        pd.DataFrame({column: counts[column] for column in "abcd"}), mode, window
+    )
+    ror, lower, upper = ror_from_counts(tbl.a, tbl.b, tbl.c, tbl.d)
+    return ror.tolist(), lower.tolist(), upper.tolist()
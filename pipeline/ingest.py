@@ -0,0 +1,225 @@
+"""
+Single-pass ingestion of FAERS quarters, as soon as their files are downloaded.
+
+Each of the four files of a quarter is read once, and everything later stages
+look up is derived from that read:
+    demo/                   typed demographics column store (see column_store.py),
+                            one row per case (its latest version), index caseid
+    drug_index.npz          sparse (drug terms x cases) incidence: the inverted
+                            index of the cases of each normalized drug name
+    reaction_index.npz      same for the normalized reaction terms
+    drug_terms.npy          drug vocabulary, sorted (rows of drug_index)
+    reaction_terms.npy      reaction vocabulary, sorted (rows of reaction_index)
+    serious_cases.npy       sorted case rows with a serious outcome (listed in outc)
+The number of cases of a term is the size of its inverted index row. The count
+cube (count_cube.py --ingested) is built from the inverted indexes.
+
+A quarter is written to a temporary directory renamed into place when complete,
+so a quarter directory is either fully ingested or absent.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+
+import defopt
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import utils
+from column_store import read_column_store, write_column_store
+from download_faers_data import NBER_URL, download_urls, quarter_urls
+from utils import Quarter, QuestionConfig, generate_quarters
+
+logger = logging.getLogger("FAERS")
+
+# kind -> file prefix, term column, normalization
+TERM_SOURCES: Dict[str, tuple] = {
+    "drug": ("drug", "drugname", QuestionConfig.normalize_drug_name),
+    "reaction": ("reac", "pt", QuestionConfig.normalize_reaction_name),
+}
+
+
+def _term_index(
+    fn: str, column: str, normalize: Callable[[str], str], case_ids: pd.Index
+):
+    """Sorted vocabulary and (terms x cases) incidence of the terms in file fn"""
+    df = pd.read_csv(fn, usecols=["caseid", column], dtype=str).dropna()
+    # Normalize each distinct raw name once
+    raw_codes, raw_names = pd.factorize(df[column])
+    terms, raw_to_term = np.unique(
+        [normalize(name) for name in raw_names], return_inverse=True
+    )
+    term_codes = raw_to_term[raw_codes]
+    case_rows = case_ids.get_indexer(df.caseid)
+    known = case_rows >= 0
+    incidence = sp.csr_matrix(
+        (
+            np.ones(known.sum(), dtype=bool),
+            (term_codes[known], case_rows[known]),
+        ),
+        shape=(len(terms), len(case_ids)),
+    )
+    incidence.sum_duplicates()
+    return terms, incidence
+
+
+def ingest_quarter(dir_in: str, q: str, dir_out: str) -> str:
+    """
+    Ingest the files of quarter q in dir_in into dir_out/q.
+
+    :return: the quarter directory
+    """
+    dir_quarter = os.path.join(dir_out, q)
+    dir_tmp = dir_quarter + ".tmp"
+    shutil.rmtree(dir_tmp, ignore_errors=True)
+    os.makedirs(dir_tmp)
+
+    demo = utils.read_demo_data(os.path.join(dir_in, f"demo{q}.csv.zip"))
+    # Like mark_data, the demographics of a case are those of its latest version
+    demo = demo.drop_duplicates("caseid", keep="last").set_index("caseid")
+    write_column_store(demo, os.path.join(dir_tmp, "demo"))
+
+    for kind, (prefix, column, normalize) in TERM_SOURCES.items():
+        fn = os.path.join(dir_in, f"{prefix}{q}.csv.zip")
+        terms, incidence = _term_index(fn, column, normalize, demo.index)
+        np.save(os.path.join(dir_tmp, f"{kind}_terms.npy"), terms.astype(str))
+        sp.save_npz(os.path.join(dir_tmp, f"{kind}_index.npz"), incidence)
+
+    outc = pd.read_csv(
+        os.path.join(dir_in, f"outc{q}.csv.zip"), usecols=["caseid"], dtype=str
+    )
+    serious = np.flatnonzero(demo.index.isin(outc.caseid))
+    np.save(os.path.join(dir_tmp, "serious_cases.npy"), serious)
+
+    shutil.rmtree(dir_quarter, ignore_errors=True)
+    os.replace(dir_tmp, dir_quarter)
+    logger.info(f"Ingested {q}: {len(demo):,d} cases")
+    return dir_quarter
+
+
+class IngestedQuarter:
+    """Lookups in an ingested quarter"""
+
+    def __init__(self, dir_quarter: str):
+        self.demo = read_column_store(os.path.join(dir_quarter, "demo"))
+        self.terms = {}
+        self.index = {}
+        for kind in TERM_SOURCES:
+            self.terms[kind] = np.load(os.path.join(dir_quarter, f"{kind}_terms.npy"))
+            self.index[kind] = sp.load_npz(
+                os.path.join(dir_quarter, f"{kind}_index.npz")
+            ).tocsr()
+        self.serious_cases = np.load(os.path.join(dir_quarter, "serious_cases.npy"))
+
+    @classmethod
+    def load(cls, dir_out: str, q: str) -> "IngestedQuarter":
+        return cls(os.path.join(dir_out, q))
+
+    def term_counts(self, kind: str) -> pd.Series:
+        """Number of cases of each term of the vocabulary"""
+        return pd.Series(np.diff(self.index[kind].indptr), index=self.terms[kind])
+
+    def cases_with(self, kind: str, terms: List[str]) -> np.ndarray:
+        """Sorted rows of the cases with any of the (normalized) terms"""
+        rows = np.flatnonzero(np.isin(self.terms[kind], terms))
+        return np.unique(self.index[kind][rows].indices)
+
+
+async def download_and_ingest(
+    quarters: List[str],
+    dir_raw: str,
+    dir_out: str,
+    connections: int = 4,
+    force: bool = False,
+    base_url: str = NBER_URL,
+) -> List[str]:
+    """
+    Download the files of the quarters and ingest each quarter in a worker
+    process as soon as its four files are available, while the download of the
+    other quarters goes on. Quarters already ingested are skipped unless force.
+
+    :return: the ingested quarters
+    """
+    urls = {q: quarter_urls(Quarter(q), base_url) for q in quarters}
+    missing = {q: set(urls[q]) for q in quarters}
+    loop = asyncio.get_running_loop()
+    ingestions = {}
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+
+        def on_file(url):
+            for q, pending in missing.items():
+                if url in pending:
+                    pending.discard(url)
+                    if pending:
+                        continue
+                    if os.path.isdir(os.path.join(dir_out, q)) and not force:
+                        logger.debug(f"Skipping {q}, it is already ingested")
+                        ingestions[q] = loop.create_future()
+                        ingestions[q].set_result(os.path.join(dir_out, q))
+                    else:
+                        logger.info(f"Downloaded {q}, ingesting it")
+                        ingestions[q] = loop.run_in_executor(
+                            executor, ingest_quarter, dir_raw, q, dir_out
+                        )
+
+        await download_urls(
+            [url for q in quarters for url in urls[q]],
+            dir_raw,
+            connections=connections,
+            force=force,
+            on_file=on_file,
+        )
+        await asyncio.gather(*ingestions.values())
+
+    for q in quarters:
+        if q not in ingestions:
+            logger.error(f"Not ingesting {q}, some of its files failed to download")
+    return [q for q in quarters if q in ingestions]
+
+
+def main(
+    *,
+    year_q_from: str,
+    year_q_to: str,
+    dir_raw: str,
+    dir_out: str,
+    threads: int = 4,
+    force: bool = False,
+):
+    """
+    Download FAERS quarters and ingest each one once its files are downloaded
+
+    :param str year_q_from:
+        XXXXqQ, where XXXX is the year, q is the literal "q" and Q is 1, 2, 3 or 4
+    :param str year_q_to:
+        XXXXqQ (exclusive)
+    :param str dir_raw:
+        Directory of the downloaded FAERS zip files
+    :param str dir_out:
+        Output directory, with a directory per ingested quarter
+    :param int threads:
+        N of parallel download connections
+    :param bool force:
+        Download again files that already exist
+    """
+    os.makedirs(dir_raw, exist_ok=True)
+    os.makedirs(dir_out, exist_ok=True)
+    quarters = [
+        str(q) for q in generate_quarters(Quarter(year_q_from), Quarter(year_q_to))
+    ]
+    ingested = asyncio.run(
+        download_and_ingest(
+            quarters, dir_raw, dir_out, connections=threads, force=force
+        )
+    )
+    logger.info(f"Ingested {len(ingested)} of {len(quarters)} quarters")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    defopt.run(main)
@@ -10,6 +10,7 @@ from core.config import get_settings
 from core.logging import setup_logging
 from core.http_client import http_client
 from database import create_db_and_tables
+from services.callback_sender import callback_sender
 from fastapi import FastAPI
 from models import *
 
@@ -26,7 +27,9 @@ async def lifespan(app: FastAPI):
     faers_logger.info(f"FAERS quarter bounds set to {q_min}..{q_max}")
     create_db_and_tables()
     await http_client.get_or_create()
+    await callback_sender.start()
     yield
+    await callback_sender.stop()
     await http_client.stop()
     logger.info("FAERS API shutting down...")
 
@@ -1,15 +1,12 @@
 import logging
 import os
-import pickle
 import shutil
-from functools import partial
-from multiprocessing import Pool
 
 import defopt
 import numpy as np
 import pandas as pd
-import tqdm
 import utils
+from column_store import write_column_store
 from utils import Quarter, QuestionConfig, generate_quarters
 
 logger = logging.getLogger("FAERS")
@@ -70,7 +67,9 @@ def handle_duplicates(df):
     return ret.set_index("caseid")
 
 
-def mark_data(df_drug, df_reac, df_demo, config_items):
+def merge_marked_data(df_drug, df_reac, df_demo, config_items):
+    """Rows of the demographics joined with the exposure/outcome of each config,
+    before the versions of each case are combined"""
     logger.info("Marking the data")
     cols_to_collect = list(df_demo.columns)
     df_merged = df_demo.join(df_reac).join(df_drug)
@@ -90,7 +89,11 @@ def mark_data(df_drug, df_reac, df_demo, config_items):
         reacted = f"reacted {config.name}"
         df_merged[reacted] = df_merged[reaction_columns].any(axis=1)
         cols_to_collect.append(reacted)
-    df_merged = df_merged[cols_to_collect].reset_index().sort_values(["caseid", "q"])
+    return df_merged[cols_to_collect].reset_index().sort_values(["caseid", "q"])
+
+
+def mark_data(df_drug, df_reac, df_demo, config_items):
+    df_merged = merge_marked_data(df_drug, df_reac, df_demo, config_items)
     logger.info(f"Handling duplicates of {len(df_merged):,d} rows")
     ret = handle_duplicates(df_merged)
     return ret
@@ -157,30 +160,16 @@ def process_quarters(
     df_marked = mark_data(
         df_drug=df_drug, df_reac=df_reac, df_demo=df_demo, config_items=config_items
     )
-    logger.info("Marked the data, dumping the file")
-
-    # Save the combined file
-    pickle.dump(df_marked, open(os.path.join(dir_out, "marked_data.pkl"), "wb"))
+    logger.info("Marked the data, saving the column store")
 
-    # Save individual quarterly files
-    for q in quarters:
-        df_q = df_marked[df_marked.q == str(q)]
-        if not df_q.empty:
-            pickle.dump(df_q, open(os.path.join(dir_out, f"{q}.pkl"), "wb"))
-            logger.info(f"Saved quarterly file for {q}")
+    # One file per column, partitioned by quarter (see report.load_marked_data)
+    write_column_store(df_marked, dir_out, partition_by="q")
 
     return df_marked
 
 
-def process_quarter_wrapper(
-    q, dir_in, dir_out, config_items, drug_names, reaction_types
-):
-    """Wrapper function for process_quarter to use with multiprocessing"""
-    output_file = os.path.join(dir_out, f"{q}.pkl")
-    if os.path.exists(output_file):
-        logger.debug(f"Skipping {q} because {output_file} already exists")
-        return
-    # Process the single quarter
+def mark_quarter(q, dir_in, config_items, drug_names, reaction_types):
+    """Mark the cases of a single quarter (deduplicated within the quarter only)"""
     template_drug = os.path.join(dir_in, "drugQ.csv.zip")
     usecols = ["primaryid", "caseid", "drugname"]
     df_drug = load_quarder_files(template_drug, [q], usecols=usecols).dropna()
@@ -195,17 +184,10 @@ def process_quarter_wrapper(
     df_demo = utils.read_demo_data(fn_demo).set_index("caseid")
     df_demo["q"] = str(q)
 
-    df_marked = mark_data(
+    return mark_data(
         df_drug=df_drug, df_reac=df_reac, df_demo=df_demo, config_items=config_items
     )
 
-    # Only save the quarterly file for this quarter
-
-    logger.info(f"Saving quarterly file {output_file}")
-    pickle.dump(df_marked, open(output_file, "wb"))
-
-    return df_marked
-
 
 def main(
     *,
@@ -235,7 +217,7 @@ def main(
     :param str dir_out:
         Output directory
     :param int threads:
-        Threads in parallel processing
+        Unused, kept for compatibility: all the quarters are marked together
     :param bool clean_on_failure:
         Remove output files on failure
     :param logging.Logger logger:
@@ -304,16 +286,6 @@ def main(
             drug_names=drug_names,
             reaction_types=reaction_types,
         )
-        with Pool(threads) as pool:
-            wrapper_func = partial(
-                process_quarter_wrapper,
-                dir_in=dir_in,
-                dir_out=dir_out,
-                config_items=config_items,
-                drug_names=drug_names,
-                reaction_types=reaction_types,
-            )
-            _ = list(tqdm.tqdm(pool.imap(wrapper_func, quarters), total=len(quarters)))
     except Exception as err:
         if clean_on_failure:
             shutil.rmtree(dir_out)
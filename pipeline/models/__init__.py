@@ -1,3 +1,3 @@
-from models.models import TaskResults
+from models.models import CallbackOutbox, TaskQuarterlyCounts, TaskResults
 
-__all__ = ["TaskResults"]
+__all__ = ["CallbackOutbox", "TaskQuarterlyCounts", "TaskResults"]
@@ -1,8 +1,8 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from constants import TaskStatus
-from sqlmodel import JSON, Column, Field, SQLModel
+from constants import CallbackStatus, RorMode, TaskStatus
+from sqlmodel import JSON, Column, Field, Index, SQLModel
 
 
 class TaskBase(SQLModel):
@@ -33,6 +33,8 @@ class TaskResults(TaskBase, table=True):
     """Database model for storing task results"""
 
     __tablename__ = "tasks"
+    # Lookup of the oldest reusable slot (status, then completion time)
+    __table_args__ = (Index("ix_tasks_status_completed_at", "status", "completed_at"),)
 
     completed_at: datetime | None = Field(default=None, nullable=True)
     ror_values: List[Optional[float]] = Field(
@@ -50,3 +52,73 @@ class TaskResults(TaskBase, table=True):
         default_factory=list,
         description="Upper bound of ROR values",
     )
+
+
+class CallbackOutbox(SQLModel, table=True):
+    """Pending result callback to the external system, delivered by the callback sender"""
+
+    __tablename__ = "callback_outbox"
+
+    id: int | None = Field(default=None, primary_key=True)
+    task_id: int = Field(index=True, description="Task the callback reports on")
+    external_id: str = Field(description="External ID the callback is addressed to")
+    payload: Dict[str, Any] = Field(
+        sa_column=Column("payload", JSON),
+        default_factory=dict,
+        description="Task snapshot sent as the callback body",
+    )
+    status: CallbackStatus = Field(default=CallbackStatus.PENDING, index=True)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        index=True,
+        description="Earliest time of the next delivery attempt",
+    )
+    last_error: str | None = Field(default=None)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: datetime | None = Field(default=None)
+
+
+class TaskQuarterlyCounts(SQLModel, table=True):
+    """Per-quarter 2x2 counts behind a completed task's cumulative ROR timeline"""
+
+    __tablename__ = "task_quarterly_counts"
+
+    task_id: int = Field(primary_key=True, description="Task the counts belong to")
+    config: Dict[str, Any] = Field(
+        sa_column=Column("config", JSON),
+        default_factory=dict,
+        description="Query of the task: drug, reaction and control lists",
+    )
+    first_quarter: str = Field(description="First quarter of the task (e.g. 2020q1)")
+    last_quarter: str = Field(
+        index=True, description="Last quarter included in the counts (e.g. 2020q4)"
+    )
+    quarters: List[str] = Field(sa_column=Column("quarters", JSON), default_factory=list)
+    a: List[int] = Field(
+        sa_column=Column("a", JSON),
+        default_factory=list,
+        description="Cases exposed to the drug and with the reaction",
+    )
+    b: List[int] = Field(
+        sa_column=Column("b", JSON),
+        default_factory=list,
+        description="Cases exposed to the drug and without the reaction",
+    )
+    c: List[int] = Field(
+        sa_column=Column("c", JSON),
+        default_factory=list,
+        description="Cases not exposed to the drug and with the reaction",
+    )
+    d: List[int] = Field(
+        sa_column=Column("d", JSON),
+        default_factory=list,
+        description="Cases neither exposed to the drug nor with the reaction",
+    )
+    ror_mode: RorMode = Field(
+        default=RorMode.CUMULATIVE, description="ROR timeline of the task results"
+    )
+    ror_window: int = Field(
+        default=4, description="Number of quarters of the sliding-window timeline"
+    )
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
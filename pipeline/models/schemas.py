@@ -2,9 +2,12 @@
 Pydantic models for request/response schemas
 """
 
+from datetime import datetime
 from typing import Dict, List, Optional
 
+from constants import RorMode, TaskStatus
 from core.config import get_settings
+from models.models import TaskResults
 from pydantic import BaseModel, Field
 
 
@@ -24,12 +27,23 @@ class PipelineRequest(BaseModel):
     control: Optional[List[str]] = Field(
         None, description="Optional list of control drugs for comparison"
     )
+    ror_mode: RorMode = Field(
+        RorMode.CUMULATIVE,
+        description="ROR timeline saved as the task results: cumulative, sliding window or per quarter",
+    )
+    ror_window: int = Field(
+        4, ge=1, le=40, description="Number of quarters of the sliding-window timeline"
+    )
     external_id: str = Field(
         ...,
         min_length=1,
         max_length=100,
         description="ID from external system. Used for updating the results (this way the external system ensures ids uniqeness and format).",
     )
+    profile: bool = Field(
+        False,
+        description="Profile the task and save the stats next to its log (set by the backend for staff users, honored when PIPELINE_ALLOW_PROFILE_REQUESTS is set)",
+    )
 
     def model_post_init(self, __context) -> None:
         """Validate date ranges"""
@@ -107,6 +121,67 @@ class TaskListResponse(BaseModel):
     count: int = Field(..., description="Total number of tasks found")
 
 
+class ExternalIdsRequest(BaseModel):
+    """Request model for looking up tasks by a batch of external_ids"""
+
+    external_ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="External system IDs to look up",
+    )
+
+
+class TaskBatchResponse(BaseModel):
+    """Response model for batch task lookup by external_id"""
+
+    tasks: List[TaskResults] = Field(
+        ..., description="Latest task for each external_id that was found"
+    )
+    missing: List[str] = Field(
+        ..., description="Requested external_ids that have no task"
+    )
+
+
+class TaskStatusEvent(BaseModel):
+    """Status change of a task, pushed to the subscribers of its event stream"""
+
+    id: int = Field(..., description="Task ID")
+    external_id: str = Field(..., description="External system ID")
+    status: TaskStatus = Field(..., description="Current status of the task")
+    progress: Optional[str] = Field(
+        None, description="Pipeline stage the running task is in"
+    )
+    completed_at: Optional[datetime] = Field(
+        None, description="Completion time of a completed or failed task"
+    )
+    ror_values: List[Optional[float]] = Field(
+        default_factory=list, description="ROR values of a completed task"
+    )
+    ror_lower: List[Optional[float]] = Field(
+        default_factory=list, description="ROR lower bounds of a completed task"
+    )
+    ror_upper: List[Optional[float]] = Field(
+        default_factory=list, description="ROR upper bounds of a completed task"
+    )
+
+
+class QuarterRefreshRequest(BaseModel):
+    """Request model for extending stored results with a newly available quarter"""
+
+    year: int = Field(..., description="Year of the new quarter", ge=1900, le=2100)
+    quarter: int = Field(..., ge=1, le=4, description="New quarter (1-4)")
+
+
+class QuarterRefreshResponse(BaseModel):
+    """Response model for a triggered refresh of stored results"""
+
+    quarter: str = Field(..., description="Quarter added to the results (e.g. 2020q4)")
+    tasks: int = Field(
+        ..., description="Number of task results ending at the previous quarter"
+    )
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
 
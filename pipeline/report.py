@@ -8,9 +8,9 @@ Added an option to return the graph data points instead of generating them.
 import json
 import logging
 import os
-import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
-from typing import Dict, List, Optional, TypeAlias, Union
+from typing import Dict, List, NamedTuple, Optional, TypeAlias, Union
 
 import defopt
 import numpy as np
@@ -20,15 +20,41 @@ import statsmodels.api as sm
 import tqdm
 from matplotlib import pylab as plt
 from statsmodels.stats.outliers_influence import variance_inflation_factor
+from column_store import read_column_names, read_column_store
+from constants import RorFields, RorMode
+from count_cube import CountCube
+from shrinkage import DEFAULT_PRIOR, ebgm, expected_counts, information_component
 from utils import (
     ContingencyMatrix,
     QuestionConfig,
     html_from_fig,
+    mantel_haenszel_ror,
+    ror_field_name,
+    ror_from_counts,
+    timeline_counts,
 )
 
 # Add logger definition
 logger = logging.getLogger(__name__)
 
+# Strata of the stratified ROR: sex x age band (lower edges in years, last band open)
+STRATA_SEXES = ["F", "M"]
+STRATA_AGE_BANDS = [0, 18, 45, 65]
+
+# Bin widths of the continuous covariates of the aggregated logistic regression
+# (age in years, weight in kg)
+REGRESSION_BIN_WIDTHS = {"age": 1.0, "wt": 1.0}
+
+# PlotDataDict field -> column of the ROR table
+SHRINKAGE_FIELDS = {
+    "ic": "IC",
+    "ic_lower": "IC_lower",
+    "ic_upper": "IC_upper",
+    "ebgm": "EBGM",
+    "eb05": "EB05",
+    "eb95": "EB95",
+}
+
 
 class Reporter:
     FORMATS: List[str] = ["png"]
@@ -41,8 +67,22 @@ class Reporter:
         "ror_upper": List[float],    # Upper confidence bounds for ROR
         "log10_ror": List[float],    # Log10 of ROR values for plotting
         "log10_ror_lower": List[float], # Log10 of lower bounds
-        "log10_ror_upper": List[float]  # Log10 of upper bounds
+        "log10_ror_upper": List[float], # Log10 of upper bounds
+        "ic": List[float],           # Information component (BCPNN), log2 scale
+        "ic_lower": List[float],     # Lower 95% credibility bound of IC (IC025)
+        "ic_upper": List[float],     # Upper 95% credibility bound of IC (IC975)
+        "ebgm": List[float],         # Empirical Bayes geometric mean
+        "eb05": List[float],         # 5th percentile of the EBGM posterior
+        "eb95": List[float],         # 95th percentile of the EBGM posterior
+        "counts": Dict[str, List[int]], # Non-cumulative per-quarter 2x2 counts a, b, c, d
+        "window_ror_values": List[float],    # ROR over the last ror_window quarters
+        "window_ror_lower": List[float],     # (of the quarters with data) up to each quarter
+        "window_ror_upper": List[float],
+        "quarterly_ror_values": List[float], # ROR of each quarter on its own
+        "quarterly_ror_lower": List[float],
+        "quarterly_ror_upper": List[float]
     }
+    All ROR values above use the cumulative timeline, unless prefixed.
     """
 
     def __init__(
@@ -52,6 +92,9 @@ class Reporter:
         dir_raw_data: str,
         output_raw_exposure_data: bool,
         return_plot_data_only: bool = False,
+        count_cube: Optional[CountCube] = None,
+        ror_window: int = 4,
+        aggregate_regression: bool = False,
     ) -> None:
         """Initialize the Reporter with configuration and mode settings.
 
@@ -60,6 +103,10 @@ class Reporter:
             dir_out: Base output directory
             output_raw_exposure_data: Whether to include raw exposure data
             return_plot_data_only: If True, only process data without generating files
+            count_cube: Optional precomputed counts to answer ROR queries without marked data
+            ror_window: Number of quarters of the sliding-window ROR timeline
+            aggregate_regression: Fit the logistic regression on binned covariate
+                patterns weighted by their number of cases instead of on every case
         """
         # Analysis configuration
         self.config = config
@@ -70,6 +117,9 @@ class Reporter:
         self.dir_out = os.path.join(dir_out, self.title)
         self.output_raw_exposure_data = output_raw_exposure_data
         self.return_plot_data_only = return_plot_data_only
+        self.count_cube = count_cube
+        self.ror_window = ror_window
+        self.aggregate_regression = aggregate_regression
         self.figure_count = 0
 
         # Setup output directories only if generating files
@@ -130,6 +180,81 @@ class Reporter:
         # return plot_data in a dictionary for optionally return other values (i.e. regression_data) in the future
         return plot_data_dict
 
+    def report_from_count_cube(self, quarters: List[str]) -> PlotDataDict:
+        """ROR plot data of the (unfiltered) initial data, looked up in the count cube."""
+        return {"ror_data": self._calculate_ror_data(None, quarters)}
+
+    def report_stratified(self, data: pd.DataFrame) -> PlotDataDict:
+        """
+        Cumulative ROR stratified by sex and age band: the Mantel-Haenszel pooled
+        estimate as ror_data, and the estimate of each stratum with cases in strata.
+        """
+        quarters, strata, counts = self.stratified_counts(
+            self._process_data(data), self.config
+        )
+        # (quarters x strata x cells) -> cumulative over quarters
+        cumulative = counts.cumsum(axis=0)
+        a, b, c, d = (cumulative[..., i] for i in range(4))
+
+        ror, lower, upper = mantel_haenszel_ror(a, b, c, d)
+        df_rors = pd.DataFrame(
+            {"q": quarters, "ROR_lower": lower, "ROR": ror, "ROR_upper": upper}
+        )
+
+        ror, lower, upper = ror_from_counts(a, b, c, d)
+        has_cases = counts.sum(axis=(0, 2)) > 0
+        strata_data = {
+            stratum: {
+                "ror_values": ror[:, k].tolist(),
+                "ror_lower": lower[:, k].tolist(),
+                "ror_upper": upper[:, k].tolist(),
+            }
+            for k, stratum in enumerate(strata)
+            if has_cases[k]
+        }
+        return {"ror_data": self.plot_ror_data(df_rors), "strata": strata_data}
+
+    @staticmethod
+    def stratified_counts(data: pd.DataFrame, config: QuestionConfig):
+        """
+        2x2 counts per quarter and sex/age-band stratum, in a single pass over the rows.
+
+        Returns (quarters, strata labels, counts) where counts is a (quarters x strata x 4)
+        array with the cells a, b, c, d last. Cases of other or unknown sex, or of
+        unknown age, are kept in their own strata.
+        """
+        quarter_codes, quarters = pd.factorize(data["q"], sort=True)
+
+        sex_codes = pd.Categorical(data["sex"], categories=STRATA_SEXES).codes
+        sex_codes = np.where(sex_codes < 0, len(STRATA_SEXES), sex_codes)
+        sex_labels = STRATA_SEXES + ["unknown sex"]
+
+        age = data["age"].values.astype(float)
+        known_age = np.isfinite(age) & (age >= 0)
+        band_codes = np.where(
+            known_age,
+            np.searchsorted(STRATA_AGE_BANDS, np.where(known_age, age, 0), side="right")
+            - 1,
+            len(STRATA_AGE_BANDS),
+        )
+        band_labels = [
+            f"{lower}-{upper - 1}"
+            for lower, upper in zip(STRATA_AGE_BANDS, STRATA_AGE_BANDS[1:])
+        ] + [f"{STRATA_AGE_BANDS[-1]}+", "unknown age"]
+
+        strata = [f"{sex}, {band}" for sex in sex_labels for band in band_labels]
+        stratum_codes = sex_codes * len(band_labels) + band_codes
+
+        exposure = data[f"exposed {config.name}"].values.astype(bool)
+        outcome = data[f"reacted {config.name}"].values.astype(bool)
+        # 0: a (exposed, reacted), 1: b, 2: c, 3: d (neither)
+        cell_codes = 3 - (exposure.astype(int) * 2 + outcome.astype(int))
+
+        shape = (len(quarters), len(strata), 4)
+        flat_codes = (quarter_codes * shape[1] + stratum_codes) * 4 + cell_codes
+        counts = np.bincount(flat_codes, minlength=np.prod(shape)).reshape(shape)
+        return [str(q) for q in quarters], strata, counts
+
     def _process_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """Process and validate input data."""
         # Check for duplicate indices
@@ -185,7 +310,8 @@ class Reporter:
             f.write("\n".join(lines))
         logger.info(f"Saved report to {fn}")
 
-    def handle_controls(self, data, config):
+    @staticmethod
+    def handle_controls(data, config):
         if config.control is None:
             return data
         control_col = f"control {config.name}"
@@ -261,10 +387,15 @@ class Reporter:
 
         try:
             # Fit model
-            logit = sm.Logit(
-                data_regression[outcome_col], data_regression[regression_cols]
-            )
-            result = logit.fit()
+            if self.aggregate_regression:
+                result = fit_aggregated_logit(
+                    data_regression, regression_cols, outcome_col
+                )
+            else:
+                logit = sm.Logit(
+                    data_regression[outcome_col], data_regression[regression_cols]
+                )
+                result = logit.fit()
 
             # Process results
             or_estimates = result.conf_int().rename(columns={0: "lower", 1: "upper"})
@@ -469,33 +600,92 @@ class Reporter:
 
         return ret
 
-    def _calculate_ror_data(self, data: pd.DataFrame) -> PlotDataDict:
-        """Calculate ROR values and prepare plot data."""
-        rors = []
-
-        # Select relevant columns
-        columns_to_keep = ["age", "sex", "event_date", "q"] + [
-            c for c in data.columns if c.endswith(self.config.name)
-        ]
-        if "wt" in data.columns:
-            columns_to_keep.append("wt")
-
-        # Process data by quarter
-        ror_data = pd.DataFrame()
-        gr = data[columns_to_keep].groupby("q")
-
-        for q, curr in sorted(gr):
-            ror_data = pd.concat((ror_data, curr))
-            contingency_matrix = ContingencyMatrix.from_results_table(
-                ror_data, self.config
-            )
-            ror, (lower, upper) = contingency_matrix.ror()
-            rors.append([q, lower, ror, upper])
+    def _calculate_ror_data(
+        self, data: Optional[pd.DataFrame], quarters: Optional[List[str]] = None
+    ) -> PlotDataDict:
+        """Calculate cumulative ROR values and prepare plot data.
 
-        # Convert to DataFrame for data processing
-        df_rors = pd.DataFrame(rors, columns=["q", "ROR_lower", "ROR", "ROR_upper"])
+        Single-drug/single-reaction configs are answered from the count cube
+        (when the reporter has one) for the given quarters, and data may be None.
+        Otherwise the per-quarter counts are taken from the marked rows.
+        """
+        if self.count_cube is not None and data is None:
+            counts = self.count_cube.quarterly_counts(self.config, quarters)
+        else:
+            counts = self.quarterly_counts(data, self.config)
 
-        return self.plot_ror_data(df_rors)
+        # The main timeline is cumulative: each point uses all quarters up to it
+        cumulative = timeline_counts(counts, RorMode.CUMULATIVE)
+        ror, lower, upper = ror_from_counts(
+            cumulative.a, cumulative.b, cumulative.c, cumulative.d
+        )
+        df_rors = pd.DataFrame(
+            {"q": counts.index, "ROR_lower": lower, "ROR": ror, "ROR_upper": upper}
+        )
+        df_rors = df_rors.join(self.shrinkage_metrics(cumulative).reset_index(drop=True))
+
+        plot_data = self.plot_ror_data(df_rors)
+        # Kept so the timeline can be extended when a new quarter lands
+        plot_data["counts"] = {column: counts[column].tolist() for column in "abcd"}
+
+        # Sliding-window and per-quarter timelines from the same per-quarter counts
+        for mode in RorMode.WINDOW, RorMode.QUARTERLY:
+            tbl = timeline_counts(counts, mode, self.ror_window)
+            for field, values in zip(
+                RorFields, ror_from_counts(tbl.a, tbl.b, tbl.c, tbl.d)
+            ):
+                plot_data[ror_field_name(mode, field)] = values.tolist()
+        return plot_data
+
+    def shrinkage_metrics(self, counts: pd.DataFrame) -> pd.DataFrame:
+        """IC and EBGM (with their intervals) from the same 2x2 count vectors as ROR.
+
+        The EBGM prior of each quarter is the one fit over all pair counts of that
+        quarter in the count cube, or the default prior when there is no cube.
+        """
+        a = counts.a.values
+        expected = expected_counts(
+            a + counts.b.values,
+            a + counts.c.values,
+            counts[["a", "b", "c", "d"]].values.sum(axis=1),
+        )
+        ic, ic_lower, ic_upper = information_component(a, expected)
+
+        if self.count_cube is not None:
+            priors = [self.count_cube.ebgm_prior(q) for q in counts.index]
+        else:
+            priors = [DEFAULT_PRIOR] * len(counts)
+        ebgm_values, eb05, eb95 = np.full((3, len(counts)), np.nan)
+        for prior in set(priors):
+            sel = np.array([p == prior for p in priors], dtype=bool)
+            ebgm_values[sel], eb05[sel], eb95[sel] = ebgm(a[sel], expected[sel], prior)
+
+        return pd.DataFrame(
+            {
+                "IC": ic,
+                "IC_lower": ic_lower,
+                "IC_upper": ic_upper,
+                "EBGM": ebgm_values,
+                "EB05": eb05,
+                "EB95": eb95,
+            },
+            index=counts.index,
+        )
+
+    @staticmethod
+    def quarterly_counts(data: pd.DataFrame, config: QuestionConfig) -> pd.DataFrame:
+        """Non-cumulative 2x2 counts per quarter (columns a, b, c, d) from marked rows."""
+        exposure = data[f"exposed {config.name}"].astype(bool)
+        outcome = data[f"reacted {config.name}"].astype(bool)
+        cell = exposure.astype(int) * 2 + outcome.astype(int)
+        counts = (
+            pd.crosstab(data["q"], cell)
+            .reindex(columns=[3, 2, 1, 0], fill_value=0)
+            .sort_index()
+        )
+        counts.columns = ["a", "b", "c", "d"]
+        counts.columns.name = None
+        return counts
 
     def _generate_plot_html(self, plot_data: PlotDataDict) -> str:
         """Generate plot visualization and return HTML.
@@ -537,7 +727,7 @@ class Reporter:
         df["l10_ROR_upper"] = np.log10(df.ROR_upper)
 
         # Create data dictionary
-        return {
+        plot_data = {
             "quarters": quarters,
             "ror_values": df.ROR.values.tolist(),
             "ror_lower": df.ROR_lower.values.tolist(),
@@ -546,6 +736,11 @@ class Reporter:
             "log10_ror_lower": df.l10_ROR_lower.values.tolist(),
             "log10_ror_upper": df.l10_ROR_upper.values.tolist(),
         }
+        # Shrinkage metrics, when calculated
+        for field, column in SHRINKAGE_FIELDS.items():
+            if column in df.columns:
+                plot_data[field] = df[column].values.tolist()
+        return plot_data
 
     def draw_ror_plot(
         self,
@@ -647,41 +842,193 @@ class Reporter:
         return ax_ror
 
 
-def filter_illegal_values(data: pd.DataFrame) -> pd.DataFrame:
-    """Filter out rows with illegal values for weight, age, and sex."""
-    sel = (
-        ((data.wt > 0) & (data.wt < 360))
-        & ((data.age > 0) & (data.age < 120))
-        & (data.sex.isin({"M", "F"}))
+def aggregate_covariate_patterns(
+    data_regression: pd.DataFrame,
+    regression_cols: List[str],
+    outcome_col: str,
+    bin_widths: Dict[str, float] = REGRESSION_BIN_WIDTHS,
+) -> pd.DataFrame:
+    """
+    Collapse cases into covariate patterns.
+
+    The covariates in bin_widths are replaced by the center of their bin, then
+    cases with identical covariates are grouped.
+
+    :return: one row per pattern with the covariates, n_cases (cases of the
+        pattern) and n_outcome (cases of the pattern with the outcome)
+    """
+    covariates = data_regression[regression_cols].copy()
+    for col, width in bin_widths.items():
+        if col in covariates:
+            covariates[col] = (np.floor(covariates[col] / width) + 0.5) * width
+    return (
+        covariates.assign(_outcome=data_regression[outcome_col].to_numpy())
+        .groupby(regression_cols, sort=False, dropna=False)["_outcome"]
+        .agg(n_outcome="sum", n_cases="size")
+        .reset_index()
     )
-    return data.loc[sel]
 
 
-def filter_data_for_regression(
-    data: pd.DataFrame, config: QuestionConfig, including_the_weight: bool = True
-) -> pd.DataFrame:
-    """Filter data for regression analysis based on percentiles."""
-    percentile_ = 99.0
+def fit_aggregated_logit(
+    data_regression: pd.DataFrame,
+    regression_cols: List[str],
+    outcome_col: str,
+    bin_widths: Dict[str, float] = REGRESSION_BIN_WIDTHS,
+):
+    """
+    Logistic regression of the outcome on binned covariate patterns.
+
+    A binomial GLM of (n_outcome, n_cases - n_outcome) per pattern has the same
+    likelihood as a logistic regression on the cases of the patterns, so apart
+    from the binning the estimates are those of sm.Logit on every case.
+    """
+    patterns = aggregate_covariate_patterns(
+        data_regression, regression_cols, outcome_col, bin_widths
+    )
+    logger.info(
+        f"Fitting the logistic regression on {len(patterns)} covariate patterns "
+        f"of {len(data_regression)} cases"
+    )
+    endog = np.column_stack(
+        [patterns.n_outcome, patterns.n_cases - patterns.n_outcome]
+    )
+    glm = sm.GLM(endog, patterns[regression_cols], family=sm.families.Binomial())
+    return glm.fit()
+
+
+class RegressionFilters(NamedTuple):
+    """Row masks of the data of the filtered reports."""
+
+    # Legal values, age and weight within the central percentiles
+    with_weight: np.ndarray
+    # Legal values, age within the central percentiles
+    without_weight: np.ndarray
+
+
+def regression_filters(
+    data: pd.DataFrame, config: QuestionConfig, percentile_: float = 99.0
+) -> RegressionFilters:
+    """
+    Masks of the rows kept for the regression reports, with and without weight.
+
+    Rows with illegal weight, age or sex values are left out, then rows with age
+    (and weight) outside the central percentile_ of the remaining rows. The
+    percentiles are computed once for both masks.
+    """
+    age = data.age.to_numpy()
+    wt = data.wt.to_numpy()
+    legal = (
+        (wt > 0) & (wt < 360) & (age > 0) & (age < 120) & data.sex.isin({"M", "F"})
+    ).to_numpy()
+
+    if not (legal & data[f"exposed {config.name}"].to_numpy()).any():
+        nothing = np.zeros(len(data), dtype=bool)
+        return RegressionFilters(nothing, nothing)
+
     percentile_lower = (100 - percentile_) / 2
     percentile_upper = 100 - percentile_lower
+    (age_from, weight_from), (age_to, weight_to) = np.nanpercentile(
+        np.column_stack([age[legal], wt[legal]]),
+        [percentile_lower, percentile_upper],
+        axis=0,
+    )
+    without_weight = legal & (age > age_from) & (age < age_to)
+    with_weight = without_weight & (wt > weight_from) & (wt < weight_to)
+    assert with_weight.any() and without_weight.any()
+    return RegressionFilters(with_weight, without_weight)
 
-    col_exposure = f"exposed {config.name}"
-    if data.loc[data[col_exposure]].empty:
-        return data.head(0)
-    else:
-        age_from, age_to = np.nanpercentile(
-            data.age, [percentile_lower, percentile_upper]
-        )
-        sel = (data.sex.isin({"M", "F"})) & (data.age > age_from) & (data.age < age_to)
-        if including_the_weight:
-            weight_from, weight_to = np.nanpercentile(
-                data.wt, [percentile_lower, percentile_upper]
-            )
-            sel = sel & ((data.wt > weight_from) & (data.wt < weight_to))
-        else:
-            data.drop("wt", axis=1, inplace=True)
-        assert sel.any()
-        return data.loc[sel]
+
+def load_marked_data(
+    dir_marked_data: str,
+    columns: Optional[List[str]] = None,
+    quarters: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Load the marked data saved by mark_data, only the given columns and quarters.
+
+    The data is a column store partitioned by quarter (see column_store.py): the
+    columns are memory-mapped and only the requested ones are read, and a
+    quarter is a row range of the same files.
+    """
+    return read_column_store(dir_marked_data, columns, partitions=quarters)
+
+
+def config_columns(columns: List[str], config: QuestionConfig) -> List[str]:
+    """Demographic columns and the marked columns of the config"""
+    return ["age", "sex", "wt", "event_date", "q"] + [
+        c for c in columns if c.endswith(config.name)
+    ]
+
+
+def report_config(
+    data: pd.DataFrame,
+    config: QuestionConfig,
+    reporter: Reporter,
+    stratified: bool = False,
+) -> Dict[str, Reporter.PlotDataDict]:
+    """The reports of a config from its marked data"""
+    logger.info(f"Processing config: {config.name}")
+    plot_data_by_report = {
+        "initial_data": None,
+        "stratified_lr": None,
+        "stratified_lr_no_weight": None,
+    }
+
+    # Report 1: Initial data
+    plot_data_by_report["initial_data"] = reporter.report(
+        data,
+        "01 Initial data",
+        explanation="Raw data",
+        skip_lr=True,
+        config=config,
+    )
+
+    if stratified:
+        plot_data_by_report["stratified_sex_age"] = reporter.report_stratified(data)
+
+    # Filter and process data
+    filters = regression_filters(data, config)
+    data_lr = data.loc[filters.with_weight]
+
+    # Report 2: Stratified for LR
+    plot_data_by_report["stratified_lr"] = reporter.report(
+        data_lr,
+        "02 Stratified for LR",
+        config=config,
+        explanation="After filtering out age and weight values that do not fit 99 percentile of the exposed population",
+    )
+
+    # Report 3: Stratified for LR without weight
+    data_lr = data.loc[filters.without_weight, data.columns.drop("wt")]
+    plot_data_by_report["stratified_lr_no_weight"] = reporter.report(
+        data_lr,
+        "03 Stratified for LR ignoring weight",
+        config=config,
+        explanation="After filtering out age values that do not fit 99 percentile of the exposed population",
+    )
+    return plot_data_by_report
+
+
+def load_config_data(dir_marked_data: str, config: QuestionConfig) -> pd.DataFrame:
+    """The marked data columns used by the reports of a config"""
+    return load_marked_data(
+        dir_marked_data, config_columns(read_column_names(dir_marked_data), config)
+    )
+
+
+def _report_config_from_marked_data(
+    dir_marked_data: str,
+    config: QuestionConfig,
+    reporter_kwargs: dict,
+    count_cube_dir: Optional[str],
+    stratified: bool,
+) -> Dict[str, Reporter.PlotDataDict]:
+    """Worker of main: the reports of a config"""
+    reporter = Reporter(
+        config, **reporter_kwargs, count_cube=CountCube.load_if_exists(count_cube_dir)
+    )
+    return report_config(
+        load_config_data(dir_marked_data, config), config, reporter, stratified
+    )
 
 
 def main(
@@ -693,6 +1040,12 @@ def main(
     dir_reports: str,
     output_raw_exposure_data: bool = False,
     return_plot_data_only: bool = False,
+    count_cube_dir: str = None,
+    quarters: List[str] = None,
+    ror_window: int = 4,
+    stratified: bool = False,
+    aggregate_regression: bool = False,
+    workers: int = 1,
     custom_logger=None,
 ) -> Dict[str, Dict[str, Reporter.PlotDataDict]]:
     """
@@ -710,6 +1063,25 @@ def main(
         whether to include raw table of exposure cases
     :param bool return_plot_data:
         If True, returns a dict containing plot data points instead of generating plots
+    :param str count_cube_dir:
+        Optional count cube directory (see count_cube.py). Single-drug/single-reaction
+        configs without a control group are answered from it for the given quarters,
+        without reading the marked data. Only the initial data report is produced for them.
+    :param list[str] quarters:
+        Quarters (e.g. 2020q1) to look up in the count cube
+    :param int ror_window:
+        Number of quarters of the sliding-window ROR timeline
+    :param bool stratified:
+        Add the ROR stratified by sex and age band (stratified_sex_age): per stratum
+        and Mantel-Haenszel pooled. Not available for configs answered from the count cube.
+    :param bool aggregate_regression:
+        Fit the logistic regression of the reports on covariate patterns (age and
+        weight binned, see REGRESSION_BIN_WIDTHS) weighted by their number of cases,
+        instead of on every case
+    :param int workers:
+        Number of processes reporting configs concurrently. Each memory-maps the
+        marked data columns of its config. Results are in the order of the
+        configs either way.
     :param logging.Logger logger:
         Optional logger instance to direct the output.
 
@@ -739,73 +1111,71 @@ def main(
     if config_dict:
         config_items.append(QuestionConfig.config_from_dict(config_dict))
 
-    files = sorted(glob(os.path.join(dir_marked_data, "*.pkl")))
-    data_all_configs = pd.concat([pickle.load(open(f, "rb")) for f in files])
+    count_cube = CountCube.load_if_exists(count_cube_dir) if quarters else None
+    reporter_kwargs = dict(
+        dir_out=dir_reports,
+        dir_raw_data=dir_raw_data,
+        output_raw_exposure_data=output_raw_exposure_data,
+        return_plot_data_only=return_plot_data_only,
+        ror_window=ror_window,
+        aggregate_regression=aggregate_regression,
+    )
 
-    # Always create the plot data dictionary now
+    # Always create the plot data dictionary now, in the order of the configs
     plot_data_by_config = {}
-
-    for config in tqdm.tqdm(config_items):
-        logger.info(f"Processing config: {config.name}")
-
-        # Data selection
-        columns_to_keep = ["age", "sex", "wt", "event_date", "q"] + [
-            c for c in data_all_configs.columns if c.endswith(config.name)
-        ]
-        data = data_all_configs[columns_to_keep]
-
-        # Initialize reporter with plot data only mode
-        reporter = Reporter(
-            config,
-            dir_reports,
-            dir_raw_data,
-            output_raw_exposure_data=output_raw_exposure_data,
-            return_plot_data_only=return_plot_data_only,
-        )
-
-        # Initialize plot data structure for this config
-        plot_data_by_config[config.name] = {
-            "initial_data": None,
-            "stratified_lr": None,
-            "stratified_lr_no_weight": None,
-        }
-
-        # Report 1: Initial data
-        plot_data = reporter.report(
-            data,
-            "01 Initial data",
-            explanation="Raw data",
-            skip_lr=True,
-            config=config,
-        )
-        plot_data_by_config[config.name]["initial_data"] = plot_data
-
-        # Filter and process data
-        data = filter_illegal_values(data)
-        data_lr = filter_data_for_regression(data, config)
-
-        # Report 2: Stratified for LR
-        plot_data = reporter.report(
-            data_lr,
-            "02 Stratified for LR",
-            config=config,
-            explanation="After filtering out age and weight values that do not fit 99 percentile of the exposed population",
-        )
-        plot_data_by_config[config.name]["stratified_lr"] = plot_data
-
-        # Report 3: Stratified for LR without weight
-        data_lr = filter_data_for_regression(data, config, including_the_weight=False)
-        plot_data = reporter.report(
-            data_lr,
-            "03 Stratified for LR ignoring weight",
-            config=config,
-            explanation="After filtering out age values that do not fit 99 percentile of the exposed population",
-        )
-        plot_data_by_config[config.name]["stratified_lr_no_weight"] = plot_data
+    marked_configs = []
+    for config in config_items:
+        if count_cube is not None and count_cube.can_answer(config, quarters):
+            logger.info(f"Answering config {config.name} from the count cube")
+            reporter = Reporter(
+                config,
+                **{**reporter_kwargs, "return_plot_data_only": True},
+                count_cube=count_cube,
+            )
+            plot_data_by_config[config.name] = {
+                "initial_data": reporter.report_from_count_cube(quarters),
+                "stratified_lr": None,
+                "stratified_lr_no_weight": None,
+            }
+        else:
+            if count_cube is not None:
+                logger.info(
+                    f"The count cube cannot answer config {config.name}, "
+                    "reporting from the marked data"
+                )
+            plot_data_by_config[config.name] = None
+            marked_configs.append(config)
+
+    if len(marked_configs) > 1 and workers > 1:
+        # Workers map the columns of their config from the marked data files
+        with ProcessPoolExecutor(max_workers=min(workers, len(marked_configs))) as ex:
+            futures = {
+                config.name: ex.submit(
+                    _report_config_from_marked_data,
+                    dir_marked_data,
+                    config,
+                    reporter_kwargs,
+                    count_cube_dir if quarters else None,
+                    stratified,
+                )
+                for config in marked_configs
+            }
+            for _ in tqdm.tqdm(as_completed(futures.values()), total=len(futures)):
+                pass
+            for name, future in futures.items():
+                plot_data_by_config[name] = future.result()
+    else:
+        for config in tqdm.tqdm(marked_configs):
+            reporter = Reporter(config, **reporter_kwargs, count_cube=count_cube)
+            plot_data_by_config[config.name] = report_config(
+                load_config_data(dir_marked_data, config), config, reporter, stratified
+            )
 
     for config_name, config_data in plot_data_by_config.items():
         logger.debug(f"\nPlot data for {config_name}:")
         for report_type, plot_data in config_data.items():
+            if plot_data is None:
+                continue
             logger.debug(f"{report_type}:")
             # Log ROR data
             ror_data = plot_data["ror_data"]
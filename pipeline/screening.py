@@ -0,0 +1,182 @@
+"""
+Database-wide signal screening: ROR for every drug-reaction pair, per quarter.
+
+Per quarter, the deduplicated cases are turned into sparse case x drug and
+case x reaction incidence matrices, and the counts of all pairs come out of a
+single sparse matrix product. ROR and its confidence interval are then computed
+with array operations over all the pairs at once, as are the IC and EBGM
+shrinkage metrics (the EBGM prior is fit once per quarter over all its pairs).
+The top signals are written to a compact columnar file (one compressed array
+per column).
+"""
+
+import logging
+from typing import List
+
+import defopt
+import numpy as np
+import pandas as pd
+from count_cube import case_incidence, quarterly_incidence, versions_incidence
+from shrinkage import ebgm, expected_counts, fit_gps_prior, information_component
+from utils import Quarter, generate_quarters, ror_from_counts
+
+logger = logging.getLogger("FAERS")
+
+SIGNAL_COLUMNS = [
+    "q",
+    "drug",
+    "reaction",
+    "a",
+    "b",
+    "c",
+    "d",
+    "ror",
+    "ror_lower",
+    "ror_upper",
+    "ic",
+    "ic_lower",
+    "ebgm",
+    "eb05",
+]
+
+
+def screen_pairs(
+    x_drug, x_reac, alpha: float = 0.05, min_cases: int = 3, top: int = 1000
+) -> pd.DataFrame:
+    """
+    Screen all drug-reaction pairs of one quarter.
+
+    A pair is a signal when at least min_cases cases report both the drug and
+    the reaction and the lower confidence bound of its ROR is above 1.
+    Returns up to top signals (drug and reaction as column indices), strongest
+    lower bound first.
+    """
+    n = x_drug.shape[0]
+    n_drug = np.asarray(x_drug.sum(axis=0)).ravel()
+    n_reaction = np.asarray(x_reac.sum(axis=0)).ravel()
+
+    pairs = (x_drug.T @ x_reac).tocoo()
+    # The EBGM prior is fit over all the reported pairs, not only the kept ones
+    prior = fit_gps_prior(
+        pairs.data, expected_counts(n_drug[pairs.row], n_reaction[pairs.col], n)
+    )
+
+    keep = pairs.data >= min_cases
+    drug, reaction, a = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    a = a.astype(np.int64)
+    b = n_drug[drug] - a
+    c = n_reaction[reaction] - a
+    d = n - n_drug[drug] - n_reaction[reaction] + a
+
+    ror, lower, upper = ror_from_counts(a, b, c, d, alpha=alpha)
+    signal = np.flatnonzero(np.nan_to_num(lower, nan=0.0) > 1)
+    if len(signal) > top:
+        # Partial selection: only the top entries are sorted
+        signal = signal[np.argpartition(-lower[signal], top - 1)[:top]]
+    signal = signal[np.argsort(-lower[signal], kind="stable")]
+
+    expected = expected_counts(n_drug[drug[signal]], n_reaction[reaction[signal]], n)
+    ic, ic_lower, _ = information_component(a[signal], expected, alpha=alpha)
+    ebgm_values, eb05, _ = ebgm(a[signal], expected, prior)
+
+    return pd.DataFrame(
+        {
+            "drug": drug[signal],
+            "reaction": reaction[signal],
+            "a": a[signal],
+            "b": b[signal],
+            "c": c[signal],
+            "d": d[signal],
+            "ror": ror[signal],
+            "ror_lower": lower[signal],
+            "ror_upper": upper[signal],
+            "ic": ic,
+            "ic_lower": ic_lower,
+            "ebgm": ebgm_values,
+            "eb05": eb05,
+        }
+    )
+
+
+def screen(
+    dir_in: str,
+    quarters: List[str],
+    alpha: float = 0.05,
+    min_cases: int = 3,
+    top: int = 1000,
+) -> pd.DataFrame:
+    """Screen all drug-reaction pairs of each quarter. Returns the top signals of all quarters."""
+    quarters = [str(q) for q in quarters]
+    incidence = case_incidence(dir_in, quarters)
+    drugs, reactions = incidence.drugs, incidence.reactions
+    case_quarter, x_drug, x_reac, _ = versions_incidence(incidence)
+    logger.info(
+        f"Screening {len(drugs):,d} drugs x {len(reactions):,d} reactions "
+        f"over {len(case_quarter):,d} cases"
+    )
+
+    drugs = np.asarray(drugs, dtype=object)
+    reactions = np.asarray(reactions, dtype=object)
+    signals = []
+    for i, x_drug_q, x_reac_q in quarterly_incidence(case_quarter, x_drug, x_reac):
+        tbl = screen_pairs(x_drug_q, x_reac_q, alpha, min_cases, top)
+        tbl["drug"] = drugs[tbl.drug.values]
+        tbl["reaction"] = reactions[tbl.reaction.values]
+        tbl.insert(0, "q", quarters[i])
+        logger.info(f"{quarters[i]}: {len(tbl):,d} signals")
+        signals.append(tbl)
+
+    if not signals:
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
+    return pd.concat(signals, ignore_index=True)[SIGNAL_COLUMNS]
+
+
+def save_signals(signals: pd.DataFrame, fn_out: str) -> None:
+    """Write the signals column by column to a compressed .npz file."""
+    columns = {}
+    for column in SIGNAL_COLUMNS:
+        values = signals[column].values
+        if values.dtype == object:
+            values = values.astype(str)
+        columns[column] = values
+    np.savez_compressed(fn_out, **columns)
+
+
+def load_signals(fn: str) -> pd.DataFrame:
+    with np.load(fn) as columns:
+        return pd.DataFrame({column: columns[column] for column in SIGNAL_COLUMNS})
+
+
+def main(
+    *,
+    year_q_from: str,
+    year_q_to: str,
+    dir_in: str,
+    fn_out: str,
+    min_cases: int = 3,
+    top: int = 1000,
+):
+    """
+    Screen every drug-reaction pair of each quarter and save the top signals.
+
+    :param str year_q_from:
+        XXXXqQ, where XXXX is the year, q is the literal "q" and Q is 1, 2, 3 or 4
+    :param str year_q_to:
+        XXXXqQ, exclusive
+    :param str dir_in:
+        Directory with the FAERS quarter files
+    :param str fn_out:
+        Output .npz file
+    :param int min_cases:
+        Minimal number of cases with both the drug and the reaction
+    :param int top:
+        Maximal number of signals kept per quarter
+    """
+    quarters = generate_quarters(Quarter(year_q_from), Quarter(year_q_to))
+    signals = screen(dir_in, list(quarters), min_cases=min_cases, top=top)
+    save_signals(signals, fn_out)
+    logger.info(f"Saved {len(signals):,d} signals to {fn_out}")
+
+
+if __name__ == "__main__":
+    defopt.run(main)
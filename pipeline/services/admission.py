@@ -0,0 +1,226 @@
+"""
+Memory-aware admission of pipeline tasks to the process pool.
+
+A task's peak memory is estimated from its number of quarters: a base footprint
+plus a per-quarter footprint, taken from the median of the footprints measured
+in the recent tasks (or the configured defaults before any task finished).
+Tasks are started while the estimates of the running tasks fit in the memory
+budget and wait in a FIFO queue otherwise. When the queue is full new requests
+are refused, with the expected wait until the queue moves.
+"""
+
+import logging
+import math
+import re
+import resource
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, NamedTuple
+
+from core.config import get_settings
+from errors import PipelineQueueFullError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Footprints of the recent tasks the estimates are based on
+FOOTPRINT_HISTORY = 50
+
+
+class TaskFootprint(NamedTuple):
+    """Measured resources of a finished task, returned by its process"""
+
+    n_quarters: int
+    peak_rss_mb: float
+    seconds: float
+
+
+class AdmittedTask(NamedTuple):
+    # Id of a pipeline task, or key of another job (e.g. "refresh-2024q1")
+    task_id: int | str
+    n_quarters: int
+    estimate_mb: float
+    expected_seconds: float
+    start: Callable[[], Future]
+
+
+def reset_peak_rss() -> None:
+    """Reset the peak resident memory of this process (Linux), so the peak of a
+    task is measured on its own in a reused pool process"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process since the last reset_peak_rss"""
+    try:
+        with open("/proc/self/status") as f:
+            m = re.search(r"VmHWM:\s+(\d+) kB", f.read())
+        if m:
+            return int(m.group(1)) / 1024
+    except OSError:
+        pass
+    # Peak over the lifetime of the process: an overestimate in reused processes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class AdmissionController:
+    """
+    Starts tasks within a memory budget and queues the others.
+
+    Runs in the API process. Tasks finish in the executor's thread, so the state
+    is guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        budget_mb: float,
+        max_queued: int,
+        base_mb: float,
+        mb_per_quarter: float,
+        seconds_per_quarter: float,
+    ):
+        self.budget_mb = budget_mb
+        self.max_queued = max_queued
+        self.base_mb = base_mb
+        self.default_mb_per_quarter = mb_per_quarter
+        self.default_seconds_per_quarter = seconds_per_quarter
+        self.footprints: Deque[TaskFootprint] = deque(maxlen=FOOTPRINT_HISTORY)
+        self.queue: Deque[AdmittedTask] = deque()
+        # task_id -> (task, start time)
+        self.running: dict = {}
+        self._lock = threading.RLock()
+
+    # -----------------------------
+    # Estimates
+    # -----------------------------
+    def mb_per_quarter(self) -> float:
+        if not self.footprints:
+            return self.default_mb_per_quarter
+        return statistics.median(
+            max(f.peak_rss_mb - self.base_mb, 0) / max(f.n_quarters, 1)
+            for f in self.footprints
+        )
+
+    def seconds_per_quarter(self) -> float:
+        if not self.footprints:
+            return self.default_seconds_per_quarter
+        return statistics.median(
+            f.seconds / max(f.n_quarters, 1) for f in self.footprints
+        )
+
+    def estimate_mb(self, n_quarters: int) -> float:
+        return self.base_mb + self.mb_per_quarter() * n_quarters
+
+    def expected_seconds(self, n_quarters: int) -> float:
+        return self.seconds_per_quarter() * n_quarters
+
+    def running_mb(self) -> float:
+        return sum(task.estimate_mb for task, _ in self.running.values())
+
+    # -----------------------------
+    # Admission
+    # -----------------------------
+    def check(self) -> None:
+        """Refuse new tasks when the queue is full (PipelineQueueFullError)"""
+        with self._lock:
+            if len(self.queue) >= self.max_queued:
+                retry_after = self.retry_after_seconds()
+                raise PipelineQueueFullError(
+                    f"Pipeline queue is full ({len(self.queue)} tasks wait for "
+                    f"memory). Retry in {retry_after} seconds.",
+                    retry_after=retry_after,
+                )
+
+    def submit(
+        self, task_id: int | str, n_quarters: int, start: Callable[[], Future]
+    ) -> bool:
+        """
+        Start the task if it fits in the memory budget, queue it otherwise.
+
+        :param start: submits the task to the executor
+        :return: whether the task was started
+        """
+        task = AdmittedTask(
+            task_id,
+            n_quarters,
+            self.estimate_mb(n_quarters),
+            self.expected_seconds(n_quarters),
+            start,
+        )
+        with self._lock:
+            if not self.queue and self._fits(task):
+                self._start(task)
+                return True
+            self.queue.append(task)
+            logger.info(
+                f"Queued task {task_id} ({n_quarters} quarters, "
+                f"~{task.estimate_mb:.0f} MB): {self.running_mb():.0f} of "
+                f"{self.budget_mb:.0f} MB in use, {len(self.queue)} tasks queued"
+            )
+            return False
+
+    def _fits(self, task: AdmittedTask) -> bool:
+        # A task larger than the budget runs alone rather than never
+        return not self.running or (
+            self.running_mb() + task.estimate_mb <= self.budget_mb
+        )
+
+    def _start(self, task: AdmittedTask) -> None:
+        self.running[task.task_id] = (task, time.monotonic())
+        try:
+            future = task.start()
+        except Exception as e:
+            del self.running[task.task_id]
+            logger.error(f"Failed to start task {task.task_id}: {e}", exc_info=True)
+            return
+        future.add_done_callback(lambda f: self._on_done(task, f))
+
+    def _on_done(self, task: AdmittedTask, future: Future) -> None:
+        with self._lock:
+            self.running.pop(task.task_id, None)
+            if not future.cancelled() and future.exception() is None:
+                footprint = future.result()
+                if isinstance(footprint, TaskFootprint):
+                    self.footprints.append(footprint)
+            while self.queue and self._fits(self.queue[0]):
+                self._start(self.queue.popleft())
+
+    def retry_after_seconds(self) -> int:
+        """
+        Expected seconds until the first queued task starts: until enough of the
+        running tasks (in the order they are expected to finish) have finished
+        for it to fit in the budget.
+        """
+        with self._lock:
+            if not self.queue:
+                return 1
+            needed_mb = self.queue[0].estimate_mb
+            now = time.monotonic()
+            remaining = sorted(
+                (max(task.expected_seconds - (now - started), 0), task.estimate_mb)
+                for task, started in self.running.values()
+            )
+            in_use = self.running_mb()
+            wait = 0.0
+            for seconds, estimate_mb in remaining:
+                if in_use + needed_mb <= self.budget_mb:
+                    break
+                wait = seconds
+                in_use -= estimate_mb
+            return max(1, math.ceil(wait))
+
+
+admission_controller = AdmissionController(
+    budget_mb=settings.PIPELINE_MEMORY_BUDGET_MB,
+    max_queued=settings.PIPELINE_MAX_QUEUED_TASKS,
+    base_mb=settings.PIPELINE_TASK_BASE_MEMORY_MB,
+    mb_per_quarter=settings.PIPELINE_TASK_MEMORY_PER_QUARTER_MB,
+    seconds_per_quarter=settings.PIPELINE_TASK_SECONDS_PER_QUARTER,
+)
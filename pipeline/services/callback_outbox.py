@@ -0,0 +1,138 @@
+"""
+Callback outbox repository: durable queue of result callbacks to the external system.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from constants import CallbackStatus
+from core.config import get_settings
+from database import create_session
+from models.models import CallbackOutbox, TaskResults
+from sqlalchemy import delete, update
+from sqlmodel import select
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CallbackOutboxRepository:
+    """Repository for CallbackOutbox entries and their delivery state."""
+
+    @staticmethod
+    def enqueue(task: TaskResults) -> CallbackOutbox:
+        """Store a snapshot of the task to be delivered by the callback sender."""
+        entry = CallbackOutbox(
+            task_id=task.id,
+            external_id=task.external_id,
+            # mode="json" handles datetime serialization as well
+            payload=task.model_dump(mode="json"),
+        )
+        with create_session() as session:
+            session.add(entry)
+            session.commit()
+            session.refresh(entry)
+        logger.info(
+            f"Queued callback {entry.id} for task {task.id} (external_id={task.external_id})"
+        )
+        return entry
+
+    @staticmethod
+    def claim_due(limit: int) -> List[CallbackOutbox]:
+        """
+        Claim pending callbacks whose next attempt time has passed, oldest first.
+
+        The claim moves their next attempt time a lease ahead in the same statement,
+        so the senders of the other API worker processes skip them. Callbacks of a
+        sender that stopped before recording the outcome are retried once the lease
+        expires.
+        """
+        now = datetime.now(timezone.utc)
+        due = (
+            CallbackOutbox.status == CallbackStatus.PENDING,
+            CallbackOutbox.next_attempt_at <= now,
+        )
+        oldest_due = (
+            select(CallbackOutbox.id)
+            .where(*due)
+            .order_by(CallbackOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(CallbackOutbox)
+            # Checked again on the claimed rows: a concurrent claim of the same
+            # rows waits for this one and then finds them no longer due
+            .where(CallbackOutbox.id.in_(oldest_due), *due)
+            .values(
+                next_attempt_at=now
+                + timedelta(seconds=settings.PIPELINE_CALLBACK_LEASE_SECONDS)
+            )
+            .returning(CallbackOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        with create_session() as session:
+            entries = list(session.scalars(statement))
+            for entry in entries:
+                session.expunge(entry)
+            session.commit()
+        return entries
+
+    @staticmethod
+    def purge_sent(older_than: timedelta) -> int:
+        """Delete the callbacks delivered before the retention period. Returns their count."""
+        statement = delete(CallbackOutbox).where(
+            CallbackOutbox.status == CallbackStatus.SENT,
+            CallbackOutbox.sent_at < datetime.now(timezone.utc) - older_than,
+        )
+        with create_session() as session:
+            deleted = session.exec(statement).rowcount
+            session.commit()
+        if deleted:
+            logger.info(f"Deleted {deleted} sent callbacks older than {older_than}")
+        return deleted
+
+    @staticmethod
+    def mark_sent(entry_id: int):
+        with create_session() as session:
+            entry = session.get(CallbackOutbox, entry_id)
+            if entry:
+                entry.status = CallbackStatus.SENT
+                entry.attempts += 1
+                entry.sent_at = datetime.now(timezone.utc)
+                entry.last_error = None
+                session.add(entry)
+                session.commit()
+
+    @staticmethod
+    def mark_attempt_failed(entry_id: int, error: str):
+        """Schedule a retry with exponential backoff, or give up after the max attempts."""
+        with create_session() as session:
+            entry = session.get(CallbackOutbox, entry_id)
+            if not entry:
+                return
+
+            entry.attempts += 1
+            entry.last_error = error
+            if entry.attempts >= settings.PIPELINE_CALLBACK_MAX_ATTEMPTS:
+                entry.status = CallbackStatus.FAILED
+                logger.error(
+                    f"Giving up on callback {entry.id} for task {entry.task_id} "
+                    f"(external_id={entry.external_id}) after {entry.attempts} attempts: {error}"
+                )
+            else:
+                delay = min(
+                    settings.PIPELINE_CALLBACK_RETRY_BASE_SECONDS
+                    * 2 ** (entry.attempts - 1),
+                    settings.PIPELINE_CALLBACK_RETRY_MAX_SECONDS,
+                )
+                entry.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+                    seconds=delay
+                )
+                logger.warning(
+                    f"Callback {entry.id} for task {entry.task_id} failed "
+                    f"(attempt {entry.attempts}), retrying in {delay}s: {error}"
+                )
+            session.add(entry)
+            session.commit()
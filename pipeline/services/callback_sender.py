@@ -0,0 +1,130 @@
+"""
+Long-lived sender that delivers queued result callbacks to the external system.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Optional
+
+from core.config import get_settings
+from core.http_client import HTTPClient, http_client
+from models.models import CallbackOutbox
+from services.callback_outbox import CallbackOutboxRepository
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# How often the sent callbacks past their retention are deleted
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class CallbackSender:
+    """
+    Delivers outbox callbacks in batches through the shared HTTP client pool.
+
+    Runs as a single background task in each API process. Worker processes only
+    write to the outbox; the sender is woken when a task finishes and also polls
+    periodically to pick up retries. Each batch is claimed atomically, so the
+    senders of several API worker processes never deliver the same callback.
+    """
+
+    def __init__(self, client: HTTPClient = http_client):
+        self.client = client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._purged_at: Optional[float] = None
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="callback-sender")
+        logger.info("Callback sender started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Callback sender stopped")
+
+    def wake(self) -> None:
+        """Wake the sender. Safe to call from any thread (e.g. executor done-callbacks)."""
+        if self._loop is None or self._wake_event is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def purge_sent_callbacks(self) -> None:
+        """Delete the sent callbacks past their retention, at most once per interval"""
+        now = time.monotonic()
+        if (
+            self._purged_at is not None
+            and now - self._purged_at < PURGE_INTERVAL_SECONDS
+        ):
+            return
+        self._purged_at = now
+        await asyncio.to_thread(
+            CallbackOutboxRepository.purge_sent,
+            timedelta(hours=settings.PIPELINE_CALLBACK_SENT_RETENTION_HOURS),
+        )
+
+    async def _run(self) -> None:
+        while True:
+            self._wake_event.clear()
+            try:
+                # Keep sending while full batches come back
+                while (
+                    await self.send_due_callbacks()
+                    >= settings.PIPELINE_CALLBACK_BATCH_SIZE
+                ):
+                    pass
+                await self.purge_sent_callbacks()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Callback sender iteration failed: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(
+                    self._wake_event.wait(),
+                    timeout=settings.PIPELINE_CALLBACK_POLL_INTERVAL_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_due_callbacks(self) -> int:
+        """Deliver one batch of due callbacks concurrently. Returns the batch size."""
+        entries = await asyncio.to_thread(
+            CallbackOutboxRepository.claim_due, settings.PIPELINE_CALLBACK_BATCH_SIZE
+        )
+        if entries:
+            await asyncio.gather(*(self._deliver(entry) for entry in entries))
+        return len(entries)
+
+    async def _deliver(self, entry: CallbackOutbox) -> None:
+        url = f"{settings.PIPELINE_CALLBACK_URL}/{entry.external_id}/"
+        try:
+            response = await self.client.put(url, json=entry.payload)
+            response.raise_for_status()
+        except Exception as e:
+            await asyncio.to_thread(
+                CallbackOutboxRepository.mark_attempt_failed, entry.id, str(e)
+            )
+            return
+
+        await asyncio.to_thread(CallbackOutboxRepository.mark_sent, entry.id)
+        logger.info(
+            f"Sent callback {entry.id} for task {entry.task_id} "
+            f"(external_id={entry.external_id}, status={entry.payload.get('status')})"
+        )
+
+
+callback_sender = CallbackSender()
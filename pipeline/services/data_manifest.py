@@ -0,0 +1,153 @@
+"""
+In-memory manifest of the FAERS quarter files of the external data directory.
+
+The directory is listed once and served from memory until its modification time
+changes (a file was added, removed or renamed into place, as the downloader
+does) or the manifest is older than PIPELINE_DATA_MANIFEST_MAX_AGE_SECONDS.
+Checking a cached manifest costs a single stat of the directory.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from core.config import get_settings
+from models.schemas import AvailableDataResponse, QuarterData
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FILE_TYPES = ["demo", "drug", "outc", "reac"]
+FILE_SUFFIX = ".csv.zip"
+
+# Timestamps have a coarse resolution: a directory changed this recently may
+# change again without a new modification time, so it is listed again next time
+RACY_SECONDS = 1.0
+
+
+class FileInfo(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+
+
+class ManifestSnapshot(NamedTuple):
+    # quarter -> file type -> file
+    quarters: Dict[str, Dict[str, FileInfo]]
+    etag: str
+    available_data: AvailableDataResponse
+
+    def missing_files(self, quarter: str) -> List[str]:
+        files = self.quarters.get(quarter, {})
+        return [
+            f"{file_type}{quarter}{FILE_SUFFIX}"
+            for file_type in FILE_TYPES
+            if file_type not in files
+        ]
+
+
+def scan_directory(directory: Path) -> ManifestSnapshot:
+    quarters: Dict[str, Dict[str, FileInfo]] = {}
+    if directory.is_dir():
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(FILE_SUFFIX) or not entry.is_file():
+                    continue
+                for file_type in FILE_TYPES:
+                    if entry.name.startswith(file_type):
+                        quarter = entry.name[len(file_type) : -len(FILE_SUFFIX)]
+                        stat = entry.stat()
+                        quarters.setdefault(quarter, {})[file_type] = FileInfo(
+                            entry.name, stat.st_size, stat.st_mtime_ns
+                        )
+    else:
+        logger.warning(f"External data directory does not exist: {directory}")
+
+    digest = hashlib.sha1()
+    for quarter in sorted(quarters):
+        for info in sorted(quarters[quarter].values()):
+            digest.update(f"{info.name}:{info.size}:{info.mtime_ns};".encode())
+
+    sorted_quarters = sorted(quarters)
+    complete = {q for q in sorted_quarters if len(quarters[q]) == len(FILE_TYPES)}
+    available_data = AvailableDataResponse(
+        incomplete_quarters=[q for q in sorted_quarters if q not in complete],
+        complete_quarters=[q for q in sorted_quarters if q in complete],
+        file_details={
+            q: QuarterData(
+                files=sorted(info.name for info in quarters[q].values()),
+                complete=q in complete,
+            )
+            for q in sorted_quarters
+        },
+    )
+    logger.debug(
+        f"Scanned {directory}: {len(sorted_quarters)} quarters, "
+        f"{len(complete)} complete"
+    )
+    return ManifestSnapshot(quarters, f'"{digest.hexdigest()}"', available_data)
+
+
+class DataManifest:
+    """Cached manifest of one data directory, safe to share between threads"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._snapshot: Optional[ManifestSnapshot] = None
+        self._dir_mtime_ns: Optional[int] = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _directory_mtime_ns(self) -> Optional[int]:
+        try:
+            return self.directory.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _is_stale(self, dir_mtime_ns: Optional[int]) -> bool:
+        if self._snapshot is None or dir_mtime_ns is None:
+            return True
+        if dir_mtime_ns != self._dir_mtime_ns:
+            return True
+        age = time.time() - self._scanned_at
+        racy = self._scanned_at - dir_mtime_ns / 1e9 < RACY_SECONDS
+        return racy or age > settings.PIPELINE_DATA_MANIFEST_MAX_AGE_SECONDS
+
+    def get(self) -> ManifestSnapshot:
+        """The manifest, listing the directory again if it changed"""
+        with self._lock:
+            dir_mtime_ns = self._directory_mtime_ns()
+            if self._is_stale(dir_mtime_ns):
+                self._scanned_at = time.time()
+                self._snapshot = scan_directory(self.directory)
+                self._dir_mtime_ns = dir_mtime_ns
+            return self._snapshot
+
+
+_manifests: Dict[Path, DataManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # A task process may be forked while another thread holds one of the locks
+    global _manifests_lock
+    _manifests_lock = threading.Lock()
+    _manifests.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_data_manifest(directory: Path) -> ManifestSnapshot:
+    """Manifest of a data directory, cached per process"""
+    directory = Path(directory).resolve()
+    with _manifests_lock:
+        manifest = _manifests.get(directory)
+        if manifest is None:
+            manifest = _manifests[directory] = DataManifest(directory)
+    return manifest.get()
@@ -1,26 +1,52 @@
-import asyncio
+import cProfile
+import io
 import logging
+import pstats
 import shutil
+import time
 from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from utils import Quarter, generate_quarters
 
-import httpx
-from constants import RorFields, TaskStatus
+from constants import RorFields, RorMode, TaskStatus
 from core.config import get_settings
+from count_cube import CountCube
 
 from errors import DataFilesNotFoundError
+from incremental import CaseHistory, new_quarter_counts, ror_timeline
 from mark_data import main as mark_data_main
 from models.models import TaskResults
-from models.schemas import AvailableDataResponse, PipelineRequest, QuarterData
+from models.schemas import AvailableDataResponse, PipelineRequest
 from report import main as report_main
+from services.admission import (
+    TaskFootprint,
+    admission_controller,
+    peak_rss_mb,
+    reset_peak_rss,
+)
+from services.callback_outbox import CallbackOutboxRepository
+from services.callback_sender import callback_sender
+from services.data_manifest import ManifestSnapshot, get_data_manifest
+from services.quarterly_counts import QuarterlyCountsRepository
+from services.task_events import init_worker, publish_task_event, task_event_bus
 from services.task_repository import TaskRepository
-from utils import get_ror_fields, normalise_empty_ror_fields
+from utils import (
+    QuestionConfig,
+    get_quarterly_counts,
+    get_ror_fields,
+    normalise_empty_ror_fields,
+    ror_field_name,
+)
 
 # Global static settings
 settings = get_settings()
-executor = ProcessPoolExecutor(settings.PIPELINE_MAX_WORKERS)
+# Task processes forward their status events to the event streams of this process
+executor = ProcessPoolExecutor(
+    settings.PIPELINE_MAX_WORKERS,
+    initializer=init_worker,
+    initargs=(task_event_bus.worker_queue(),),
+)
 
 logger: logging.Logger = logging.getLogger(__name__)
 # Once a task process is spawned, this value is overridden by a custom logger for that task.
@@ -71,6 +97,29 @@ def configure_task_logger(task_id: int) -> logging.Logger:
     return logger
 
 
+# -----------------------------
+# Profiling helpers
+# -----------------------------
+def profile_path(task_id: int) -> Path:
+    """cProfile stats of a task, next to its log file"""
+    return settings.get_logs_dir() / f"{task_id}.prof"
+
+
+def should_profile(request: PipelineRequest) -> bool:
+    """Profile every task, or the tasks that ask for it when that is allowed"""
+    return settings.PIPELINE_PROFILE_TASKS or (
+        request.profile and settings.PIPELINE_ALLOW_PROFILE_REQUESTS
+    )
+
+
+def profile_summary(task_id: int, sort: str = "cumulative", limit: int = 50) -> str:
+    """Text report of the top functions of a task profile (FileNotFoundError if none)"""
+    stream = io.StringIO()
+    stats = pstats.Stats(str(profile_path(task_id)), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
 # -----------------------------
 # Pipeline helper functions
 # -----------------------------
@@ -96,21 +145,21 @@ def handle_task_failure(task: TaskResults, error_message: str, send_callback: bo
 
 
 
+def quarter_files_exist(dir_external, quarter: str) -> bool:
+    missing = get_data_manifest(dir_external).missing_files(quarter)
+    for name in missing:
+        task_logger.warning(f"Missing file: {Path(dir_external) / name}")
+    return not missing
+
+
 def verify_data_files_exist(request: PipelineRequest, dir_external):
     available_quarters = []
     requested_quarters = []
-    file_types = ["demo", "drug", "outc", "reac"]
     quarters = generate_quarters(Quarter(request.year_start, request.quarter_start), Quarter(request.year_end, request.quarter_end))
 
     for q in quarters:
         requested_quarters.append(q.__str__())
-        has_all_files = True
-        for file_type in file_types:
-            expected_file = dir_external / f"{file_type}{q.__str__()}.csv.zip"
-            if not expected_file.exists():
-                task_logger.warning(f"Missing file: {expected_file}")
-                has_all_files = False
-        if has_all_files:
+        if quarter_files_exist(dir_external, q.__str__()):
             available_quarters.append(q.__str__())
             task_logger.info(f"Found complete data for quarter: {q}")
 
@@ -148,7 +197,17 @@ def mark_data(
     task_logger.info("Data marking step completed successfully")
 
 
-def generate_reports(marked_data_dir, dir_external, config_dict, dir_reports):
+def can_use_count_cube(config_dict, quarters) -> bool:
+    """Whether the count cube can answer the query, so the data marking step can be skipped."""
+    count_cube = CountCube.load_if_exists(settings.get_count_cube_path())
+    if count_cube is None:
+        return False
+    return count_cube.can_answer(QuestionConfig.config_from_dict(config_dict), quarters)
+
+
+def generate_reports(
+    marked_data_dir, dir_external, config_dict, dir_reports, quarters=None, ror_window=4
+):
     task_logger.info("Starting Step 2: Generate reports")
     report_main(
         dir_marked_data=str(marked_data_dir),
@@ -157,6 +216,9 @@ def generate_reports(marked_data_dir, dir_external, config_dict, dir_reports):
         dir_reports=str(dir_reports),
         output_raw_exposure_data=True,
         return_plot_data_only=True,
+        count_cube_dir=str(settings.get_count_cube_path()),
+        quarters=quarters,
+        ror_window=ror_window,
         custom_logger=task_logger,
     )
     results_file = dir_reports / "results.json"
@@ -166,8 +228,19 @@ def generate_reports(marked_data_dir, dir_external, config_dict, dir_reports):
     return results_file
 
 
-def save_results_to_db(task: TaskResults, results_file):
-    """Save pipeline results to database using TaskRepository."""
+def save_results_to_db(
+    task: TaskResults,
+    results_file,
+    config_dict=None,
+    quarters=None,
+    ror_mode: RorMode = RorMode.CUMULATIVE,
+    ror_window: int = 4,
+):
+    """
+    Save pipeline results (the ROR timeline of the requested mode) to database using TaskRepository.
+    With the query config and quarters, the per-quarter counts are saved as well,
+    so the results can be extended when a new quarter lands.
+    """
     ror_fields = get_ror_fields(results_file)
     task_logger.debug(
         f"Extracted ROR arrays for task {task.id}: "
@@ -178,9 +251,9 @@ def save_results_to_db(task: TaskResults, results_file):
     )
     task.status = TaskStatus.COMPLETED
     task.completed_at = datetime.now(timezone.utc)
-    task.ror_values = ror_fields[RorFields.ROR_VALUES]
-    task.ror_lower = ror_fields[RorFields.ROR_LOWER]
-    task.ror_upper = ror_fields[RorFields.ROR_UPPER]
+    task.ror_values = ror_fields[ror_field_name(ror_mode, RorFields.ROR_VALUES)]
+    task.ror_lower = ror_fields[ror_field_name(ror_mode, RorFields.ROR_LOWER)]
+    task.ror_upper = ror_fields[ror_field_name(ror_mode, RorFields.ROR_UPPER)]
     changed_fields = normalise_empty_ror_fields(task)
     if changed_fields:
         task_logger.warning(
@@ -190,50 +263,41 @@ def save_results_to_db(task: TaskResults, results_file):
     TaskRepository.save_task_results(task)
     task_logger.info(f"Results for task {task.id} saved to DB")
 
+    if config_dict is not None and quarters:
+        counts = get_quarterly_counts(results_file)
+        if counts is not None:
+            QuarterlyCountsRepository.save(
+                task.id,
+                config_dict,
+                counts,
+                quarters[0],
+                quarters[-1],
+                ror_mode,
+                ror_window,
+            )
+
 
 def send_results_to_callback(task: TaskResults):
+    """
+    Queue the task results for delivery to the callback URL.
+    The callback sender in the API process delivers (and retries) it, so a failed
+    delivery is never lost and the task process does not wait on the network.
+    """
     callback_url = settings.PIPELINE_CALLBACK_URL
     if not callback_url:
         task_logger.warning("No callback URL configured, skipping sending results")
         return
 
-    async def _send():
-        # Configure client for single-use in subprocess context
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        limits = httpx.Limits(
-            max_connections=1,
-            max_keepalive_connections=0,  # No persistent connections to avoid cleanup issues
-        )
-
-        # Scoped client ensures proper cleanup before event loop closes
-        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-            changed_fields = normalise_empty_ror_fields(task)
-            if changed_fields:
-                task_logger.warning(
-                    f"Task {task.id}: normalized ROR fields before callback payload: {changed_fields}"
-                )
-            task_logger.debug(f"Sending task data: {task}")
-            # Convert task to JSON-compatible dict. Use mode="json" to handle datetime serialization as well.
-            task_json = task.model_dump(mode="json")
-            url = f"{callback_url}/{task_json['external_id']}/"
-            task_logger.info(
-                f"Sending callback for task {task.id} (external_id={task_json['external_id']}, status={task_json['status']})"
-            )
-
-            response = await client.put(url, json=task_json)
-            response.raise_for_status()
-
-            task_logger.info(
-                f"Sent results for task {task.id} to callback URL {callback_url}"
-            )
-
-    try:
-        asyncio.run(_send())
-    except Exception as e:
-        task_logger.error(
-            f"Failed to send results for task {task.id} to callback URL {callback_url}: {str(e)}",
-            exc_info=True,
+    changed_fields = normalise_empty_ror_fields(task)
+    if changed_fields:
+        task_logger.warning(
+            f"Task {task.id}: normalized ROR fields before callback payload: {changed_fields}"
         )
+    task_logger.debug(f"Queueing task data: {task}")
+    entry = CallbackOutboxRepository.enqueue(task)
+    task_logger.info(
+        f"Queued callback {entry.id} for task {task.id} (external_id={task.external_id}, status={task.status})"
+    )
 
 
 def cleanup(calc_dir: Path):
@@ -252,9 +316,36 @@ def cleanup(calc_dir: Path):
 # -----------------------------
 # Main pipeline function
 # -----------------------------
-def run_pipeline(request: PipelineRequest, task: TaskResults):
+def run_pipeline(request: PipelineRequest, task: TaskResults) -> TaskFootprint:
+    """Run the task, return its measured footprint for the admission controller"""
     global task_logger
     task_logger = configure_task_logger(task.id)
+    # Task ids are reused: never serve the profile of an earlier task
+    profile_path(task.id).unlink(missing_ok=True)
+    reset_peak_rss()
+    start = time.perf_counter()
+    if not should_profile(request):
+        execute_pipeline(request, task)
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(execute_pipeline, request, task)
+        finally:
+            profiler.dump_stats(profile_path(task.id))
+            task_logger.info(
+                f"Profile of task {task.id} saved to {profile_path(task.id)}"
+            )
+    footprint = TaskFootprint(
+        request_quarters(request), peak_rss_mb(), time.perf_counter() - start
+    )
+    task_logger.info(
+        f"Task {task.id}: {footprint.n_quarters} quarters, peak memory "
+        f"{footprint.peak_rss_mb:.0f} MB, {footprint.seconds:.1f} s"
+    )
+    return footprint
+
+
+def execute_pipeline(request: PipelineRequest, task: TaskResults):
     try:
         TaskRepository.update_status(task, TaskStatus.RUNNING)
 
@@ -284,18 +375,37 @@ def run_pipeline(request: PipelineRequest, task: TaskResults):
             "control": request.control,
         }
 
-        verify_data_files_exist(request, dir_external)
-        mark_data(
-            year_q_from,
-            year_q_to,
+        publish_task_event(task, progress="verifying data files")
+        quarters = verify_data_files_exist(request, dir_external)
+        if can_use_count_cube(config_dict, quarters):
+            task_logger.info("Answering the query from the count cube, skipping data marking")
+        else:
+            publish_task_event(task, progress="marking data")
+            mark_data(
+                year_q_from,
+                year_q_to,
+                dir_external,
+                config_dict,
+                marked_data_dir,
+            )
+        publish_task_event(task, progress="generating reports")
+        results_file = generate_reports(
+            marked_data_dir,
             dir_external,
             config_dict,
-            marked_data_dir,
+            dir_reports,
+            quarters,
+            request.ror_window,
         )
-        results_file = generate_reports(
-            marked_data_dir, dir_external, config_dict, dir_reports
+        publish_task_event(task, progress="saving results")
+        save_results_to_db(
+            task,
+            results_file,
+            config_dict,
+            quarters,
+            request.ror_mode,
+            request.ror_window,
         )
-        save_results_to_db(task, results_file)
         send_results_to_callback(task)
 
         # Step 5
@@ -317,70 +427,155 @@ def run_pipeline(request: PipelineRequest, task: TaskResults):
 # -----------------------------
 # Trigger function
 # -----------------------------
+def request_quarters(request: PipelineRequest) -> int:
+    first = Quarter(request.year_start, request.quarter_start)
+    end = Quarter(request.year_end, request.quarter_end)
+    return len(list(generate_quarters(first, end)))
+
+
+def check_admission():
+    """Raise PipelineQueueFullError if no more tasks can wait for memory"""
+    admission_controller.check()
+
+
 def start_pipeline(request: PipelineRequest, task: TaskResults):
-    """Start the pipeline in a separate process"""
+    """Start the pipeline in a separate process once it fits in the memory budget"""
     logger.info(f"Triggering pipeline for task {task.id}")
-    # Submit to process pool and immediately return
-    executor.submit(run_pipeline, request, task)
-    logger.debug(f"Task {task.id} was submitted sucesssfully")
 
+    def submit():
+        # Submit to process pool and immediately return
+        future = executor.submit(run_pipeline, request, task)
+        # Deliver the task's queued callback as soon as the process finishes
+        future.add_done_callback(lambda _: callback_sender.wake())
+        logger.debug(f"Task {task.id} was submitted sucesssfully")
+        return future
 
-def get_available_data() -> AvailableDataResponse:
-    """Get information about available FAERS data quarters"""
-    try:
-        external_dir = settings.get_external_data_path()
-        available_data = {}
-        file_types = ["demo", "drug", "outc", "reac"]
-
-        if not external_dir.exists():
-            logger.warning(f"External data directory does not exist: {external_dir}")
-            return AvailableDataResponse(
-                incomplete_quarters=[],
-                complete_quarters=[],
-                file_details={},
-            )
+    admission_controller.submit(task.id, request_quarters(request), submit)
 
-        all_files = [f.name for f in external_dir.iterdir() if f.is_file()]
-
-        # Organize by quarters
-        for file in all_files:
-            for file_type in file_types:
-                if file.startswith(file_type) and file.endswith(".csv.zip"):
-                    quarter = file[len(file_type) : -8]
-                    if quarter not in available_data:
-                        available_data[quarter] = {"files": [], "complete": False}
-                    available_data[quarter]["files"].append(file)
-
-        # Check which quarters have complete data
-        for quarter, data in available_data.items():
-            if len(data["files"]) == len(file_types):
-                data["complete"] = True
-
-        # Convert to Pydantic models
-        file_details = {
-            quarter: QuarterData(files=data["files"], complete=data["complete"])
-            for quarter, data in available_data.items()
-        }
 
-        # Sort quarters
-        sorted_quarters = sorted(available_data.keys())
-        complete_quarters = [
-            q for q in sorted_quarters if available_data[q]["complete"]
-        ]
-        incomplete_quarters = [
-            q for q in sorted_quarters if not available_data[q]["complete"]
-        ]
-
-        logger.info(
-            f"Found {len(sorted_quarters)} quarters total: {len(complete_quarters)} complete, {len(incomplete_quarters)} incomplete"
+# -----------------------------
+# Incremental update for a new quarter
+# -----------------------------
+def refresh_tasks_for_quarter(quarter: str) -> int:
+    """
+    Extend the results of the completed tasks that end right before the given quarter.
+    Only the new quarter is read, earlier cases are looked up in the case history:
+    its counts are appended to the stored per-quarter counts of each task and the
+    cumulative ROR recomputed from them.
+    Returns the number of refreshed tasks.
+    """
+    previous_quarter = str(Quarter(quarter).decrement())
+    entries = QuarterlyCountsRepository.get_by_last_quarter(previous_quarter)
+    if not entries:
+        logger.info(f"No task results end at {previous_quarter}, nothing to refresh")
+        return 0
+
+    dir_external = settings.get_external_data_path()
+    queries = {
+        entry.task_id: (
+            entry.first_quarter,
+            QuestionConfig.config_from_dict(entry.config, name=f"task-{entry.task_id}"),
+        )
+        for entry in entries
+    }
+    new_counts = new_quarter_counts(
+        str(dir_external), quarter, queries, str(settings.get_case_history_path())
+    )
+
+    refreshed = 0
+    for entry in entries:
+        # The task may have been deleted, reused or rerun since the counts were read:
+        # only extend counts that still belong to its completed results
+        task = TaskRepository.get_task(entry.task_id)
+        if task is None or task.status != TaskStatus.COMPLETED:
+            continue
+        updated = QuarterlyCountsRepository.append(
+            entry.task_id,
+            previous_quarter,
+            quarter,
+            new_counts[entry.task_id],
+            expected_updated_at=entry.updated_at,
+        )
+        if updated is None:
+            continue
+
+        task.ror_values, task.ror_lower, task.ror_upper = ror_timeline(
+            updated.model_dump(), updated.ror_mode, updated.ror_window
+        )
+        task.completed_at = datetime.now(timezone.utc)
+        normalise_empty_ror_fields(task)
+        TaskRepository.save_task_results(task)
+        send_results_to_callback(task)
+        refreshed += 1
+
+    logger.info(f"Refreshed {refreshed} task results with {quarter}")
+    return refreshed
+
+
+def refresh_quarters_to_read(quarter: str) -> int:
+    """Number of quarters the refresh with the given quarter reads"""
+    previous_quarter = str(Quarter(quarter).decrement())
+    entries = QuarterlyCountsRepository.get_by_last_quarter(previous_quarter)
+    if not entries:
+        return 1
+    _, missing = CaseHistory.missing_quarters(
+        CaseHistory.saved_quarters(str(settings.get_case_history_path())),
+        quarter,
+        min(entry.first_quarter for entry in entries),
+    )
+    return len(missing) + 1
+
+
+def start_quarter_refresh(quarter: str):
+    """
+    Refresh the stored results with a new quarter in a separate process, once it
+    fits in the memory budget. It is admitted as a job over the quarters it reads:
+    the new quarter, and the earlier ones missing from the case history.
+    """
+    if not quarter_files_exist(settings.get_external_data_path(), quarter):
+        q_from = Quarter(quarter)
+        q_to = q_from.increment()
+        raise DataFilesNotFoundError(
+            year_start=q_from.year,
+            quarter_start=q_from.quarter,
+            year_end=q_to.year,
+            quarter_end=q_to.quarter,
+            requested_quarters=[quarter],
         )
+    admission_controller.check()
+    n_quarters = refresh_quarters_to_read(quarter)
+    logger.info(
+        f"Triggering refresh of task results with {quarter}, reading {n_quarters} "
+        "quarters"
+    )
+
+    def submit():
+        future = executor.submit(refresh_tasks_for_quarter, quarter)
+        # Deliver the refreshed results' callbacks as soon as the process finishes
+        future.add_done_callback(lambda _: callback_sender.wake())
+        return future
+
+    admission_controller.submit(f"refresh-{quarter}", n_quarters, submit)
 
-        return AvailableDataResponse(
-            incomplete_quarters=incomplete_quarters,
-            complete_quarters=complete_quarters,
-            file_details=file_details,
+
+def get_available_data() -> AvailableDataResponse:
+    """Get information about available FAERS data quarters"""
+    try:
+        manifest = get_data_manifest(settings.get_external_data_path())
+        data_info = manifest.available_data
+        logger.debug(
+            f"Found {len(data_info.file_details)} quarters total: {len(data_info.complete_quarters)} complete, {len(data_info.incomplete_quarters)} incomplete"
         )
+        return data_info
 
     except Exception as e:
         logger.error(f"Error retrieving available data: {str(e)}", exc_info=True)
         raise
+
+
+def available_data_snapshot() -> ManifestSnapshot:
+    """
+    Available data with its ETag (which changes with the files of any quarter),
+    from one snapshot of the manifest so the two always match
+    """
+    return get_data_manifest(settings.get_external_data_path())
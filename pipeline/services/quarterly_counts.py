@@ -0,0 +1,104 @@
+"""
+Quarterly counts repository: the per-quarter 2x2 counts of completed tasks, so their
+cumulative ROR timelines can be extended when a new quarter lands.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from constants import RorMode
+from database import create_session
+from models.models import TaskQuarterlyCounts
+from sqlmodel import select
+
+logger = logging.getLogger(__name__)
+
+
+class QuarterlyCountsRepository:
+    """Repository for TaskQuarterlyCounts entries."""
+
+    @staticmethod
+    def save(
+        task_id: int,
+        config: Dict[str, Any],
+        counts: Dict[str, List],
+        first_quarter: str,
+        last_quarter: str,
+        ror_mode: RorMode = RorMode.CUMULATIVE,
+        ror_window: int = 4,
+    ) -> TaskQuarterlyCounts:
+        """
+        Store (or replace) the counts of a task for the queried quarters first..last,
+        with the ROR timeline its results hold.
+        """
+        with create_session() as session:
+            entry = session.get(TaskQuarterlyCounts, task_id) or TaskQuarterlyCounts(
+                task_id=task_id
+            )
+            entry.config = config
+            entry.first_quarter = first_quarter
+            entry.last_quarter = last_quarter
+            entry.ror_mode = ror_mode
+            entry.ror_window = ror_window
+            entry.quarters = list(counts["quarters"])
+            for column in "abcd":
+                setattr(entry, column, [int(x) for x in counts[column]])
+            entry.updated_at = datetime.now(timezone.utc)
+            session.add(entry)
+            session.commit()
+            session.refresh(entry)
+        logger.debug(f"Saved quarterly counts of task {task_id} up to {last_quarter}")
+        return entry
+
+    @staticmethod
+    def get_by_last_quarter(last_quarter: str) -> List[TaskQuarterlyCounts]:
+        """Counts of all tasks that end at the given quarter."""
+        with create_session() as session:
+            statement = select(TaskQuarterlyCounts).where(
+                TaskQuarterlyCounts.last_quarter == last_quarter
+            )
+            return list(session.exec(statement).all())
+
+    @staticmethod
+    def append(
+        task_id: int,
+        expected_last_quarter: str,
+        quarter: str,
+        counts: Dict[str, int],
+        expected_updated_at: Optional[datetime] = None,
+    ) -> TaskQuarterlyCounts | None:
+        """
+        Append the counts of a new quarter (or only advance last_quarter when counts is
+        empty, i.e. the quarter has no cases). Returns None, changing nothing, when the
+        entry no longer ends at expected_last_quarter (it was already extended) or, with
+        expected_updated_at, was saved again since it was read (the task was rerun).
+        """
+        with create_session() as session:
+            entry = session.get(TaskQuarterlyCounts, task_id)
+            if entry is None or entry.last_quarter != expected_last_quarter:
+                return None
+            if (
+                expected_updated_at is not None
+                and entry.updated_at != expected_updated_at
+            ):
+                return None
+            if counts:
+                # Reassign the lists so the JSON columns are flagged as changed
+                entry.quarters = entry.quarters + [quarter]
+                for column in "abcd":
+                    setattr(entry, column, getattr(entry, column) + [int(counts[column])])
+            entry.last_quarter = quarter
+            entry.updated_at = datetime.now(timezone.utc)
+            session.add(entry)
+            session.commit()
+            session.refresh(entry)
+            return entry
+
+    @staticmethod
+    def delete(task_id: int):
+        with create_session() as session:
+            entry = session.get(TaskQuarterlyCounts, task_id)
+            if entry:
+                session.delete(entry)
+                session.commit()
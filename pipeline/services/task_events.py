@@ -0,0 +1,158 @@
+"""
+In-process notification bus for task status changes.
+
+The task repository publishes an event whenever a task's status or results are
+written. In the API process the event is dispatched to the subscribed event
+streams right away. Task processes cannot reach those subscribers, so their
+events are forwarded to the API process through a multiprocessing queue, handed
+to each process of the pool by its initializer, and dispatched by a reader thread.
+Events are best-effort notifications: the database stays the source of truth.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from typing import Iterable, Optional, Set
+
+from constants import TaskStatus
+from core.config import get_settings
+from models.models import TaskResults
+from models.schemas import TaskStatusEvent
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FINAL_STATUSES = {TaskStatus.COMPLETED, TaskStatus.FAILED}
+
+
+def task_event(task: TaskResults, progress: Optional[str] = None) -> TaskStatusEvent:
+    final = task.status in FINAL_STATUSES
+    return TaskStatusEvent(
+        id=task.id,
+        external_id=task.external_id,
+        status=task.status,
+        progress=progress,
+        completed_at=task.completed_at if final else None,
+        ror_values=(task.ror_values or []) if final else [],
+        ror_lower=(task.ror_lower or []) if final else [],
+        ror_upper=(task.ror_upper or []) if final else [],
+    )
+
+
+def format_sse(event: TaskStatusEvent) -> str:
+    """Server-sent event message of a status change"""
+    return f"event: status\ndata: {event.model_dump_json()}\n\n"
+
+
+class Subscription:
+    """Events of some tasks (by id or external_id), queued for one stream"""
+
+    def __init__(self, task_ids: Iterable[int], external_ids: Iterable[str]):
+        self.task_ids = set(task_ids)
+        self.external_ids = set(external_ids)
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(settings.PIPELINE_EVENTS_QUEUE_SIZE)
+
+    def matches(self, event: TaskStatusEvent) -> bool:
+        return event.id in self.task_ids or event.external_id in self.external_ids
+
+    def put(self, event: TaskStatusEvent) -> None:
+        # Runs in the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class TaskEventBus:
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        # Set in task processes: events go to the API process
+        self._forward: Optional[multiprocessing.Queue] = None
+        self._queue: Optional[multiprocessing.Queue] = None
+
+    def worker_queue(self) -> multiprocessing.Queue:
+        """
+        Queue the task processes forward their events to. Created on first use,
+        together with the thread dispatching its events in this process.
+        """
+        with self._lock:
+            if self._queue is None:
+                self._queue = multiprocessing.Queue()
+                threading.Thread(
+                    target=self._read_worker_events,
+                    name="task-events-reader",
+                    daemon=True,
+                ).start()
+            return self._queue
+
+    def init_worker(self, queue: multiprocessing.Queue) -> None:
+        """Forward the events of this (task) process to the API process"""
+        self._forward = queue
+        # A forked process inherits the subscriptions (and lock) of the API process
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        # Never block the exit of the process on undelivered events
+        queue.cancel_join_thread()
+
+    def _read_worker_events(self) -> None:
+        while True:
+            try:
+                event = self._queue.get()
+            except (EOFError, OSError):
+                return
+            try:
+                self.dispatch(event)
+            except Exception as e:
+                logger.error(f"Failed to dispatch task event: {e}", exc_info=True)
+
+    def publish(self, event: TaskStatusEvent) -> None:
+        """Notify the subscribers of the task. Safe to call from any thread or process."""
+        if self._forward is not None:
+            self._forward.put(event)
+        else:
+            self.dispatch(event)
+
+    def dispatch(self, event: TaskStatusEvent) -> None:
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.matches(event)]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(subscription)
+
+    def subscribe(
+        self, task_ids: Iterable[int] = (), external_ids: Iterable[str] = ()
+    ) -> Subscription:
+        """Subscribe to the events of some tasks. Call from the event loop."""
+        subscription = Subscription(task_ids, external_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+
+task_event_bus = TaskEventBus()
+
+
+def init_worker(queue: multiprocessing.Queue) -> None:
+    """Initializer of the task process pool"""
+    task_event_bus.init_worker(queue)
+
+
+def publish_task_event(task: TaskResults, progress: Optional[str] = None) -> None:
+    try:
+        task_event_bus.publish(task_event(task, progress))
+    except Exception as e:
+        # A notification never fails the write it reports
+        logger.warning(f"Failed to publish event of task {task.id}: {e}")
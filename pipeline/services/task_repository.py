@@ -3,22 +3,24 @@ Task repository for managing TaskResults lifecycle and persistence.
 """
 
 import logging
-import threading
 from datetime import datetime, timedelta, timezone
 
 from constants import TaskStatus
 from core.config import get_settings
+from core.locks import FileLock
 from database import create_session
 from errors import PipelineCapacityExceededError
-from models.models import TaskResults
+from models.models import TaskQuarterlyCounts, TaskResults
+from services.task_events import publish_task_event
+from sqlalchemy import func, update
 from sqlmodel import select
 
-# Global mutex for task creation
-task_creation_mutex = threading.Lock()
-
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Global mutex for task creation, shared by the API worker processes
+task_creation_mutex = FileLock(settings.get_slot_lock_path())
+
 
 class TaskRepository:
     """Repository for TaskResults management with circular buffer logic."""
@@ -31,7 +33,9 @@ class TaskRepository:
                 max_limit = settings.PIPELINE_MAX_RESULTS
                 min_retention_minutes = settings.PIPELINE_MIN_RESULT_RETENTION_MINUTES
 
-                total_count = len(session.exec(select(TaskResults)).all())
+                total_count = session.exec(
+                    select(func.count()).select_from(TaskResults)
+                ).one()
 
                 if total_count < max_limit:
                     # Still have room - create new task
@@ -42,15 +46,16 @@ class TaskRepository:
                     logger.info(
                         f"Created new task {task.id} for external_id {external_id}"
                     )
+                    publish_task_event(task)
                     return task
 
-                # At limit - find oldest completed task that can be reused
+                # At limit - claim the oldest completed task that can be reused, in
+                # one statement (served by the (status, completed_at) index)
                 min_completed_time = datetime.now(timezone.utc) - timedelta(
                     minutes=min_retention_minutes
                 )
-
-                statement = (
-                    select(TaskResults)
+                oldest_completed = (
+                    select(TaskResults.id)
                     .where(
                         TaskResults.status.in_(
                             [TaskStatus.COMPLETED, TaskStatus.FAILED]
@@ -58,11 +63,28 @@ class TaskRepository:
                         TaskResults.completed_at <= min_completed_time,
                     )
                     .order_by(TaskResults.completed_at)
+                    .limit(1)
+                    .scalar_subquery()
                 )
+                statement = (
+                    update(TaskResults)
+                    .where(TaskResults.id == oldest_completed)
+                    .values(
+                        external_id=external_id,
+                        status=TaskStatus.PENDING,
+                        created_at=datetime.now(timezone.utc),
+                        completed_at=None,
+                        # Clear old results
+                        ror_values=[],
+                        ror_lower=[],
+                        ror_upper=[],
+                    )
+                    .returning(TaskResults.id)
+                    .execution_options(synchronize_session=False)
+                )
+                old_task_id = session.exec(statement).scalar()
 
-                oldest_completed = session.exec(statement).first()
-
-                if not oldest_completed:
+                if old_task_id is None:
                     # No reusable tasks available - capacity exceeded
                     logger.warning(
                         "Pipeline capacity exceeded: no reusable task slots available"
@@ -71,24 +93,22 @@ class TaskRepository:
                         f"Pipeline capacity exceeded. All {max_limit} slots are busy or results are too recent to override."
                     )
 
-                # Override the oldest eligible completed task
-                old_task_id = oldest_completed.id
-                old_completed_at = oldest_completed.completed_at
-                oldest_completed.external_id = external_id
-                oldest_completed.status = TaskStatus.PENDING
-                oldest_completed.created_at = datetime.now(timezone.utc)
-                oldest_completed.completed_at = None
-                # Clear old results
-                oldest_completed.ror_values = []
-                oldest_completed.ror_lower = []
-                oldest_completed.ror_upper = []
+                old_counts = session.get(TaskQuarterlyCounts, old_task_id)
+                if old_counts:
+                    session.delete(old_counts)
 
                 session.commit()
-                session.refresh(oldest_completed)
+                task = session.get(TaskResults, old_task_id, populate_existing=True)
                 logger.info(
-                    f"Reused task slot {old_task_id} (was completed {old_completed_at}) for external_id {external_id}"
+                    f"Reused task slot {old_task_id} for external_id {external_id}"
                 )
-                return oldest_completed
+                publish_task_event(task)
+                return task
+
+    @staticmethod
+    def get_task(task_id: int) -> TaskResults | None:
+        with create_session() as session:
+            return session.get(TaskResults, task_id)
 
     @staticmethod
     def update_status(task: TaskResults, status: TaskStatus):
@@ -106,6 +126,7 @@ class TaskRepository:
                 session.commit()
                 session.refresh(task_db)
         logger.info(f"Task {task.id} status updated to {status}")
+        publish_task_event(task)
 
     @staticmethod
     def save_task_results(task: TaskResults):
@@ -118,3 +139,4 @@ class TaskRepository:
                 session.commit()
                 session.refresh(task_db)
         logger.info(f"Results for task {task.id} saved to database")
+        publish_task_event(task)
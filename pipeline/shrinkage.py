@@ -0,0 +1,170 @@
+"""
+Bayesian shrinkage disproportionality metrics, computed on arrays of counts.
+
+ROR is unstable for small counts. The observed-to-expected based metrics here
+shrink towards 1 when there is little data:
+
+- IC (information component, BCPNN): log2((a + 0.5) / (E + 0.5)), with the
+  credibility interval from the gamma posterior (Noren et al. 2013).
+- EBGM (empirical Bayes geometric mean, DuMouchel 1999): a two-component gamma
+  mixture prior on the observed-to-expected ratio, fit once over all pair counts
+  (e.g. of a quarter), and the geometric mean of the posterior of each pair.
+
+a is the number of cases with both the drug and the reaction and E the count
+expected under independence, n_drug * n_reaction / n.
+"""
+
+import logging
+from typing import NamedTuple
+
+import numpy as np
+from scipy import optimize, special
+
+logger = logging.getLogger("FAERS")
+
+
+class GpsPrior(NamedTuple):
+    """Gamma mixture prior: p * Gamma(alpha1, beta1) + (1 - p) * Gamma(alpha2, beta2)."""
+
+    alpha1: float
+    beta1: float
+    alpha2: float
+    beta2: float
+    p: float
+
+
+# Starting values (and fallback when no fit is available) from DuMouchel 1999
+DEFAULT_PRIOR = GpsPrior(alpha1=0.2, beta1=0.1, alpha2=2.0, beta2=4.0, p=1 / 3)
+
+
+def expected_counts(n_drug, n_reaction, n):
+    n_drug, n_reaction, n = (
+        np.asarray(x, dtype=float) for x in (n_drug, n_reaction, n)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 0, n_drug * n_reaction / n, np.nan)
+
+
+def information_component(a, expected, alpha=0.05):
+    """Returns (ic, lower, upper) arrays."""
+    a = np.asarray(a, dtype=float) + 0.5
+    expected = np.asarray(expected, dtype=float) + 0.5
+    ic = np.log2(a / expected)
+    lower = np.log2(special.gammaincinv(a, alpha / 2) / expected)
+    upper = np.log2(special.gammaincinv(a, 1 - alpha / 2) / expected)
+    return ic, lower, upper
+
+
+def _log_negative_binomial(a, expected, alpha, beta):
+    """log P(a) when a ~ Poisson(lambda * E) and lambda ~ Gamma(alpha, beta)."""
+    return (
+        special.gammaln(alpha + a)
+        - special.gammaln(alpha)
+        - special.gammaln(a + 1)
+        + alpha * np.log(beta / (beta + expected))
+        + a * np.log(expected / (beta + expected))
+    )
+
+
+def _component_log_likelihoods(a, expected, prior: GpsPrior):
+    log_f1 = _log_negative_binomial(a, expected, prior.alpha1, prior.beta1)
+    log_f2 = _log_negative_binomial(a, expected, prior.alpha2, prior.beta2)
+    return np.log(prior.p) + log_f1, np.log1p(-prior.p) + log_f2
+
+
+def _negative_log_likelihood(params, a, expected):
+    prior = _prior_from_params(params)
+    log_1, log_2 = _component_log_likelihoods(a, expected, prior)
+    # Only pairs reported at least once are observed: use the zero-truncated mixture
+    p_zero = prior.p * (prior.beta1 / (prior.beta1 + expected)) ** prior.alpha1 + (
+        1 - prior.p
+    ) * (prior.beta2 / (prior.beta2 + expected)) ** prior.alpha2
+    p_zero = np.minimum(p_zero, 1 - 1e-12)
+    return -np.sum(np.logaddexp(log_1, log_2) - np.log1p(-p_zero))
+
+
+def _params_from_prior(prior: GpsPrior) -> np.ndarray:
+    return np.array(
+        [
+            np.log(prior.alpha1),
+            np.log(prior.beta1),
+            np.log(prior.alpha2),
+            np.log(prior.beta2),
+            special.logit(prior.p),
+        ]
+    )
+
+
+def _prior_from_params(params) -> GpsPrior:
+    alpha1, beta1, alpha2, beta2 = np.exp(params[:4])
+    p = special.expit(params[4])
+    return GpsPrior(float(alpha1), float(beta1), float(alpha2), float(beta2), float(p))
+
+
+def fit_gps_prior(a, expected, initial: GpsPrior = DEFAULT_PRIOR) -> GpsPrior:
+    """
+    Fit the gamma mixture prior by maximum marginal likelihood over all pairs with a >= 1.
+    Falls back to the initial prior when there are too few pairs or the fit fails.
+    """
+    a = np.asarray(a, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    observed = (a >= 1) & np.isfinite(expected) & (expected > 0)
+    a, expected = a[observed], expected[observed]
+    if len(a) < 10:
+        logger.warning(
+            f"Only {len(a)} pairs to fit the EBGM prior, using the default prior"
+        )
+        return initial
+
+    result = optimize.minimize(
+        _negative_log_likelihood,
+        _params_from_prior(initial),
+        args=(a, expected),
+        method="L-BFGS-B",
+        bounds=[(-10, 10)] * 5,
+    )
+    if not result.success or not np.isfinite(result.fun):
+        logger.warning(
+            f"EBGM prior fit did not converge ({result.message}), using the default prior"
+        )
+        return initial
+    return _prior_from_params(result.x)
+
+
+def ebgm(a, expected, prior: GpsPrior = DEFAULT_PRIOR, alpha=0.1):
+    """
+    Returns (ebgm, lower, upper) arrays: the posterior geometric mean of the
+    observed-to-expected ratio and its alpha/2 and 1 - alpha/2 posterior quantiles
+    (EB05 and EB95 with the default alpha).
+    """
+    a = np.asarray(a, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_1, log_2 = _component_log_likelihoods(a, expected, prior)
+        # Posterior probability of the first mixture component
+        q = np.exp(log_1 - np.logaddexp(log_1, log_2))
+        shape1, rate1 = prior.alpha1 + a, prior.beta1 + expected
+        shape2, rate2 = prior.alpha2 + a, prior.beta2 + expected
+        mean_log = q * (special.digamma(shape1) - np.log(rate1)) + (1 - q) * (
+            special.digamma(shape2) - np.log(rate2)
+        )
+        lower = _mixture_quantile(alpha / 2, q, shape1, rate1, shape2, rate2)
+        upper = _mixture_quantile(1 - alpha / 2, q, shape1, rate1, shape2, rate2)
+    return np.exp(mean_log), lower, upper
+
+
+def _mixture_quantile(level, q, shape1, rate1, shape2, rate2, iterations=60):
+    """Quantile of q * Gamma(shape1, rate1) + (1 - q) * Gamma(shape2, rate2), by bisection."""
+    x1 = special.gammaincinv(shape1, level) / rate1
+    x2 = special.gammaincinv(shape2, level) / rate2
+    # The mixture quantile lies between the quantiles of its components
+    lo, hi = np.fmin(x1, x2), np.fmax(x1, x2)
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        cdf = q * special.gammainc(shape1, rate1 * mid) + (
+            1 - q
+        ) * special.gammainc(shape2, rate2 * mid)
+        below = cdf < level
+        lo = np.where(below, mid, lo)
+        hi = np.where(below, hi, mid)
+    return (lo + hi) / 2
@@ -53,3 +53,74 @@ def test_app(test_session):
 
     app.dependency_overrides[get_session] = override_get_session
     return app
+
+
+# ============================================================================
+# FAERS DATA FIXTURES
+# ============================================================================
+
+FAERS_QUARTERS = ["2020q1", "2020q2", "2020q3"]
+FAERS_DRUGS = ["aspirin", "ibuprofen", "metformin", "warfarin", "insulin"]
+FAERS_REACTIONS = ["nausea", "headache", "bleeding", "rash", "dizziness"]
+
+
+@pytest.fixture(scope="session")
+def faers_dir(tmp_path_factory):
+    """
+    Write a small synthetic FAERS extract (demo/drug/reac/outc files per quarter).
+
+    Warfarin is associated with bleeding so the ROR of that pair is above 1.
+    Some cases get a follow-up version in the next quarter, like real FAERS data.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    dir_out = tmp_path_factory.mktemp("faers")
+    next_caseid = 1000
+    follow_ups = []
+
+    for q in FAERS_QUARTERS:
+        demo, drug, reac, outc = [], [], [], []
+        cases = list(follow_ups)
+        follow_ups = []
+        for _ in range(300):
+            cases.append(next_caseid)
+            next_caseid += 1
+
+        for caseid in cases:
+            primaryid = f"{caseid}{q[-1]}"
+            demo.append(
+                {
+                    "primaryid": primaryid,
+                    "caseid": caseid,
+                    "event_dt_num": "20200115",
+                    "age": rng.integers(18, 90),
+                    "age_cod": "YR",
+                    "sex": rng.choice(["M", "F", "UNK"], p=[0.45, 0.5, 0.05]),
+                    "wt": rng.integers(40, 120),
+                    "wt_cod": "KG",
+                }
+            )
+            # Make drug name normalization visible: upper case and trailing dots
+            drugs = rng.choice(FAERS_DRUGS, size=rng.integers(1, 3), replace=False)
+            for d in drugs:
+                name = d.upper() if rng.random() < 0.5 else f"{d}."
+                drug.append({"primaryid": primaryid, "caseid": caseid, "drugname": name})
+            reactions = set(
+                rng.choice(FAERS_REACTIONS, size=rng.integers(1, 3), replace=False)
+            )
+            if "warfarin" in drugs and rng.random() < 0.6:
+                reactions.add("bleeding")
+            for r in sorted(reactions):
+                reac.append({"primaryid": primaryid, "caseid": caseid, "pt": r.title()})
+            outc.append({"primaryid": primaryid, "caseid": caseid, "outc_cod": "OT"})
+            if rng.random() < 0.05:
+                follow_ups.append(caseid)
+
+        for name, rows in ("demo", demo), ("drug", drug), ("reac", reac), ("outc", outc):
+            pd.DataFrame(rows).to_csv(
+                dir_out / f"{name}{q}.csv.zip", index=False, compression="zip"
+            )
+
+    return dir_out
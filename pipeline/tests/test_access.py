@@ -0,0 +1,21 @@
+"""
+Tests for the restriction of internal endpoints to the backend
+"""
+
+import pytest
+from core.access import is_allowed
+
+
+@pytest.mark.parametrize(
+    "client_ip, expected",
+    [
+        ("10.0.0.7", True),
+        ("172.21.3.4", True),
+        ("127.0.0.1", True),
+        ("192.168.1.5", False),
+        ("testclient", False),
+    ],
+)
+def test_is_allowed_matches_ips_networks_and_hostnames(client_ip, expected):
+    rules = ["10.0.0.7", "172.21.0.0/16", "localhost"]
+    assert is_allowed(client_ip, rules) is expected
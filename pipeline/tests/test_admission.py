@@ -0,0 +1,106 @@
+"""
+Unit tests for the memory-aware admission of pipeline tasks
+"""
+
+from concurrent.futures import Future
+
+import pytest
+from errors import PipelineQueueFullError
+from services.admission import AdmissionController, TaskFootprint
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture
+def controller():
+    return AdmissionController(
+        budget_mb=1000,
+        max_queued=2,
+        base_mb=100,
+        mb_per_quarter=50,
+        seconds_per_quarter=10,
+    )
+
+
+class Starter:
+    """Start callables of tasks whose futures the test completes"""
+
+    def __init__(self):
+        self.futures = {}
+
+    def __call__(self, task_id):
+        def start():
+            self.futures[task_id] = Future()
+            return self.futures[task_id]
+
+        return start
+
+    def finish(self, task_id, footprint=None):
+        self.futures[task_id].set_result(footprint)
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_estimates_learn_from_finished_tasks(controller):
+    assert controller.estimate_mb(4) == 100 + 4 * 50
+    starter = Starter()
+    controller.submit(1, 4, starter(1))
+    starter.finish(1, TaskFootprint(n_quarters=4, peak_rss_mb=900, seconds=80))
+
+    assert controller.mb_per_quarter() == 200
+    assert controller.estimate_mb(2) == 500
+    assert controller.expected_seconds(2) == 40
+
+
+def test_tasks_wait_for_memory_in_order(controller):
+    starter = Starter()
+    # 100 + 10 * 50 = 600 MB each: only one fits in the budget at a time
+    assert controller.submit(1, 10, starter(1)) is True
+    assert controller.submit(2, 10, starter(2)) is False
+    # Smaller, but does not overtake the queued task
+    assert controller.submit(3, 1, starter(3)) is False
+    assert list(starter.futures) == [1]
+
+    starter.finish(1)
+    assert list(starter.futures) == [1, 2, 3]
+    assert sorted(controller.running) == [2, 3]
+    assert not controller.queue
+
+
+def test_task_larger_than_budget_runs_alone(controller):
+    starter = Starter()
+    assert controller.submit(1, 40, starter(1)) is True
+    assert controller.submit(2, 1, starter(2)) is False
+
+    starter.finish(1)
+    assert 2 in controller.running
+
+
+def test_full_queue_is_refused_with_retry_after(controller):
+    starter = Starter()
+    controller.check()
+    controller.submit(1, 10, starter(1))
+    controller.submit(2, 10, starter(2))
+    controller.submit(3, 10, starter(3))
+
+    with pytest.raises(PipelineQueueFullError) as e:
+        controller.check()
+    # Task 2 starts once task 1 (10 quarters, 10 s each) finishes
+    assert 90 <= e.value.retry_after <= 100
+
+    starter.finish(1)
+    controller.check()
+
+
+def test_failed_start_releases_memory(controller):
+    def start():
+        raise RuntimeError("executor is shut down")
+
+    assert controller.submit(1, 10, start) is True
+    assert not controller.running
+    assert controller.running_mb() == 0
@@ -0,0 +1,105 @@
+"""
+Unit tests for the logistic regression on aggregated covariate patterns.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from report import Reporter, aggregate_covariate_patterns, fit_aggregated_logit
+from utils import QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+REGRESSION_COLS = ["age", "is_female", "exposure", "intercept", "wt"]
+
+
+@pytest.fixture(scope="module")
+def config():
+    return QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"]}
+    )
+
+
+@pytest.fixture(scope="module")
+def marked_data(config):
+    """Simulated marked cases with a known exposure odds ratio of 2."""
+    rng = np.random.default_rng(0)
+    n_cases = 20_000
+    age = rng.uniform(18, 90, n_cases)
+    wt = rng.normal(75, 15, n_cases).clip(30, 200)
+    sex = rng.choice(["F", "M"], n_cases)
+    exposed = rng.random(n_cases) < 0.2
+    logit = -3 + np.log(2) * exposed + 0.02 * (age - 50) + 0.3 * (sex == "F")
+    reacted = rng.random(n_cases) < 1 / (1 + np.exp(-logit))
+    return pd.DataFrame(
+        {
+            "age": age,
+            "wt": wt,
+            "sex": sex,
+            f"exposed {config.name}": exposed,
+            f"reacted {config.name}": reacted,
+        }
+    )
+
+
+def regression_data(marked_data, config, aggregate_regression):
+    reporter = Reporter(
+        config,
+        "",
+        None,
+        False,
+        return_plot_data_only=True,
+        aggregate_regression=aggregate_regression,
+    )
+    return reporter._calculate_regression_data(marked_data)
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_patterns_keep_all_cases(marked_data, config):
+    data = regression_data(marked_data, config, False)["data_regression"]
+
+    patterns = aggregate_covariate_patterns(data, REGRESSION_COLS, "outcome")
+
+    assert patterns.n_cases.sum() == len(data)
+    assert patterns.n_outcome.sum() == data.outcome.sum()
+    assert len(patterns) < len(data)
+    assert not patterns.duplicated(REGRESSION_COLS).any()
+
+
+def test_unbinned_patterns_give_the_exact_fit(marked_data, config):
+    data = regression_data(marked_data, config, False)
+    # Rounded ages and weights repeat, so patterns group several cases
+    data_regression = data["data_regression"].round({"age": 0, "wt": -1})
+    exact = regression_data(
+        marked_data.assign(age=data_regression.age, wt=data_regression.wt),
+        config,
+        False,
+    )["result"]
+
+    aggregated = fit_aggregated_logit(
+        data_regression, REGRESSION_COLS, "outcome", bin_widths={}
+    )
+
+    assert aggregated.nobs < len(data_regression)
+    np.testing.assert_allclose(aggregated.params, exact.params, rtol=1e-6)
+    np.testing.assert_allclose(aggregated.bse, exact.bse, rtol=1e-6)
+
+
+def test_aggregated_odds_ratios_match_exact_fit(marked_data, config):
+    exact = regression_data(marked_data, config, False)
+    aggregated = regression_data(marked_data, config, True)
+
+    assert aggregated["error"] is None
+    assert list(aggregated["or_estimates"].index) == REGRESSION_COLS
+    for col in "age", "is_female", "exposure", "wt":
+        assert aggregated["or_estimates"].loc[col].to_numpy() == pytest.approx(
+            exact["or_estimates"].loc[col].to_numpy(), rel=0.01
+        )
+    lower, odds_ratio, upper = aggregated["or_estimates"].loc["exposure"]
+    assert lower < 2 < upper
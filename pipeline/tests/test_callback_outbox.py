@@ -0,0 +1,298 @@
+"""
+Unit tests for the callback outbox repository and sender.
+"""
+
+import multiprocessing
+import threading
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from constants import CallbackStatus, TaskStatus
+from models.models import CallbackOutbox, TaskResults
+from services.callback_outbox import CallbackOutboxRepository
+from services.callback_sender import CallbackSender
+from sqlmodel import select
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture(autouse=True)
+def mock_create_session(test_session, mocker):
+    """
+    Redirect outbox database operations to the test database.
+    The sender runs them in worker threads, so access to the shared session is
+    serialized like separate sessions would be.
+    """
+    lock = threading.RLock()
+
+    def acquire(*args):
+        lock.acquire()
+        return test_session
+
+    def release(*args):
+        lock.release()
+
+    mock = mocker.patch("services.callback_outbox.create_session")
+    mock.return_value.__enter__.side_effect = acquire
+    mock.return_value.__exit__.side_effect = release
+    return mock
+
+
+@pytest.fixture(autouse=True)
+def mock_settings(mocker):
+    settings_mock = mocker.MagicMock()
+    settings_mock.PIPELINE_CALLBACK_URL = "http://backend/update-by-task"
+    settings_mock.PIPELINE_CALLBACK_BATCH_SIZE = 10
+    settings_mock.PIPELINE_CALLBACK_MAX_ATTEMPTS = 3
+    settings_mock.PIPELINE_CALLBACK_RETRY_BASE_SECONDS = 2
+    settings_mock.PIPELINE_CALLBACK_RETRY_MAX_SECONDS = 300
+    settings_mock.PIPELINE_CALLBACK_LEASE_SECONDS = 120
+    settings_mock.PIPELINE_CALLBACK_SENT_RETENTION_HOURS = 24
+    mocker.patch("services.callback_outbox.settings", settings_mock)
+    mocker.patch("services.callback_sender.settings", settings_mock)
+    return settings_mock
+
+
+@pytest.fixture
+def completed_task():
+    return TaskResults(
+        id=7,
+        external_id="ext_007",
+        status=TaskStatus.COMPLETED,
+        ror_values=[1.5],
+        ror_lower=[1.2],
+        ror_upper=[1.8],
+    )
+
+
+@pytest.fixture
+def mock_client(mocker):
+    client = mocker.MagicMock()
+    response = mocker.MagicMock(spec=httpx.Response)
+    response.raise_for_status.return_value = None
+    client.put = mocker.AsyncMock(return_value=response)
+    return client
+
+
+# ============================================================================
+# TESTS FOR CallbackOutboxRepository
+# ============================================================================
+
+
+def test_enqueue_stores_json_snapshot(completed_task, test_session):
+    entry = CallbackOutboxRepository.enqueue(completed_task)
+
+    stored = test_session.get(CallbackOutbox, entry.id)
+    assert stored.status == CallbackStatus.PENDING
+    assert stored.task_id == 7
+    assert stored.external_id == "ext_007"
+    assert stored.payload["status"] == "completed"
+    assert stored.payload["ror_values"] == [1.5]
+    assert isinstance(stored.payload["created_at"], str)
+
+
+def test_claim_due_skips_future_and_finished_entries(test_session):
+    now = datetime.now(timezone.utc)
+    test_session.add_all(
+        [
+            CallbackOutbox(id=1, task_id=1, external_id="a", next_attempt_at=now),
+            CallbackOutbox(
+                id=2,
+                task_id=2,
+                external_id="b",
+                next_attempt_at=now + timedelta(minutes=5),
+            ),
+            CallbackOutbox(
+                id=3, task_id=3, external_id="c", status=CallbackStatus.SENT
+            ),
+            CallbackOutbox(
+                id=4,
+                task_id=4,
+                external_id="d",
+                next_attempt_at=now - timedelta(minutes=1),
+            ),
+        ]
+    )
+    test_session.commit()
+
+    due = CallbackOutboxRepository.claim_due(limit=10)
+
+    assert sorted(entry.id for entry in due) == [1, 4]
+
+
+def test_claim_due_claims_oldest_first_and_leases_them(test_session):
+    now = datetime.now(timezone.utc)
+    test_session.add_all(
+        [
+            CallbackOutbox(id=1, task_id=1, external_id="a", next_attempt_at=now),
+            CallbackOutbox(
+                id=2,
+                task_id=2,
+                external_id="b",
+                next_attempt_at=now - timedelta(minutes=1),
+            ),
+        ]
+    )
+    test_session.commit()
+
+    assert [entry.id for entry in CallbackOutboxRepository.claim_due(limit=1)] == [2]
+    # Claimed entries are skipped by other senders until the lease expires
+    assert [entry.id for entry in CallbackOutboxRepository.claim_due(limit=10)] == [1]
+    assert CallbackOutboxRepository.claim_due(limit=10) == []
+
+    leased = test_session.get(CallbackOutbox, 2)
+    test_session.refresh(leased)
+    assert leased.status == CallbackStatus.PENDING
+    assert leased.next_attempt_at.replace(tzinfo=None) >= (
+        now + timedelta(seconds=110)
+    ).replace(tzinfo=None)
+
+
+def _claim_until_empty(claimed):
+    ids = []
+    while entries := CallbackOutboxRepository.claim_due(limit=5):
+        ids.extend(entry.id for entry in entries)
+    claimed.put(ids)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_claim_due_from_several_processes_never_overlaps(tmp_path, mocker):
+    """Test the senders of several API processes claim disjoint callbacks."""
+    from database import build_engine
+    from sqlmodel import Session, SQLModel
+
+    engine = build_engine(f"sqlite:///{tmp_path / 'outbox.sqlite3'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            CallbackOutbox(task_id=i, external_id=f"ext_{i}") for i in range(200)
+        )
+        session.commit()
+    mocker.patch(
+        "services.callback_outbox.create_session", side_effect=lambda: Session(engine)
+    )
+    engine.dispose()
+
+    context = multiprocessing.get_context("fork")
+    claimed = context.Queue()
+    processes = [
+        context.Process(target=_claim_until_empty, args=(claimed,)) for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    ids = [i for _ in processes for i in claimed.get(timeout=60)]
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert sorted(ids) == list(range(1, 201))
+
+
+def test_purge_sent_deletes_old_sent_entries_only(test_session):
+    now = datetime.now(timezone.utc)
+    test_session.add_all(
+        [
+            CallbackOutbox(
+                id=1,
+                task_id=1,
+                external_id="a",
+                status=CallbackStatus.SENT,
+                sent_at=now - timedelta(days=2),
+            ),
+            CallbackOutbox(
+                id=2,
+                task_id=2,
+                external_id="b",
+                status=CallbackStatus.SENT,
+                sent_at=now - timedelta(minutes=5),
+            ),
+            CallbackOutbox(id=3, task_id=3, external_id="c"),
+            CallbackOutbox(
+                id=4, task_id=4, external_id="d", status=CallbackStatus.FAILED
+            ),
+        ]
+    )
+    test_session.commit()
+
+    assert CallbackOutboxRepository.purge_sent(timedelta(days=1)) == 1
+
+    test_session.expire_all()
+    remaining = test_session.exec(select(CallbackOutbox.id)).all()
+    assert sorted(remaining) == [2, 3, 4]
+
+
+def test_mark_attempt_failed_backs_off_then_gives_up(completed_task, test_session):
+    entry = CallbackOutboxRepository.enqueue(completed_task)
+
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    CallbackOutboxRepository.mark_attempt_failed(entry.id, "connection refused")
+    stored = test_session.get(CallbackOutbox, entry.id)
+    assert stored.status == CallbackStatus.PENDING
+    assert stored.attempts == 1
+    assert stored.last_error == "connection refused"
+    assert stored.next_attempt_at.replace(tzinfo=None) >= before + timedelta(seconds=2)
+
+    CallbackOutboxRepository.mark_attempt_failed(entry.id, "connection refused")
+    stored = test_session.get(CallbackOutbox, entry.id)
+    assert stored.next_attempt_at.replace(tzinfo=None) >= before + timedelta(seconds=4)
+
+    CallbackOutboxRepository.mark_attempt_failed(entry.id, "connection refused")
+    stored = test_session.get(CallbackOutbox, entry.id)
+    assert stored.status == CallbackStatus.FAILED
+    assert stored.attempts == 3
+
+
+# ============================================================================
+# TESTS FOR CallbackSender
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_send_due_callbacks_delivers_batch(
+    completed_task, test_session, mock_client
+):
+    first = CallbackOutboxRepository.enqueue(completed_task)
+    completed_task.external_id = "ext_008"
+    second = CallbackOutboxRepository.enqueue(completed_task)
+    sender = CallbackSender(client=mock_client)
+
+    assert await sender.send_due_callbacks() == 2
+
+    urls = sorted(call.args[0] for call in mock_client.put.call_args_list)
+    assert urls == [
+        "http://backend/update-by-task/ext_007/",
+        "http://backend/update-by-task/ext_008/",
+    ]
+    for entry in (first, second):
+        stored = test_session.get(CallbackOutbox, entry.id)
+        assert stored.status == CallbackStatus.SENT
+        assert stored.sent_at is not None
+
+    # Sent callbacks are not delivered again
+    assert await sender.send_due_callbacks() == 0
+
+
+@pytest.mark.asyncio
+async def test_send_due_callbacks_failure_is_kept_for_retry(
+    completed_task, test_session, mock_client
+):
+    entry = CallbackOutboxRepository.enqueue(completed_task)
+    mock_client.put.side_effect = httpx.ConnectError("connection refused")
+    sender = CallbackSender(client=mock_client)
+
+    await sender.send_due_callbacks()
+
+    stored = test_session.get(CallbackOutbox, entry.id)
+    assert stored.status == CallbackStatus.PENDING
+    assert stored.attempts == 1
+    assert "connection refused" in stored.last_error
+
+
+def test_wake_before_start_is_noop(mock_client):
+    sender = CallbackSender(client=mock_client)
+    sender.wake()  # must not raise when the sender is not running
@@ -0,0 +1,58 @@
+"""
+Unit tests for the memory-mapped column store.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from column_store import (
+    read_column_names,
+    read_column_store,
+    read_manifest,
+    write_column_store,
+)
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "age": [34.0, np.nan, 71.5],
+            "sex": ["F", np.nan, "M"],
+            "event_date": pd.to_datetime(["2020-01-03", None, "2020-05-17"]),
+            "q": ["2020q1", "2020q1", "2020q2"],
+            "exposed config 1": [True, False, True],
+        },
+        index=pd.Index(["101", "102", "103"], name="caseid"),
+    )
+
+
+def test_round_trip(df, tmp_path):
+    write_column_store(df, str(tmp_path))
+
+    assert read_column_names(str(tmp_path)) == list(df.columns)
+    pd.testing.assert_frame_equal(read_column_store(str(tmp_path)), df)
+
+
+def test_selected_columns_are_read_only_maps(df, tmp_path):
+    write_column_store(df, str(tmp_path))
+
+    data = read_column_store(str(tmp_path), ["exposed config 1", "age"])
+
+    pd.testing.assert_frame_equal(data, df[["exposed config 1", "age"]])
+    for column in data.columns:
+        assert not data[column].to_numpy().flags.writeable
+
+
+def test_partitions_are_row_ranges(df, tmp_path):
+    write_column_store(df, str(tmp_path), partition_by="q")
+
+    assert read_manifest(str(tmp_path))["partitions"] == {
+        "2020q1": [0, 2],
+        "2020q2": [2, 3],
+    }
+    pd.testing.assert_frame_equal(
+        read_column_store(str(tmp_path), ["age"], partitions=["2020q2", "2019q4"]),
+        df.loc[["103"], ["age"]],
+    )
+    assert read_column_store(str(tmp_path), partitions=[]).empty
@@ -0,0 +1,251 @@
+"""
+Unit tests for the count cube and the ROR lookups answered from it.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+from count_cube import CountCube, build_count_cube
+from ingest import ingest_quarter
+from mark_data import process_quarters
+from report import Reporter, load_marked_data
+from report import main as report_main
+from tests.conftest import FAERS_QUARTERS
+from utils import ContingencyMatrix, QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+def make_config(drug, reaction, control=None):
+    return QuestionConfig.config_from_dict(
+        {"drug": [drug], "reaction": [reaction], "control": control}
+    )
+
+
+@pytest.fixture(scope="module")
+def cube_dir(faers_dir, tmp_path_factory):
+    dir_cube = tmp_path_factory.mktemp("count_cube")
+    build_count_cube(str(faers_dir), FAERS_QUARTERS).save(str(dir_cube))
+    return dir_cube
+
+
+@pytest.fixture(scope="module")
+def cube(cube_dir):
+    return CountCube.load(str(cube_dir))
+
+
+def marked_data(faers_dir, tmp_path, config):
+    drug_names = set(config.drugs) | set(config.control or [])
+    return process_quarters(
+        FAERS_QUARTERS,
+        dir_in=str(faers_dir),
+        dir_out=str(tmp_path),
+        config_items=[config],
+        drug_names=drug_names,
+        reaction_types=set(config.reactions),
+    )
+
+
+def reporter(config, tmp_path, count_cube=None):
+    return Reporter(
+        config,
+        str(tmp_path),
+        dir_raw_data=None,
+        output_raw_exposure_data=False,
+        return_plot_data_only=True,
+        count_cube=count_cube,
+    )
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+@pytest.mark.parametrize(
+    "drug, reaction",
+    [("warfarin", "bleeding"), ("aspirin", "nausea"), ("unknown drug", "rash")],
+)
+def test_cube_counts_match_marked_data(faers_dir, tmp_path, cube, drug, reaction):
+    config = make_config(drug, reaction)
+    data = marked_data(faers_dir, tmp_path, config)
+
+    from_rows = Reporter.quarterly_counts(data, config)
+    from_cube = cube.quarterly_counts(config, FAERS_QUARTERS)
+
+    assert from_cube.to_dict() == from_rows.to_dict()
+
+
+def test_cube_ror_matches_row_level_ror(faers_dir, tmp_path, cube):
+    config = make_config("warfarin", "bleeding")
+    data = marked_data(faers_dir, tmp_path, config)
+
+    from_rows = reporter(config, tmp_path, cube)._calculate_ror_data(data)
+    from_cube = reporter(config, tmp_path, cube).report_from_count_cube(
+        FAERS_QUARTERS
+    )["ror_data"]
+
+    assert from_cube == from_rows
+    assert from_cube["quarters"] == FAERS_QUARTERS
+    # Warfarin is associated with bleeding in the synthetic data
+    assert all(lower > 1 for lower in from_cube["ror_lower"])
+    assert all(lower > 0 for lower in from_cube["ic_lower"])
+    assert all(eb05 > 1 for eb05 in from_cube["eb05"])
+
+
+def test_row_level_ror_matches_contingency_matrix(faers_dir, tmp_path):
+    config = make_config("warfarin", "bleeding")
+    data = marked_data(faers_dir, tmp_path, config)
+
+    plot_data = reporter(config, tmp_path)._calculate_ror_data(data)
+
+    for i, q in enumerate(FAERS_QUARTERS):
+        cumulative = data.loc[data.q <= q]
+        ror, (lower, upper) = ContingencyMatrix.from_results_table(
+            cumulative, config
+        ).ror()
+        assert plot_data["ror_values"][i] == pytest.approx(ror)
+        assert plot_data["ror_lower"][i] == pytest.approx(lower)
+        assert plot_data["ror_upper"][i] == pytest.approx(upper)
+
+
+SUB_RANGES = [
+    FAERS_QUARTERS[start:stop]
+    for start in range(len(FAERS_QUARTERS))
+    for stop in range(start + 1, len(FAERS_QUARTERS) + 1)
+    if stop - start < len(FAERS_QUARTERS)
+]
+
+
+@pytest.mark.parametrize("quarters", SUB_RANGES, ids="-".join)
+@pytest.mark.parametrize(
+    "drug, reaction",
+    [("warfarin", "bleeding"), ("aspirin", "nausea"), ("unknown drug", "rash")],
+)
+def test_cube_counts_match_marked_data_of_a_sub_range(
+    faers_dir, tmp_path, cube, quarters, drug, reaction
+):
+    """Cases are deduplicated within the queried range, as when marking it."""
+    config = make_config(drug, reaction)
+    data = process_quarters(
+        quarters,
+        dir_in=str(faers_dir),
+        dir_out=str(tmp_path),
+        config_items=[config],
+        drug_names=set(config.drugs),
+        reaction_types=set(config.reactions),
+    )
+
+    from_rows = Reporter.quarterly_counts(data, config)
+    from_cube = cube.quarterly_counts(config, quarters)
+
+    assert cube.can_answer(config, quarters)
+    assert from_cube.to_dict() == from_rows.to_dict()
+
+
+def test_cube_without_versions_answers_only_its_whole_range(cube):
+    config = make_config("warfarin", "bleeding")
+    old_cube = copy.copy(cube)
+    old_cube.version_keys = None
+
+    assert old_cube.can_answer(config, FAERS_QUARTERS)
+    assert not old_cube.can_answer(config, FAERS_QUARTERS[1:])
+
+
+def test_can_answer_only_simple_queries_over_the_cube(cube):
+    assert cube.can_answer(make_config("warfarin", "bleeding"), FAERS_QUARTERS)
+    assert not cube.can_answer(
+        make_config("warfarin", "bleeding", control=["aspirin"]), FAERS_QUARTERS
+    )
+    assert not cube.can_answer(
+        QuestionConfig.config_from_dict(
+            {"drug": ["warfarin", "aspirin"], "reaction": ["bleeding"]}
+        ),
+        FAERS_QUARTERS,
+    )
+    assert not cube.can_answer(make_config("warfarin", "bleeding"), ["2020q4"])
+    assert not cube.can_answer(
+        make_config("warfarin", "bleeding"), [FAERS_QUARTERS[0], FAERS_QUARTERS[2]]
+    )
+
+
+def test_report_main_answers_from_cube_without_marked_data(
+    faers_dir, cube_dir, tmp_path
+):
+    empty_marked_data_dir = tmp_path / "marked"
+    empty_marked_data_dir.mkdir()
+
+    results = report_main(
+        dir_marked_data=str(empty_marked_data_dir),
+        config_dict={"drug": ["warfarin"], "reaction": ["bleeding"]},
+        dir_raw_data=str(faers_dir),
+        dir_reports=str(tmp_path),
+        return_plot_data_only=True,
+        count_cube_dir=str(cube_dir),
+        quarters=FAERS_QUARTERS,
+    )
+
+    config_results = results["dict-config"]
+    assert config_results["initial_data"]["ror_data"]["quarters"] == FAERS_QUARTERS
+    assert config_results["stratified_lr"] is None
+    assert (tmp_path / "results.json").exists()
+
+
+def test_cube_built_from_ingested_quarters_matches_raw_files(
+    faers_dir, tmp_path, cube
+):
+    for q in FAERS_QUARTERS:
+        ingest_quarter(str(faers_dir), q, str(tmp_path))
+
+    from_ingested = build_count_cube(str(tmp_path), FAERS_QUARTERS, ingested=True)
+
+    assert from_ingested.drugs == cube.drugs
+    assert from_ingested.reactions == cube.reactions
+    np.testing.assert_array_equal(from_ingested.n_cases, cube.n_cases)
+    assert (from_ingested.drug_counts != cube.drug_counts).nnz == 0
+    assert (from_ingested.reaction_counts != cube.reaction_counts).nnz == 0
+    np.testing.assert_array_equal(from_ingested.pair_keys, cube.pair_keys)
+    np.testing.assert_array_equal(from_ingested.pair_quarters, cube.pair_quarters)
+    np.testing.assert_array_equal(from_ingested.pair_counts, cube.pair_counts)
+    np.testing.assert_array_equal(from_ingested.version_keys, cube.version_keys)
+    np.testing.assert_array_equal(from_ingested.first_counts, cube.first_counts)
+    for kind in "drug_versions", "reaction_versions":
+        for ingested_array, raw_array in zip(
+            getattr(from_ingested, kind), getattr(cube, kind)
+        ):
+            np.testing.assert_array_equal(ingested_array, raw_array)
+
+
+def test_load_if_exists_reuses_loaded_cube(cube_dir, tmp_path):
+    assert CountCube.load_if_exists(str(tmp_path)) is None
+    assert CountCube.load_if_exists(None) is None
+
+    first = CountCube.load_if_exists(str(cube_dir))
+    assert CountCube.load_if_exists(str(cube_dir)) is first
+    assert np.array_equal(first.n_cases, [300, 300, 300])
+
+
+def test_cube_stores_ebgm_prior_per_quarter(cube, cube_dir):
+    loaded = CountCube.load(str(cube_dir))
+
+    for q in FAERS_QUARTERS:
+        assert loaded.ebgm_prior(q) == cube.ebgm_prior(q)
+        assert all(np.isfinite(loaded.ebgm_prior(q)))
+
+
+def test_load_marked_data_reads_columns_and_quarters(faers_dir, tmp_path):
+    config = make_config("warfarin", "bleeding")
+    data = marked_data(faers_dir, tmp_path, config)
+
+    loaded = load_marked_data(str(tmp_path))
+    assert len(loaded) == len(data)
+    assert loaded.index.is_unique
+
+    columns = ["q", f"exposed {config.name}"]
+    loaded = load_marked_data(str(tmp_path), columns, quarters=FAERS_QUARTERS[1:])
+    expected = data.loc[data.q.isin(FAERS_QUARTERS[1:]), columns]
+    pd.testing.assert_frame_equal(loaded.sort_index(), expected.sort_index())
@@ -0,0 +1,84 @@
+"""
+Tests for the manifest of the external data files
+"""
+
+import os
+import time
+
+import pytest
+from services import data_manifest
+from services.data_manifest import DataManifest, get_data_manifest
+
+
+def _touch_quarter(directory, quarter, file_types=("demo", "drug", "outc", "reac")):
+    for file_type in file_types:
+        (directory / f"{file_type}{quarter}.csv.zip").write_bytes(b"zip")
+
+
+def _age_directory(directory, seconds=10):
+    # Out of the racy window, as if the directory was last changed a while ago
+    past = time.time() - seconds
+    os.utime(directory, (past, past))
+
+
+@pytest.fixture
+def scans(mocker):
+    return mocker.spy(data_manifest, "scan_directory")
+
+
+def test_manifest_lists_quarters(tmp_path):
+    """Test complete and incomplete quarters and the missing files"""
+    _touch_quarter(tmp_path, "2023q1")
+    _touch_quarter(tmp_path, "2023q2", file_types=["demo", "drug"])
+    (tmp_path / "notes.txt").write_text("not FAERS data")
+
+    snapshot = DataManifest(tmp_path).get()
+
+    assert snapshot.available_data.complete_quarters == ["2023q1"]
+    assert snapshot.available_data.incomplete_quarters == ["2023q2"]
+    assert snapshot.missing_files("2023q1") == []
+    assert snapshot.missing_files("2023q2") == [
+        "outc2023q2.csv.zip",
+        "reac2023q2.csv.zip",
+    ]
+    assert len(snapshot.missing_files("2024q1")) == 4
+    assert snapshot.quarters["2023q1"]["demo"].size == 3
+
+
+def test_manifest_served_from_memory_until_directory_changes(tmp_path, scans):
+    """Test the directory is listed again only once it changed"""
+    _touch_quarter(tmp_path, "2023q1")
+    _age_directory(tmp_path)
+    manifest = DataManifest(tmp_path)
+
+    first = manifest.get()
+    assert manifest.get() is first
+    assert scans.call_count == 1
+
+    _touch_quarter(tmp_path, "2023q2")
+    second = manifest.get()
+
+    assert scans.call_count == 2
+    assert second.available_data.complete_quarters == ["2023q1", "2023q2"]
+    assert second.etag != first.etag
+
+
+def test_recently_changed_directory_is_listed_again(tmp_path, scans):
+    """Test a change within the timestamp resolution is not missed"""
+    manifest = DataManifest(tmp_path)
+    _touch_quarter(tmp_path, "2023q1")
+    manifest.get()
+    manifest.get()
+
+    assert scans.call_count == 2
+
+
+def test_manifest_of_missing_directory(tmp_path):
+    """Test a missing directory has no quarters until it is created"""
+    directory = tmp_path / "faers"
+
+    assert get_data_manifest(directory).available_data.complete_quarters == []
+
+    directory.mkdir()
+    _touch_quarter(directory, "2023q1")
+    assert get_data_manifest(directory).available_data.complete_quarters == ["2023q1"]
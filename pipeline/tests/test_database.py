@@ -0,0 +1,84 @@
+"""
+Tests for the pipeline database engine
+"""
+
+import multiprocessing
+
+import pytest
+from constants import TaskStatus
+from database import build_engine, dispose_after_fork
+from models.models import TaskResults
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+
+N_PROCESSES = 8
+N_UPDATES = 50
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'tasks.sqlite3'}")
+    dispose_after_fork(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_sqlite_file_engine_uses_wal(file_engine):
+    """Test file databases are set to WAL, synchronous=NORMAL and a busy timeout."""
+    with file_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+
+def test_sqlite_memory_engine_keeps_memory_journal():
+    """Test in-memory databases are left out of WAL."""
+    engine = build_engine("sqlite:///:memory:")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "memory"
+    engine.dispose()
+
+
+def _update_task_repeatedly(engine, task_id):
+    # Runs in a forked process, with the engine inherited from the test process
+    for i in range(N_UPDATES):
+        with Session(engine) as session:
+            task = session.get(TaskResults, task_id)
+            task.status = (
+                TaskStatus.COMPLETED if i == N_UPDATES - 1 else TaskStatus.RUNNING
+            )
+            session.add(task)
+            session.commit()
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_concurrent_task_updates_from_forked_processes(file_engine):
+    """Test many processes updating tasks at once do not hit 'database is locked'."""
+    with Session(file_engine) as session:
+        tasks = [TaskResults(external_id=f"stress-{i}") for i in range(N_PROCESSES)]
+        session.add_all(tasks)
+        session.commit()
+        task_ids = [task.id for task in tasks]
+
+    # Pooled connections of this process must not be reused by the children
+    with file_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_update_task_repeatedly, args=(file_engine, task_id))
+        for task_id in task_ids
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+
+    assert [process.exitcode for process in processes] == [0] * N_PROCESSES
+    with Session(file_engine) as session:
+        for task_id in task_ids:
+            assert session.get(TaskResults, task_id).status == TaskStatus.COMPLETED
@@ -0,0 +1,193 @@
+"""
+Unit tests for the FAERS downloader, against a local HTTP stand-in server.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from download_faers_data import MANIFEST_FILE, quarter_urls, run_download
+from utils import Quarter
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+def zip_bytes(name, size):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr(name, os.urandom(size))
+    return buffer.getvalue()
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves files from memory, with Range support and injectable failures."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.files = {}
+        # path -> responses to cut off halfway before serving the file
+        self.truncate = {}
+        # path -> responses answered with 503
+        self.unavailable = {}
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        if self.path not in server.files:
+            self.send_error(404)
+            return
+        if server.unavailable.get(self.path, 0) > 0:
+            server.unavailable[self.path] -= 1
+            self.send_error(503)
+            return
+
+        body = server.files[self.path]
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if server.truncate.get(self.path, 0) > 0:
+            server.truncate[self.path] -= 1
+            self.wfile.write(body[start : start + (len(body) - start) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    for url in quarter_urls(Quarter("2020q1"), server.base_url):
+        path = url[len(server.base_url) :]
+        server.files[path] = zip_bytes(os.path.basename(path)[:-4], 200_000)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download(server, dir_out, **kwargs):
+    run_download(
+        "2020q1",
+        "2020q2",
+        str(dir_out),
+        clean_on_failure=False,
+        base_url=server.base_url,
+        **kwargs,
+    )
+
+
+def downloaded(dir_out):
+    return sorted(os.listdir(dir_out))
+
+
+EXPECTED_FILES = sorted(
+    [f"{w}2020q1.csv.zip" for w in ("demo", "drug", "outc", "reac")] + [MANIFEST_FILE]
+)
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_download_writes_files_and_manifest(server, tmp_path):
+    download(server, tmp_path)
+
+    assert downloaded(tmp_path) == EXPECTED_FILES
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    for path, body in server.files.items():
+        entry = manifest[os.path.basename(path)]
+        assert (tmp_path / os.path.basename(path)).read_bytes() == body
+        assert entry["size"] == len(body)
+        assert entry["sha256"] == hashlib.sha256(body).hexdigest()
+
+
+def test_partial_download_is_resumed(server, tmp_path):
+    path = "/2020/csv/drug2020q1.csv.zip"
+    body = server.files[path]
+    (tmp_path / "drug2020q1.csv.zip.part").write_bytes(body[:1000])
+
+    download(server, tmp_path)
+
+    assert (path, "bytes=1000-") in server.requests
+    assert (tmp_path / "drug2020q1.csv.zip").read_bytes() == body
+    assert downloaded(tmp_path) == EXPECTED_FILES
+
+
+def test_interrupted_and_failed_downloads_are_retried(server, tmp_path, monkeypatch):
+    monkeypatch.setattr("download_faers_data.asyncio.sleep", _no_sleep)
+    server.truncate["/2020/csv/demo2020q1.csv.zip"] = 2
+    server.unavailable["/2020/csv/reac2020q1.csv.zip"] = 1
+
+    download(server, tmp_path)
+
+    assert downloaded(tmp_path) == EXPECTED_FILES
+    for path, body in server.files.items():
+        assert (tmp_path / os.path.basename(path)).read_bytes() == body
+    # The truncated download was resumed rather than started over
+    assert ("/2020/csv/demo2020q1.csv.zip", None) in server.requests
+    assert sum(
+        path == "/2020/csv/demo2020q1.csv.zip" and byte_range is not None
+        for path, byte_range in server.requests
+    ) == 2
+
+
+def test_existing_files_are_verified_once(server, tmp_path):
+    download(server, tmp_path)
+    # A truncated file left by an older version of the downloader
+    truncated = tmp_path / "outc2020q1.csv.zip"
+    truncated.write_bytes(truncated.read_bytes()[:5000])
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    del manifest["outc2020q1.csv.zip"]
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest))
+    server.requests.clear()
+
+    download(server, tmp_path)
+
+    assert [path for path, _ in server.requests] == ["/2020/csv/outc2020q1.csv.zip"]
+    assert truncated.read_bytes() == server.files["/2020/csv/outc2020q1.csv.zip"]
+    assert "outc2020q1.csv.zip" in json.loads((tmp_path / MANIFEST_FILE).read_text())
+
+
+def test_missing_file_is_not_saved(server, tmp_path):
+    del server.files["/2020/csv/outc2020q1.csv.zip"]
+
+    download(server, tmp_path)
+
+    assert "outc2020q1.csv.zip" not in downloaded(tmp_path)
+    assert "outc2020q1.csv.zip.part" not in downloaded(tmp_path)
+    assert "outc2020q1.csv.zip" not in json.loads(
+        (tmp_path / MANIFEST_FILE).read_text()
+    )
+
+
+async def _no_sleep(delay):
+    pass
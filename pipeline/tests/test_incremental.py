@@ -0,0 +1,307 @@
+"""
+Unit tests for the incremental update of cumulative ROR results with a new quarter.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from constants import RorMode, TaskStatus
+import incremental
+from incremental import CaseHistory, new_quarter_counts, ror_timeline
+from mark_data import process_quarters
+from models.models import TaskQuarterlyCounts, TaskResults
+from report import Reporter
+from services.admission import AdmissionController
+from services.pipeline_service import (
+    refresh_tasks_for_quarter,
+    start_quarter_refresh,
+)
+from services.quarterly_counts import QuarterlyCountsRepository
+from tests.conftest import FAERS_QUARTERS
+from utils import QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+CONFIG_DICT = {"drug": ["warfarin"], "reaction": ["bleeding"], "control": None}
+
+
+@pytest.fixture(autouse=True)
+def mock_create_session(test_session, mocker):
+    """Redirect repository database operations to the test database."""
+    mocks = []
+    for module in "services.quarterly_counts", "services.task_repository":
+        mock = mocker.patch(f"{module}.create_session")
+        mock.return_value.__enter__.return_value = test_session
+        mock.return_value.__exit__.return_value = None
+        mocks.append(mock)
+    return mocks
+
+
+def full_run_counts(faers_dir, tmp_path, config, quarters):
+    data = process_quarters(
+        quarters,
+        dir_in=str(faers_dir),
+        dir_out=str(tmp_path),
+        config_items=[config],
+        drug_names=set(config.drugs) | set(config.control or []),
+        reaction_types=set(config.reactions),
+    )
+    return Reporter.quarterly_counts(Reporter.handle_controls(data, config), config)
+
+
+def marked_rows(counts, config):
+    """Marked rows reproducing the given per-quarter counts."""
+    rows = []
+    for q, cell in counts.iterrows():
+        for column, exposed, reacted in (
+            ("a", True, True),
+            ("b", True, False),
+            ("c", False, True),
+            ("d", False, False),
+        ):
+            rows += [(q, exposed, reacted)] * int(cell[column])
+    return pd.DataFrame(
+        rows, columns=["q", f"exposed {config.name}", f"reacted {config.name}"]
+    )
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+@pytest.mark.parametrize("control", [None, ["aspirin"]])
+def test_new_quarter_counts_match_full_run(faers_dir, tmp_path, control):
+    config = QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"], "control": control},
+        name="task-1",
+    )
+    full = full_run_counts(faers_dir, tmp_path, config, FAERS_QUARTERS)
+
+    counts = new_quarter_counts(
+        str(faers_dir), FAERS_QUARTERS[-1], {1: (FAERS_QUARTERS[0], config)}
+    )
+
+    assert counts[1] == full.loc[FAERS_QUARTERS[-1]].to_dict()
+
+
+def test_new_quarter_counts_of_several_queries_in_one_pass(faers_dir):
+    queries = {
+        key: (
+            first_quarter,
+            QuestionConfig.config_from_dict(
+                {"drug": [drug], "reaction": ["nausea"]}, name=f"task-{key}"
+            ),
+        )
+        for key, (first_quarter, drug) in enumerate(
+            [("2020q2", "aspirin"), ("2020q3", "aspirin"), ("2020q3", "insulin")]
+        )
+    }
+
+    counts = new_quarter_counts(str(faers_dir), "2020q3", queries)
+
+    n_cases = {key: sum(c.values()) for key, c in counts.items()}
+    # Follow-ups of 2020q2 cases are only new for the queries that start in 2020q3
+    assert n_cases[0] < n_cases[1]
+    assert n_cases[1] == n_cases[2]
+
+
+def test_new_quarter_counts_extend_the_saved_case_history(
+    faers_dir, tmp_path, mocker
+):
+    config = QuestionConfig.config_from_dict(CONFIG_DICT, name="task-1")
+    queries = {1: (FAERS_QUARTERS[0], config)}
+    dir_history = str(tmp_path / "case_history")
+    read_case_ids = mocker.spy(incremental, "read_case_ids")
+
+    for i in range(1, len(FAERS_QUARTERS)):
+        q = FAERS_QUARTERS[i]
+        full = full_run_counts(faers_dir, tmp_path, config, FAERS_QUARTERS[: i + 1])
+        read_case_ids.reset_mock()
+        counts = new_quarter_counts(str(faers_dir), q, queries, dir_history)
+
+        assert counts[1] == full.loc[q].to_dict()
+        assert CaseHistory.load(dir_history).quarters == FAERS_QUARTERS[: i + 1]
+    # Only the first refresh read the cases of the earlier quarters
+    read_case_ids.assert_not_called()
+
+
+def test_case_history_is_rebuilt_when_it_starts_too_late(faers_dir, tmp_path):
+    dir_history = str(tmp_path)
+    CaseHistory.up_to(str(faers_dir), FAERS_QUARTERS[2], FAERS_QUARTERS[1], None).save(
+        dir_history
+    )
+
+    history = CaseHistory.up_to(
+        str(faers_dir), FAERS_QUARTERS[2], FAERS_QUARTERS[0], dir_history
+    )
+
+    assert history.quarters == FAERS_QUARTERS[:2]
+
+
+def test_ror_timeline_matches_report(faers_dir, tmp_path):
+    config = QuestionConfig.config_from_dict(CONFIG_DICT)
+    counts = full_run_counts(faers_dir, tmp_path, config, FAERS_QUARTERS)
+    reporter = Reporter(config, str(tmp_path), None, False, return_plot_data_only=True)
+
+    plot_data = reporter._calculate_ror_data(marked_rows(counts, config))
+    ror, lower, upper = ror_timeline(counts.to_dict(orient="list"))
+
+    np.testing.assert_allclose(ror, plot_data["ror_values"])
+    np.testing.assert_allclose(lower, plot_data["ror_lower"])
+    np.testing.assert_allclose(upper, plot_data["ror_upper"])
+    assert plot_data["counts"] == counts.to_dict(orient="list")
+
+    for mode in RorMode.WINDOW, RorMode.QUARTERLY:
+        ror, lower, upper = ror_timeline(counts.to_dict(orient="list"), mode, 4)
+        np.testing.assert_allclose(ror, plot_data[f"{mode.value}_ror_values"])
+        np.testing.assert_allclose(upper, plot_data[f"{mode.value}_ror_upper"])
+
+
+def test_append_only_extends_counts_ending_at_the_expected_quarter(test_session):
+    counts = {"quarters": ["2020q1"], "a": [1], "b": [2], "c": [3], "d": [4]}
+    QuarterlyCountsRepository.save(7, CONFIG_DICT, counts, "2020q1", "2020q1")
+    new = {"a": 5, "b": 6, "c": 7, "d": 8}
+
+    entries = QuarterlyCountsRepository.get_by_last_quarter("2020q1")
+    assert [entry.task_id for entry in entries] == [7]
+    assert QuarterlyCountsRepository.append(7, "2020q1", "2020q2", new) is not None
+    # A second refresh with the same quarter changes nothing
+    assert QuarterlyCountsRepository.append(7, "2020q1", "2020q2", new) is None
+
+    stored = test_session.get(TaskQuarterlyCounts, 7)
+    assert stored.last_quarter == "2020q2"
+    assert stored.quarters == ["2020q1", "2020q2"]
+    assert stored.a == [1, 5] and stored.d == [4, 8]
+
+
+def test_append_skips_counts_saved_again_since_read(test_session):
+    counts = {"quarters": ["2020q1"], "a": [1], "b": [2], "c": [3], "d": [4]}
+    saved = QuarterlyCountsRepository.save(7, CONFIG_DICT, counts, "2020q1", "2020q1")
+    read_at = saved.updated_at
+    # The task is rerun: its counts are replaced, ending at the same quarter
+    QuarterlyCountsRepository.save(7, CONFIG_DICT, counts, "2020q1", "2020q1")
+    new = {"a": 5, "b": 6, "c": 7, "d": 8}
+
+    assert (
+        QuarterlyCountsRepository.append(
+            7, "2020q1", "2020q2", new, expected_updated_at=read_at
+        )
+        is None
+    )
+    assert test_session.get(TaskQuarterlyCounts, 7).last_quarter == "2020q1"
+
+
+def test_refresh_skips_tasks_that_are_not_completed(test_session, mocker):
+    mocker.patch("services.pipeline_service.settings")
+    mocker.patch(
+        "services.pipeline_service.new_quarter_counts",
+        return_value={12: {"a": 1, "b": 1, "c": 1, "d": 1}},
+    )
+    mock_callback = mocker.patch("services.pipeline_service.send_results_to_callback")
+    # The slot of the task was reused by a task that is still running
+    test_session.add(
+        TaskResults(id=12, external_id="ext_012", status=TaskStatus.RUNNING)
+    )
+    test_session.commit()
+    counts = {"quarters": ["2020q1"], "a": [1], "b": [2], "c": [3], "d": [4]}
+    QuarterlyCountsRepository.save(12, CONFIG_DICT, counts, "2020q1", "2020q1")
+
+    assert refresh_tasks_for_quarter("2020q2") == 0
+
+    assert test_session.get(TaskQuarterlyCounts, 12).last_quarter == "2020q1"
+    mock_callback.assert_not_called()
+
+
+def test_refresh_tasks_for_quarter_matches_full_run(
+    faers_dir, tmp_path, test_session, mocker
+):
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_external_data_path.return_value = faers_dir
+    mock_settings.get_case_history_path.return_value = tmp_path / "case_history"
+    mock_callback = mocker.patch("services.pipeline_service.send_results_to_callback")
+    config = QuestionConfig.config_from_dict(CONFIG_DICT)
+    full = full_run_counts(faers_dir, tmp_path, config, FAERS_QUARTERS)
+
+    # Results of a task over the first two quarters, extended with the third
+    task = TaskResults(
+        id=11,
+        external_id="ext_011",
+        status=TaskStatus.COMPLETED,
+        completed_at=datetime.now(timezone.utc),
+    )
+    test_session.add(task)
+    test_session.commit()
+    first_two = full_run_counts(faers_dir, tmp_path, config, FAERS_QUARTERS[:2])
+    QuarterlyCountsRepository.save(
+        11,
+        CONFIG_DICT,
+        {"quarters": FAERS_QUARTERS[:2], **first_two.to_dict(orient="list")},
+        FAERS_QUARTERS[0],
+        FAERS_QUARTERS[1],
+    )
+
+    assert refresh_tasks_for_quarter(FAERS_QUARTERS[2]) == 1
+
+    refreshed = test_session.get(TaskResults, 11)
+    expected = first_two.to_dict(orient="list")
+    for column in "abcd":
+        expected[column].append(int(full.loc[FAERS_QUARTERS[2], column]))
+    ror, lower, upper = ror_timeline(expected)
+    assert refreshed.ror_values == pytest.approx(ror)
+    assert refreshed.ror_lower == pytest.approx(lower)
+    assert len(refreshed.ror_upper) == 3
+    mock_callback.assert_called_once()
+    assert test_session.get(TaskQuarterlyCounts, 11).last_quarter == FAERS_QUARTERS[2]
+
+    # Nothing ends at 2020q3 - 1 anymore
+    assert refresh_tasks_for_quarter(FAERS_QUARTERS[2]) == 0
+
+
+@pytest.mark.parametrize(
+    "history_quarters, n_quarters",
+    [(None, 3), (FAERS_QUARTERS[:2], 1), (FAERS_QUARTERS[1:2], 3)],
+    ids=["no history", "history up to date", "history starts too late"],
+)
+def test_quarter_refresh_is_admitted_over_the_quarters_it_reads(
+    tmp_path, mocker, history_quarters, n_quarters
+):
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_case_history_path.return_value = tmp_path
+    mocker.patch("services.pipeline_service.quarter_files_exist", return_value=True)
+    mock_executor = mocker.patch("services.pipeline_service.executor")
+    controller = AdmissionController(
+        budget_mb=1000,
+        max_queued=2,
+        base_mb=100,
+        mb_per_quarter=500,
+        seconds_per_quarter=10,
+    )
+    mocker.patch("services.pipeline_service.admission_controller", controller)
+    # A running 10-quarter task holds the memory budget
+    controller.submit(1, 10, mocker.MagicMock())
+    # A task over the first two quarters is extended with the third
+    QuarterlyCountsRepository.save(
+        11,
+        CONFIG_DICT,
+        {"quarters": FAERS_QUARTERS[:2], **{column: [1, 1] for column in "abcd"}},
+        FAERS_QUARTERS[0],
+        FAERS_QUARTERS[1],
+    )
+    if history_quarters is not None:
+        CaseHistory(history_quarters, CaseHistory.empty().last_seen).save(
+            str(tmp_path)
+        )
+
+    start_quarter_refresh("2020q3")
+
+    mock_executor.submit.assert_not_called()
+    assert [task.task_id for task in controller.queue] == ["refresh-2020q3"]
+    assert controller.queue[0].n_quarters == n_quarters
+
+    controller.queue[0].start()
+    mock_executor.submit.assert_called_once_with(refresh_tasks_for_quarter, "2020q3")
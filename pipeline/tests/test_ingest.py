@@ -0,0 +1,112 @@
+"""
+Unit tests for the single-pass ingestion of downloaded FAERS quarters.
+"""
+
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from ingest import IngestedQuarter, download_and_ingest, ingest_quarter
+from mark_data import mark_quarter
+from tests.conftest import FAERS_QUARTERS
+from tests.test_download_faers_data import StandInServer
+from utils import QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture(scope="module")
+def ingested_dir(faers_dir, tmp_path_factory):
+    dir_out = tmp_path_factory.mktemp("ingested")
+    ingest_quarter(str(faers_dir), FAERS_QUARTERS[1], str(dir_out))
+    return dir_out
+
+
+@pytest.fixture
+def faers_server(faers_dir):
+    """Serves the synthetic FAERS files at their NBER paths."""
+    server = StandInServer()
+    for fn in os.listdir(faers_dir):
+        server.files[f"/{fn[4:8]}/csv/{fn}"] = (faers_dir / fn).read_bytes()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_inverted_indexes_match_marked_data(faers_dir, ingested_dir):
+    q = FAERS_QUARTERS[1]
+    config = QuestionConfig.config_from_dict(
+        {"drug": ["warfarin", "insulin"], "reaction": ["bleeding"]}
+    )
+    marked = mark_quarter(
+        q, str(faers_dir), [config], set(config.drugs), set(config.reactions)
+    )
+
+    ingested = IngestedQuarter.load(str(ingested_dir), q)
+
+    case_ids = ingested.demo.index
+    exposed = case_ids[ingested.cases_with("drug", config.drugs)]
+    reacted = case_ids[ingested.cases_with("reaction", config.reactions)]
+    assert sorted(exposed) == sorted(marked.index[marked[f"exposed {config.name}"]])
+    assert sorted(reacted) == sorted(marked.index[marked[f"reacted {config.name}"]])
+    assert sorted(case_ids) == sorted(marked.index)
+
+
+def test_vocabulary_counts_cases_per_normalized_term(faers_dir, ingested_dir):
+    q = FAERS_QUARTERS[1]
+    drug = pd.read_csv(faers_dir / f"drug{q}.csv.zip", dtype=str)
+    drug["term"] = drug.drugname.map(QuestionConfig.normalize_drug_name)
+    expected = drug.groupby("term").caseid.nunique()
+
+    ingested = IngestedQuarter.load(str(ingested_dir), q)
+
+    pd.testing.assert_series_equal(
+        ingested.term_counts("drug"), expected, check_names=False, check_dtype=False
+    )
+    assert "warfarin" in ingested.terms["drug"]
+    assert ingested.cases_with("drug", ["no such drug"]).size == 0
+
+
+def test_serious_outcome_index(faers_dir, ingested_dir):
+    q = FAERS_QUARTERS[1]
+    ingested = IngestedQuarter.load(str(ingested_dir), q)
+
+    # Every case of the synthetic extract has an outcome row
+    np.testing.assert_array_equal(
+        ingested.serious_cases, np.arange(len(ingested.demo))
+    )
+    assert ingested.demo.age.dtype == float
+    assert ingested.demo.event_date.dtype.kind == "M"
+
+
+def test_quarters_are_ingested_as_their_files_arrive(faers_server, tmp_path):
+    dir_raw = tmp_path / "raw"
+    dir_out = tmp_path / "ingested"
+    dir_raw.mkdir()
+    dir_out.mkdir()
+    del faers_server.files["/2020/csv/reac2020q3.csv.zip"]
+
+    ingested = asyncio.run(
+        download_and_ingest(
+            FAERS_QUARTERS,
+            str(dir_raw),
+            str(dir_out),
+            base_url=faers_server.base_url,
+        )
+    )
+
+    assert ingested == FAERS_QUARTERS[:2]
+    assert sorted(os.listdir(dir_out)) == FAERS_QUARTERS[:2]
+    assert len(IngestedQuarter.load(str(dir_out), "2020q1").demo) == 300
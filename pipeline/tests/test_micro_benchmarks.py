@@ -0,0 +1,71 @@
+"""
+Tests of the micro-benchmark suite. The comparison with the saved baseline is
+opt-in (set RUN_MICRO_BENCHMARKS=1), since timings depend on the machine.
+"""
+
+import os
+
+import pytest
+from benchmarks.micro import (
+    BENCHMARKS,
+    DEFAULT_BASELINE,
+    compare_records,
+    load_records,
+    run_micro_benchmarks,
+    save_records,
+)
+
+
+def _record(benchmark, size, seconds):
+    return {
+        "benchmark": benchmark,
+        "size": size,
+        "median_seconds": 1.1 * seconds,
+        "min_seconds": seconds,
+        "repeat": 1,
+    }
+
+
+def test_benchmarks_run_on_small_data():
+    records = run_micro_benchmarks(sizes=[200], repeat=1)
+    assert [r["benchmark"] for r in records] == list(BENCHMARKS)
+    assert all(r["size"] == 200 and r["median_seconds"] > 0 for r in records)
+
+
+def test_compare_flags_slowdowns(tmp_path):
+    baseline = [_record("a", 10, 1.0), _record("b", 10, 1.0), _record("c", 10, 1.0)]
+    current = [_record("a", 10, 1.2), _record("b", 10, 1.5), _record("c", 10, 0.5)]
+    save_records(baseline, str(tmp_path / "baseline.json"))
+
+    tbl = compare_records(load_records(str(tmp_path / "baseline.json")), current)
+
+    assert tbl.loc[("b", 10), "ratio"] == pytest.approx(1.5)
+    assert list(tbl.index[tbl.slowdown]) == [("b", 10)]
+    assert not compare_records(baseline, current, threshold=0.6).slowdown.any()
+
+
+def test_compare_ignores_small_absolute_slowdowns():
+    baseline = [_record("a", 10, 0.001)]
+    current = [_record("a", 10, 0.002)]
+    assert not compare_records(baseline, current).slowdown.any()
+    assert compare_records(baseline, current, min_delta=0).slowdown.all()
+
+
+def test_compare_ignores_benchmarks_missing_from_a_run():
+    baseline = [_record("a", 10, 1.0), _record("a", 100, 1.0)]
+    current = [_record("a", 10, 1.0), _record("new", 10, 9.0)]
+    assert list(compare_records(baseline, current).index) == [("a", 10)]
+
+
+@pytest.mark.skipif(
+    not os.environ.get("RUN_MICRO_BENCHMARKS"),
+    reason="set RUN_MICRO_BENCHMARKS=1 to compare with the saved baseline",
+)
+def test_no_slowdown_against_baseline():
+    baseline = load_records(DEFAULT_BASELINE)
+    sizes = sorted({r["size"] for r in baseline})
+    threshold = float(os.environ.get("MICRO_BENCHMARK_THRESHOLD", 0.25))
+
+    tbl = compare_records(baseline, run_micro_benchmarks(sizes), threshold)
+
+    assert not tbl.slowdown.any(), tbl.loc[tbl.slowdown].to_string()
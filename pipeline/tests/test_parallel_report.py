@@ -0,0 +1,86 @@
+"""
+Unit tests for reporting several configs concurrently.
+"""
+
+import json
+
+import pytest
+from mark_data import process_quarters
+from report import main as report_main
+from tests.conftest import FAERS_QUARTERS
+from utils import QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+CONFIGS = {
+    "warfarin_bleeding": {"drug": ["warfarin"], "reaction": ["bleeding"]},
+    "insulin_dizziness": {"drug": ["insulin"], "reaction": ["dizziness"]},
+    "aspirin_nausea_vs_ibuprofen": {
+        "drug": ["aspirin"],
+        "reaction": ["nausea"],
+        "control": ["ibuprofen"],
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def config_dir(tmp_path_factory):
+    dir_config = tmp_path_factory.mktemp("config")
+    for name, config in CONFIGS.items():
+        (dir_config / f"{name}.json").write_text(json.dumps(config))
+    return dir_config
+
+
+@pytest.fixture(scope="module")
+def marked_dir(faers_dir, config_dir, tmp_path_factory):
+    config_items = QuestionConfig.load_config_items(str(config_dir))
+    dir_out = tmp_path_factory.mktemp("marked")
+    drug_names = set()
+    for config in config_items:
+        drug_names.update(config.drugs)
+        drug_names.update(config.control or [])
+    process_quarters(
+        FAERS_QUARTERS,
+        dir_in=str(faers_dir),
+        dir_out=str(dir_out),
+        config_items=config_items,
+        drug_names=drug_names,
+        reaction_types={r for config in config_items for r in config.reactions},
+    )
+    return dir_out
+
+
+def run_reports(faers_dir, config_dir, marked_dir, dir_reports, workers):
+    report_main(
+        dir_marked_data=str(marked_dir),
+        config_dir=str(config_dir),
+        dir_raw_data=str(faers_dir),
+        dir_reports=str(dir_reports),
+        return_plot_data_only=True,
+        workers=workers,
+    )
+    return (dir_reports / "results.json").read_text()
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_parallel_results_match_serial_results(
+    faers_dir, config_dir, marked_dir, tmp_path
+):
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "parallel").mkdir()
+    serial = run_reports(faers_dir, config_dir, marked_dir, tmp_path / "serial", 1)
+    parallel = run_reports(
+        faers_dir, config_dir, marked_dir, tmp_path / "parallel", 3
+    )
+
+    assert parallel == serial
+    # Configs in the order they were loaded, whatever the completion order
+    assert list(json.loads(parallel)) == sorted(CONFIGS)
+    # The shared column store is removed
+    assert [p.name for p in (tmp_path / "parallel").iterdir()] == ["results.json"]
@@ -3,18 +3,22 @@ Unit tests for pipeline_service functions
 """
 
 import json
+import pstats
 from datetime import datetime, timezone
 from pathlib import Path
 
 import pytest
-from constants import RorFields, TaskStatus
+from constants import RorFields, RorMode, TaskStatus
 from errors import DataFilesNotFoundError
 from models.models import TaskResults
 from models.schemas import PipelineRequest
 from services.pipeline_service import (
+    can_use_count_cube,
     cleanup,
     get_available_data,
     mark_data,
+    profile_summary,
+    run_pipeline,
     save_results_to_db,
     verify_data_files_exist,
 )
@@ -159,6 +163,25 @@ def test_save_results_to_db_with_valid_data(
     mock_get_ror_fields.assert_called_once_with(results_file_with_data)
 
 
+def test_save_results_to_db_with_window_mode(sample_task, results_file_with_data, mocker):
+    mocker.patch("services.pipeline_service.TaskRepository.save_task_results")
+    mock_get_ror_fields = mocker.patch("services.pipeline_service.get_ror_fields")
+    mock_get_ror_fields.return_value = {
+        RorFields.ROR_VALUES: [1.5, 2.0, 1.8],
+        RorFields.ROR_LOWER: [1.2, 1.7, 1.5],
+        RorFields.ROR_UPPER: [1.8, 2.3, 2.1],
+        "window_ror_values": [1.5, 2.5, 1.6],
+        "window_ror_lower": [1.2, 2.1, 1.1],
+        "window_ror_upper": [1.8, 2.9, 2.0],
+    }
+
+    save_results_to_db(sample_task, results_file_with_data, ror_mode=RorMode.WINDOW)
+
+    assert sample_task.ror_values == [1.5, 2.5, 1.6]
+    assert sample_task.ror_lower == [1.2, 2.1, 1.1]
+    assert sample_task.ror_upper == [1.8, 2.9, 2.0]
+
+
 def test_save_results_to_db_with_empty_data(sample_task, results_file_empty, mocker):
     mock_task_repository = mocker.patch(
         "services.pipeline_service.TaskRepository.save_task_results"
@@ -332,3 +355,87 @@ def test_get_available_data_with_incomplete_quarters(
     assert len(result.file_details["2023q1"].files) == 4
     assert result.file_details["2023q2"].complete is False
     assert len(result.file_details["2023q2"].files) == 2
+
+
+# ============================================================================
+# TESTS FOR can_use_count_cube
+# ============================================================================
+
+
+def test_can_use_count_cube_without_cube(tmp_path, mocker):
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_count_cube_path.return_value = tmp_path / "count_cube"
+
+    config_dict = {"drug": ["aspirin"], "reaction": ["nausea"], "control": None}
+    assert can_use_count_cube(config_dict, ["2023q1"]) is False
+
+
+def test_can_use_count_cube_for_simple_queries_only(tmp_path, mocker):
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_count_cube_path.return_value = tmp_path
+    cube = mocker.MagicMock()
+    cube.can_answer.side_effect = lambda config, quarters: not config.control
+    mocker.patch(
+        "services.pipeline_service.CountCube.load_if_exists", return_value=cube
+    )
+
+    simple = {"drug": ["aspirin"], "reaction": ["nausea"], "control": None}
+    with_control = {"drug": ["aspirin"], "reaction": ["nausea"], "control": ["placebo"]}
+    assert can_use_count_cube(simple, ["2023q1"]) is True
+    assert can_use_count_cube(with_control, ["2023q1"]) is False
+
+
+# ============================================================================
+# TESTS FOR task profiling
+# ============================================================================
+
+
+@pytest.fixture
+def profiling_settings(tmp_path, mocker):
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_logs_dir.return_value = tmp_path
+    mock_settings.PIPELINE_PROFILE_TASKS = False
+    mock_settings.PIPELINE_ALLOW_PROFILE_REQUESTS = True
+    mocker.patch("services.pipeline_service.configure_task_logger")
+    return mock_settings
+
+
+def test_run_pipeline_saves_profile_when_requested(
+    tmp_path, mocker, profiling_settings, pipeline_request, sample_task
+):
+    execute = mocker.patch("services.pipeline_service.execute_pipeline")
+    pipeline_request.profile = True
+
+    run_pipeline(pipeline_request, sample_task)
+
+    execute.assert_called_once_with(pipeline_request, sample_task)
+    profile = tmp_path / f"{sample_task.id}.prof"
+    assert pstats.Stats(str(profile)).total_calls > 0
+    assert "function calls" in profile_summary(sample_task.id)
+
+
+def test_run_pipeline_profiles_every_task_when_enabled(
+    tmp_path, mocker, profiling_settings, pipeline_request, sample_task
+):
+    mocker.patch("services.pipeline_service.execute_pipeline")
+    profiling_settings.PIPELINE_PROFILE_TASKS = True
+
+    run_pipeline(pipeline_request, sample_task)
+
+    assert (tmp_path / f"{sample_task.id}.prof").exists()
+
+
+def test_run_pipeline_ignores_profile_requests_unless_allowed(
+    tmp_path, mocker, profiling_settings, pipeline_request, sample_task
+):
+    execute = mocker.patch("services.pipeline_service.execute_pipeline")
+    profiling_settings.PIPELINE_ALLOW_PROFILE_REQUESTS = False
+    pipeline_request.profile = True
+    # Left by an earlier task in the same slot
+    stale = tmp_path / f"{sample_task.id}.prof"
+    stale.write_bytes(b"stale")
+
+    run_pipeline(pipeline_request, sample_task)
+
+    execute.assert_called_once_with(pipeline_request, sample_task)
+    assert not stale.exists()
@@ -0,0 +1,90 @@
+"""
+Unit tests for the row filters of the regression reports.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from report import regression_filters
+from utils import QuestionConfig
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture(scope="module")
+def config():
+    return QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"]}
+    )
+
+
+@pytest.fixture(scope="module")
+def data(config):
+    """Marked cases, some with illegal or missing age, weight and sex."""
+    rng = np.random.default_rng(0)
+    n_cases = 5_000
+    age = rng.uniform(-5, 130, n_cases)
+    wt = rng.uniform(-10, 400, n_cases)
+    age[rng.random(n_cases) < 0.05] = np.nan
+    wt[rng.random(n_cases) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "age": age,
+            "wt": wt,
+            "sex": rng.choice(["F", "M", "UNK", None], n_cases),
+            f"exposed {config.name}": rng.random(n_cases) < 0.2,
+            f"reacted {config.name}": rng.random(n_cases) < 0.1,
+        }
+    )
+
+
+def percentile_filter(data, columns):
+    """Rows of legal data within the central 99 percentiles of the columns."""
+    legal = data.loc[
+        (data.wt > 0)
+        & (data.wt < 360)
+        & (data.age > 0)
+        & (data.age < 120)
+        & data.sex.isin({"M", "F"})
+    ]
+    sel = pd.Series(True, index=legal.index)
+    for column in columns:
+        low, high = np.nanpercentile(legal[column], [0.5, 99.5])
+        sel &= (legal[column] > low) & (legal[column] < high)
+    return data.index.isin(legal.index[sel])
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_masks_keep_rows_within_percentiles_of_legal_values(data, config):
+    filters = regression_filters(data, config)
+
+    np.testing.assert_array_equal(
+        filters.with_weight, percentile_filter(data, ["age", "wt"])
+    )
+    np.testing.assert_array_equal(
+        filters.without_weight, percentile_filter(data, ["age"])
+    )
+    assert (filters.without_weight | ~filters.with_weight).all()
+
+
+def test_data_is_left_unchanged(data, config):
+    before = data.copy()
+
+    regression_filters(data, config)
+
+    pd.testing.assert_frame_equal(data, before)
+
+
+def test_nothing_is_kept_without_legal_exposed_cases(data, config):
+    no_exposure = data.assign(**{f"exposed {config.name}": data.age > 200})
+
+    filters = regression_filters(no_exposure, config)
+
+    assert not filters.with_weight.any()
+    assert not filters.without_weight.any()
@@ -2,14 +2,24 @@
 Unit tests for pipeline routes
 """
 
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from constants import TaskStatus
-from errors import PipelineCapacityExceededError
+from errors import (
+    DataFilesNotFoundError,
+    PipelineCapacityExceededError,
+    PipelineQueueFullError,
+)
 from fastapi.testclient import TestClient
 from models.models import TaskResults
+from services import pipeline_service
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
     HTTP_422_UNPROCESSABLE_CONTENT,
     HTTP_429_TOO_MANY_REQUESTS,
@@ -23,6 +33,13 @@ def test_client(test_app):
     return TestClient(test_app)
 
 
+@pytest.fixture
+def backend_client(test_app, mocker):
+    """Test client with the address of the backend"""
+    mocker.patch("core.access.settings.PIPELINE_BACKEND_IPS", "10.0.0.0/24")
+    return TestClient(test_app, client=("10.0.0.2", 50000))
+
+
 @pytest.fixture
 def sample_tasks(test_session):
     """Create sample tasks for testing"""
@@ -230,6 +247,24 @@ def test_run_pipeline_capacity_exceeded(test_client, mocker, request_data):
     assert "Pipeline capacity exceeded" in data["detail"]
 
 
+def test_run_pipeline_queue_full(test_client, mocker, request_data):
+    """Test 429 with Retry-After, without taking a slot, when the queue is full"""
+    mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.check_admission",
+        side_effect=PipelineQueueFullError("Pipeline queue is full", retry_after=42),
+    )
+    mock_task_repository = mocker.patch(
+        "api.v1.routes.pipeline.TaskRepository.create_or_reuse_slot"
+    )
+
+    response = test_client.post("/run", json=request_data)
+
+    assert response.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "42"
+    assert "queue is full" in response.json()["detail"]
+    mock_task_repository.assert_not_called()
+
+
 @pytest.mark.parametrize(
     "invalid_field,invalid_value",
     [
@@ -323,7 +358,7 @@ def test_get_available_data_success(test_client, mocker):
 def test_get_available_data_service_error(test_client, mocker):
     """Test available data retrieval when service raises an error"""
     mock_pipeline_service = mocker.patch(
-        "api.v1.routes.pipeline.pipeline_service.get_available_data"
+        "api.v1.routes.pipeline.pipeline_service.available_data_snapshot"
     )
     mock_pipeline_service.side_effect = Exception("Service error")
 
@@ -334,6 +369,63 @@ def test_get_available_data_service_error(test_client, mocker):
     assert "Failed to retrieve available data information" in data["detail"]
 
 
+# ============================================================================
+# TESTS FOR POST /refresh endpoint
+# ============================================================================
+
+
+def test_refresh_results_success(test_client, mocker):
+    """Test triggering a refresh of the stored results with a new quarter"""
+    mock_get_entries = mocker.patch(
+        "api.v1.routes.pipeline.QuarterlyCountsRepository.get_by_last_quarter",
+        return_value=[mocker.MagicMock(), mocker.MagicMock()],
+    )
+    mock_start_refresh = mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.start_quarter_refresh"
+    )
+
+    response = test_client.post("/refresh", json={"year": 2024, "quarter": 1})
+
+    assert response.status_code == HTTP_202_ACCEPTED
+    assert response.json() == {"quarter": "2024q1", "tasks": 2}
+    mock_get_entries.assert_called_once_with("2023q4")
+    mock_start_refresh.assert_called_once_with("2024q1")
+
+
+def test_refresh_results_missing_quarter_data(test_client, mocker):
+    """Test refresh when the files of the new quarter are missing"""
+    mocker.patch(
+        "api.v1.routes.pipeline.QuarterlyCountsRepository.get_by_last_quarter",
+        return_value=[],
+    )
+    mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.start_quarter_refresh",
+        side_effect=DataFilesNotFoundError(2024, 1, 2024, 2, ["2024q1"], []),
+    )
+
+    response = test_client.post("/refresh", json={"year": 2024, "quarter": 1})
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+    assert "2024q1" in response.json()["detail"]
+
+
+def test_refresh_results_queue_full(test_client, mocker):
+    """Test refresh is refused with Retry-After when too many jobs wait for memory"""
+    mocker.patch(
+        "api.v1.routes.pipeline.QuarterlyCountsRepository.get_by_last_quarter",
+        return_value=[],
+    )
+    mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.start_quarter_refresh",
+        side_effect=PipelineQueueFullError("Pipeline queue is full", retry_after=30),
+    )
+
+    response = test_client.post("/refresh", json={"year": 2024, "quarter": 1})
+
+    assert response.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "30"
+
+
 # ============================================================================
 # TESTS FOR GET /external/{external_id} endpoint
 # ============================================================================
@@ -361,3 +453,235 @@ def test_get_pipeline_by_external_id_not_found(test_client):
     assert response.status_code == HTTP_404_NOT_FOUND
     data = response.json()
     assert "Task with external_id does_not_exist not found" in data["detail"]
+
+
+# ============================================================================
+# TESTS FOR POST /external/batch endpoint
+# ============================================================================
+
+
+def test_get_pipeline_by_external_ids_returns_latest_per_id(
+    test_client, test_session
+):
+    """Test batch lookup returns the newest task for each external_id"""
+    now = datetime.now(timezone.utc)
+    test_session.add_all(
+        [
+            TaskResults(
+                id=1,
+                external_id="ext_a",
+                status=TaskStatus.FAILED,
+                created_at=now - timedelta(hours=1),
+            ),
+            TaskResults(
+                id=2, external_id="ext_a", status=TaskStatus.RUNNING, created_at=now
+            ),
+            TaskResults(
+                id=3, external_id="ext_b", status=TaskStatus.COMPLETED, created_at=now
+            ),
+        ]
+    )
+    test_session.commit()
+
+    response = test_client.post(
+        "/external/batch",
+        json={"external_ids": ["ext_b", "ext_a", "ext_missing", "ext_a"]},
+    )
+
+    assert response.status_code == HTTP_200_OK
+    data = response.json()
+    assert [task["id"] for task in data["tasks"]] == [3, 2]
+    assert data["tasks"][1]["status"] == "running"
+    assert data["missing"] == ["ext_missing"]
+
+
+def test_get_pipeline_by_external_ids_empty_list_rejected(test_client):
+    """Test batch lookup requires at least one external_id"""
+    response = test_client.post("/external/batch", json={"external_ids": []})
+
+    assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_get_pipeline_profile(backend_client, test_session, mocker, tmp_path):
+    """Test the profile of a task is returned as a pstats file or a text report"""
+    import cProfile
+
+    test_session.add(
+        TaskResults(id=7, external_id="ext_7", status=TaskStatus.COMPLETED)
+    )
+    test_session.commit()
+    profile = tmp_path / "7.prof"
+    profiler = cProfile.Profile()
+    profiler.runcall(sorted, [3, 1, 2])
+    profiler.dump_stats(profile)
+    mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.profile_path", return_value=profile
+    )
+
+    response = backend_client.get("/7/profile")
+    assert response.status_code == HTTP_200_OK
+    assert response.content == profile.read_bytes()
+
+    response = backend_client.get("/7/profile", params={"format": "text", "limit": 5})
+    assert response.status_code == HTTP_200_OK
+    assert "sorted" in response.text
+
+
+def test_get_pipeline_profile_not_found(
+    backend_client, test_session, mocker, tmp_path
+):
+    """Test 404 for unknown tasks and for tasks that were not profiled"""
+    test_session.add(TaskResults(id=8, external_id="ext_8", status=TaskStatus.RUNNING))
+    test_session.commit()
+    mocker.patch(
+        "api.v1.routes.pipeline.pipeline_service.profile_path",
+        return_value=tmp_path / "8.prof",
+    )
+
+    assert backend_client.get("/8/profile").status_code == HTTP_404_NOT_FOUND
+    assert backend_client.get("/999/profile").status_code == HTTP_404_NOT_FOUND
+
+
+def test_get_pipeline_profile_only_for_the_backend(test_app, test_session, mocker):
+    """Test profiles are not served to other clients, nor to any without a whitelist"""
+    test_session.add(TaskResults(id=9, external_id="ext_9", status=TaskStatus.RUNNING))
+    test_session.commit()
+    other_client = TestClient(test_app, client=("192.168.1.5", 50000))
+
+    mocker.patch("core.access.settings.PIPELINE_BACKEND_IPS", "10.0.0.0/24")
+    assert other_client.get("/9/profile").status_code == HTTP_403_FORBIDDEN
+
+    mocker.patch("core.access.settings.PIPELINE_BACKEND_IPS", "")
+    mocker.patch("core.access.settings.DEBUG", False)
+    assert other_client.get("/9/profile").status_code == HTTP_403_FORBIDDEN
+
+
+def _read_sse_events(response):
+    import json
+
+    return [
+        json.loads(line[len("data: ") :])
+        for line in response.iter_lines()
+        if line.startswith("data: ")
+    ]
+
+
+def test_stream_task_events_finished_task(test_client, test_session):
+    """Test the stream of a finished task sends its results and ends"""
+    test_session.add(
+        TaskResults(
+            id=9,
+            external_id="ext_9",
+            status=TaskStatus.COMPLETED,
+            completed_at=datetime.now(timezone.utc),
+            ror_values=[1.5, 2.0],
+            ror_lower=[1.0, 1.2],
+            ror_upper=[2.0, 3.0],
+        )
+    )
+    test_session.commit()
+
+    with test_client.stream("GET", "/events", params={"task_id": 9}) as response:
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _read_sse_events(response)
+
+    assert [event["status"] for event in events] == [TaskStatus.COMPLETED]
+    assert events[0]["ror_values"] == [1.5, 2.0]
+
+
+def test_stream_task_events_pushes_changes(test_client, test_session):
+    """Test status changes published while streaming are pushed until the task ends"""
+    import threading
+    import time
+
+    from services.task_events import task_event, task_event_bus
+
+    task = TaskResults(id=10, external_id="ext_10", status=TaskStatus.PENDING)
+    test_session.add(task)
+    test_session.commit()
+    running = TaskResults(id=10, external_id="ext_10", status=TaskStatus.RUNNING)
+    completed = TaskResults(
+        id=10,
+        external_id="ext_10",
+        status=TaskStatus.COMPLETED,
+        completed_at=datetime.now(timezone.utc),
+        ror_values=[1.1],
+        ror_lower=[0.9],
+        ror_upper=[1.3],
+    )
+
+    def publish_when_subscribed():
+        deadline = time.monotonic() + 10
+        while task_event_bus.subscriber_count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        task_event_bus.publish(task_event(running, progress="marking data"))
+        task_event_bus.publish(task_event(completed))
+
+    publisher = threading.Thread(target=publish_when_subscribed)
+    publisher.start()
+    response = test_client.get("/events", params={"external_id": "ext_10"})
+    publisher.join()
+
+    assert response.status_code == HTTP_200_OK
+    events = _read_sse_events(response)
+    assert [event["status"] for event in events] == [
+        TaskStatus.PENDING,
+        TaskStatus.RUNNING,
+        TaskStatus.COMPLETED,
+    ]
+    assert events[1]["progress"] == "marking data"
+    assert events[2]["ror_values"] == [1.1]
+    assert task_event_bus.subscriber_count() == 0
+
+
+def test_stream_task_events_invalid_request(test_client):
+    """Test 422 without tasks to follow and 404 for unknown task ids"""
+    from services.task_events import task_event_bus
+
+    assert test_client.get("/events").status_code == HTTP_422_UNPROCESSABLE_CONTENT
+    response = test_client.get("/events", params={"task_id": 999})
+    assert response.status_code == HTTP_404_NOT_FOUND
+    assert task_event_bus.subscriber_count() == 0
+
+
+def test_get_available_data_etag(test_client, mocker, tmp_path):
+    """Test the available data is not sent again while its ETag matches"""
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_external_data_path.return_value = tmp_path
+    for file_type in ["demo", "drug", "outc", "reac"]:
+        (tmp_path / f"{file_type}2023q1.csv.zip").touch()
+
+    response = test_client.get("/data/available")
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["complete_quarters"] == ["2023q1"]
+    etag = response.headers["ETag"]
+
+    response = test_client.get("/data/available", headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+
+    (tmp_path / "demo2023q2.csv.zip").touch()
+    response = test_client.get("/data/available", headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["incomplete_quarters"] == ["2023q2"]
+    assert response.headers["ETag"] != etag
+
+
+def test_get_available_data_etag_and_body_from_one_snapshot(
+    test_client, mocker, tmp_path
+):
+    """Test the ETag and the body come from the same manifest snapshot"""
+    mock_settings = mocker.patch("services.pipeline_service.settings")
+    mock_settings.get_external_data_path.return_value = tmp_path
+    for file_type in ["demo", "drug", "outc", "reac"]:
+        (tmp_path / f"{file_type}2023q1.csv.zip").touch()
+    get_data_manifest = mocker.spy(pipeline_service, "get_data_manifest")
+
+    response = test_client.get("/data/available")
+
+    assert response.status_code == HTTP_200_OK
+    get_data_manifest.assert_called_once_with(tmp_path)
+    snapshot = get_data_manifest.spy_return
+    assert response.headers["ETag"] == snapshot.etag
+    assert response.json() == snapshot.available_data.model_dump(mode="json")
@@ -0,0 +1,67 @@
+"""
+Unit tests for database-wide signal screening.
+"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from count_cube import build_count_cube
+from screening import load_signals, save_signals, screen, screen_pairs
+from tests.conftest import FAERS_QUARTERS
+from utils import QuestionConfig, ror_from_counts
+
+
+@pytest.fixture(scope="module")
+def signals(faers_dir):
+    return screen(str(faers_dir), FAERS_QUARTERS, min_cases=3)
+
+
+def test_known_association_is_the_top_signal(signals):
+    for q in FAERS_QUARTERS:
+        top = signals.loc[signals.q == q].iloc[0]
+        assert (top.drug, top.reaction) == ("warfarin", "bleeding")
+        assert top.ror_lower > 1
+
+
+def test_signal_counts_match_count_cube(faers_dir, signals):
+    cube = build_count_cube(str(faers_dir), FAERS_QUARTERS)
+    config = QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"]}
+    )
+    counts = cube.quarterly_counts(config, FAERS_QUARTERS)
+
+    screened = signals.loc[
+        (signals.drug == "warfarin") & (signals.reaction == "bleeding")
+    ].set_index("q")[["a", "b", "c", "d"]]
+
+    assert screened.to_dict() == counts.to_dict()
+
+
+def test_screen_pairs_filters_and_ranks():
+    # 6 cases x 2 drugs and 6 cases x 2 reactions
+    x_drug = sp.csr_matrix(
+        np.array([[1, 0], [1, 0], [1, 0], [0, 1], [0, 1], [0, 1]], dtype=np.int32)
+    )
+    x_reac = sp.csr_matrix(
+        np.array([[1, 0], [1, 0], [0, 1], [0, 1], [0, 1], [1, 0]], dtype=np.int32)
+    )
+
+    everything = screen_pairs(x_drug, x_reac, min_cases=1, top=10)
+    a = everything.a.values
+    b, c, d = everything.b.values, everything.c.values, everything.d.values
+    np.testing.assert_allclose(everything.ror, ror_from_counts(a, b, c, d)[0])
+    assert (a + b + c + d == 6).all()
+
+    assert screen_pairs(x_drug, x_reac, min_cases=3, top=10).empty
+    assert len(screen_pairs(x_drug, x_reac, min_cases=1, top=1)) <= 1
+
+
+def test_signals_roundtrip(signals, tmp_path):
+    fn = tmp_path / "signals.npz"
+
+    save_signals(signals, str(fn))
+    loaded = load_signals(str(fn))
+
+    assert loaded.drug.tolist() == signals.drug.tolist()
+    assert loaded.q.tolist() == signals.q.tolist()
+    np.testing.assert_allclose(loaded.ror_lower, signals.ror_lower)
@@ -0,0 +1,72 @@
+"""
+Unit tests for the IC and EBGM shrinkage metrics.
+"""
+
+import numpy as np
+import pytest
+from shrinkage import (
+    DEFAULT_PRIOR,
+    GpsPrior,
+    ebgm,
+    expected_counts,
+    fit_gps_prior,
+    information_component,
+)
+
+
+def test_expected_counts():
+    np.testing.assert_allclose(
+        expected_counts([10, 5], [20, 0], [100, 100]), [2.0, 0.0]
+    )
+    assert np.isnan(expected_counts(1, 1, 0))
+
+
+def test_information_component():
+    ic, lower, upper = information_component([0, 20], [0, 4.5])
+
+    # With no observed and no expected cases IC is exactly 0
+    assert ic[0] == 0
+    assert ic[1] == pytest.approx(np.log2(20.5 / 5))
+    assert (lower < ic).all() and (ic < upper).all()
+
+
+def test_shrinkage_towards_one_for_small_counts():
+    # Same observed-to-expected ratio (10), with little and with a lot of data
+    a = np.array([1, 1000])
+    expected = np.array([0.1, 100])
+
+    ebgm_values, eb05, eb95 = ebgm(a, expected)
+    ic, _, _ = information_component(a, expected)
+
+    assert ebgm_values[0] < ebgm_values[1]
+    assert ebgm_values[1] == pytest.approx(10, rel=0.05)
+    assert ic[0] < ic[1]
+    assert ic[1] == pytest.approx(np.log2(10), abs=0.05)
+    assert (eb05 < ebgm_values).all() and (ebgm_values < eb95).all()
+
+
+def test_fit_gps_prior_recovers_simulated_prior():
+    rng = np.random.default_rng(0)
+    true_prior = DEFAULT_PRIOR
+    n_pairs = 50_000
+
+    expected = rng.gamma(1.0, 2.0, n_pairs)
+    first = rng.random(n_pairs) < true_prior.p
+    ratio = np.where(
+        first,
+        rng.gamma(true_prior.alpha1, 1 / true_prior.beta1, n_pairs),
+        rng.gamma(true_prior.alpha2, 1 / true_prior.beta2, n_pairs),
+    )
+    a = rng.poisson(ratio * expected)
+    observed = a >= 1
+
+    fitted = fit_gps_prior(a, expected, initial=GpsPrior(1.0, 1.0, 1.0, 1.0, 0.5))
+
+    # The mixture parameters are weakly identified, the posteriors are not
+    true_ebgm = ebgm(a[observed], expected[observed], true_prior)[0]
+    fitted_ebgm = ebgm(a[observed], expected[observed], fitted)[0]
+    assert np.median(np.abs(np.log(fitted_ebgm / true_ebgm))) < 0.05
+
+
+def test_fit_gps_prior_falls_back_with_few_pairs():
+    assert fit_gps_prior([1, 2, 3], [0.5, 1.0, 1.5]) == DEFAULT_PRIOR
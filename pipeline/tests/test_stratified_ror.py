@@ -0,0 +1,98 @@
+"""
+Unit tests for the ROR stratified by sex and age band.
+"""
+
+import numpy as np
+import pytest
+from mark_data import process_quarters
+from report import Reporter, load_marked_data
+from report import main as report_main
+from statsmodels.stats.contingency_tables import StratifiedTable
+from tests.conftest import FAERS_QUARTERS
+from utils import QuestionConfig, mantel_haenszel_ror
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture(scope="module")
+def config():
+    return QuestionConfig.config_from_dict(
+        {"drug": ["warfarin"], "reaction": ["bleeding"]}
+    )
+
+
+@pytest.fixture(scope="module")
+def marked_dir(faers_dir, config, tmp_path_factory):
+    dir_out = tmp_path_factory.mktemp("marked")
+    process_quarters(
+        FAERS_QUARTERS,
+        dir_in=str(faers_dir),
+        dir_out=str(dir_out),
+        config_items=[config],
+        drug_names=set(config.drugs),
+        reaction_types=set(config.reactions),
+    )
+    return dir_out
+
+
+@pytest.fixture(scope="module")
+def data(marked_dir):
+    return load_marked_data(str(marked_dir))
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_stratified_counts_add_up_to_crude_counts(data, config):
+    quarters, strata, counts = Reporter.stratified_counts(data, config)
+
+    crude = Reporter.quarterly_counts(data, config)
+    assert quarters == FAERS_QUARTERS
+    assert len(strata) == counts.shape[1]
+    np.testing.assert_array_equal(counts.sum(axis=1), crude[["a", "b", "c", "d"]])
+
+
+def test_stratum_counts_match_filtered_data(data, config):
+    quarters, strata, counts = Reporter.stratified_counts(data, config)
+
+    subset = data.loc[(data.sex == "F") & (data.age >= 45) & (data.age < 65)]
+    expected = Reporter.quarterly_counts(subset, config)
+    k = strata.index("F, 45-64")
+    np.testing.assert_array_equal(counts[:, k, :], expected[["a", "b", "c", "d"]])
+
+
+def test_mantel_haenszel_matches_statsmodels(data, config):
+    _, _, counts = Reporter.stratified_counts(data, config)
+    cumulative = counts.cumsum(axis=0)
+    ror, lower, upper = mantel_haenszel_ror(*(cumulative[..., i] for i in range(4)))
+
+    for i in range(len(FAERS_QUARTERS)):
+        tables = cumulative[i].reshape(-1, 2, 2)
+        # Strata without cases add nothing to the pooled estimate
+        tables = tables[tables.sum(axis=(1, 2)) > 0]
+        expected = StratifiedTable(tables.transpose(1, 2, 0))
+        assert ror[i] == pytest.approx(expected.oddsratio_pooled)
+        assert (lower[i], upper[i]) == pytest.approx(
+            expected.oddsratio_pooled_confint()
+        )
+
+
+def test_report_main_adds_stratified_report(faers_dir, marked_dir, tmp_path):
+    results = report_main(
+        dir_marked_data=str(marked_dir),
+        config_dict={"drug": ["warfarin"], "reaction": ["bleeding"]},
+        dir_raw_data=str(faers_dir),
+        dir_reports=str(tmp_path),
+        return_plot_data_only=True,
+        stratified=True,
+    )
+
+    stratified = results["dict-config"]["stratified_sex_age"]
+    assert stratified["ror_data"]["quarters"] == FAERS_QUARTERS
+    assert all(lower > 1 for lower in stratified["ror_data"]["ror_lower"])
+    assert "F, 45-64" in stratified["strata"]
+    assert len(stratified["strata"]["F, 45-64"]["ror_values"]) == len(FAERS_QUARTERS)
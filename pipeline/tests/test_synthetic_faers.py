@@ -0,0 +1,72 @@
+"""
+Unit tests for the synthetic FAERS data of the benchmarks.
+"""
+
+import os
+
+import pandas as pd
+import pytest
+from benchmarks.end_to_end import quarter_after
+from benchmarks.synthetic_faers import SIGNAL_DRUG, SIGNAL_REACTION, generate_faers
+from mark_data import mark_quarter
+from utils import QuestionConfig, read_demo_data
+
+QUARTERS = ["2010q4", "2011q1"]
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+
+@pytest.fixture(scope="module")
+def synthetic_dir(tmp_path_factory):
+    dir_out = tmp_path_factory.mktemp("synthetic_faers")
+    n_rows = generate_faers(str(dir_out), QUARTERS, cases_per_quarter=2000, seed=1)
+    return dir_out, n_rows
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+
+def test_generated_files_are_readable(synthetic_dir):
+    dir_out, n_rows = synthetic_dir
+    for q in QUARTERS:
+        demo = read_demo_data(os.path.join(dir_out, f"demo{q}.csv.zip"))
+        assert len(demo) == n_rows[q]["demo"] == 2000
+        for name in "drug", "reac", "outc":
+            df = pd.read_csv(os.path.join(dir_out, f"{name}{q}.csv.zip"), dtype=str)
+            assert len(df) == n_rows[q][name]
+            assert set(df.caseid) <= set(demo.caseid)
+
+
+def test_duplicate_reports_are_new_versions(synthetic_dir):
+    dir_out, _ = synthetic_dir
+    demo = pd.concat(
+        pd.read_csv(os.path.join(dir_out, f"demo{q}.csv.zip")) for q in QUARTERS
+    )
+    assert demo.primaryid.is_unique
+    n_versions = demo.groupby("caseid").size()
+    assert n_versions.max() > 1
+    assert (n_versions > 1).sum() == pytest.approx(0.05 * len(demo), rel=0.3)
+
+
+def test_signal_drug_is_associated_with_signal_reaction(synthetic_dir):
+    dir_out, _ = synthetic_dir
+    config = QuestionConfig.config_from_dict(
+        {"drug": [SIGNAL_DRUG], "reaction": [SIGNAL_REACTION]}
+    )
+    marked = mark_quarter(
+        QUARTERS[0], str(dir_out), [config], config.drugs, config.reactions
+    )
+    exposed = marked[f"exposed {config.name}"]
+    reacted = marked[f"reacted {config.name}"]
+    assert exposed.any() and (~exposed).any()
+    assert reacted[exposed].mean() > 1.5 * reacted[~exposed].mean()
+
+
+def test_quarter_after():
+    assert quarter_after("2010q1", 0) == "2010q1"
+    assert quarter_after("2010q1", 3) == "2010q4"
+    assert quarter_after("2010q3", 8) == "2012q3"
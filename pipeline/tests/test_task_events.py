@@ -0,0 +1,88 @@
+"""
+Tests for the task status event bus
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from constants import TaskStatus
+from models.models import TaskResults
+from services.task_events import (
+    TaskEventBus,
+    format_sse,
+    init_worker,
+    publish_task_event,
+    task_event,
+    task_event_bus,
+)
+
+
+def test_task_event_sends_results_of_finished_tasks_only():
+    """Test ROR arrays are only part of the events of finished tasks"""
+    task = TaskResults(
+        id=1, external_id="ext_1", status=TaskStatus.RUNNING, ror_values=[1.0]
+    )
+    assert task_event(task, progress="marking data").ror_values == []
+
+    task.status = TaskStatus.COMPLETED
+    event = task_event(task)
+    assert event.ror_values == [1.0]
+    assert format_sse(event).startswith("event: status\ndata: {")
+
+
+@pytest.mark.asyncio
+async def test_dispatch_to_matching_subscriptions():
+    """Test events reach the subscriptions of their task id or external_id"""
+    bus = TaskEventBus()
+    by_id = bus.subscribe(task_ids=[1])
+    by_external_id = bus.subscribe(external_ids=["ext_1"])
+    other = bus.subscribe(task_ids=[2], external_ids=["ext_2"])
+
+    bus.publish(task_event(TaskResults(id=1, external_id="ext_1")))
+    await asyncio.sleep(0)
+
+    assert by_id.queue.qsize() == 1
+    assert by_external_id.queue.qsize() == 1
+    assert other.queue.empty()
+
+    bus.unsubscribe(by_id)
+    assert bus.subscriber_count() == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_keeps_latest_events(mocker):
+    """Test a full subscription drops its oldest events"""
+    mocker.patch("services.task_events.settings.PIPELINE_EVENTS_QUEUE_SIZE", 2)
+    bus = TaskEventBus()
+    subscription = bus.subscribe(task_ids=[1])
+
+    for status in [TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.COMPLETED]:
+        bus.publish(task_event(TaskResults(id=1, external_id="ext_1", status=status)))
+    await asyncio.sleep(0)
+
+    statuses = [subscription.queue.get_nowait().status for _ in range(2)]
+    assert statuses == [TaskStatus.RUNNING, TaskStatus.COMPLETED]
+
+
+def _publish_from_task_process(task_id):
+    publish_task_event(
+        TaskResults(id=task_id, external_id="ext", status=TaskStatus.COMPLETED)
+    )
+
+
+@pytest.mark.asyncio
+async def test_events_of_task_processes_reach_the_api_process():
+    """Test events published in a pool process are dispatched in this process"""
+    subscription = task_event_bus.subscribe(task_ids=[42])
+    try:
+        with ProcessPoolExecutor(
+            1, initializer=init_worker, initargs=(task_event_bus.worker_queue(),)
+        ) as executor:
+            await asyncio.wrap_future(executor.submit(_publish_from_task_process, 42))
+        event = await asyncio.wait_for(subscription.queue.get(), timeout=10)
+    finally:
+        task_event_bus.unsubscribe(subscription)
+
+    assert event.id == 42
+    assert event.status == TaskStatus.COMPLETED
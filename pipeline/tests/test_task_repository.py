@@ -364,3 +364,76 @@ def test_save_task_results_preserves_timestamps(test_session, create_test_task):
     if completed_at.tzinfo is None:
         completed_at = completed_at.replace(tzinfo=timezone.utc)
     assert completed_at == original_completed_at
+
+
+# Tests for slot allocation at scale and across processes
+def test_reusable_slot_lookup_uses_status_completed_at_index(test_session):
+    """Test the oldest reusable slot is found through the composite index."""
+    from sqlalchemy import text
+
+    plan = test_session.exec(
+        text(
+            "EXPLAIN QUERY PLAN SELECT id FROM tasks "
+            "WHERE status IN ('COMPLETED', 'FAILED') AND completed_at <= '2030-01-01' "
+            "ORDER BY completed_at LIMIT 1"
+        )
+    ).all()
+
+    assert any("ix_tasks_status_completed_at" in row[-1] for row in plan)
+
+
+def test_create_or_reuse_slot_drops_old_quarterly_counts(
+    test_session, mock_settings, create_test_task
+):
+    """Test the stored counts of a reused slot are deleted."""
+    from models.models import TaskQuarterlyCounts
+
+    mock_settings.PIPELINE_MAX_RESULTS = 1
+    old_time = datetime.now(timezone.utc) - timedelta(minutes=75)
+    old_task = create_test_task("old_task", TaskStatus.COMPLETED, old_time)
+    test_session.add(
+        TaskQuarterlyCounts(
+            task_id=old_task.id, first_quarter="2020q1", last_quarter="2020q2"
+        )
+    )
+    test_session.commit()
+
+    new_task = TaskRepository.create_or_reuse_slot("new_task")
+
+    assert new_task.id == old_task.id
+    assert test_session.get(TaskQuarterlyCounts, old_task.id) is None
+
+
+def _hold_lock(path, acquired, hold_seconds):
+    import time
+
+    from core.locks import FileLock
+
+    with FileLock(path):
+        acquired.set()
+        time.sleep(hold_seconds)
+
+
+def test_file_lock_excludes_other_processes(tmp_path):
+    """Test the slot lock blocks while another process holds it."""
+    import multiprocessing
+    import time
+
+    from core.locks import FileLock
+
+    context = multiprocessing.get_context("spawn")
+    acquired = context.Event()
+    process = context.Process(
+        target=_hold_lock, args=(tmp_path / "slots.lock", acquired, 0.5)
+    )
+    process.start()
+    assert acquired.wait(30)
+
+    start = time.monotonic()
+    with FileLock(tmp_path / "slots.lock") as lock:
+        waited = time.monotonic() - start
+        assert lock.locked()
+    process.join()
+
+    assert waited > 0.2
+    assert not lock.locked()
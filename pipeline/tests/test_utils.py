@@ -1,8 +1,17 @@
 import math
 
+import numpy as np
+import pandas as pd
 import pytest
+from constants import RorFields, RorMode
 from models import TaskResults
-from utils import normalise_empty_ror_fields
+from utils import (
+    ContingencyMatrix,
+    normalise_empty_ror_fields,
+    ror_field_name,
+    ror_from_counts,
+    timeline_counts,
+)
 
 
 class TestNormaliseEmptyRorFields:
@@ -88,3 +97,72 @@ class TestNormaliseEmptyRorFields:
         assert task.ror_upper == expected_ror_upper, (
             f"ror_upper: expected {expected_ror_upper}, got {task.ror_upper}"
         )
+
+
+class TestRorFromCounts:
+    """ror_from_counts must agree with ContingencyMatrix.ror, including its NaN handling"""
+
+    @pytest.mark.parametrize(
+        "a, b, c, d",
+        [
+            (10, 20, 30, 400),
+            (1, 1, 1, 1),
+            (0, 20, 30, 400),  # ROR 0, no interval
+            (10, 0, 30, 400),  # ROR undefined
+            (10, 20, 0, 400),  # ROR undefined
+            (10, 20, 30, 0),  # ROR 0, no interval
+        ],
+    )
+    def test_matches_contingency_matrix(self, a, b, c, d):
+        crosstab = pd.DataFrame(
+            [[d, c], [b, a]],
+            index=pd.Index([False, True], name="exposure"),
+            columns=pd.Index([False, True], name="outcome"),
+        )
+        expected_ror, (expected_lower, expected_upper) = ContingencyMatrix(
+            crosstab
+        ).ror()
+
+        ror, lower, upper = ror_from_counts([a], [b], [c], [d])
+
+        np.testing.assert_allclose(ror, [expected_ror])
+        np.testing.assert_allclose(lower, [expected_lower])
+        np.testing.assert_allclose(upper, [expected_upper])
+
+
+class TestTimelineCounts:
+    """Counts behind each timeline point, from a single per-quarter count vector"""
+
+    @pytest.fixture
+    def counts(self):
+        return pd.DataFrame(
+            {
+                "a": [1, 2, 3, 4, 5],
+                "b": [1, 1, 1, 1, 1],
+                "c": [0, 1, 0, 1, 0],
+                "d": [10, 10, 10, 10, 10],
+            },
+            index=pd.Index(["2020q1", "2020q2", "2020q3", "2020q4", "2021q1"]),
+        )
+
+    def test_cumulative(self, counts):
+        cumulative = timeline_counts(counts, RorMode.CUMULATIVE)
+        assert cumulative.a.tolist() == [1, 3, 6, 10, 15]
+
+    def test_window(self, counts):
+        window = timeline_counts(counts, RorMode.WINDOW, window=2)
+        assert window.a.tolist() == [1, 3, 5, 7, 9]
+        assert window.d.tolist() == [10, 20, 20, 20, 20]
+        # A window of all the quarters is the cumulative timeline
+        pd.testing.assert_frame_equal(
+            timeline_counts(counts, RorMode.WINDOW, window=5),
+            timeline_counts(counts, RorMode.CUMULATIVE),
+        )
+
+    def test_quarterly(self, counts):
+        quarterly = timeline_counts(counts, RorMode.QUARTERLY)
+        pd.testing.assert_frame_equal(quarterly, counts)
+
+    def test_ror_field_name(self):
+        assert ror_field_name(RorMode.CUMULATIVE, RorFields.ROR_VALUES) == "ror_values"
+        assert ror_field_name(RorMode.WINDOW, RorFields.ROR_LOWER) == "window_ror_lower"
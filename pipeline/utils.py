@@ -5,11 +5,12 @@ import os
 import re
 from glob import glob
 from pathlib import Path
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
 import scipy.stats as stats
+from constants import RorFields, RorMode
 from models import TaskResults
 
 logger = logging.getLogger("FAERS")
@@ -68,6 +69,15 @@ class Quarter:
             year += 1
         return Quarter(year, quarter)
 
+    def decrement(self):
+        year = self.year
+        quarter = self.quarter
+        quarter -= 1
+        if quarter < 1:
+            quarter = 4
+            year -= 1
+        return Quarter(year, quarter)
+
     def __eq__(self, other):
         if other is self:
             return True
@@ -199,6 +209,73 @@ class ContingencyMatrix:
         return self.__str__()
 
 
+def ror_from_counts(a, b, c, d, alpha=0.05):
+    """Vectorized ContingencyMatrix.ror over arrays of 2x2 counts.
+
+    Returns (ror, lower, upper) arrays with the same NaN conventions:
+    ROR is NaN when b*c is zero, and the confidence interval is NaN
+    unless all four counts are non-zero.
+    """
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+    interval = stats.distributions.norm.interval(1 - alpha)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = b * c
+        ror = np.where(denominator != 0, (a * d) / denominator, np.nan)
+        all_nonzero = (a != 0) & (b != 0) & (c != 0) & (d != 0)
+        ln_ror = np.log(ror)
+        standard_error_ln_ror = np.sqrt(1 / a + 1 / b + 1 / c + 1 / d)
+        lower = np.where(
+            all_nonzero, np.exp(ln_ror + interval[0] * standard_error_ln_ror), np.nan
+        )
+        upper = np.where(
+            all_nonzero, np.exp(ln_ror + interval[1] * standard_error_ln_ror), np.nan
+        )
+    return ror, lower, upper
+
+
+def mantel_haenszel_ror(a, b, c, d, alpha=0.05):
+    """Mantel-Haenszel pooled ROR over the last axis (strata) of arrays of 2x2 counts.
+
+    Returns (ror, lower, upper) arrays of the leading shape (e.g. one value per
+    quarter for (quarters x strata) counts). The confidence interval uses the
+    Robins-Breslow-Greenland variance. Strata without cases do not contribute.
+    """
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+    n = a + b + c + d
+    interval = stats.distributions.norm.interval(1 - alpha)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = np.where(n > 0, n, np.nan)
+        r = np.nansum(a * d / n, axis=-1)
+        s = np.nansum(b * c / n, axis=-1)
+        p = (a + d) / n
+        q = (b + c) / n
+        ror = np.where(s != 0, r / s, np.nan)
+        variance = (
+            np.nansum(p * a * d / n, axis=-1) / (2 * r**2)
+            + np.nansum((p * b * c + q * a * d) / n, axis=-1) / (2 * r * s)
+            + np.nansum(q * b * c / n, axis=-1) / (2 * s**2)
+        )
+        standard_error_ln_ror = np.where((r > 0) & (s > 0), np.sqrt(variance), np.nan)
+        ln_ror = np.log(ror)
+        lower = np.exp(ln_ror + interval[0] * standard_error_ln_ror)
+        upper = np.exp(ln_ror + interval[1] * standard_error_ln_ror)
+    return ror, lower, upper
+
+
+def timeline_counts(counts: pd.DataFrame, mode: str, window: int = 4) -> pd.DataFrame:
+    """2x2 counts behind each point of a ROR timeline, from the per-quarter counts.
+
+    cumulative: all quarters up to the point; window: the last `window` quarters
+    (of the quarters with data) up to the point; quarterly: the quarter itself.
+    """
+    if mode == RorMode.QUARTERLY:
+        return counts
+    cumulative = counts.cumsum()
+    if mode == RorMode.WINDOW:
+        return cumulative - cumulative.shift(window, fill_value=0)
+    return cumulative
+
+
 class QuestionConfig:
     def __init__(self, name, drugs, reactions, control):
         self.name = name
@@ -375,6 +452,14 @@ def compute_df_uniqueness(df, cols=None, do_print=False, print_prefix=None):
     return frac_unique
 
 
+def ror_field_name(mode: str, field: str) -> str:
+    """Name of a ROR field of the given timeline mode, e.g. window_ror_values."""
+    field = RorFields(field).value
+    if mode == RorMode.CUMULATIVE:
+        return field
+    return f"{RorMode(mode).value}_{field}"
+
+
 def get_ror_fields(json_file: Union[str, Path]) -> Dict[str, Any]:
     """Extract ROR fields from the JSON file that main function of report.py creates
 
@@ -382,7 +467,9 @@ def get_ror_fields(json_file: Union[str, Path]) -> Dict[str, Any]:
         json_file: Path to the JSON file containing ROR data
 
     Returns:
-        Dictionary with ror_values, ror_lower, and ror_upper
+        Dictionary with ror_values, ror_lower, and ror_upper of the cumulative timeline,
+        and the same fields of the window and per-quarter timelines (e.g.
+        window_ror_values) when present
 
     Raises:
         FileNotFoundError: If the JSON file doesn't exist
@@ -402,16 +489,50 @@ def get_ror_fields(json_file: Union[str, Path]) -> Dict[str, Any]:
 
         ror_data = file_content[first_key]["initial_data"]["ror_data"]
 
-        return {
+        ror_fields = {
             "ror_values": ror_data["ror_values"],
             "ror_lower": ror_data["ror_lower"],
             "ror_upper": ror_data["ror_upper"],
         }
+        # Window and per-quarter series, when the report calculated them
+        for mode in RorMode.WINDOW, RorMode.QUARTERLY:
+            for field in RorFields:
+                name = ror_field_name(mode, field)
+                if name in ror_data:
+                    ror_fields[name] = ror_data[name]
+        return ror_fields
 
     except (FileNotFoundError, KeyError, IndexError, json.JSONDecodeError) as e:
         raise ValueError(f"Error processing ROR data from {json_file}: {e}")
 
 
+def get_quarterly_counts(json_file: Union[str, Path]) -> Optional[Dict[str, List]]:
+    """Extract the per-quarter 2x2 counts of the initial data from the results JSON file
+
+    Returns:
+        Dictionary with quarters and the a, b, c and d count lists, or None when the
+        results were produced without counts
+    """
+    try:
+        with open(json_file, "r", encoding="utf-8") as f:
+            file_content = json.load(f)
+        first_key = next(iter(file_content))
+        ror_data = file_content[first_key]["initial_data"]["ror_data"]
+    except (
+        FileNotFoundError,
+        KeyError,
+        StopIteration,
+        TypeError,
+        json.JSONDecodeError,
+    ) as e:
+        raise ValueError(f"Error processing ROR data from {json_file}: {e}")
+
+    counts = ror_data.get("counts")
+    if counts is None:
+        return None
+    return {"quarters": ror_data["quarters"], **counts}
+
+
 def normalise_empty_ror_fields(task: TaskResults) -> list[str]:
     """
     Normalize ROR arrays for safe JSON serialization.